@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Measures the latency of small conversions served by an event loop
+while large messages are converted concurrently, with
+:py:meth:`~mercator.ProtoMapping.to_protobuf` blocking the loop and
+with :py:meth:`~mercator.ProtoMapping.to_protobuf_async`.
+
+Small requests are issued every millisecond and their latency is the
+time between the moment they are due and the end of their conversion,
+which includes the lag of the event loop.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.async_lag
+"""
+import asyncio
+import statistics
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.functional.mappings import UserMapping
+
+
+def make_user(token_count):
+    return {
+        'id': 'some-uuid',
+        'login': 'Hulk',
+        'tokens': [
+            {'data': f'token-{index}', 'created_at': 1552240433 + index}
+            for index in range(token_count)
+        ],
+    }
+
+
+async def serve_small_requests(latencies, stop, interval=0.001):
+    small = make_user(3)
+    due = time.perf_counter()
+    while not stop.is_set():
+        due += interval
+        await asyncio.sleep(max(due - time.perf_counter(), 0))
+        UserMapping(small).to_protobuf()
+        latencies.append(time.perf_counter() - due)
+        # skip the requests that could not be served in time
+        due = max(due, time.perf_counter() - interval)
+
+
+async def run(convert, big, rounds):
+    latencies = []
+    durations = []
+    stop = asyncio.Event()
+    server = asyncio.ensure_future(serve_small_requests(latencies, stop))
+    for _ in range(rounds):
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await convert(big)
+        durations.append(time.perf_counter() - started)
+
+    stop.set()
+    await server
+    return latencies, durations
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main(token_count=20000, rounds=10):
+    big = make_user(token_count)
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def blocking(data):
+        return UserMapping(data).to_protobuf()
+
+    def sliced(slice_size):
+        async def convert(data):
+            return await UserMapping(data).to_protobuf_async(slice_size=slice_size)
+        return convert
+
+    async def offloaded(data):
+        return await UserMapping(data).to_protobuf_async(executor=executor)
+
+    scenarios = [
+        ('to_protobuf()', blocking),
+        ('to_protobuf_async(slice_size=1000)', sliced(1000)),
+        ('to_protobuf_async(slice_size=250)', sliced(250)),
+        ('to_protobuf_async(executor=threads)', offloaded),
+    ]
+    print(f'{token_count} tokens converted {rounds} times, small requests every 1 ms')
+    for name, convert in scenarios:
+        latencies, durations = asyncio.run(run(convert, big, rounds))
+        print(f'{name:<38} small p50 {percentile(latencies, 0.5) * 1e3:6.2f} ms'
+              f'  p99 {percentile(latencies, 0.99) * 1e3:6.2f} ms'
+              f'  max {max(latencies) * 1e3:6.2f} ms'
+              f'  big conversion {statistics.median(durations) * 1e3:6.1f} ms')
+
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
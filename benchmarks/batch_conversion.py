@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Compares the per-row cost of :py:meth:`~mercator.ProtoMapping.to_protobuf_many`
+against the loop of one :py:class:`~mercator.ProtoMapping` per record.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.batch_conversion
+"""
+import timeit
+
+from tests.functional.mappings import UserMapping, UserAuthTokenMapping
+from tests.functional import domain_pb2
+from tests.functional import sql
+
+
+def make_rows(count):
+    rows = []
+    for index in range(count):
+        tokens = [
+            {'data': f'token-{index}-{n}', 'created_at': 1552240433, 'expires_at': 1552240733}
+            for n in range(3)
+        ]
+        if index % 2:
+            rows.append({'id': str(index), 'login': f'user{index}', 'email': f'{index}@test.com', 'tokens': tokens})
+        else:
+            rows.append(sql.User(login=f'user{index}', email=f'{index}@test.com'))
+
+    return rows
+
+
+def per_row_microseconds(function, rows, repeat=9):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return best / len(rows) * 1e6
+
+
+def main(count=10000):
+    rows = make_rows(count)
+    tokens = [token for row in rows if isinstance(row, dict) for token in row['tokens']]
+
+    results = {
+        'loop: [Mapping(row).to_protobuf() for row in rows]': per_row_microseconds(
+            lambda: [UserMapping(row).to_protobuf() for row in rows], rows),
+        'batch: Mapping.to_protobuf_many(rows)': per_row_microseconds(
+            lambda: UserMapping.to_protobuf_many(rows), rows),
+        'loop: parent.tokens.extend(Mapping(t).to_protobuf() ...)': per_row_microseconds(
+            lambda: domain_pb2.User().tokens.extend(UserAuthTokenMapping(t).to_protobuf() for t in tokens), tokens),
+        'batch: Mapping.to_protobuf_many(tokens, into=parent.tokens)': per_row_microseconds(
+            lambda: UserAuthTokenMapping.to_protobuf_many(tokens, into=domain_pb2.User().tokens), tokens),
+    }
+    for name, microseconds in results.items():
+        print(f'{name:<65} {microseconds:8.2f} µs/row')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Compares :py:meth:`~mercator.ProtoMapping.to_protobuf_columns`
+against exploding the same columns into one :py:class:`dict` per row
+for :py:meth:`~mercator.ProtoMapping.to_protobuf_many`, with NumPy
+arrays when available and python lists otherwise.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.columnar_input
+"""
+import sys
+import time
+
+from tests.functional.mappings import UserAuthTokenMapping, MeasurementMapping
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_columns(count):
+    if numpy is None:
+        return {
+            UserAuthTokenMapping: {
+                'data': [f'token-{index}' for index in range(count)],
+                'created_at': list(range(1552240433, 1552240433 + count)),
+            },
+            MeasurementMapping: {
+                'value': [index / 7 for index in range(count)],
+                'count': list(range(count)),
+                'unit': ['kg'] * count,
+            },
+        }
+
+    return {
+        UserAuthTokenMapping: {
+            'data': numpy.char.add('token-', numpy.arange(count).astype(str)),
+            'created_at': numpy.arange(1552240433, 1552240433 + count, dtype='i8'),
+        },
+        MeasurementMapping: {
+            'value': numpy.arange(count, dtype='f8') / 7,
+            'count': numpy.arange(count, dtype='u4'),
+            'unit': numpy.full(count, 'kg'),
+        },
+    }
+
+
+def explode_rows(columns):
+    """the per-row path: one dict per row with python values"""
+    names = list(columns)
+    values = [column.tolist() if hasattr(column, 'tolist') else column for column in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def measure(function):
+    started = time.perf_counter()
+    messages = function()
+    return time.perf_counter() - started, len(messages)
+
+
+def main(count=1000000):
+    print(f'{count} rows of {"numpy arrays" if numpy is not None else "python lists"}')
+    for mapping, columns in make_columns(count).items():
+        results = {
+            'dict per row + to_protobuf_many()': measure(
+                lambda: mapping.to_protobuf_many(explode_rows(columns))),
+            'to_protobuf_columns()': measure(
+                lambda: mapping.to_protobuf_columns(columns)),
+        }
+        baseline = results['dict per row + to_protobuf_many()'][0]
+        for name, (seconds, converted) in results.items():
+            print(f'{mapping.__name__:<22} {name:<36} {seconds:6.2f} s '
+                  f'{seconds / converted * 1e6:6.2f} µs/row ({baseline / seconds:4.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Compares converting ORM instances against converting the rows of
+a SQLAlchemy Core result with :py:meth:`~mercator.ProtoMapping.to_protobuf_rows`,
+including the time spent querying an in-memory SQLite database.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.core_rows
+"""
+import time
+
+from mercator.orm import loader_options
+from mercator.orm import select_columns
+
+from tests.functional import sql
+from tests.functional.mappings import UserAuthTokenMapping
+
+
+def create_tokens(session, count):
+    session.bulk_insert_mappings(sql.AuthToken, [
+        {'data': f'token-{index}', 'created_at': 1552240433 + index}
+        for index in range(count)
+    ])
+    session.commit()
+
+
+def measure(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        messages = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, len(messages)
+
+
+def main(count=100000):
+    session = sql.create_session()
+    create_tokens(session, count)
+
+    def orm_instances():
+        session.expunge_all()
+        return UserAuthTokenMapping.to_protobuf_many(session.query(sql.AuthToken))
+
+    def orm_load_only():
+        session.expunge_all()
+        query = session.query(sql.AuthToken).options(*loader_options(UserAuthTokenMapping))
+        return UserAuthTokenMapping.to_protobuf_many(query)
+
+    def core_rows():
+        result = session.execute(select_columns(UserAuthTokenMapping))
+        return UserAuthTokenMapping.to_protobuf_rows(result)
+
+    results = {
+        'ORM instances': measure(orm_instances),
+        'ORM instances with load_only': measure(orm_load_only),
+        'Core rows': measure(core_rows),
+    }
+    baseline = results['ORM instances'][0]
+    for name, (seconds, converted) in results.items():
+        print(f'{name:<30} {converted} rows in {seconds:6.3f} s '
+              f'{seconds / converted * 1e6:6.2f} µs/row ({baseline / seconds:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
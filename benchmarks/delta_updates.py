@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Measures updates of wide messages that already exist, applying the
+changed keys with :py:meth:`~mercator.ProtoMapping.apply_to` against
+converting the whole new version with
+:py:meth:`~mercator.ProtoMapping.to_protobuf`, and computing the
+changes with :py:meth:`~mercator.ProtoMapping.diff` first.
+
+Run from the project root:
+
+.. code:: bash
+
+   python -m benchmarks.delta_updates
+"""
+import timeit
+
+from .synthetic import build_message_classes
+from .synthetic import declare_mapping
+from .synthetic import make_record
+
+
+FIELD_COUNT = 80
+EXPLICIT_FIELDS = 40
+
+
+def per_record_microseconds(function, records, repeat=7):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return best / len(records) * 1e6
+
+
+def change_record(record, changed):
+    "returns a copy of ``record`` with new values for its first ``changed`` keys"
+    new = dict(record)
+    for key in list(record)[:changed]:
+        value = record[key]
+        new[key] = not value if isinstance(value, bool) else value * 2
+
+    return new
+
+
+def main(count=5000):
+    message_class, = build_message_classes(1, FIELD_COUNT)
+    mapping = declare_mapping(message_class, explicit_fields=EXPLICIT_FIELDS)
+
+    old = [make_record(FIELD_COUNT, explicit_fields=EXPLICIT_FIELDS, index=index) for index in range(count)]
+    messages = [mapping(record).to_protobuf() for record in old]
+
+    print(f'{count} messages of {FIELD_COUNT} fields, microseconds per message')
+    for changed in (1, 4, 16):
+        new = [change_record(record, changed) for record in old]
+        changes = [mapping.diff(before, after) for before, after in zip(old, new)]
+        assert all(len(item) == changed for item in changes)
+
+        def rebuild():
+            return [mapping(record).to_protobuf() for record in new]
+
+        def apply_changes():
+            for item, message in zip(changes, messages):
+                mapping(item).apply_to(message)
+
+        def diff_and_apply():
+            for before, after, message in zip(old, new, messages):
+                mapping(mapping.diff(before, after)).apply_to(message)
+
+        apply_changes()
+        assert messages == rebuild()
+
+        print(f'{changed} changed field(s)')
+        for name, function in [
+            ('to_protobuf() of the new version', rebuild),
+            ('apply_to() of the changes', apply_changes),
+            ('diff() and apply_to()', diff_and_apply),
+        ]:
+            print(f'  {name:<34} {per_record_microseconds(function, new):8.2f}')
+
+        messages = [mapping(record).to_protobuf() for record in old]
+
+
+if __name__ == '__main__':
+    main()
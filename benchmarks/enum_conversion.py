@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of media whose content type is given by
+name, converted by hand per record before
+:py:meth:`~mercator.ProtoMapping.to_protobuf_many`, with the enum
+wrapper of the generated module, and with :py:class:`~mercator.ProtoEnum`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.enum_conversion
+"""
+import timeit
+
+from mercator import ProtoMapping, ProtoKey, ProtoEnum, MercatorDomainClass
+
+from tests.functional import domain_pb2
+
+
+NAMES = ['video', 'IMAGE', 'Blog_Post', 'gif', 'mp4']
+ALIASES = {'mp4': 'VIDEO'}
+
+
+class EnumWrapperCaster(MercatorDomainClass):
+    "looks up names with the enum wrapper of the generated module"
+    def __call__(self, value):
+        name = value.upper()
+        return domain_pb2.UserMedia.ContentType.Value(ALIASES.get(value.lower(), name))
+
+
+class HandConvertedMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('id', str)
+    content_type = ProtoKey('kind', int)
+
+
+class WrapperMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('id', str)
+    content_type = ProtoKey('kind', EnumWrapperCaster())
+
+
+class EnumMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('id', str)
+    content_type = ProtoEnum('kind', aliases=ALIASES)
+
+
+def make_media(count):
+    return [{'id': f'media-{index}', 'kind': NAMES[index % len(NAMES)]} for index in range(count)]
+
+
+def convert_by_hand(media):
+    "the per-record pre-conversion that ProtoEnum replaces"
+    records = []
+    for item in media:
+        record = dict(item)
+        kind = record['kind'].lower()
+        record['kind'] = domain_pb2.UserMedia.ContentType.Value(ALIASES.get(kind, kind.upper()))
+        records.append(record)
+
+    return HandConvertedMediaMapping.to_protobuf_many(records)
+
+
+def milliseconds(function, repeat=5, number=3):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main(count=50000):
+    media = make_media(count)
+    expected = EnumMediaMapping.to_protobuf_many(media)
+    assert convert_by_hand(media) == expected
+    assert WrapperMediaMapping.to_protobuf_many(media) == expected
+
+    scenarios = [
+        ('by hand per record', lambda: convert_by_hand(media)),
+        ('enum wrapper caster', lambda: WrapperMediaMapping.to_protobuf_many(media)),
+        ('ProtoEnum', lambda: EnumMediaMapping.to_protobuf_many(media)),
+    ]
+    print(f'{count} media with a content type by name')
+    for name, function in scenarios:
+        print(f'{name:<24} to_protobuf_many() {milliseconds(function):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
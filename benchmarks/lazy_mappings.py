@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Measures the import time of a module with many
+:py:class:`~mercator.ProtoMapping` declarations, eager against
+``__lazy__``, and the cost paid later on first use or by
+:py:func:`~mercator.finalize_all`.
+
+Run from the project root:
+
+.. code:: bash
+
+   python -m benchmarks.lazy_mappings
+"""
+import time
+
+from mercator import finalize_all
+
+from .synthetic import build_message_classes
+from .synthetic import declare_mapping
+from .synthetic import make_record
+
+
+MAPPING_COUNT = 400
+FIELD_COUNT = 20
+EXPLICIT_FIELDS = 3
+
+
+def milliseconds(function):
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def declare_mappings(message_classes, lazy):
+    "the equivalent of importing a module with one mapping per message"
+    return [
+        declare_mapping(message_class, explicit_fields=EXPLICIT_FIELDS, __lazy__=lazy)
+        for message_class in message_classes
+    ]
+
+
+def use_mappings(mappings):
+    record = make_record(FIELD_COUNT, explicit_fields=EXPLICIT_FIELDS)
+    for mapping in mappings:
+        mapping(record).to_protobuf()
+
+
+def main():
+    for lazy in (False, True):
+        message_classes = build_message_classes(MAPPING_COUNT, FIELD_COUNT)
+
+        declaring, mappings = milliseconds(lambda: declare_mappings(message_classes, lazy))
+        first_use, _ = milliseconds(lambda: use_mappings(mappings[:3]))
+        finalizing, _ = milliseconds(finalize_all)
+
+        print(f'{"lazy" if lazy else "eager":>5}: '
+              f'import {MAPPING_COUNT} mappings {declaring:7.1f} ms, '
+              f'first use of 3 mappings {first_use:5.1f} ms, '
+              f'finalize_all() {finalizing:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
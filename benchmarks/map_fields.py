@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of ``map`` fields of 10k entries filled by
+hand after the conversion, one ``CopyFrom()`` or assignment at a time,
+and with :py:class:`~mercator.ProtoMap`, into messages with
+:py:meth:`~mercator.ProtoMapping.to_protobuf` and into bytes with
+:py:meth:`~mercator.ProtoMapping.to_bytes`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.map_fields
+"""
+import timeit
+
+from google.protobuf import struct_pb2
+
+from mercator import ProtoMapping, ProtoKey, ProtoMap
+
+from tests.functional import domain_pb2
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+
+    string_value = ProtoKey('text', str)
+    number_value = ProtoKey('amount', float)
+
+
+class StructMapping(ProtoMapping):
+    __proto__ = struct_pb2.Struct
+
+    fields = ProtoMap('properties', ValueMapping, key='name')
+
+
+class MeasurementMapping(ProtoMapping):
+    __proto__ = domain_pb2.Measurement
+
+    value = ProtoKey('value', float)
+
+
+class LabeledMeasurementMapping(ProtoMapping):
+    __proto__ = domain_pb2.Measurement
+
+    value = ProtoKey('value', float)
+    labels = ProtoMap('labels', str)
+
+
+def make_struct(count):
+    return {'properties': [{'name': f'property-{index}', 'amount': index} for index in range(count)]}
+
+
+def make_measurement(count):
+    return {'value': 1.5, 'labels': dict([(f'label-{index}', f'value-{index}') for index in range(count)])}
+
+
+def struct_by_hand(data):
+    "the post-processing that ProtoMap replaces"
+    message = struct_pb2.Struct()
+    for record in data['properties']:
+        message.fields[record['name']].CopyFrom(ValueMapping(record).to_protobuf())
+
+    return message
+
+
+def measurement_by_hand(data):
+    message = MeasurementMapping(data).to_protobuf()
+    for key, value in data['labels'].items():
+        message.labels[key] = value
+
+    return message
+
+
+def milliseconds(function, repeat=5, number=3):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main(count=10000):
+    struct = make_struct(count)
+    measurement = make_measurement(count)
+    assert struct_by_hand(struct) == StructMapping(struct).to_protobuf()
+    assert measurement_by_hand(measurement) == LabeledMeasurementMapping(measurement).to_protobuf()
+
+    scenarios = [
+        ('Struct by hand', lambda: struct_by_hand(struct)),
+        ('Struct to_protobuf()', lambda: StructMapping(struct).to_protobuf()),
+        ('Struct to_bytes()', lambda: StructMapping(struct).to_bytes()),
+        ('labels by hand', lambda: measurement_by_hand(measurement)),
+        ('labels to_protobuf()', lambda: LabeledMeasurementMapping(measurement).to_protobuf()),
+        ('labels to_bytes()', lambda: LabeledMeasurementMapping(measurement).to_bytes()),
+    ]
+    print(f'maps of {count} entries')
+    for name, function in scenarios:
+        print(f'{name:<24} {milliseconds(function):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Measures the memory held by many :py:class:`~mercator.ProtoMapping`
+subclasses, as with generated variants of mappings of the same
+messages, and by :py:class:`~mercator.ProtoMapping` instances.
+
+Memory is measured with :py:mod:`tracemalloc` after the message
+classes are built, so it only accounts for the mappings: their field
+tables, field mappings and compiled plans.
+
+Run from the project root:
+
+.. code:: bash
+
+   python -m benchmarks.mapping_memory
+"""
+import gc
+import tracemalloc
+
+from .synthetic import build_message_classes
+from .synthetic import declare_mapping
+
+
+def allocated(function):
+    """returns the result of ``function`` and the memory it allocated in bytes"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function()
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def main(count=500, field_count=20, variants=4, instances=100000):
+    message_classes = build_message_classes(count, field_count)
+    tracemalloc.start()
+
+    mappings, declared = allocated(lambda: [
+        declare_mapping(message_class, explicit_fields=variant, __lazy__=True, __compact__=True)
+        for variant in range(variants)
+        for message_class in message_classes
+    ])
+    _, finalized = allocated(lambda: [mapping.__fields__ for mapping in mappings])
+
+    mapping = mappings[0]
+    _, per_instance = allocated(lambda: [mapping({}) for _ in range(instances)])
+
+    tracemalloc.stop()
+    total = len(mappings)
+    print(f'{total} mappings of {count} messages with {field_count} fields:')
+    print(f'  declared   {declared / total:8.0f} bytes/mapping')
+    print(f'  finalized  {finalized / total:8.0f} bytes/mapping (field tables and compiled plans)')
+    print(f'  total      {(declared + finalized) / 2 ** 20:8.1f} MiB')
+    print(f'  instances  {per_instance / instances:8.0f} bytes/instance (including the list)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of media sharing a few authors, each with
+tokens, with and without a :py:class:`~mercator.MemoCache`, into
+messages with :py:meth:`~mercator.ProtoMapping.to_protobuf_many` and
+into bytes with :py:meth:`~mercator.ProtoMapping.to_bytes`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.memo_cache
+"""
+import timeit
+
+from mercator import ProtoMapping, ProtoKey, MemoCache
+
+from tests.functional import domain_pb2
+from tests.functional.mappings import MediaMapping, UserMapping
+
+
+class MemoizedMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('uuid', str)
+    author = ProtoKey('author', UserMapping, memoize=True)
+    download_url = ProtoKey('link', str)
+
+
+def make_media(count, author_count):
+    authors = [
+        {
+            'id': f'author-{index}',
+            'login': f'user{index}',
+            'email': f'user{index}@avengers.world',
+            'tokens': [{'data': f'token-{token}', 'created_at': 1552240433 + token} for token in range(5)],
+        }
+        for index in range(author_count)
+    ]
+    return [
+        {'uuid': f'media-{index}', 'author': authors[index % author_count], 'link': f'https://media/{index}'}
+        for index in range(count)
+    ]
+
+
+def milliseconds(function, repeat=7, number=3):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main(count=10000, author_count=10):
+    media = make_media(count, author_count)
+
+    def to_bytes(mapping_class):
+        return lambda: [mapping_class(item).to_bytes() for item in media]
+
+    def with_cache(function):
+        def run():
+            with MemoCache():
+                return function()
+        return run
+
+    scenarios = [
+        ('to_protobuf_many()', lambda: MediaMapping.to_protobuf_many(media)),
+        ('to_protobuf_many(memo=MemoCache())', lambda: MemoizedMediaMapping.to_protobuf_many(media, memo=MemoCache())),
+        ('to_bytes()', to_bytes(MediaMapping)),
+        ('to_bytes() with MemoCache()', with_cache(to_bytes(MemoizedMediaMapping))),
+    ]
+    print(f'{count} media shared by {author_count} authors with 5 tokens each')
+    for name, function in scenarios:
+        print(f'{name:<38} {milliseconds(function):8.2f} ms')
+
+    cache = MemoCache()
+    MemoizedMediaMapping.to_protobuf_many(media, memo=cache)
+    print(f'hit rate {cache.hit_rate:.4f}')
+
+
+if __name__ == '__main__':
+    main()
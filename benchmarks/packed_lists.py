@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of large ``repeated`` scalar fields given as
+lists, :py:class:`array.array` and NumPy arrays, into messages with
+:py:meth:`~mercator.ProtoMapping.to_protobuf` and into bytes with
+:py:meth:`~mercator.ProtoMapping.to_bytes`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.packed_lists
+"""
+import array
+import timeit
+
+from tests.functional.mappings import MeasurementMapping
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_inputs(count):
+    samples = [index / 7 for index in range(count)]
+    deltas = [index - count // 2 for index in range(count)]
+    inputs = {
+        'list': {'samples': samples, 'deltas': deltas},
+        'array.array': {'samples': array.array('d', samples), 'deltas': array.array('q', deltas)},
+    }
+    if numpy is not None:
+        inputs['numpy'] = {'samples': numpy.array(samples), 'deltas': numpy.array(deltas)}
+
+    return inputs
+
+
+def milliseconds(function, repeat=7, number=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main(count=50000):
+    print(f'{count} doubles in "samples" and {count} sint32 in "deltas"')
+    for name, data in make_inputs(count).items():
+        mapping = MeasurementMapping(data)
+        print(f'{name:<12} to_protobuf() {milliseconds(mapping.to_protobuf):7.2f} ms'
+              f'    to_bytes() {milliseconds(mapping.to_bytes):7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Measures the throughput of :py:meth:`~mercator.ProtoMapping.to_bytes_parallel`
+with an increasing number of worker processes, against encoding in the
+current process.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.parallel_conversion
+"""
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from tests.functional.mappings import UserMapping
+
+
+def make_users(count):
+    return [
+        {
+            'id': str(index),
+            'login': f'user{index}',
+            'email': f'{index}@test.com',
+            'tokens': [
+                {'data': f'token-{index}-{n}', 'created_at': 1552240433, 'expires_at': 1552240733}
+                for n in range(3)
+            ],
+        }
+        for index in range(count)
+    ]
+
+
+def records_per_second(function, count):
+    started = time.perf_counter()
+    function()
+    return count / (time.perf_counter() - started)
+
+
+def main(count=200000, chunk_size=2000):
+    users = make_users(count)
+
+    baseline = records_per_second(lambda: [UserMapping(user).to_bytes() for user in users], count)
+    print(f'{"in process":>12}: {baseline:10,.0f} records/s')
+
+    cpus = os.cpu_count() or 1
+    workers = 1
+    while workers <= max(cpus, 2):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # warm up the workers so process startup is not measured
+            list(UserMapping.to_bytes_parallel(users[:workers], workers=workers, chunk_size=1, executor=executor))
+
+            throughput = records_per_second(
+                lambda: list(UserMapping.to_bytes_parallel(users, workers=workers, chunk_size=chunk_size, executor=executor)),
+                count,
+            )
+
+        print(f'{workers:>4} workers: {throughput:10,.0f} records/s ({throughput / baseline:4.1f}x)')
+        workers *= 2
+
+    print(f'({cpus} CPUs available)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Measures a read-heavy workload where records are served far more
+often than they change, encoded with
+:py:meth:`~mercator.ProtoMapping.to_bytes` without a cache, with a
+:py:class:`~mercator.LRUResultCache` and with a
+:py:class:`~mercator.FileResultCache`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.result_cache
+"""
+import random
+import tempfile
+import time
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoList,
+    LRUResultCache,
+    FileResultCache,
+)
+
+from tests.functional import domain_pb2
+from tests.functional.mappings import UserAuthTokenMapping
+
+
+class ProductMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+    __cache_key__ = ('id', 'updated_at')
+
+    uuid = ProtoKey('id', str)
+    email = ProtoKey('email', str)
+    username = ProtoKey('login', str)
+    tokens = ProtoList('tokens', UserAuthTokenMapping)
+    metadata = ProtoKey('extra_info', dict)
+
+
+def make_records(count, token_count):
+    return [
+        {
+            'id': f'product-{index}',
+            'updated_at': 1552240433,
+            'login': f'product {index}',
+            'email': f'product-{index}@example.com',
+            'tokens': [{'data': f'sku-{token}', 'created_at': 1552240433 + token} for token in range(token_count)],
+            'extra_info': {'color': 'green', 'sizes': ['S', 'M', 'L']},
+        }
+        for index in range(count)
+    ]
+
+
+def run(records, reads, write_ratio, cache):
+    """serves ``reads`` random records, updating one of them instead
+    with the probability ``write_ratio``"""
+    random.seed(0)
+    started = time.perf_counter()
+    for _ in range(reads):
+        record = random.choice(records)
+        if random.random() < write_ratio:
+            record['updated_at'] += 1
+            record['login'] = record['login'].upper()
+
+        ProductMapping(record).to_bytes(cache=cache)
+
+    return (time.perf_counter() - started) / reads * 1e6
+
+
+def main(count=2000, token_count=10, reads=50000, write_ratio=0.01):
+    print(f'{reads} reads of {count} records with {token_count} items, {write_ratio:.0%} updates')
+    with tempfile.TemporaryDirectory() as directory:
+        scenarios = [
+            ('no cache', None),
+            ('LRUResultCache()', LRUResultCache()),
+            ('FileResultCache()', FileResultCache(directory)),
+        ]
+        for name, cache in scenarios:
+            microseconds = run(make_records(count, token_count), reads, write_ratio, cache)
+            hit_rate = f'hit rate {cache.hit_rate:.3f}' if cache is not None else ''
+            print(f'{name:<20} {microseconds:7.2f} µs/read  {hit_rate}')
+
+
+if __name__ == '__main__':
+    main()
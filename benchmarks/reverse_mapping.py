@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Compares :py:meth:`~mercator.ProtoMapping.from_protobuf` against
+``google.protobuf.json_format.MessageToDict`` for decoding the same
+messages back into python data.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.reverse_mapping
+"""
+import timeit
+
+from google.protobuf import json_format
+
+from tests.functional.mappings import UserMapping, MeasurementMapping
+
+
+def make_users(count):
+    return UserMapping.to_protobuf_many(
+        {
+            'id': str(index),
+            'login': f'user{index}',
+            'email': f'{index}@test.com',
+            'tokens': [
+                {'data': f'token-{index}-{n}', 'created_at': 1552240433, 'expires_at': 1552240733}
+                for n in range(3)
+            ],
+            'extra_info': {'plan': 'free', 'visits': index},
+        }
+        for index in range(count)
+    )
+
+
+def make_measurements(count):
+    return MeasurementMapping.to_protobuf_many(
+        {
+            'value': index / 7,
+            'total': index * 1000,
+            'offset': -index,
+            'unit': 'kg',
+            'samples': [0.5] * 16,
+            'tags': ['a', 'b', 'c'],
+            'labels': {'site': 'berlin'},
+            'taken_at': 1552240433 + index,
+        }
+        for index in range(count)
+    )
+
+
+def per_message_microseconds(function, messages, repeat=7):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return best / len(messages) * 1e6
+
+
+def main(count=5000):
+    for mapping, messages in [(UserMapping, make_users(count)), (MeasurementMapping, make_measurements(count))]:
+        results = {
+            'json_format.MessageToDict(message)': per_message_microseconds(
+                lambda: [json_format.MessageToDict(m) for m in messages], messages),
+            'Mapping.from_protobuf_many(messages)': per_message_microseconds(
+                lambda: mapping.from_protobuf_many(messages), messages),
+        }
+        baseline = results['json_format.MessageToDict(message)']
+        for name, microseconds in results.items():
+            print(f'{mapping.__name__:<20} {name:<40} {microseconds:8.2f} µs/message ({baseline / microseconds:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Measures :py:meth:`~mercator.ProtoMapping.to_protobuf` on wide
+messages with sparse and dense inputs, comparing the compiled plan
+against the interpreted path of :py:meth:`~mercator.ProtoMapping.to_dict`.
+
+Run from the project root:
+
+.. code:: bash
+
+   python -m benchmarks.sparse_inputs
+"""
+import timeit
+
+from .synthetic import build_message_classes
+from .synthetic import declare_mapping
+from .synthetic import make_record
+
+
+FIELD_COUNT = 80
+EXPLICIT_FIELDS = 40
+
+
+def per_record_microseconds(function, records, repeat=7):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return best / len(records) * 1e6
+
+
+def main(count=5000):
+    message_class, = build_message_classes(1, FIELD_COUNT)
+    mapping = declare_mapping(message_class, explicit_fields=EXPLICIT_FIELDS)
+
+    for populated in (5, 10, 40, FIELD_COUNT):
+        records = [
+            make_record(FIELD_COUNT, populated, explicit_fields=EXPLICIT_FIELDS, index=index)
+            for index in range(count)
+        ]
+        interpreted = per_record_microseconds(
+            lambda: [message_class(**mapping(record).to_dict()) for record in records], records)
+        compiled = per_record_microseconds(
+            lambda: [mapping(record).to_protobuf() for record in records], records)
+        batch = per_record_microseconds(
+            lambda: mapping.to_protobuf_many(records), records)
+
+        print(f'{populated:>3}/{FIELD_COUNT} fields populated: '
+              f'interpreted {interpreted:7.2f} µs, '
+              f'to_protobuf() {compiled:6.2f} µs, '
+              f'to_protobuf_many() {batch:6.2f} µs per record')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Compares the mappings written by :py:mod:`mercator.codegen` with the
+dynamic mappings they were generated from: the time to import the
+module of mappings and the time to convert records.
+
+Import times are measured in a new interpreter, after importing the
+protobuf and SQLAlchemy modules used by both.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.static_mappings
+"""
+import os
+import sys
+import timeit
+import tempfile
+import subprocess
+import importlib.util
+
+from mercator import codegen
+
+from tests.functional import mappings
+
+
+IMPORT_TIME = '''
+import time
+from tests.functional import domain_pb2, sql
+started = time.perf_counter()
+{statement}
+print(time.perf_counter() - started)
+'''
+
+
+def import_time(statement, path, repeat=5):
+    script = IMPORT_TIME.format(statement=statement)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([path, os.getcwd()]))
+    return min([
+        float(subprocess.check_output([sys.executable, '-c', script], env=env))
+        for _ in range(repeat)
+    ]) * 1e3
+
+
+def microseconds(function, number=20000, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'static_mappings.py')
+        codegen.main(['tests.functional.mappings', '-o', path])
+        spec = importlib.util.spec_from_file_location('static_mappings', path)
+        static = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(static)
+
+        print('import time')
+        print(f'  mercator                   {import_time("import mercator", directory):7.2f} ms')
+        print(f'  tests.functional.mappings  {import_time("import tests.functional.mappings", directory):7.2f} ms')
+        print(f'  generated module           {import_time("import static_mappings", directory):7.2f} ms')
+
+    user = {
+        'id': 'some-uuid', 'login': 'Hulk', 'email': 'hulk@avengers.world',
+        'tokens': [{'data': f'token-{index}', 'created_at': 1552240433} for index in range(3)],
+    }
+    media = {'uuid': 'media', 'author': user, 'link': 'https://media', 'blob': b'data'}
+    measurement = {'value': 1.5, 'delta': 3, 'unit': 'ms', 'samples': [1.0, 2.0], 'taken_at': 1552240433}
+
+    print('conversion')
+    for name, data in [('UserMapping', user), ('MediaMapping', media), ('MeasurementMapping', measurement)]:
+        dynamic = getattr(mappings, name)(data)
+        generated = getattr(static, name)(data)
+        print(f'  {name:<20} dynamic {microseconds(dynamic.to_protobuf):6.2f} µs'
+              f'  generated {microseconds(generated.to_protobuf):6.2f} µs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Measures the peak memory of :py:meth:`~mercator.ProtoMapping.write_delimited`
+for increasing amounts of records, against materializing the list of
+messages with :py:meth:`~mercator.ProtoMapping.to_protobuf_many`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.streaming_memory
+"""
+import time
+import tracemalloc
+
+from tests.functional.mappings import MediaMapping
+from tests.functional import sql
+
+
+class NullFile(object):
+    "a file-like object that discards the data"
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def generate_media(count):
+    for index in range(count):
+        yield {
+            'link': f'https://test.com/media/{index}/download',
+            'blob': b'\x00' * 64,
+            'author': {
+                'id': str(index),
+                'login': f'user{index}',
+                'tokens': [{'data': f'token{index}', 'created_at': index}],
+            },
+        }
+
+
+def generate_media_rows(count):
+    "yields sqlalchemy media rows from an in-memory sqlite database using yield_per()"
+    session = sql.create_session()
+    author = sql.User(login='chucknorris')
+    session.add(author)
+    session.flush()
+    session.bulk_insert_mappings(sql.Media, [
+        {'url': f'https://test.com/media/{index}', 'author_id': author.uuid}
+        for index in range(count)
+    ])
+    session.commit()
+    session.expunge_all()
+    return session.query(sql.Media).yield_per(1000)
+
+
+def measure(function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024, elapsed
+
+
+def main():
+    for count in (1000, 10000, 100000):
+        streaming, streaming_time = measure(
+            lambda: MediaMapping.write_delimited(generate_media(count), NullFile()))
+        materialized, materialized_time = measure(
+            lambda: [m.SerializeToString() for m in MediaMapping.to_protobuf_many(list(generate_media(count)))])
+        print(f'{count:>7} dicts:  write_delimited() peak {streaming:9.1f} KiB ({streaming_time:5.2f}s)   '
+              f'materialized list peak {materialized:9.1f} KiB ({materialized_time:5.2f}s)')
+
+    for count in (1000, 10000):
+        rows = generate_media_rows(count)
+        streaming, streaming_time = measure(lambda: MediaMapping.write_delimited(rows, NullFile()))
+        print(f'{count:>7} rows:   write_delimited(query.yield_per(1000)) peak {streaming:9.1f} KiB ({streaming_time:5.2f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of JSON-like documents into
+``google.protobuf.Struct`` with :py:func:`~google.protobuf.json_format.ParseDict`,
+:py:meth:`Struct.update` and :py:func:`mercator.structs.to_struct`,
+from python objects and from JSON bytes, then the conversion of users
+whose ``extra_info`` holds such a document.
+
+Documents nest objects ``depth`` times, each level with a few scalars
+and a list of objects. Protobuf parses at most 100 nested messages, so
+documents deeper than 32 objects are built field by field rather than
+parsed, see :py:func:`mercator.structs.build_message`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.struct_conversion
+"""
+import json
+import timeit
+
+from google.protobuf import json_format
+from google.protobuf.struct_pb2 import Struct
+
+from mercator import ProtoMapping, ProtoKey
+from mercator.structs import to_struct
+
+from tests.functional import domain_pb2
+from tests.functional.mappings import UserMapping
+
+
+class PassThroughUserMapping(ProtoMapping):
+    "hands extra_info to the message constructor as is"
+    __proto__ = domain_pb2.User
+
+    username = ProtoKey('login', str)
+    metadata = ProtoKey('extra_info')
+
+
+def make_document(depth, width=3):
+    document = {'id': 'root', 'count': 1, 'ratio': 0.5, 'active': True, 'note': None}
+    leaf = document
+    for level in range(depth):
+        child = {'id': f'level-{level}', 'count': level, 'ratio': level / 3, 'active': False, 'note': None}
+        leaf['items'] = [{'name': f'item-{index}', 'tags': ['a', 'b', 'c']} for index in range(width)]
+        leaf['child'] = child
+        leaf = child
+
+    return document
+
+
+def microseconds(function, repeat=5, number=200):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def update(document):
+    message = Struct()
+    message.update(document)
+    return message
+
+
+def main(depths=(1, 8, 16, 34, 46), user_count=1000):
+    for depth in depths:
+        document = make_document(depth)
+        encoded = json.dumps(document).encode('utf-8')
+        assert to_struct(document) == json_format.ParseDict(document, Struct())
+
+        scenarios = [
+            ('json_format.ParseDict()', lambda: json_format.ParseDict(document, Struct())),
+            ('Struct.update()', lambda: update(document)),
+            ('to_struct()', lambda: to_struct(document)),
+            ('json_format.Parse() from bytes', lambda: json_format.Parse(encoded, Struct())),
+            ('to_struct() from bytes', lambda: to_struct(encoded)),
+        ]
+        print(f'document of depth {depth}, {len(encoded)} bytes of JSON')
+        for name, function in scenarios:
+            print(f'  {name:<34} {microseconds(function):9.1f} µs')
+
+    users = [
+        {'login': f'user{index}', 'extra_info': make_document(4)}
+        for index in range(user_count)
+    ]
+    scenarios = [
+        ('pass-through to_protobuf_many()', lambda: PassThroughUserMapping.to_protobuf_many(users)),
+        ('ProtoKey(dict) to_protobuf_many()', lambda: UserMapping.to_protobuf_many(users)),
+    ]
+    print(f'{user_count} users with documents of depth 4')
+    for name, function in scenarios:
+        print(f'  {name:<34} {microseconds(function, number=3) / 1e3:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
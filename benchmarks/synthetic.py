@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Builds synthetic protobuf messages and mappings at runtime, used by
+benchmarks that need many or wide message types.
+"""
+import itertools
+
+from google.protobuf import descriptor_pb2
+from google.protobuf import descriptor_pool
+from google.protobuf.descriptor import FieldDescriptor
+
+from mercator import ProtoKey
+from mercator import ProtoMapping
+from mercator.bench import get_message_class
+
+
+FILE_COUNTER = itertools.count()
+
+# (protobuf type, python value generator) cycled through the fields
+FIELD_TYPES = [
+    (FieldDescriptor.TYPE_STRING, lambda index: f'value {index}'),
+    (FieldDescriptor.TYPE_INT64, lambda index: index * 1000),
+    (FieldDescriptor.TYPE_DOUBLE, lambda index: index / 3),
+    (FieldDescriptor.TYPE_BOOL, lambda index: bool(index % 2)),
+    (FieldDescriptor.TYPE_INT32, lambda index: index),
+]
+
+
+def build_message_classes(count, field_count):
+    """returns a list of ``count`` new message classes with ``field_count`` fields each"""
+    package = f'mercator.synthetic{next(FILE_COUNTER)}'
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f'{package.replace(".", "/")}.proto',
+        package=package,
+        syntax='proto3',
+    )
+    for index in range(count):
+        message = file_proto.message_type.add(name=f'Message{index}')
+        for number in range(1, field_count + 1):
+            field_type, _ = FIELD_TYPES[number % len(FIELD_TYPES)]
+            message.field.add(
+                name=f'field_{number}',
+                number=number,
+                type=field_type,
+                label=FieldDescriptor.LABEL_OPTIONAL,
+            )
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    return [
+        get_message_class(pool.FindMessageTypeByName(f'{package}.Message{index}'))
+        for index in range(count)
+    ]
+
+
+def field_value(number, index=0):
+    "returns a valid python value for the field with the given number"
+    _, make_value = FIELD_TYPES[number % len(FIELD_TYPES)]
+    return make_value(number + index)
+
+
+def declare_mapping(message_class, explicit_fields=0, **attributes):
+    """declares a new :py:class:`~mercator.ProtoMapping` for the given
+    message class, renaming the first ``explicit_fields`` fields from
+    ``source_field_<number>`` with :py:class:`~mercator.ProtoKey`.
+    """
+    attributes['__proto__'] = message_class
+    for number in range(1, explicit_fields + 1):
+        attributes[f'field_{number}'] = ProtoKey(f'source_field_{number}')
+
+    return type(f'{message_class.__name__}Mapping', (ProtoMapping,), attributes)
+
+
+def make_record(field_count, populated=None, explicit_fields=0, index=0):
+    """returns a dict with values for the first ``populated`` fields
+    (all of them by default) with keys matching :py:func:`declare_mapping`.
+    """
+    record = {}
+    for number in range(1, (populated or field_count) + 1):
+        key = f'source_field_{number}' if number <= explicit_fields else f'field_{number}'
+        record[key] = field_value(number, index)
+
+    return record
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Measures the conversion of tokens with two ``Timestamp`` fields
+with casters that build a message per value, like
+:py:class:`~mercator.SinglePropertyMapping` used to, with
+:py:class:`~mercator.SinglePropertyMapping` and with the casters of
+:py:mod:`mercator.wellknown`, from seconds, datetimes and ISO strings,
+into messages with :py:meth:`~mercator.ProtoMapping.to_protobuf_many`
+and into bytes with :py:meth:`~mercator.ProtoMapping.to_bytes`.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.well_known_types
+"""
+import datetime
+import timeit
+
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoMapping, ProtoKey, SinglePropertyMapping, MercatorDomainClass
+from mercator.wellknown import TIMESTAMP
+
+from tests.functional import domain_pb2
+
+
+class MessageCaster(MercatorDomainClass):
+    "builds a new message per value with the given function"
+    def __init__(self, build):
+        self.build = build
+
+    def __call__(self, value):
+        return self.build(value)
+
+
+def timestamp_per_value(value):
+    "like SinglePropertyMapping.__call__()"
+    params = {}
+    params['seconds'] = int(value)
+    return Timestamp(**params)
+
+
+def timestamp_from_datetime(value):
+    "the protobuf way of converting datetimes"
+    message = Timestamp()
+    message.FromDatetime(value)
+    return message
+
+
+def timestamp_from_string(value):
+    "the protobuf way of parsing RFC 3339 strings"
+    message = Timestamp()
+    message.FromJsonString(value)
+    return message
+
+
+def make_mapping(caster):
+    class TokenMapping(ProtoMapping):
+        __proto__ = domain_pb2.User.AuthToken
+
+        value = ProtoKey('data', str)
+        created_at = ProtoKey('created_at', caster)
+        expires_at = ProtoKey('expires_at', caster)
+
+    return TokenMapping
+
+
+def make_tokens(count, kind):
+    start = datetime.datetime(2019, 3, 10, 18, 53, 53, 250000)
+    tokens = []
+    for index in range(count):
+        created_at = start + datetime.timedelta(seconds=index)
+        expires_at = created_at + datetime.timedelta(days=1)
+        if kind == 'seconds':
+            created_at, expires_at = int(created_at.timestamp()), int(expires_at.timestamp())
+        elif kind == 'iso':
+            created_at, expires_at = created_at.isoformat() + 'Z', expires_at.isoformat() + 'Z'
+        tokens.append({'data': f'token-{index}', 'created_at': created_at, 'expires_at': expires_at})
+
+    return tokens
+
+
+def milliseconds(function, repeat=5, number=3):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e3
+
+
+def main(count=20000):
+    scenarios = [
+        ('seconds', 'message per value', MessageCaster(timestamp_per_value)),
+        ('seconds', 'SinglePropertyMapping', SinglePropertyMapping(int, Timestamp, 'seconds')),
+        ('seconds', 'TIMESTAMP', TIMESTAMP),
+        ('datetime', 'Timestamp.FromDatetime()', MessageCaster(timestamp_from_datetime)),
+        ('datetime', 'TIMESTAMP', TIMESTAMP),
+        ('iso', 'Timestamp.FromJsonString()', MessageCaster(timestamp_from_string)),
+        ('iso', 'TIMESTAMP', TIMESTAMP),
+    ]
+    print(f'{count} tokens with 2 timestamps')
+    for kind, name, caster in scenarios:
+        tokens = make_tokens(count, kind)
+        mapping_class = make_mapping(caster)
+        to_protobuf_many = milliseconds(lambda: mapping_class.to_protobuf_many(tokens))
+        to_bytes = milliseconds(lambda: [mapping_class(token).to_bytes() for token in tokens])
+        label = f'{kind:<8} {name}'
+        print(f'{label:<38} to_protobuf_many() {to_protobuf_many:8.2f} ms  to_bytes() {to_bytes:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Compares :py:meth:`~mercator.ProtoMapping.to_bytes` against
+``to_protobuf().SerializeToString()``.
+
+Run from the project root after ``make proto``:
+
+.. code:: bash
+
+   python -m benchmarks.wire_encoding
+"""
+import timeit
+
+from tests.functional.mappings import (
+    AuthRequestMapping,
+    MeasurementMapping,
+    MediaMapping,
+)
+
+
+CASES = {
+    'flat (AuthRequest)': (AuthRequestMapping, {'username': 'Hulk', 'password': 'H00LK5m4sh'}),
+    'scalars (Measurement)': (MeasurementMapping, {
+        'value': 1.5, 'ratio': 0.5, 'delta': -1, 'total': 1 << 40, 'count': 10,
+        'valid': True, 'unit': 'ms', 'raw': b'\x00' * 16,
+        'samples': [0.1] * 100, 'deltas': list(range(100)), 'taken_at': 1552240433,
+    }),
+    'nested (Media -> User -> AuthToken)': (MediaMapping, {
+        'link': 'https://test.com/media/123/download',
+        'blob': b'\x00' * 64,
+        'author': {
+            'id': 'a6f4b7a8-0ba4-4cde-8c2b-b2d0e1a9c1aa',
+            'login': 'Hulk',
+            'email': 'bruce@avengers.world',
+            'tokens': [
+                {'data': f'token-{n}', 'created_at': 1552240433, 'expires_at': 1552240733}
+                for n in range(10)
+            ],
+        },
+    }),
+}
+
+
+def microseconds(function, number=10000, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    buffer = bytearray()
+
+    def to_bytes_reusing_buffer(mapping_class, data):
+        buffer.clear()
+        return mapping_class(data).to_bytes(into=buffer)
+
+    for name, (mapping_class, data) in CASES.items():
+        serialize = microseconds(lambda: mapping_class(data).to_protobuf().SerializeToString())
+        to_bytes = microseconds(lambda: mapping_class(data).to_bytes())
+        reusing = microseconds(lambda: to_bytes_reusing_buffer(mapping_class, data))
+        print(f'{name:<40} to_protobuf().SerializeToString(): {serialize:7.2f} µs  '
+              f'to_bytes(): {to_bytes:7.2f} µs  to_bytes(into=buffer): {reusing:7.2f} µs')
+
+
+if __name__ == '__main__':
+    main()
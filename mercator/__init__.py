@@ -16,9 +16,42 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 # from google.protobuf.message import Message
+import copy
+import enum
+import functools
+
+from google.protobuf.message import DecodeError
 from .meta import MetaMapping
 from .meta import FieldMapping
 from .meta import MercatorDomainClass
+from .meta import finalize_all
+from .meta import cast_each
+from .meta import cast_error
+from .meta import compile_field_checker
+from .meta import is_repeated
+from .meta import is_map_field
+from .memo import MemoCache
+from .cache import LRUResultCache
+from .cache import FileResultCache
+from .structs import StructCaster
+from .structs import DEFAULT_COERCIONS
+from .wellknown import WellKnownCaster
+from .wellknown import TimestampCaster
+from .wellknown import DurationCaster
+from .wellknown import WrapperCaster
+from .wellknown import FieldMaskCaster
+from .wire import get_encoder
+from . import aio
+from . import memo
+from . import structs
+from . import wellknown
+from . import stream
+from . import buffers
+from . import reverse
+from . import parallel
+from . import rows
+from . import columns
+from . import delta
 # from .meta import BASE_MODEL_CLASS_REGISTRY
 from .errors import TypeCastError
 from .errors import ProtobufCastError
@@ -54,10 +87,15 @@ class SinglePropertyMapping(MercatorDomainClass):
         assert isinstance(auth_token.created_at, Timestamp)
         assert auth_token.created_at.seconds == 12345
     """
+    __slots__ = ('to_python', 'message_type', 'argname', 'check')
+
     def __init__(self, to_python, pb2_type, argname):
         self.to_python = to_python
         self.message_type = pb2_type
         self.argname = argname
+        self.check = None
+        if argname in pb2_type.DESCRIPTOR.fields_by_name:
+            self.check = compile_field_checker(pb2_type, argname)
 
     def __call__(self, value):
         params = {}
@@ -65,6 +103,43 @@ class SinglePropertyMapping(MercatorDomainClass):
         params[self.argname] = input_value
         return self.message_type(**params)
 
+    def to_fields(self, value):
+        """
+        :returns: a :py:class:`dict` like ``{'seconds': 12345}``, which message constructors accept in place of a message without an intermediate copy, used by compiled plans. Values that the message rejects raise here rather than in the constructor of the parent message, see :py:func:`~mercator.meta.compile_field_checker`.
+        """
+        value = self.to_python(value)
+        if self.check is not None:
+            self.check(value)
+
+        return {self.argname: value}
+
+    def cast_column(self, values):
+        """casts a :py:class:`list` of values at once, keeping ``None``
+        values, see :py:meth:`~mercator.meta.FieldMapping.compile_column_caster`.
+
+        :returns: a :py:class:`list` of :py:class:`dict` like ``{'seconds': 12345}``, which message constructors accept in place of a message without an intermediate copy.
+        """
+        argname = self.argname
+        to_python = self.to_python
+        check = self.check
+        if check is not None:
+            convert = to_python
+
+            def to_python(value):
+                return check(convert(value))
+
+        if None in values:
+            return [None if value is None else {argname: to_python(value)} for value in values]
+
+        return [{argname: value} for value in map(to_python, values)]
+
+    def from_protobuf(self, message):
+        """the inverse of calling this object, used by :py:meth:`~mercator.ProtoMapping.from_protobuf`.
+
+        :returns: the value of the single property of the given message.
+        """
+        return getattr(message, self.argname)
+
 
 class ProtoKey(FieldMapping):
     """Represents the intent to translate a object property or dictionary
@@ -84,20 +159,115 @@ class ProtoKey(FieldMapping):
     :param name_at_source: a string with the name of key or property to be extracted in an input object before casting into the target type.
     :param target_type: an optional :py:class:`~mercator.ProtoMapping` subclass or native python type. Check :ref:`target-type` for more details.
     """
+    __slots__ = ()
+
     def cast(self, value):
         """
         :param value: a python object that is compatible with the given ``target_type``
-        :returns: ``value`` coerced into the target type. Supports ProtoMappings by automatically calling :py:meth:`~mercator.ProtoMapping.to_protobuf`.
+        :returns: ``value`` coerced into the target type. Supports ProtoMappings by automatically calling :py:meth:`~mercator.ProtoMapping.to_protobuf`. Values of ``Struct``, ``ListValue`` and ``Value`` fields declared with :py:class:`dict` or :py:class:`list` are converted like in compiled plans, see :py:meth:`compile_json_caster`.
         """
         if value is None:
             return
 
+        cast_json = self.compile_json_caster()
+        if cast_json is not None:
+            return cast_json(value)
+
         result = super().cast(value)
         if not isinstance(result, ProtoMapping):
             return result
 
         return result.to_protobuf()
 
+    def compile_caster(self, get_converter=None):
+        """
+        :returns: a callable equivalent to :py:meth:`cast` for values that are not ``None``. Nested ProtoMappings are converted with their compiled plan.
+        """
+        if is_proto_mapping(self.target_type):
+            convert = (get_converter or get_plan_converter)(self.target_type)
+            return memo.memoized(convert, self.memoize) if self.memoize else convert
+
+        if isinstance(self.target_type, (SinglePropertyMapping, WellKnownCaster)):
+            return self.compile_fields_caster()
+
+        cast_json = self.compile_json_caster()
+        if cast_json is not None:
+            return cast_json
+
+        return super().compile_caster()
+
+    def compile_fields_caster(self):
+        """
+        :returns: a callable that returns the fields of the message of a :py:class:`~mercator.SinglePropertyMapping` or a :py:class:`~mercator.wellknown.WellKnownCaster` as a :py:class:`dict`, which the constructor of the parent message fills its sub-message with.
+        """
+        target_type = self.target_type
+        to_fields = target_type.to_fields
+
+        def cast(value):
+            try:
+                return to_fields(value)
+            except (ValueError, TypeError) as e:
+                raise cast_error(e, value, target_type)
+
+        return cast
+
+    def compile_json_caster(self):
+        """
+        :returns: a callable that converts values of ``google.protobuf.Struct``, ``ListValue`` and ``Value`` fields declared with :py:class:`dict`, :py:class:`list` or a :py:class:`~mercator.structs.StructCaster` in a single pass, see :py:mod:`mercator.structs`, otherwise ``None``.
+        """
+        target_type = self.target_type
+        if isinstance(target_type, StructCaster):
+            cast_json = target_type.cast
+        else:
+            message_type = structs.get_json_message_type(self.descriptor)
+            if message_type is None or target_type not in (dict, list):
+                return
+
+            cast_json = structs.compile_json_caster(message_type, fallback=target_type)
+
+        def cast(value):
+            try:
+                return cast_json(value)
+            except (ValueError, TypeError, DecodeError) + structs.ENCODING_ERRORS as e:
+                raise cast_error(e, value, target_type)
+
+        return cast
+
+    def compile_column_caster(self, get_converter=None):
+        """
+        :returns: a callable that casts a whole column, see :py:meth:`~mercator.meta.FieldMapping.compile_column_caster`. Values of :py:class:`~mercator.SinglePropertyMapping` are cast with :py:meth:`~mercator.SinglePropertyMapping.cast_column`.
+        """
+        if isinstance(self.target_type, (SinglePropertyMapping, WellKnownCaster)):
+            cast_column = self.target_type.cast_column
+            cast_values = cast_each(self.compile_caster(get_converter))
+
+            def cast(values):
+                try:
+                    return cast_column(values)
+                except (ValueError, TypeError):
+                    # find the faulty value
+                    return cast_values(values)
+
+            return cast
+
+        if is_proto_mapping(self.target_type):
+            return cast_each(self.compile_caster(get_converter))
+
+        cast_json = self.compile_json_caster()
+        if cast_json is not None:
+            return cast_each(cast_json)
+
+        return super().compile_column_caster(get_converter)
+
+    def compile_value_parser(self, get_parser=None):
+        """
+        :returns: a callable that converts messages of nested ProtoMappings back with :py:meth:`~mercator.ProtoMapping.from_protobuf`, see :py:meth:`~mercator.meta.FieldMapping.compile_value_parser`.
+        """
+        if is_proto_mapping(self.target_type):
+            return (get_parser or reverse.get_parser)(self.target_type)
+
+        return super().compile_value_parser(get_parser)
+
 
 class ProtoList(FieldMapping):
     """Represents the intent to translate a several object properties or dictionary
@@ -113,28 +283,503 @@ class ProtoList(FieldMapping):
 
            tokens = ProtoList('tokens', UserAuthTokenMapping)
 
+    Besides lists and tuples, fields of native python types accept
+    typed buffers such as :py:class:`array.array` or NumPy arrays,
+    which are converted at once, see :py:mod:`mercator.buffers`.
+
     :param name_at_source: a string with the name of key or property to be extracted in an input object before casting into the target type.
     :param target_type: an optional :py:class:`~mercator.ProtoMapping` subclass or native python type. Check :ref:`target-type` for more details.
     """
+    __slots__ = ()
+
     def cast(self, value):
         """
-        :param value: a python object that is compatible with the given ``target_type``
+        :param value: a list, tuple or typed buffer of python objects that are compatible with the given ``target_type``
         :returns: list of items target type coerced into the ``target_type``. Supports ProtoMappings by automatically calling :py:meth:`~mercator.ProtoMapping.to_protobuf`.
         """
-        result = super().cast(value)
-
-        if result is None:
+        if value is None:
             return
 
+        if buffers.is_buffer(value) and not is_proto_mapping(self.target_type):
+            return buffers.compile_buffer_caster(self.descriptor, self.target_type)(value)
+
         if not isinstance(value, (list, tuple)):
             raise TypeCastError(f'ProtoList.cast() received a non-list value '
                                 f'(type {type(value).__name__}): {value}')
 
-        if issubclass(self.target_type, ProtoMapping):
+        if self.target_type is None:
+            return list(value)
+
+        if is_proto_mapping(self.target_type):
             return [self.target_type(item).to_protobuf() for item in value]
 
         return [self.target_type(item) for item in value]
 
+    def compile_caster(self, get_converter=None):
+        """
+        :returns: a callable equivalent to :py:meth:`cast` for values that are not ``None``. Nested ProtoMappings are converted with their compiled plan.
+        """
+        target_type = self.target_type
+        cast_buffer = None
+        if is_proto_mapping(target_type):
+            target_type = (get_converter or get_plan_converter)(target_type)
+            if self.memoize:
+                target_type = memo.memoized(target_type, self.memoize)
+        else:
+            cast_buffer = buffers.compile_buffer_caster(self.descriptor, target_type)
+
+        def cast(value):
+            if not isinstance(value, (list, tuple)):
+                if cast_buffer is not None and buffers.is_buffer(value):
+                    return cast_buffer(value)
+
+                raise TypeCastError(f'ProtoList.cast() received a non-list value '
+                                    f'(type {type(value).__name__}): {value}')
+
+            if target_type is None:
+                return list(value)
+
+            return list(map(target_type, value))
+
+        return cast
+
+    def compile_column_caster(self, get_converter=None):
+        """
+        :returns: a callable that casts a column of lists, see :py:meth:`~mercator.meta.FieldMapping.compile_column_caster`.
+        """
+        return cast_each(self.compile_caster(get_converter))
+
+    def compile_value_parser(self, get_parser=None):
+        """
+        :returns: a callable that converts items of nested ProtoMappings back with :py:meth:`~mercator.ProtoMapping.from_protobuf`, see :py:meth:`~mercator.meta.FieldMapping.compile_value_parser`.
+        """
+        if is_proto_mapping(self.target_type):
+            return (get_parser or reverse.get_parser)(self.target_type)
+
+        return super().compile_value_parser(get_parser)
+
+
+class ProtoMap(FieldMapping):
+    """Represents the intent to translate a dictionary, or a list of
+    records keyed by one of their keys or attributes, into a ``map``
+    field of a protobuf message.
+
+    Values are cast like in :py:class:`~mercator.ProtoKey`, e.g.: with
+    the compiled plan of a nested :py:class:`~mercator.ProtoMapping`,
+    and the whole map is given to the constructor of the message at
+    once rather than filled entry by entry. :py:meth:`~mercator.ProtoMapping.to_bytes`
+    serializes maps through a message.
+
+    Example:
+
+    .. code:: python
+
+       class StructMapping(ProtoMapping):
+           __proto__ = struct_pb2.Struct
+
+           fields = ProtoMap('properties', ValueMapping)
+
+       class MeasurementMapping(ProtoMapping):
+           __proto__ = domain_pb2.Measurement
+
+           labels = ProtoMap('labels', str, key_type=str)
+
+       StructMapping({'properties': [{'name': 'age', 'amount': 49}]}).to_protobuf()
+       MeasurementMapping({'labels': {'rack': 7}}).to_protobuf()
+
+    :param name_at_source: a string with the name of key or property to be extracted in an input object before casting into the target type.
+    :param target_type: an optional :py:class:`~mercator.ProtoMapping` subclass or native python type of the values. Check :ref:`target-type` for more details.
+    :param key: an optional name of the key or attribute of records, so that the source value can be a list of records rather than a :py:class:`dict`.
+    :param key_type: an optional python type the keys are cast into, e.g.: :py:class:`str`.
+    :param memoize: like in :py:class:`~mercator.meta.FieldMapping`, for :py:class:`~mercator.ProtoMapping` values.
+    """
+    __slots__ = ('key', 'key_type')
+
+    def __init__(self, name_at_source: str, target_type: type = None, key: str = None, key_type: type = None, memoize=None):
+        super().__init__(name_at_source, target_type, memoize)
+        self.key = key
+        self.key_type = key_type
+
+    def bind(self, descriptor):
+        """binds the field mapping like :py:meth:`~mercator.meta.FieldMapping.bind`,
+        only to ``map`` fields.
+        """
+        if descriptor is not None and not is_map_field(descriptor):
+            raise TypeError(f'ProtoMap() must be declared for a map field, but {descriptor.full_name} is not one')
+
+        return super().bind(descriptor)
+
+    def cast(self, value):
+        """
+        :param value: a :py:class:`dict`, or a list of records when declared with ``key``.
+        :returns: a :py:class:`dict` with the keys and the values cast into the ``target_type``.
+        """
+        if value is None:
+            return
+
+        return self.compile_caster()(value)
+
+    def get_value_mapping(self):
+        """returns a :py:class:`~mercator.ProtoKey` bound to the ``value``
+        field of the map entries, which casts every value of the map.
+        """
+        value_descriptor = self.descriptor.message_type.fields_by_name['value']
+        return ProtoKey(self.name_at_source, self.target_type, self.memoize).bind(value_descriptor)
+
+    def compile_caster(self, get_converter=None):
+        """
+        :returns: a callable equivalent to :py:meth:`cast` for values that are not ``None``. Nested ProtoMappings are converted with their compiled plan into the keyword-arguments of their message, which the constructor of the parent message fills the map with.
+        """
+        target_type = self.target_type
+        if get_converter is None and is_proto_mapping(target_type) and target_type.__plan__ is not None:
+            convert = functools.partial(get_plan_converter(target_type), proto=dict)
+            if self.memoize:
+                convert = memo.memoized(convert, self.memoize)
+
+            return self.compile_items_caster(convert)
+
+        return self.compile_items_caster(self.get_value_mapping().compile_caster(get_converter))
+
+    def compile_items_caster(self, cast_value):
+        """
+        :param cast_value: the caster of every value, or ``None`` to keep the values as they are.
+        :returns: a callable that takes a :py:class:`dict` or a list of records and returns the :py:class:`dict` given to the message constructor.
+        """
+        key = self.key
+        key_type = self.key_type
+        name_at_source = self.name_at_source
+
+        def get_key(record):
+            if isinstance(record, dict):
+                return record.get(key)
+
+            return getattr(record, key, None)
+
+        def cast(value):
+            if isinstance(value, dict):
+                if cast_value is None and key_type is None:
+                    # the constructor of the message copies the map
+                    return value
+
+                items = value.items()
+            elif key is not None and isinstance(value, (list, tuple)):
+                items = zip(map(get_key, value), value)
+            else:
+                expected = 'a dict or a list of records' if key is not None else 'a dict'
+                raise TypeCastError(f'ProtoMap({name_at_source!r}) takes {expected}, but got '
+                                    f'{type(value).__name__}: {value}')
+
+            if key_type is not None:
+                try:
+                    items = [(key_type(k), v) for k, v in items]
+                except (ValueError, TypeError) as e:
+                    raise cast_error(e, value, key_type)
+
+            if cast_value is None:
+                return dict(items)
+
+            return {k: cast_value(v) for k, v in items}
+
+        return cast
+
+    def compile_parser(self, get_parser=None):
+        """
+        :returns: a callable that converts the map back into a :py:class:`dict`, parsing nested messages with :py:meth:`~mercator.ProtoMapping.from_protobuf`.
+        """
+        parse = self.get_value_mapping().compile_value_parser(get_parser)
+        if parse is None:
+            return dict
+
+        def parse_map(values):
+            return dict([(k, parse(v)) for k, v in values.items()])
+
+        return parse_map
+
+
+class ProtoEnum(FieldMapping):
+    """Represents the intent to translate the names of enum values, e.g.:
+    ``'ACTIVE'``, into the numbers of an ``enum`` field.
+
+    The names, their aliases and numbers are looked up in a table
+    computed once from the descriptor of the field when the mapping is
+    declared, so that casting a value is a single dictionary lookup.
+    Members of :py:class:`enum.Enum` are looked up by name, and numbers
+    pass through.
+
+    Example:
+
+    .. code:: python
+
+       class MediaMapping(ProtoMapping):
+           __proto__ = domain_pb2.UserMedia
+
+           content_type = ProtoEnum('kind', aliases={'post': 'BLOG_POST', 'mp4': 'VIDEO'})
+
+    :param name_at_source: a string with the name of key or property to be extracted in an input object before casting into the target type.
+    :param aliases: an optional :py:class:`dict` of other names accepted for the enum values, e.g.: ``{'mp4': 'VIDEO'}``, whose values are the names or numbers of enum values.
+    :param case_sensitive: when ``False`` (default) names and aliases match regardless of their case.
+    """
+    __slots__ = ('aliases', 'case_sensitive', 'numbers', 'names')
+
+    def __init__(self, name_at_source: str, aliases: dict = None, case_sensitive: bool = False):
+        super().__init__(name_at_source)
+        self.aliases = dict(aliases or {})
+        self.case_sensitive = case_sensitive
+        self.numbers = None
+        self.names = None
+
+    def bind(self, descriptor):
+        """binds the field mapping like :py:meth:`~mercator.meta.FieldMapping.bind`
+        and computes the tables of names and numbers of the enum.
+        """
+        field = super().bind(descriptor)
+        if descriptor is not None:
+            if descriptor.enum_type is None:
+                raise TypeError(f'ProtoEnum() must be declared for an enum field, but {descriptor.full_name} is not one')
+
+            field.numbers, field.names = build_enum_tables(descriptor.enum_type, field.aliases, field.case_sensitive)
+
+        return field
+
+    def cast(self, value):
+        """
+        :param value: the name, an alias or the number of an enum value, an :py:class:`enum.Enum` member, or a list of them for ``repeated`` fields.
+        :returns: the number of the enum value, or a list of numbers.
+        """
+        if value is None:
+            return
+
+        return self.compile_caster()(value)
+
+    def compile_caster(self, get_converter=None):
+        """
+        :returns: a callable equivalent to :py:meth:`cast` for values that are not ``None``.
+        """
+        numbers = self.numbers
+        if numbers is None:
+            raise TypeError(f'{self.__class__.__name__}({self.name_at_source!r}) is not bound to an enum field')
+
+        enum_type = self.descriptor.enum_type
+        case_sensitive = self.case_sensitive
+
+        def cast_value(value):
+            try:
+                return numbers[value]
+            except (KeyError, TypeError):
+                return find_enum_number(numbers, enum_type, case_sensitive, value)
+
+        if not is_repeated(self.descriptor):
+            return cast_value
+
+        def cast(value):
+            if not isinstance(value, (list, tuple)):
+                raise TypeCastError(f'ProtoEnum.cast() received a non-list value for a repeated field '
+                                    f'(type {type(value).__name__}): {value}')
+
+            return [cast_value(item) for item in value]
+
+        return cast
+
+    def compile_value_parser(self, get_parser=None):
+        """
+        :returns: a callable that returns the name of an enum value from its number, or the number itself if unknown.
+        """
+        names = self.names
+
+        def parse(number):
+            return names.get(number, number)
+
+        return parse
+
+
+def build_enum_tables(enum_type, aliases, case_sensitive):
+    """returns the :py:class:`dict` of numbers by name, alias and number
+    and the :py:class:`dict` of names by number of the given
+    :py:class:`~google.protobuf.descriptor.EnumDescriptor`.
+    """
+    numbers = {}
+    names = {}
+    for value in enum_type.values:
+        numbers[value.name] = value.number
+        numbers[value.number] = value.number
+        # enums with allow_alias have several names per number, the
+        # first one declared is the canonical name
+        names.setdefault(value.number, value.name)
+
+    for alias, target in aliases.items():
+        if not isinstance(alias, str) or target not in numbers:
+            raise TypeError(f'ProtoEnum() takes aliases of the values of {enum_type.full_name}, but got {alias!r}: {target!r}')
+
+        numbers[alias] = numbers[target]
+
+    if not case_sensitive:
+        for name, number in list(numbers.items()):
+            if isinstance(name, str):
+                numbers.setdefault(name.casefold(), number)
+
+    return numbers, names
+
+
+def find_enum_number(numbers, enum_type, case_sensitive, value):
+    """the slow path of :py:meth:`ProtoEnum.compile_caster` for values
+    that are not in the table of ``numbers`` as is.
+    """
+    if isinstance(value, enum.Enum):
+        number = numbers.get(value.name)
+        if number is None and not case_sensitive:
+            number = numbers.get(value.name.casefold())
+        if number is not None:
+            return number
+
+    elif isinstance(value, str):
+        number = None if case_sensitive else numbers.get(value.casefold())
+        if number is not None:
+            return number
+
+    # unknown numbers of open enums are kept by protobuf
+    elif isinstance(value, int) and not enum_type.is_closed:
+        return value
+
+    raise ProtobufCastError(f'"{value}" ({type(value).__name__}) is not a value of {enum_type.full_name}')
+
+
+class ProtoOneOf(FieldMapping):
+    """Represents the intent to set a single member of a ``oneof``,
+    chosen by a discriminator of the source data. Declared with the name
+    of the ``oneof`` rather than of a field.
+
+    Without a discriminator, protobuf keeps the last member assigned when
+    several of them have values. Sources whose discriminator is ``None``
+    raise :py:class:`~mercator.errors.ProtobufCastError` instead when
+    more than one member has a value.
+
+    Example:
+
+    .. code:: python
+
+       class ValueMapping(ProtoMapping):
+           __proto__ = struct_pb2.Value
+
+           kind = ProtoOneOf('type', aliases={'number': 'number_value', 'text': 'string_value'})
+           number_value = ProtoKey('amount', float)
+           string_value = ProtoKey('text', str)
+
+       ValueMapping({'type': 'text', 'amount': 1.0, 'text': 'one'}).to_protobuf()
+       # string_value: "one"
+
+    :param name_at_source: the name of the key or property whose value is the name of the member to set, or ``None`` to only reject sources where several members have values.
+    :param aliases: an optional :py:class:`dict` of other values of the discriminator by the name of the member they choose.
+    """
+    __slots__ = ('aliases', 'oneof_descriptor', 'choices')
+
+    def __init__(self, name_at_source: str = None, aliases: dict = None):
+        super().__init__(name_at_source)
+        self.aliases = dict(aliases or {})
+        self.oneof_descriptor = None
+        self.choices = None
+
+    def bind(self, descriptor):
+        """Invoked by :py:class:`~mercator.MetaMapping` during "import time"
+        to associate the declaration with the :py:class:`~google.protobuf.descriptor.OneofDescriptor`
+        of the ``oneof`` it is named after.
+
+        :returns: the declaration itself, or a copy if it was already bound to another ``oneof``.
+        """
+        field = self
+        if self.oneof_descriptor is not None and self.oneof_descriptor is not descriptor:
+            field = copy.copy(self)
+
+        choices = dict([(member.name, member.name) for member in descriptor.fields])
+        for alias, member in field.aliases.items():
+            if member not in choices:
+                raise TypeError(f'ProtoOneOf() takes aliases of the members of {descriptor.full_name}, but got {alias!r}: {member!r}')
+
+            choices[alias] = member
+
+        field.oneof_descriptor = descriptor
+        field.choices = choices
+        return field
+
+    @property
+    def oneof(self):
+        """the name of the ``oneof``, or ``None`` if not bound"""
+        return self.oneof_descriptor and self.oneof_descriptor.name
+
+    @property
+    def members(self):
+        """the names of the fields of the ``oneof``"""
+        return tuple([member.name for member in self.oneof_descriptor.fields])
+
+    def compile_caster(self, get_converter=None):
+        # the discriminator is not a field of the message
+        return
+
+    def compile_selector(self):
+        """
+        :returns: a callable that takes the value of the discriminator and the :py:class:`dict` of keyword-arguments of the message constructor, and removes from it the members of the ``oneof`` that were not chosen.
+        """
+        name = self.oneof
+        members = self.members
+        choices = self.choices
+
+        def select(discriminator, kwargs):
+            if discriminator is None:
+                present = [member for member in members if kwargs.get(member) is not None]
+                if len(present) > 1:
+                    raise ProtobufCastError(f'several members of the oneof {name} have values: {", ".join(present)}')
+                return
+
+            try:
+                chosen = choices[discriminator]
+            except (KeyError, TypeError):
+                raise ProtobufCastError(f'"{discriminator}" ({type(discriminator).__name__}) is not a member of the oneof {name}')
+
+            for member in members:
+                if member != chosen:
+                    kwargs.pop(member, None)
+
+        return select
+
+    def compile_discriminator_parser(self):
+        """
+        :returns: a callable that takes the name of the member set in a message, as returned by ``WhichOneof()``, and returns the value of the discriminator, preferring the first alias declared for the member.
+        """
+        values = {}
+        for value, member in self.choices.items():
+            if value not in self.members:
+                values.setdefault(member, value)
+
+        def parse(member):
+            if member is None:
+                return
+            return values.get(member, member)
+
+        return parse
+
+
+def is_proto_mapping(target_type):
+    """returns ``True`` if the given ``target_type`` is a :py:class:`~mercator.ProtoMapping` subclass"""
+    return isinstance(target_type, type) and issubclass(target_type, ProtoMapping)
+
+
+def get_plan_converter(mapping_class):
+    """returns a function that takes source data and returns a
+    protobuf message by means of the given ProtoMapping subclass.
+
+    This is the compiled plan (see :py:mod:`mercator.plan`) unless the
+    mapping customizes its conversion. Plans replaced by :py:mod:`mercator.metrics`
+    are not captured, so that nested conversions are not instrumented
+    once metrics are disabled.
+    """
+    plan = vars(mapping_class).get('__original_plan__', mapping_class.__plan__)
+    if plan is not None:
+        return plan
+
+    def convert(data):
+        return mapping_class(data).to_protobuf()
+
+    return convert
+
 
 def extract_fields_from_dict(data: dict, names: dict):
     """Utility method used by :py:meth:`~mercator.ProtoMapping.to_dict`
@@ -158,6 +803,30 @@ def extract_fields_from_object(data: object, names: dict):
     return dict([(name, target.cast(getattr(data, target.name_at_source, None))) for name, target in names.items()])
 
 
+def select_oneof_members(data, kwargs, oneofs: dict):
+    """Utility method used by :py:meth:`~mercator.ProtoMapping.to_dict`
+    for keeping only the members of each ``oneof`` chosen by its
+    discriminator, see :py:class:`~mercator.ProtoOneOf`.
+
+    :param data: the source data
+    :param kwargs: the keyword-arguments extracted from ``data``, modified in place.
+    :param oneofs: a :py:class:`dict` with :py:class:`~mercator.ProtoOneOf` for values.
+    :returns: ``kwargs``
+    """
+    for oneof in oneofs.values():
+        name = oneof.name_at_source
+        if name is None:
+            discriminator = None
+        elif isinstance(data, dict):
+            discriminator = data.get(name)
+        else:
+            discriminator = getattr(data, name, None)
+
+        oneof.compile_selector()(discriminator, kwargs)
+
+    return kwargs
+
+
 class ProtoMapping(object, metaclass=MetaMapping):
     """Base class to define attribute mapping from :py:class:`dict` or
     :py:func:`~sqlalchemy.ext.declarative.declarative_base` subclasses'
@@ -216,6 +885,8 @@ class ProtoMapping(object, metaclass=MetaMapping):
            token = ProtoKey('token', UserAuthTokenMapping)
 
     """
+    __slots__ = ('data',)
+
     def __init__(self, data):
         """
         :param data: a :py:class:`dict` or object compatible with the :ref:`source-input-type` declaration at the class level.
@@ -231,17 +902,319 @@ class ProtoMapping(object, metaclass=MetaMapping):
 
         fields = self.__fields__
         if isinstance(self.data, dict):
-            return extract_fields_from_dict(self.data, fields)
+            kwargs = extract_fields_from_dict(self.data, fields)
 
         elif isinstance(self.data, self.__source_input_type__):
-            return extract_fields_from_object(self.data, fields)
+            kwargs = extract_fields_from_object(self.data, fields)
 
         else:
             raise TypeError(f'{self.data} must be a dict or {self.__source_input_type__} but is {type(self.data)} instead')
 
-    def to_protobuf(self):
+        return select_oneof_members(self.data, kwargs, self.__oneofs__)
+
+    def to_protobuf(self, cache=None):
         """
+        :param cache: an optional :py:class:`~mercator.cache.ResultCache`, the message is then parsed from the bytes cached under the ``__cache_key__`` of the data, see :py:mod:`mercator.cache`.
         :returns: a new :ref:`proto` instance with the data extracted with :py:meth:`~mercator.ProtoMapping.to_dict`.
+
+        The conversion runs through the plan compiled for this class
+        during "import time" (see :py:mod:`mercator.plan`), which produces
+        the exact same message as the interpreted path of :py:meth:`~mercator.ProtoMapping.to_dict`.
         """
+        if cache is not None:
+            return self.__proto__.FromString(cache.to_bytes(self.__class__, self.data))
+
+        plan = self.__plan__
+        if plan is not None:
+            return plan(self.data)
+
         data = self.to_dict()
         return self.__proto__(**data)
+
+    def apply_to(self, message, mask=False):
+        """Replaces in place the fields of an existing message whose
+        ``name_at_source`` is present in the data, leaving the other
+        fields untouched, see :py:mod:`mercator.delta`.
+
+        Example:
+
+        .. code:: python
+
+           message = UserMapping(user).to_protobuf()
+           UserMapping({'login': 'hulk', 'email': None}).apply_to(message)
+
+        Keys set to ``None`` clear their fields.
+
+        :param message: an instance of :ref:`proto`
+        :param mask: when ``True`` returns a ``google.protobuf.FieldMask`` with the names of the replaced or cleared fields.
+        :returns: ``message``, or a ``google.protobuf.FieldMask`` when ``mask`` is ``True``.
+        """
+        touched = delta.apply_changes(self.__class__, self.data, message)
+        if mask:
+            return delta.to_field_mask(self.__class__, touched)
+
+        return message
+
+    async def to_protobuf_async(self, slice_size=aio.DEFAULT_SLICE_SIZE, executor=None,
+                                offload_threshold=aio.DEFAULT_OFFLOAD_THRESHOLD):
+        """Like :py:meth:`~mercator.ProtoMapping.to_protobuf` but yields
+        control to the event loop every ``slice_size`` items of large
+        ``repeated`` fields, see :py:mod:`mercator.aio`.
+
+        Example:
+
+        .. code:: python
+
+           class UserServicer(domain_pb2_grpc.UserServicer):
+               async def GetUser(self, request, context):
+                   user = await retrieve_user(request.uuid)
+                   return await UserMapping(user).to_protobuf_async()
+
+        :param slice_size: the maximum number of items converted between two yields.
+        :param executor: an optional :py:class:`~concurrent.futures.Executor` that converts messages with at least ``offload_threshold`` items in their ``repeated`` fields.
+        :param offload_threshold: the number of items above which the conversion runs in ``executor``.
+        :returns: a new :ref:`proto` instance
+        """
+        return await aio.convert_async(type(self), self.data, slice_size, executor, offload_threshold)
+
+    def to_bytes(self, into=None, cache=None):
+        """Encodes the data directly in protobuf wire format, without
+        building the intermediate :ref:`proto` instances, see :py:mod:`mercator.wire`.
+
+        The result is byte-for-byte equal to ``self.to_protobuf().SerializeToString()``.
+
+        :param into: an optional :py:class:`bytearray` to which the encoded message is appended, allowing a single buffer to be reused across calls.
+        :param cache: an optional :py:class:`~mercator.cache.ResultCache` that keeps the encoded message under the ``__cache_key__`` of the data, see :py:mod:`mercator.cache`.
+        :returns: :py:class:`bytes`, or ``into`` when given.
+        """
+        if cache is not None:
+            encoded = cache.to_bytes(self.__class__, self.data)
+            if into is None:
+                return encoded
+
+            into += encoded
+            return into
+
+        encode = get_encoder(self.__class__)
+        if into is None:
+            return bytes(encode(self.data, bytearray()))
+
+        return encode(self.data, into)
+
+    @classmethod
+    def to_protobuf_many(cls, items, into=None, memo=None):
+        """Converts several records at once reusing the compiled plan of
+        the mapping, without creating a :py:class:`~mercator.ProtoMapping`
+        instance per record.
+
+        Example:
+
+        .. code:: python
+
+           users = UserMapping.to_protobuf_many(sql_session.query(User))
+
+           response = domain_pb2.User()
+           UserAuthTokenMapping.to_protobuf_many(token_dicts, into=response.tokens)
+
+        :param items: an iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration, possibly mixed.
+        :param into: an optional ``repeated`` message field of a parent message, which will be filled in place.
+        :param memo: an optional :py:class:`~mercator.memo.MemoCache` active during the conversion, so that nested values of fields declared with ``memoize`` are converted once.
+        :returns: a :py:class:`list` of new :ref:`proto` instances, or ``into`` when given.
+        """
+        if memo is not None:
+            with memo:
+                return cls.to_protobuf_many(items, into)
+
+        plan = cls.__plan__
+        if plan is None:
+            messages = [cls(item).to_protobuf() for item in items]
+            if into is None:
+                return messages
+
+            into.extend(messages)
+            return into
+
+        if into is None:
+            return [plan(item) for item in items]
+
+        add = into.add
+        for item in items:
+            plan(item, add)
+
+        return into
+
+    @classmethod
+    def iter_protobuf_async(cls, items, slice_size=aio.DEFAULT_SLICE_SIZE):
+        """Converts several records like :py:meth:`~mercator.ProtoMapping.to_protobuf_many`,
+        yielding control to the event loop every ``slice_size`` records.
+
+        Example:
+
+        .. code:: python
+
+           async def ListUsers(self, request, context):
+               async for message in UserMapping.iter_protobuf_async(fetch_users(request)):
+                   yield message
+
+        :param items: an iterable or an asynchronous iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+        :param slice_size: the maximum number of records converted between two yields.
+        :returns: an asynchronous generator of :ref:`proto` instances.
+        """
+        return aio.iter_protobuf_async(cls, items, slice_size)
+
+    @classmethod
+    def iter_delimited(cls, items, chunk_size=None):
+        """Generates length-delimited messages encoded with :py:meth:`~mercator.ProtoMapping.to_bytes`
+        consuming the records one by one, see :py:mod:`mercator.stream`.
+
+        Example:
+
+        .. code:: python
+
+           query = session.query(Media).yield_per(1000)
+
+           for chunk in MediaMapping.iter_delimited(query, chunk_size=65536):
+               response.write(chunk)
+
+        :param items: an iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+        :param chunk_size: when given, consecutive messages are grouped in chunks of at least ``chunk_size`` bytes.
+        :returns: a generator of :py:class:`bytes`
+        """
+        return stream.iter_delimited(cls, items, chunk_size)
+
+    @classmethod
+    def write_delimited(cls, items, file, chunk_size=stream.DEFAULT_CHUNK_SIZE):
+        """Writes length-delimited messages encoded with :py:meth:`~mercator.ProtoMapping.to_bytes`
+        into a file-like object in chunks of ``chunk_size`` bytes, see :py:mod:`mercator.stream`.
+
+        :param items: an iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+        :param file: a binary file-like object
+        :param chunk_size: the minimum amount of bytes per call to ``file.write()``
+        :returns: the number of messages written
+        """
+        return stream.write_delimited(cls, items, file, chunk_size)
+
+    @classmethod
+    def to_bytes_parallel(cls, items, workers=None, chunk_size=parallel.DEFAULT_CHUNK_SIZE, executor=None):
+        """Encodes records with :py:meth:`~mercator.ProtoMapping.to_bytes`
+        in a pool of worker processes, see :py:mod:`mercator.parallel`.
+
+        Example:
+
+        .. code:: python
+
+           with open('users.bin', 'wb') as file:
+               for data in UserMapping.to_bytes_parallel(user_dicts, workers=8):
+                   file.write(data)
+
+        :param items: an iterable of picklable records, usually :py:class:`dict`
+        :param workers: the number of worker processes, defaults to the number of CPUs.
+        :param chunk_size: the number of records sent to a worker at once.
+        :param executor: an optional :py:class:`~concurrent.futures.ProcessPoolExecutor` to be reused across calls.
+        :returns: a generator of :py:class:`bytes` in the same order as ``items``
+        """
+        return parallel.iter_bytes_parallel(cls, items, workers, chunk_size, executor)
+
+    @classmethod
+    def diff(cls, old_source, new_source):
+        """Compares two versions of the source data and returns the
+        changed values, to be given to :py:meth:`~mercator.ProtoMapping.apply_to`,
+        see :py:mod:`mercator.delta`.
+
+        Example:
+
+        .. code:: python
+
+           changes = UserMapping.diff(old_user, new_user)
+           UserMapping(changes).apply_to(message)
+
+        :param old_source: a :py:class:`dict` or instance of :ref:`source-input-type`
+        :param new_source: a :py:class:`dict` or instance of :ref:`source-input-type`
+        :returns: a :py:class:`dict` with the values of ``new_source`` that differ from ``old_source``, keyed by ``name_at_source``.
+        """
+        return delta.diff(cls, old_source, new_source)
+
+    @classmethod
+    def to_protobuf_rows(cls, result, columns=None):
+        """Converts the rows of a SQL result or plain tuples by the
+        position of their columns, see :py:mod:`mercator.rows`.
+
+        Example:
+
+        .. code:: python
+
+           from mercator.orm import select_columns
+
+           result = connection.execute(select_columns(UserMapping))
+           messages = UserMapping.to_protobuf_rows(result)
+
+        :param result: a SQLAlchemy Core result, or any iterable of rows, ``RowMapping`` or tuples.
+        :param columns: the names of the columns in order, required for plain tuples.
+        :returns: a :py:class:`list` of :ref:`proto` instances
+        """
+        return list(rows.iter_rows_to_protobuf(cls, result, columns))
+
+    @classmethod
+    def to_protobuf_columns(cls, data, into=None):
+        """Converts columnar data, casting each column at once rather
+        than each value, see :py:mod:`mercator.columns`.
+
+        Example:
+
+        .. code:: python
+
+           tokens = {
+               'data': ['first', 'second'],
+               'created_at': numpy.array([1552240433, 1552240434]),
+           }
+           response = domain_pb2.User()
+           UserAuthTokenMapping.to_protobuf_columns(tokens, into=response.tokens)
+
+        :param data: a NumPy structured or record array, an Arrow table or a mapping of columns by ``name_at_source``, e.g.: a :py:class:`dict` of lists or arrays or a pandas ``DataFrame``.
+        :param into: an optional ``repeated`` message field of a parent message, which will be filled in place.
+        :returns: a :py:class:`list` of new :ref:`proto` instances, or ``into`` when given.
+        """
+        return columns.columns_to_protobuf(cls, data, into)
+
+    @classmethod
+    def to_bytes_columns(cls, data):
+        """like :py:meth:`~mercator.ProtoMapping.to_protobuf_columns` but returns serialized messages.
+
+        :returns: a :py:class:`list` of :py:class:`bytes`
+        """
+        return columns.columns_to_bytes(cls, data)
+
+    @classmethod
+    def from_protobuf(cls, message, as_object=False):
+        """Converts a :ref:`proto` instance back into source data, the
+        inverse of :py:meth:`~mercator.ProtoMapping.to_protobuf`, see :py:mod:`mercator.reverse`.
+
+        Example:
+
+        .. code:: python
+
+           class UserMapping(ProtoMapping):
+               __proto__ = domain_pb2.User
+
+               username = ProtoKey('login', str)
+
+           UserMapping.from_protobuf(domain_pb2.User(username='foobar'))
+           # {'login': 'foobar', ...}
+
+        :param message: an instance of :ref:`proto`
+        :param as_object: when ``True`` returns an instance of :ref:`source-input-type` rather than a :py:class:`dict`, if declared. Nested mappings follow the same rule.
+        :returns: a :py:class:`dict` keyed by the ``name_at_source`` of each field mapping, or an instance of :ref:`source-input-type`.
+        """
+        parse = reverse.get_object_parser(cls) if as_object else reverse.get_parser(cls)
+        return parse(message)
+
+    @classmethod
+    def from_protobuf_many(cls, messages, as_object=False):
+        """Converts several messages at once with :py:meth:`~mercator.ProtoMapping.from_protobuf`.
+
+        :param messages: an iterable of :ref:`proto` instances, e.g.: a ``repeated`` field.
+        :param as_object: when ``True`` returns instances of :ref:`source-input-type` rather than :py:class:`dict`, if declared.
+        :returns: a :py:class:`list`
+        """
+        parse = reverse.get_object_parser(cls) if as_object else reverse.get_parser(cls)
+        return [parse(message) for message in messages]
@@ -0,0 +1,194 @@
+"""Converts records from :py:mod:`asyncio` code, e.g.: ``grpc.aio``
+servicers, without blocking the event loop for the whole conversion.
+
+Conversions are pure python and run in the thread of the event loop,
+so a message with thousands of items delays every other coroutine
+until it is done. :py:func:`convert_async` converts the message
+without its large ``repeated`` fields and then extends them in slices
+of ``slice_size`` items, yielding control to the event loop between
+slices. Only the fields of the top-level message are sliced: large
+lists nested in other fields are converted at once.
+
+Above ``offload_threshold`` items, the conversion can be run in an
+executor instead:
+
+- a :py:class:`~concurrent.futures.ThreadPoolExecutor` shares the GIL
+  with the event loop, which then resumes at least every
+  :py:func:`sys.getswitchinterval` seconds.
+- a :py:class:`~concurrent.futures.ProcessPoolExecutor` encodes the
+  message in another process with :py:mod:`mercator.parallel`, under
+  the same constraints: the mapping is declared at module level and
+  the data is picklable.
+
+:py:func:`iter_protobuf_async` converts batches of records, from a
+regular or an asynchronous iterable, ``slice_size`` records at a time.
+"""
+import asyncio
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .meta import is_map_field
+from .meta import is_repeated
+from .plan import is_opaque_field
+from . import buffers
+from . import delta
+from . import parallel
+
+
+DEFAULT_SLICE_SIZE = 1000
+DEFAULT_OFFLOAD_THRESHOLD = 10000
+
+
+def get_sliceable_fields(mapping_class):
+    """returns a list of ``(name, field, caster)`` of the ``repeated``
+    fields of the given mapping that can be converted in slices,
+    compiling their casters on first use.
+    """
+    # look up the class' own attribute, fields are not inherited
+    if '__sliceable_fields__' not in vars(mapping_class):
+        names_at_source = [field.name_at_source for field in mapping_class.__fields__.values()]
+        fields = []
+        for name, field in mapping_class.__fields__.items():
+            descriptor = field.descriptor
+            if descriptor is None or not is_repeated(descriptor) or is_map_field(descriptor):
+                continue
+
+            # the source value is left out of the data given to the
+            # plan, which would affect other fields reading it
+            if is_opaque_field(field) or names_at_source.count(field.name_at_source) > 1:
+                continue
+
+            fields.append((name, field, field.compile_caster()))
+
+        mapping_class.__sliceable_fields__ = fields
+
+    return mapping_class.__sliceable_fields__
+
+
+def get_value(data, name):
+    if isinstance(data, dict):
+        return data.get(name)
+
+    return getattr(data, name, None)
+
+
+def is_sliceable(value):
+    return isinstance(value, (list, tuple)) or buffers.is_buffer(value)
+
+
+def find_lists(mapping_class, data):
+    """returns a list of ``(name, field, caster, value)`` of the
+    sliceable fields of ``data`` that have items.
+    """
+    lists = []
+    for name, field, caster in get_sliceable_fields(mapping_class):
+        value = get_value(data, field.name_at_source)
+        if is_sliceable(value) and len(value) > 0:
+            lists.append((name, field, caster, value))
+
+    return lists
+
+
+def without_fields(mapping_class, data, fields):
+    """returns a :py:class:`dict` with the source data of ``data`` but
+    without the given fields, for the compiled plan.
+    """
+    excluded = set([field.name_at_source for field in fields])
+    if isinstance(data, dict):
+        return dict([(key, value) for key, value in data.items() if key not in excluded])
+
+    names = [field.name_at_source for field in mapping_class.__fields__.values()]
+    return dict([
+        (name, getattr(data, name, None))
+        for name in names + delta.get_discriminators(mapping_class)
+        if name not in excluded
+    ])
+
+
+def encode_in_worker(mapping_id, data):
+    """runs in worker processes and returns the encoded message"""
+    return parallel.encode_chunk(mapping_id, [data])[0]
+
+
+async def offload(mapping_class, data, executor):
+    """converts ``data`` in the given executor"""
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        mapping_id = parallel.get_mapping_id(mapping_class)
+        serialized = await loop.run_in_executor(executor, encode_in_worker, mapping_id, data)
+        return mapping_class.__proto__.FromString(serialized)
+
+    return await loop.run_in_executor(executor, convert, mapping_class, data)
+
+
+def convert(mapping_class, data):
+    plan = mapping_class.__plan__
+    if plan is None:
+        return mapping_class(data).to_protobuf()
+
+    return plan(data)
+
+
+async def convert_async(mapping_class, data, slice_size=DEFAULT_SLICE_SIZE, executor=None,
+                        offload_threshold=DEFAULT_OFFLOAD_THRESHOLD):
+    """Converts ``data`` into a message of the given mapping, yielding
+    control to the event loop every ``slice_size`` items of its large
+    ``repeated`` fields.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param data: a :py:class:`dict`, an instance of :ref:`source-input-type` or ``None``
+    :param slice_size: the maximum number of items converted between two yields.
+    :param executor: an optional :py:class:`~concurrent.futures.Executor` that converts messages with at least ``offload_threshold`` items in their ``repeated`` fields.
+    :param offload_threshold: the number of items above which the conversion runs in ``executor``.
+    :returns: a new :ref:`proto` instance, equal to :py:meth:`~mercator.ProtoMapping.to_protobuf`
+    """
+    if data is None or mapping_class.__plan__ is None:
+        # custom conversions cannot be sliced
+        lists = []
+    else:
+        lists = find_lists(mapping_class, data)
+
+    if executor is not None and sum([len(value) for _, _, _, value in lists]) >= offload_threshold:
+        return await offload(mapping_class, data, executor)
+
+    large = [entry for entry in lists if len(entry[3]) > slice_size]
+    if not large:
+        return convert(mapping_class, data)
+
+    message = mapping_class.__plan__(without_fields(mapping_class, data, [field for _, field, _, _ in large]))
+    for name, field, caster, value in large:
+        repeated = getattr(message, name)
+        for start in range(0, len(value), slice_size):
+            await asyncio.sleep(0)
+            items = value[start:start + slice_size]
+            repeated.extend(caster(items) if caster is not None else items)
+
+    return message
+
+
+async def iter_items(items):
+    """generates the items of a regular or an asynchronous iterable"""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def iter_protobuf_async(mapping_class, items, slice_size=DEFAULT_SLICE_SIZE):
+    """Converts several records, yielding control to the event loop
+    every ``slice_size`` records.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param items: an iterable or an asynchronous iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+    :param slice_size: the maximum number of records converted between two yields.
+    :returns: an asynchronous generator of :ref:`proto` instances.
+    """
+    count = 0
+    async for item in iter_items(items):
+        yield convert(mapping_class, item)
+        count += 1
+        if count == slice_size:
+            count = 0
+            await asyncio.sleep(0)
@@ -0,0 +1,371 @@
+"""Microbenchmarks of the hot paths of mercator.
+
+Run with:
+
+.. code:: bash
+
+   python -m mercator.bench
+   python -m mercator.bench --json before.json
+   python -m mercator.bench --json after.json --compare before.json
+
+Every scenario declares its own messages at runtime, so the suite
+needs no compiled ``.proto`` files and runs against any installed
+version of mercator. For each scenario it reports operations per
+second, the median (p50) and 99th percentile (p99) latency of a single
+operation and the peak memory allocated by one operation as measured
+by :py:mod:`tracemalloc`.
+
+The scenario with SQLAlchemy objects is skipped when SQLAlchemy is not
+installed.
+"""
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+from google.protobuf import descriptor_pb2
+from google.protobuf import descriptor_pool
+from google.protobuf import message_factory
+from google.protobuf import timestamp_pb2
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.internal import api_implementation
+
+from . import ProtoMapping
+from . import ProtoKey
+from . import ProtoList
+from . import SinglePropertyMapping
+from .version import version
+
+
+PROTO_FILE = 'mercator/bench.proto'
+WIDE_FIELD_COUNT = 80
+
+
+def get_message_class(descriptor):
+    """returns the python class of the given message descriptor, across protobuf versions"""
+    if hasattr(message_factory, 'GetMessageClass'):
+        return message_factory.GetMessageClass(descriptor)
+
+    return message_factory.MessageFactory(descriptor.file.pool).GetPrototype(descriptor)
+
+
+def add_field(message, name, number, field_type, label=FieldDescriptor.LABEL_OPTIONAL, type_name=None):
+    field = message.field.add(name=name, number=number, type=field_type, label=label)
+    if type_name:
+        field.type_name = type_name
+
+
+def build_file_descriptor():
+    """returns the ``FileDescriptorProto`` of the benchmark messages,
+    equivalent to the messages of the tests of mercator.
+    """
+    string = FieldDescriptor.TYPE_STRING
+    message = FieldDescriptor.TYPE_MESSAGE
+    repeated = FieldDescriptor.LABEL_REPEATED
+
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=PROTO_FILE,
+        package='mercator.bench',
+        syntax='proto3',
+        dependency=['google/protobuf/timestamp.proto'],
+    )
+    token = file_proto.message_type.add(name='AuthToken')
+    add_field(token, 'value', 1, string)
+    add_field(token, 'created_at', 2, message, type_name='.google.protobuf.Timestamp')
+    add_field(token, 'expires_at', 3, message, type_name='.google.protobuf.Timestamp')
+
+    user = file_proto.message_type.add(name='User')
+    add_field(user, 'uuid', 1, string)
+    add_field(user, 'username', 2, string)
+    add_field(user, 'email', 3, string)
+    add_field(user, 'tokens', 4, message, label=repeated, type_name='.mercator.bench.AuthToken')
+
+    media = file_proto.message_type.add(name='Media')
+    add_field(media, 'uuid', 1, string)
+    add_field(media, 'name', 2, string)
+    add_field(media, 'author', 3, message, type_name='.mercator.bench.User')
+    add_field(media, 'download_url', 4, string)
+    add_field(media, 'blob', 5, FieldDescriptor.TYPE_BYTES)
+
+    wide = file_proto.message_type.add(name='Wide')
+    wide_types = [string, FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_DOUBLE, FieldDescriptor.TYPE_BOOL]
+    for number in range(1, WIDE_FIELD_COUNT + 1):
+        add_field(wide, f'field_{number}', number, wide_types[number % len(wide_types)])
+
+    return file_proto
+
+
+def load_message_classes():
+    """adds the benchmark messages to the default descriptor pool, once
+    per process, and returns their classes by name.
+    """
+    pool = descriptor_pool.Default()
+    try:
+        pool.FindFileByName(PROTO_FILE)
+    except KeyError:
+        pool.AddSerializedFile(build_file_descriptor().SerializeToString())
+
+    names = ('AuthToken', 'User', 'Media', 'Wide')
+    return dict([(name, get_message_class(pool.FindMessageTypeByName(f'mercator.bench.{name}'))) for name in names])
+
+
+def declare_mappings(messages, source_types=None):
+    """returns the mappings of the benchmark messages by name,
+    optionally declaring a ``__source_input_type__`` for each of them.
+    """
+    source_types = source_types or {}
+    ProtobufTimestamp = SinglePropertyMapping(int, timestamp_pb2.Timestamp, 'seconds')
+
+    class AuthTokenMapping(ProtoMapping):
+        __proto__ = messages['AuthToken']
+        __source_input_type__ = source_types.get('AuthToken')
+
+        value = ProtoKey('data', str)
+        created_at = ProtoKey('created_at', ProtobufTimestamp)
+        expires_at = ProtoKey('expires_at', ProtobufTimestamp)
+
+    class UserMapping(ProtoMapping):
+        __proto__ = messages['User']
+        __source_input_type__ = source_types.get('User')
+
+        uuid = ProtoKey('id', str)
+        username = ProtoKey('login', str)
+        email = ProtoKey('email', str)
+        tokens = ProtoList('tokens', AuthTokenMapping)
+
+    class MediaMapping(ProtoMapping):
+        __proto__ = messages['Media']
+        __source_input_type__ = source_types.get('Media')
+
+        author = ProtoKey('author', UserMapping)
+        download_url = ProtoKey('link', str)
+        blob = ProtoKey('blob', bytes)
+
+    class WideMapping(ProtoMapping):
+        __proto__ = messages['Wide']
+
+    return {
+        'AuthToken': AuthTokenMapping,
+        'User': UserMapping,
+        'Media': MediaMapping,
+        'Wide': WideMapping,
+    }
+
+
+def make_token(index):
+    return {'data': f'token-{index}', 'created_at': 1552240433 + index, 'expires_at': 1552240733 + index}
+
+
+def make_user(token_count=3):
+    return {
+        'id': '8a5b5bd4-3a53-4b0c-9ae1-4a3c1e1cd7a1',
+        'login': 'chucknorris',
+        'email': 'chuck@norris.com',
+        'tokens': [make_token(index) for index in range(token_count)],
+    }
+
+
+def make_media():
+    return {
+        'uuid': '0f3ba2f1-6b5b-4bf3-8a5a-1e2e7a3b9c11',
+        'name': 'roundhouse kick',
+        'author': make_user(),
+        'link': 'https://example.com/media/roundhouse.gif',
+        'blob': b'GIF89a' * 16,
+    }
+
+
+def make_wide(populated):
+    values = ['text', 1 << 40, 3.14159, True]
+    return dict([(f'field_{number}', values[number % len(values)]) for number in range(1, populated + 1)])
+
+
+def sqlalchemy_scenarios(messages):
+    """returns the scenarios that convert SQLAlchemy instances, or an
+    empty list when SQLAlchemy is not installed.
+    """
+    try:
+        import sqlalchemy as sa
+        from sqlalchemy import orm as sa_orm
+        from sqlalchemy.ext.declarative import declarative_base
+    except ImportError:
+        return []
+
+    BaseModel = declarative_base()
+
+    class User(BaseModel):
+        __tablename__ = 'user'
+
+        id = sa.Column(sa.String(36), primary_key=True)
+        login = sa.Column(sa.String(256))
+        email = sa.Column(sa.String(256))
+
+    class AuthToken(BaseModel):
+        __tablename__ = 'auth_token'
+
+        id = sa.Column(sa.Integer, primary_key=True)
+        data = sa.Column(sa.String(256))
+        created_at = sa.Column(sa.Integer)
+        expires_at = sa.Column(sa.Integer)
+        user_id = sa.Column(sa.String(36), sa.ForeignKey('user.id'))
+        user = sa_orm.relationship(User, backref='tokens')
+
+    mappings = declare_mappings(messages, {'User': User, 'AuthToken': AuthToken})
+    UserMapping = mappings['User']
+
+    user = User(id='8a5b5bd4-3a53-4b0c-9ae1-4a3c1e1cd7a1', login='chucknorris', email='chuck@norris.com')
+    user.tokens = [AuthToken(**make_token(index)) for index in range(3)]
+    users = [user] * 100
+
+    return [
+        ('sqlalchemy: User with 3 tokens', lambda: UserMapping(user).to_protobuf()),
+        ('sqlalchemy: 100 Users with to_protobuf_many()', lambda: UserMapping.to_protobuf_many(users)),
+    ]
+
+
+def build_scenarios():
+    """returns a list of ``(name, function)`` where ``function`` takes no arguments and runs one operation"""
+    messages = load_message_classes()
+    mappings = declare_mappings(messages)
+    AuthTokenMapping = mappings['AuthToken']
+    UserMapping = mappings['User']
+    MediaMapping = mappings['Media']
+    WideMapping = mappings['Wide']
+
+    token = make_token(0)
+    media = make_media()
+    users = dict([(count, make_user(count)) for count in (1, 100, 10000)])
+    sparse = make_wide(10)
+    dense = make_wide(WIDE_FIELD_COUNT)
+
+    scenarios = [
+        ('flat: dict -> AuthToken', lambda: AuthTokenMapping(token).to_protobuf()),
+        ('flat: dict -> AuthToken bytes', lambda: AuthTokenMapping(token).to_bytes()),
+        ('nested: dict -> Media -> User -> AuthToken', lambda: MediaMapping(media).to_protobuf()),
+        ('nested: dict -> Media bytes', lambda: MediaMapping(media).to_bytes()),
+        ('ProtoList: 1 item', lambda: UserMapping(users[1]).to_protobuf()),
+        ('ProtoList: 100 items', lambda: UserMapping(users[100]).to_protobuf()),
+        ('ProtoList: 10000 items', lambda: UserMapping(users[10000]).to_protobuf()),
+        (f'wide: 10/{WIDE_FIELD_COUNT} fields', lambda: WideMapping(sparse).to_protobuf()),
+        (f'wide: {WIDE_FIELD_COUNT}/{WIDE_FIELD_COUNT} fields', lambda: WideMapping(dense).to_protobuf()),
+    ]
+    scenarios.extend(sqlalchemy_scenarios(messages))
+    return scenarios
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure_allocations(function, repeat=5):
+    """returns the smallest peak of memory allocated by ``function``, in bytes"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return min(peaks)
+
+
+def run_scenario(function, duration, min_runs=5):
+    """runs ``function`` repeatedly for about ``duration`` seconds
+    and returns a dict with its statistics.
+    """
+    function()  # warm up, e.g.: compile encoders
+
+    timings = []
+    perf_counter_ns = time.perf_counter_ns
+    deadline = time.perf_counter() + duration
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(timings) < min_runs or time.perf_counter() < deadline:
+            started = perf_counter_ns()
+            function()
+            timings.append(perf_counter_ns() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    timings.sort()
+    return {
+        'runs': len(timings),
+        'ops_per_sec': len(timings) / (sum(timings) / 1e9),
+        'p50_us': percentile(timings, 0.50) / 1e3,
+        'p99_us': percentile(timings, 0.99) / 1e3,
+        'peak_alloc_bytes': measure_allocations(function),
+    }
+
+
+def environment():
+    return {
+        'mercator': version,
+        'python': platform.python_version(),
+        'protobuf_implementation': api_implementation.Type(),
+        'platform': platform.platform(),
+    }
+
+
+def format_change(current, previous):
+    if not previous:
+        return ''
+
+    return f' {(current / previous - 1) * 100:+7.1f}%'
+
+
+def print_result(name, result, previous=None, file=sys.stdout):
+    previous = previous or {}
+    print(
+        f'{name:<45} '
+        f'{result["ops_per_sec"]:12,.1f} ops/s{format_change(result["ops_per_sec"], previous.get("ops_per_sec"))}  '
+        f'p50 {result["p50_us"]:10.2f} µs  '
+        f'p99 {result["p99_us"]:10.2f} µs{format_change(result["p99_us"], previous.get("p99_us"))}  '
+        f'{result["peak_alloc_bytes"]:>10,} B',
+        file=file,
+    )
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m mercator.bench', description=__doc__.split('\n')[0])
+    parser.add_argument('--json', metavar='FILE', help='write the results as JSON into FILE')
+    parser.add_argument('--compare', metavar='FILE', help='show changes relative to the results in FILE, written by --json')
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds spent in each scenario (default: %(default)s)')
+    parser.add_argument('--filter', metavar='TEXT', default='', help='only run scenarios whose name contains TEXT')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)['results']
+
+    results = {}
+    for name, function in build_scenarios():
+        if args.filter not in name:
+            continue
+
+        results[name] = run_scenario(function, args.duration)
+        print_result(name, results[name], previous.get(name))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'environment': environment(), 'results': results}, file, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Casts typed buffers given to ``repeated`` scalar fields, e.g.: an
+:py:class:`array.array`, a :py:class:`memoryview` or a NumPy array of
+ints or floats, without a python-level loop per item.
+
+Any object that supports the buffer protocol and has a ``tolist()``
+method is accepted by :py:class:`~mercator.ProtoList`. The items are
+checked once against the type of the field, from the format of the
+buffer, and converted into python values at once with ``tolist()``,
+since message constructors copy a :py:class:`list` faster than they
+iterate over a buffer. The ``target_type`` is only applied, with a
+single :py:func:`map`, when it differs from the type of the items.
+
+This module does not depend on NumPy.
+"""
+from google.protobuf.descriptor import FieldDescriptor
+
+from .errors import TypeCastError
+
+
+FORMAT_KINDS = dict(
+    [(code, 'i') for code in 'bhilqn'] +
+    [(code, 'u') for code in 'BHILQN'] +
+    [(code, 'f') for code in 'efd'] +
+    [('?', 'b')]
+)
+
+INTEGER_TYPES = (
+    FieldDescriptor.TYPE_INT32,
+    FieldDescriptor.TYPE_INT64,
+    FieldDescriptor.TYPE_UINT32,
+    FieldDescriptor.TYPE_UINT64,
+    FieldDescriptor.TYPE_SINT32,
+    FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED32,
+    FieldDescriptor.TYPE_FIXED64,
+    FieldDescriptor.TYPE_SFIXED32,
+    FieldDescriptor.TYPE_SFIXED64,
+    FieldDescriptor.TYPE_ENUM,
+)
+
+# the kinds of buffers accepted by numeric fields
+ACCEPTED_KINDS = dict(
+    [(field_type, ('i', 'u', 'b')) for field_type in INTEGER_TYPES] + [
+        (FieldDescriptor.TYPE_DOUBLE, ('f', 'i', 'u')),
+        (FieldDescriptor.TYPE_FLOAT, ('f', 'i', 'u')),
+        (FieldDescriptor.TYPE_BOOL, ('b', 'i', 'u')),
+    ]
+)
+
+# the python type of the items of each kind of buffer
+ITEM_TYPES = {
+    'i': int,
+    'u': int,
+    'f': float,
+    'b': bool,
+}
+
+
+def is_buffer(value):
+    """returns ``True`` for typed buffers, e.g.: :py:class:`array.array`, :py:class:`memoryview` or NumPy arrays"""
+    if isinstance(value, (list, tuple, str, bytes, bytearray)):
+        return False
+
+    try:
+        memoryview(value)
+    except TypeError:
+        return False
+
+    return callable(getattr(value, 'tolist', None))
+
+
+def describe_buffer(value):
+    """returns the kind of the items of a 1-dimensional buffer: ``'i'``,
+    ``'u'``, ``'f'``, ``'b'`` or ``None`` if unknown.
+    """
+    view = memoryview(value)
+    if view.ndim != 1:
+        raise TypeCastError(f'ProtoList.cast() received a buffer with {view.ndim} dimensions, '
+                            f'only 1-dimensional buffers are supported')
+
+    return FORMAT_KINDS.get(view.format.lstrip('@=<>!'))
+
+
+def compile_buffer_caster(descriptor, target_type):
+    """returns a function that casts a buffer given to the bound
+    repeated field ``descriptor`` into a :py:class:`list`, raising
+    :py:class:`~mercator.errors.TypeCastError` when numeric fields
+    receive buffers of other types (e.g.: floats for ints).
+
+    :param descriptor: a :py:class:`~google.protobuf.descriptor.FieldDescriptor` or ``None`` for unbound fields.
+    :param target_type: the ``target_type`` of the :py:class:`~mercator.ProtoList`, applied with :py:func:`map` when the items are not already of that type.
+    """
+    accepted_kinds = ACCEPTED_KINDS.get(descriptor.type) if descriptor is not None else None
+    type_name = descriptor.full_name if descriptor is not None else None
+
+    def cast(value):
+        kind = describe_buffer(value)
+        if accepted_kinds is not None and kind not in accepted_kinds:
+            raise TypeCastError(f'ProtoList.cast() received a buffer of {memoryview(value).format!r} items '
+                                f'for the numeric field {type_name}')
+
+        items = value.tolist()
+        if target_type is None or ITEM_TYPES.get(kind) is target_type:
+            return items
+
+        return list(map(target_type, items))
+
+    return cast
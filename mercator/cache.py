@@ -0,0 +1,345 @@
+"""Caches the serialized messages of records that did not change since
+their last conversion.
+
+Mappings declare a ``__cache_key__`` that changes whenever the
+converted data changes, e.g.: the primary key and a version column:
+
+.. code:: python
+
+   class ProductMapping(ProtoMapping):
+       __proto__ = domain_pb2.Product
+       __source_input_type__ = sql.Product
+       __cache_key__ = ('uuid', 'updated_at')
+
+       uuid = ProtoKey('uuid', str)
+       name = ProtoKey('name', str)
+
+
+   cache = LRUResultCache(max_bytes=256 * 1024 * 1024)
+   ProductMapping(product).to_bytes(cache=cache)
+
+``__cache_key__`` is either a tuple with the names of keys or
+attributes of the source data, or a function that takes the source
+data and returns a hashable key. Records whose key is ``None``, or has
+``None`` values, e.g.: instances not flushed yet, are converted
+without the cache.
+
+The key must change whenever any converted value changes, including
+the values of nested mappings: a version column that is not bumped
+when a related row changes serves stale messages.
+
+:py:class:`LRUResultCache` keeps the messages in the memory of the
+process. :py:class:`FileResultCache` keeps them in a directory shared
+by worker processes, e.g.: on a ``tmpfs`` such as ``/dev/shm`` to
+share them in memory. Other backends subclass :py:class:`ResultCache`.
+"""
+import os
+import abc
+import hashlib
+import tempfile
+import threading
+import collections
+
+from .wire import get_encoder
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# ratio of ``max_bytes`` kept when :py:class:`FileResultCache` evicts
+# files, so that the directory is not scanned on every write
+FILE_LOW_WATERMARK = 0.75
+
+
+def get_key_function(mapping_class):
+    """returns a function that takes the source data of the given
+    mapping and returns its ``__cache_key__`` or ``None``.
+    """
+    # look up the class' own attribute, keys are declared per mapping
+    if '__cache_key_function__' not in vars(mapping_class):
+        declared = vars(mapping_class).get('__cache_key__')
+        if declared is None:
+            raise TypeError(f'{mapping_class} does not declare a __cache_key__')
+
+        if callable(declared):
+            get_key = declared
+        else:
+            names = tuple(declared)
+
+            def get_key(data):
+                if isinstance(data, dict):
+                    key = tuple(map(data.get, names))
+                else:
+                    key = tuple([getattr(data, name, None) for name in names])
+
+                if any(value is None for value in key):
+                    return None
+
+                return key
+
+        mapping_class.__cache_key_function__ = staticmethod(get_key)
+
+    return mapping_class.__cache_key_function__
+
+
+def get_mapping_name(mapping_class):
+    return f'{mapping_class.__module__}.{mapping_class.__qualname__}'
+
+
+class ResultCache(abc.ABC):
+    """Abstract base class of the caches of serialized messages given to
+    :py:meth:`~mercator.ProtoMapping.to_bytes` and
+    :py:meth:`~mercator.ProtoMapping.to_protobuf`.
+
+    Subclasses implement :py:meth:`load`, :py:meth:`store`,
+    :py:meth:`clear`, ``__len__`` and :py:attr:`size`, and count their
+    evictions.
+    """
+    max_bytes = None
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_key(self, mapping_class, data):
+        """returns the key of ``data`` in the cache, or ``None`` if it
+        cannot be cached.
+        """
+        key = get_key_function(mapping_class)(data)
+        if key is None:
+            return None
+
+        return get_mapping_name(mapping_class), key
+
+    @abc.abstractmethod
+    def load(self, key):
+        """returns the :py:class:`bytes` stored under ``key`` or ``None``"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def store(self, key, value):
+        """stores the :py:class:`bytes` ``value`` under ``key``"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self):
+        """removes all cached messages"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def size(self):
+        """the number of bytes of the cached messages"""
+        raise NotImplementedError
+
+    def to_bytes(self, mapping_class, data):
+        """returns the serialized message of ``data``, encoding it
+        with :py:mod:`mercator.wire` on a miss.
+        """
+        key = self.get_key(mapping_class, data)
+        if key is not None:
+            value = self.load(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+
+        value = bytes(get_encoder(mapping_class)(data, bytearray()))
+        if key is not None:
+            self.store(key, value)
+
+        return value
+
+    @property
+    def hit_rate(self):
+        """the ratio of lookups that found a cached message, between ``0.0`` and ``1.0``"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """returns the statistics of the cache
+
+        :returns: a :py:class:`dict` like ``{'hits': 999, 'misses': 1, 'evictions': 0, 'entries': 1, 'bytes': 120, 'max_bytes': 67108864, 'hit_rate': 0.999}``
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.hit_rate,
+        }
+
+
+class LRUResultCache(ResultCache):
+    """Keeps serialized messages in memory, evicting the least recently
+    used ones when their total size exceeds ``max_bytes``.
+
+    :param max_bytes: the maximum total size of the cached messages, larger messages are not cached.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError(f'LRUResultCache() takes a positive max_bytes, but got {max_bytes} instead')
+
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+
+        return value
+
+    def store(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+
+            self.entries[key] = value
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def size(self):
+        return self.bytes
+
+
+class FileResultCache(ResultCache):
+    """Keeps serialized messages in files of ``directory``, shared by
+    the processes that use the same directory.
+
+    Files are named after a hash of the ``repr()`` of their key, so the
+    values of ``__cache_key__`` must have the same ``repr()`` in every
+    process, like :py:class:`str`, :py:class:`int`,
+    :py:class:`~uuid.UUID` or :py:class:`~datetime.datetime`. Files are
+    replaced atomically, and the least recently used ones are removed
+    when the size of the directory exceeds ``max_bytes``. Statistics
+    are counted per process.
+
+    Messages are not invalidated when mappings change, the directory
+    must be cleared when deploying new mappings.
+
+    :param directory: the path of the directory, created if necessary.
+    :param max_bytes: the maximum total size of the files, or ``None`` for no limit.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f'FileResultCache() takes a positive max_bytes, but got {max_bytes} instead')
+
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # estimated size of the directory, measured again on eviction
+        self.bytes = self.size
+
+    def get_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def load(self, key):
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = file.read()
+        except FileNotFoundError:
+            return None
+
+        # the modification time orders files for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return value
+
+    def store(self, key, value):
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            return
+
+        # temporary files start with a dot, which is ignored by the
+        # other methods
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(value)
+            os.replace(temporary_path, self.get_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        self.bytes += len(value)
+        if self.max_bytes is not None and self.bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * FILE_LOW_WATERMARK))
+
+    def iter_files(self):
+        """generates ``(path, stat)`` of the cached messages"""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    yield entry.path, entry.stat()
+                except FileNotFoundError:
+                    continue
+
+    def evict(self, target_bytes):
+        """removes the least recently used files until the directory
+        holds at most ``target_bytes``.
+        """
+        files = sorted(self.iter_files(), key=lambda item: item[1].st_mtime)
+        total = sum([stat.st_size for _, stat in files])
+        for path, stat in files:
+            if total <= target_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self.evictions += 1
+            total -= stat.st_size
+
+        self.bytes = total
+
+    def clear(self):
+        for path, _ in list(self.iter_files()):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        self.bytes = 0
+
+    def __len__(self):
+        return len(list(self.iter_files()))
+
+    @property
+    def size(self):
+        return sum([stat.st_size for _, stat in self.iter_files()])
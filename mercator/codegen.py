@@ -0,0 +1,504 @@
+"""Generates plain python modules with the converters of existing
+:py:class:`~mercator.ProtoMapping` classes.
+
+Run with:
+
+.. code:: bash
+
+   python -m mercator.codegen myapp.mappings -o myapp/static_mappings.py
+   python -m mercator.codegen myapp.mappings UserMapping MediaMapping
+
+The generated module declares a :py:class:`StaticMapping` subclass
+with the same name for every mapping of the given module, or only for
+the given ones, along with the mappings they nest. Each of them
+converts with a converter function written out field by field: the
+casts of native python types, of
+:py:class:`~mercator.SinglePropertyMapping` and the calls to the
+converters of nested mappings are inlined, so importing the module
+does no introspection nor code generation and converting does no
+dispatch through the field mappings.
+
+Generated mappings produce the exact same messages as
+:py:meth:`~mercator.ProtoMapping.to_protobuf`, and support only
+:py:meth:`~StaticMapping.to_protobuf`, :py:meth:`~StaticMapping.to_bytes`
+and :py:meth:`~StaticMapping.to_protobuf_many`: the rest of the API of
+:py:class:`~mercator.ProtoMapping`, e.g.:
+:py:meth:`~mercator.ProtoMapping.from_protobuf` or
+:py:mod:`mercator.stream`, requires the original mappings. The module
+must be generated again whenever the mappings or the ``.proto`` files
+change.
+
+Every object referenced by the mappings, e.g.: message classes,
+:ref:`source-input-type`, the ``to_python`` function of a
+:py:class:`~mercator.SinglePropertyMapping` or the casters of
+:py:mod:`mercator.wellknown`, must be importable by name. Mappings
+that customize their conversion or declare a
+:py:class:`~mercator.ProtoOneOf`, fields that override ``cast()`` and
+fields memoized with a function cannot be generated and raise
+:py:class:`TypeError`.
+"""
+import abc
+import sys
+import builtins
+import argparse
+import importlib
+
+from . import ProtoKey
+from . import ProtoList
+from . import ProtoEnum
+from . import ProtoMap
+from . import SinglePropertyMapping
+from . import is_proto_mapping
+from .plan import is_opaque_field
+from .structs import get_json_message_type
+from .wellknown import WellKnownCaster
+
+
+class StaticMapping(abc.ABC):
+    """Abstract base class of the mappings written by
+    :py:mod:`mercator.codegen`, with the :py:meth:`to_protobuf`,
+    :py:meth:`to_bytes` and :py:meth:`to_protobuf_many` methods of
+    :py:class:`~mercator.ProtoMapping`.
+
+    Subclasses implement :py:meth:`__convert__` as a static method.
+    """
+    __slots__ = ('data',)
+
+    __proto__ = None
+    __source_input_type__ = None
+
+    def __init__(self, data):
+        self.data = data
+
+    @staticmethod
+    @abc.abstractmethod
+    def __convert__(data):
+        """returns a new :ref:`proto` instance for ``data``"""
+        raise NotImplementedError
+
+    def to_protobuf(self):
+        """
+        :returns: a new :ref:`proto` instance, equal to :py:meth:`~mercator.ProtoMapping.to_protobuf`
+        """
+        return self.__convert__(self.data)
+
+    def to_bytes(self, into=None):
+        """
+        :param into: an optional :py:class:`bytearray` to which the encoded message is appended.
+        :returns: :py:class:`bytes` equal to :py:meth:`~mercator.ProtoMapping.to_bytes`, or ``into`` when given.
+        """
+        encoded = self.__convert__(self.data).SerializeToString()
+        if into is None:
+            return encoded
+
+        into += encoded
+        return into
+
+    @classmethod
+    def to_protobuf_many(cls, items, into=None):
+        """
+        :param items: an iterable of :py:class:`dict` or objects compatible with :ref:`source-input-type`.
+        :param into: an optional ``repeated`` message field of a parent message, which will be extended in place.
+        :returns: a :py:class:`list` of new :ref:`proto` instances, or ``into`` when given.
+        """
+        messages = list(map(cls.__convert__, items))
+        if into is None:
+            return messages
+
+        into.extend(messages)
+        return into
+
+
+def compile_list_caster(proto_class, name, target_type):
+    """returns the caster of a :py:class:`~mercator.ProtoList` of a
+    native python type for the field ``name`` of ``proto_class``,
+    used by generated modules so that lists and typed buffers are cast
+    exactly like in :py:meth:`~mercator.ProtoList.compile_caster`.
+    """
+    field = ProtoList(name, target_type).bind(proto_class.DESCRIPTOR.fields_by_name[name])
+    return field.compile_caster()
+
+
+def compile_key_caster(proto_class, name, target_type):
+    """returns the caster of a :py:class:`~mercator.ProtoKey` for the
+    field ``name`` of ``proto_class``, used by generated modules for
+    ``google.protobuf.Struct``, ``ListValue`` and ``Value`` fields
+    declared with :py:class:`dict` or :py:class:`list`, see
+    :py:mod:`mercator.structs`.
+    """
+    field = ProtoKey(name, target_type).bind(proto_class.DESCRIPTOR.fields_by_name[name])
+    return field.compile_caster()
+
+
+def compile_enum_caster(proto_class, name, aliases, case_sensitive):
+    """returns the caster of a :py:class:`~mercator.ProtoEnum` for the
+    field ``name`` of ``proto_class``, used by generated modules so that
+    the table of enum values is computed once at import time.
+    """
+    field = ProtoEnum(name, aliases, case_sensitive).bind(proto_class.DESCRIPTOR.fields_by_name[name])
+    return field.compile_caster()
+
+
+def compile_map_caster(proto_class, name, target_type=None, key=None, key_type=None, convert=None):
+    """returns the caster of a :py:class:`~mercator.ProtoMap` for the
+    field ``name`` of ``proto_class``, used by generated modules.
+
+    :param convert: the converter of the values, e.g.: of a generated mapping, in place of ``target_type``.
+    """
+    field = ProtoMap(name, target_type, key=key, key_type=key_type).bind(proto_class.DESCRIPTOR.fields_by_name[name])
+    if convert is not None:
+        return field.compile_items_caster(convert)
+
+    return field.compile_caster()
+
+
+def resolve(module, qualname):
+    target = module
+    for part in qualname.split('.'):
+        target = getattr(target, part, None)
+
+    return target
+
+
+def find_global_name(module, obj):
+    """returns the public global name of ``module`` bound to ``obj``, if any"""
+    for name, value in list(vars(module).items() if module is not None else ()):
+        if value is obj and not name.startswith('_'):
+            return name
+
+
+class ModuleWriter(object):
+    """Collects the imports, converters, casters and classes of a
+    generated module.
+    """
+    def __init__(self, mappings):
+        self.mappings = mappings
+        self.imports = {}
+        self.casters = []
+        self.functions = []
+        self.classes = []
+
+    def reference(self, obj, context):
+        """returns the python expression of ``obj`` in the generated
+        module, importing its module if necessary.
+        """
+        if obj is None:
+            return 'None'
+
+        name = getattr(obj, '__name__', None)
+        if name is not None and getattr(builtins, name, None) is obj:
+            return name
+
+        # prefer the fully qualified modules, e.g.: "myapp.domain_pb2"
+        # over the "domain_pb2" module imported by grpc stubs.
+        paths = sorted(self.find_paths(obj), key=lambda path: path[0].count('.'), reverse=True)
+        for module_name, qualname in paths[:1]:
+            if module_name in self.imports:
+                alias = self.imports[module_name]
+            else:
+                alias = module_name.rpartition('.')[2]
+                while alias in self.imports.values() or alias in self.mappings.values():
+                    alias = f'{alias}_'
+
+                self.imports[module_name] = alias
+
+            return f'{alias}.{qualname}'
+
+        raise TypeError(f'{context} cannot be generated statically: {obj!r} is not importable by name')
+
+    def find_paths(self, obj):
+        """generates the ``(module_name, qualname)`` where ``obj`` is found"""
+        module_name = getattr(obj, '__module__', None)
+        qualname = getattr(obj, '__qualname__', None)
+        if module_name and qualname and resolve(sys.modules.get(module_name), qualname) is obj:
+            yield module_name, qualname
+
+        # instances, e.g.: casters, are found by the global names they
+        # are bound to, preferably in the module of their class
+        if qualname is None and not isinstance(obj, type):
+            modules = [(module_name, sys.modules.get(module_name))]
+            if find_global_name(modules[0][1], obj) is None:
+                modules = list(sys.modules.items())
+
+            for module_name, module in modules:
+                name = find_global_name(module, obj)
+                if module_name != '__main__' and name is not None:
+                    yield module_name, name
+
+        # classes of generated protobuf modules don't necessarily
+        # have the name of the module they were imported as.
+        descriptor = getattr(obj, 'DESCRIPTOR', None)
+        file_descriptor = getattr(descriptor, 'file', None)
+        if file_descriptor is None:
+            return
+
+        names = []
+        while descriptor is not None:
+            names.insert(0, descriptor.name)
+            descriptor = descriptor.containing_type
+
+        qualname = '.'.join(names)
+        for module_name, module in list(sys.modules.items()):
+            if module_name != '__main__' and getattr(module, 'DESCRIPTOR', None) is file_descriptor:
+                if resolve(module, qualname) is obj:
+                    yield module_name, qualname
+
+    def generate_cast(self, lines, indent, mapping_class, name, field, variable):
+        """appends the statements that cast ``variable``, which is not
+        ``None``, into ``kwargs[name]``.
+        """
+        context = f'{mapping_class.__qualname__}.{name}'
+        target = f'kwargs[{name!r}]'
+        target_type = field.target_type
+        if is_opaque_field(field):
+            raise TypeError(f'{context} cannot be generated statically: {type(field).__name__} overrides cast()')
+
+        if field.memoize and not (field.memoize is True or isinstance(field.memoize, str)):
+            raise TypeError(f'{context} cannot be generated statically: memoize={field.memoize!r} is not a key name')
+
+        if isinstance(field, ProtoMap):
+            caster = f'cast_{mapping_class.__name__}_{name}'
+            proto = self.reference(mapping_class.__proto__, context)
+            key_type = self.reference(field.key_type, context)
+            if is_proto_mapping(target_type):
+                if target_type not in self.mappings:
+                    raise TypeError(f'{context} cannot be generated statically: {target_type.__qualname__} is not generated')
+
+                convert = f'convert_{target_type.__name__}'
+                if field.memoize:
+                    self.imports.setdefault('mercator.memo', 'memo')
+                    convert = f'memo.memoized({convert}, {field.memoize!r})'
+
+                values = f'convert={convert}'
+            else:
+                values = self.reference(target_type, context)
+
+            self.casters.append(f'{caster} = compile_map_caster({proto}, {name!r}, {values}, key={field.key!r}, key_type={key_type})')
+            lines.append(f'{indent}{target} = {caster}({variable})')
+            return
+
+        if is_proto_mapping(target_type):
+            if target_type not in self.mappings:
+                raise TypeError(f'{context} cannot be generated statically: {target_type.__qualname__} is not generated')
+
+            convert = f'convert_{target_type.__name__}'
+            if field.memoize:
+                memoized = f'memoized_{mapping_class.__name__}_{name}'
+                self.imports.setdefault('mercator.memo', 'memo')
+                self.casters.append(f'{memoized} = memo.memoized({convert}, {field.memoize!r})')
+                convert = memoized
+
+            if isinstance(field, ProtoList):
+                lines.extend([
+                    f'{indent}if not isinstance({variable}, (list, tuple)):',
+                    f"{indent}    raise TypeCastError(f'ProtoList.cast() received a non-list value '",
+                    f"{indent}                        f'(type {{type({variable}).__name__}}): {{{variable}}}')",
+                    f'{indent}{target} = list(map({convert}, {variable}))',
+                ])
+            else:
+                lines.append(f'{indent}{target} = {convert}({variable})')
+            return
+
+        if isinstance(field, ProtoEnum):
+            caster = f'cast_{mapping_class.__name__}_{name}'
+            proto = self.reference(mapping_class.__proto__, context)
+            self.casters.append(f'{caster} = compile_enum_caster({proto}, {name!r}, {field.aliases!r}, {field.case_sensitive!r})')
+            lines.append(f'{indent}{target} = {caster}({variable})')
+            return
+
+        if isinstance(field, ProtoList):
+            caster = f'cast_{mapping_class.__name__}_{name}'
+            proto = self.reference(mapping_class.__proto__, context)
+            self.casters.append(f'{caster} = compile_list_caster({proto}, {name!r}, {self.reference(target_type, context)})')
+            lines.append(f'{indent}{target} = {caster}({variable})')
+            return
+
+        if target_type in (dict, list) and get_json_message_type(field.descriptor) is not None:
+            caster = f'cast_{mapping_class.__name__}_{name}'
+            proto = self.reference(mapping_class.__proto__, context)
+            self.casters.append(f'{caster} = compile_key_caster({proto}, {name!r}, {target_type.__name__})')
+            lines.append(f'{indent}{target} = {caster}({variable})')
+            return
+
+        if target_type is None:
+            lines.append(f'{indent}{target} = {variable}')
+            return
+
+        if isinstance(target_type, SinglePropertyMapping):
+            to_python = self.reference(target_type.to_python, context)
+            value = f'{to_python}({variable})'
+            if target_type.check is not None:
+                check = f'check_{mapping_class.__name__}_{name}'
+                message_type = self.reference(target_type.message_type, context)
+                self.casters.append(f'{check} = compile_field_checker({message_type}, {target_type.argname!r})')
+                value = f'{check}({value})'
+
+            expression = f'{{{target_type.argname!r}: {value}}}'
+            error_type = 'SinglePropertyMapping'
+        elif isinstance(target_type, WellKnownCaster):
+            error_type = self.reference(target_type, context)
+            expression = f'{error_type}.to_fields({variable})'
+        elif isinstance(target_type, type):
+            error_type = self.reference(target_type, context)
+            expression = f'{error_type}({variable})'
+        else:
+            raise TypeError(f'{context} cannot be generated statically: unsupported target type {target_type!r}')
+
+        lines.extend([
+            f'{indent}try:',
+            f'{indent}    {target} = {expression}',
+            f'{indent}except (ValueError, TypeError) as e:',
+            f'{indent}    raise cast_error(e, {variable}, {error_type})',
+        ])
+
+    def generate_extraction(self, lines, mapping_class, accessor):
+        lines.append('        kwargs = {}')
+        for index, (name, field) in enumerate(mapping_class.__fields__.items()):
+            variable = f'v{index}'
+            lines.append(f'        {variable} = {accessor.format(repr(field.name_at_source))}')
+            lines.append(f'        if {variable} is not None:')
+            self.generate_cast(lines, '            ', mapping_class, name, field, variable)
+
+        lines.append('        return proto(**kwargs)')
+
+    def add_mapping(self, mapping_class):
+        name = mapping_class.__name__
+        context = mapping_class.__qualname__
+        if mapping_class.__plan__ is None:
+            raise TypeError(f'{context} cannot be generated statically: it customizes to_dict() or to_protobuf()')
+
+        if mapping_class.__oneofs__:
+            raise TypeError(f'{context} cannot be generated statically: it declares ProtoOneOf')
+
+        proto = self.reference(mapping_class.__proto__, context)
+        source_type = self.reference(getattr(mapping_class, '__source_input_type__', None), context)
+
+        lines = [
+            f'def convert_{name}(data, proto={proto}):',
+            '    if data is None:',
+            '        return proto()',
+            '    if isinstance(data, dict):',
+            '        get = data.get',
+        ]
+        self.generate_extraction(lines, mapping_class, 'get({})')
+        if source_type != 'None':
+            lines.append(f'    if isinstance(data, {source_type}):')
+            self.generate_extraction(lines, mapping_class, 'getattr(data, {}, None)')
+
+        lines.append(f"    raise TypeError(f'{{data}} must be a dict or {{{source_type}}} but is {{type(data)}} instead')")
+        self.functions.append('\n'.join(lines))
+
+        self.classes.append('\n'.join([
+            f'class {name}(StaticMapping):',
+            '    __slots__ = ()',
+            f'    __proto__ = {proto}',
+            f'    __source_input_type__ = {source_type}',
+            f'    __convert__ = staticmethod(convert_{name})',
+        ]))
+
+    def write(self, header):
+        imports = [
+            'from mercator import SinglePropertyMapping',
+            'from mercator.codegen import StaticMapping',
+            'from mercator.codegen import compile_enum_caster',
+            'from mercator.codegen import compile_key_caster',
+            'from mercator.codegen import compile_list_caster',
+            'from mercator.codegen import compile_map_caster',
+            'from mercator.errors import TypeCastError',
+            'from mercator.meta import cast_error',
+            'from mercator.meta import compile_field_checker',
+        ]
+        for module_name, alias in sorted(self.imports.items()):
+            package, _, last = module_name.rpartition('.')
+            if not package:
+                imports.append(f'import {module_name}' if alias == module_name else f'import {module_name} as {alias}')
+            elif alias == last:
+                imports.append(f'from {package} import {last}')
+            else:
+                imports.append(f'from {package} import {last} as {alias}')
+
+        sections = ['\n'.join(imports)] + self.functions
+        if self.casters:
+            sections.append('\n'.join(self.casters))
+
+        return header + '\n\n' + '\n\n\n'.join(sections + self.classes) + '\n'
+
+
+def find_mappings(module, names=None):
+    """returns the :py:class:`~mercator.ProtoMapping` subclasses
+    declared in ``module``, or the ones with the given names, along
+    with the mappings they nest.
+    """
+    if names:
+        roots = []
+        for name in names:
+            mapping_class = getattr(module, name, None)
+            if not is_proto_mapping(mapping_class):
+                raise LookupError(f'could not find the mapping {name!r} in module {module.__name__!r}')
+            roots.append(mapping_class)
+    else:
+        roots = [
+            value for value in vars(module).values()
+            if is_proto_mapping(value) and value.__module__ == module.__name__
+        ]
+
+    mappings = []
+    pending = list(roots)
+    while pending:
+        mapping_class = pending.pop(0)
+        if mapping_class in mappings:
+            continue
+
+        mappings.append(mapping_class)
+        for field in mapping_class.__fields__.values():
+            if is_proto_mapping(field.target_type):
+                pending.append(field.target_type)
+
+    return mappings
+
+
+def generate_module(mappings, header='# -*- coding: utf-8 -*-'):
+    """returns the source code of a module with a :py:class:`StaticMapping`
+    for each of the given :py:class:`~mercator.ProtoMapping` subclasses,
+    which must include the mappings they nest.
+    """
+    names = [mapping_class.__name__ for mapping_class in mappings]
+    duplicates = sorted(set([name for name in names if names.count(name) > 1]))
+    if duplicates:
+        raise TypeError(f'cannot generate several mappings named {", ".join(duplicates)}')
+
+    writer = ModuleWriter(dict([(mapping_class, mapping_class.__name__) for mapping_class in mappings]))
+    for mapping_class in mappings:
+        writer.add_mapping(mapping_class)
+
+    return writer.write(header)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m mercator.codegen', description=__doc__.split('\n')[0])
+    parser.add_argument('module', help='the python module that declares the mappings, e.g.: myapp.mappings')
+    parser.add_argument('mappings', nargs='*', metavar='MAPPING', help='the names of the mappings to generate (default: all of the module)')
+    parser.add_argument('-o', '--output', metavar='FILE', help='write the module into FILE instead of the standard output')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    module = importlib.import_module(args.module)
+    command = ' '.join(['python -m mercator.codegen', args.module] + args.mappings)
+    header = '\n'.join([
+        '# -*- coding: utf-8 -*-',
+        f'# generated by "{command}", do not edit.',
+    ])
+    source = generate_module(find_mappings(module, args.mappings), header)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(source)
+    else:
+        sys.stdout.write(source)
+
+    return source
+
+
+if __name__ == '__main__':
+    main()
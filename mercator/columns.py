@@ -0,0 +1,236 @@
+"""Converts columnar data, such as NumPy structured arrays or a
+:py:class:`dict` of columns from pandas or Arrow, into messages without
+creating a :py:class:`dict` per row.
+
+Columns are keyed by the ``name_at_source`` of the field mappings and
+every column is cast at once with the callable returned by
+:py:meth:`~mercator.meta.FieldMapping.compile_column_caster`, e.g.: a
+single ``map(str, values)`` for ``ProtoKey('login', str)``. Arrays are
+first converted into lists of python values with their ``tolist()`` or
+``to_pylist()`` method, so that NumPy scalars never reach the casters
+nor the message constructors.
+
+The messages are then created by a generated function that takes one
+positional argument per column, mapped over all the columns at once.
+``None`` values leave their field unset, note that missing values of
+NumPy and pandas are often ``NaN`` rather than ``None``, except in
+masked arrays.
+
+Example:
+
+.. code:: python
+
+   import numpy
+
+   data = numpy.array([('token', 1552240433)], dtype=[('data', 'U8'), ('created_at', 'i8')])
+   messages = UserAuthTokenMapping.to_protobuf_columns(data)
+
+This module does not depend on NumPy.
+"""
+import functools
+import itertools
+import collections.abc
+
+from .meta import cast_each
+from .plan import find_declaring_class
+from .plan import is_opaque_field
+from .plan import register_source
+
+
+COLUMN_BUILDER_COUNTER = itertools.count()
+
+
+def to_list(values):
+    """returns the given column as a :py:class:`list` of python values"""
+    if isinstance(values, list):
+        return values
+
+    for method in ('tolist', 'to_pylist'):
+        convert = getattr(values, method, None)
+        if callable(convert):
+            return convert()
+
+    return list(values)
+
+
+def get_columns(data):
+    """returns a :py:class:`dict` of the columns of ``data`` by name
+
+    :param data: a NumPy structured or record array, an Arrow table or a mapping of columns, e.g.: a :py:class:`dict` or a pandas ``DataFrame``.
+    """
+    names = getattr(getattr(data, 'dtype', None), 'names', None)
+    if names is None:
+        names = getattr(data, 'column_names', None)
+
+    if names is None and (isinstance(data, collections.abc.Mapping) or callable(getattr(data, 'keys', None))):
+        names = data.keys()
+
+    if names is None:
+        raise TypeError(f'{type(data)} is not a mapping of columns nor a structured array')
+
+    return dict([(name, data[name]) for name in names])
+
+
+def uses_inherited_column_caster(field):
+    """returns ``True`` if the given :py:class:`~mercator.meta.FieldMapping`
+    overrides ``compile_caster()`` without a matching ``compile_column_caster()``.
+    """
+    field_class = type(field)
+    compiled_by = find_declaring_class(field_class, 'compile_caster')
+    column_by = find_declaring_class(field_class, 'compile_column_caster')
+    return not issubclass(column_by, compiled_by)
+
+
+def compile_column_caster(field):
+    """returns the column caster of the given field, see :py:meth:`~mercator.meta.FieldMapping.compile_column_caster`"""
+    if not uses_inherited_column_caster(field):
+        return field.compile_column_caster()
+
+    caster = field.compile_caster()
+    if caster is not None:
+        return cast_each(caster)
+
+
+def cast_columns(mapping_class, data):
+    """casts the columns of ``data`` read by the given mapping.
+
+    :returns: a tuple with the list of protobuf field names, the list of their cast columns and the number of rows.
+    """
+    source = dict([(name, to_list(values)) for name, values in get_columns(data).items()])
+    lengths = set(map(len, source.values()))
+    if len(lengths) > 1:
+        raise ValueError(f'columns must have the same length, got {sorted(lengths)}')
+
+    length = lengths.pop() if lengths else 0
+    names = []
+    columns = []
+    for name, field in mapping_class.__fields__.items():
+        values = source.get(field.name_at_source)
+        if is_opaque_field(field):
+            if values is None:
+                values = [field.cast(None)] * length
+            else:
+                values = [field.cast(value) for value in values]
+
+        elif values is None:
+            continue
+
+        else:
+            cast_column = compile_column_caster(field)
+            if cast_column is not None:
+                values = cast_column(values)
+
+        names.append(name)
+        columns.append(values)
+
+    select_oneof_columns(mapping_class, source, names, columns, length)
+    return names, columns, length
+
+
+def select_oneof_columns(mapping_class, source, names, columns, length):
+    """replaces with ``None`` the values of the members of each ``oneof``
+    that are not chosen by their discriminator, row by row, see
+    :py:class:`~mercator.ProtoOneOf`. Modifies ``columns`` in place.
+    """
+    for oneof in mapping_class.__oneofs__.values():
+        positions = [position for position, name in enumerate(names) if name in oneof.members]
+        if not positions:
+            continue
+
+        select = oneof.compile_selector()
+        discriminators = source.get(oneof.name_at_source) if oneof.name_at_source is not None else None
+        if discriminators is None:
+            discriminators = [None] * length
+
+        # copy the columns, which may be the lists given by the caller
+        for position in positions:
+            columns[position] = list(columns[position])
+
+        for row, discriminator in enumerate(discriminators):
+            kwargs = dict([(names[position], columns[position][row]) for position in positions])
+            select(discriminator, kwargs)
+            for position in positions:
+                if names[position] not in kwargs:
+                    columns[position][row] = None
+
+
+def generate_builder_source(function_name, names):
+    """returns the source code of a function that takes one value per
+    field and returns a new message with those that are not ``None``.
+    """
+    arguments = ''.join(f'v{index}, ' for index in range(len(names)))
+    lines = [
+        f'def {function_name}({arguments}proto=proto):',
+        '    kwargs = {}',
+    ]
+    for index, name in enumerate(names):
+        lines.append(f'    if v{index} is not None:')
+        lines.append(f'        kwargs[{name!r}] = v{index}')
+
+    lines.append('    return proto(**kwargs)')
+    return '\n'.join(lines) + '\n'
+
+
+def compile_builder(mapping_class, names):
+    """Generates the function that creates messages of the given
+    mapping from the values of the given protobuf fields.
+
+    The generated source code is available in the ``__source__``
+    attribute of the returned function for debugging purposes.
+    """
+    namespace = {
+        'proto': mapping_class.__proto__,
+    }
+    function_name = f'build_{mapping_class.__name__}'
+    source = generate_builder_source(function_name, names)
+
+    filename = f'<mercator-columns-{next(COLUMN_BUILDER_COUNTER)} {mapping_class.__qualname__}>'
+    register_source(filename, source)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__source__ = source
+    function.__qualname__ = f'{mapping_class.__qualname__}.{function_name}'
+    return function
+
+
+def get_builder(mapping_class, names):
+    """returns the function of :py:func:`compile_builder`, compiling it
+    on first use for the given protobuf fields.
+    """
+    # look up the class' own attribute, builders are not inherited
+    if '__column_builders__' not in vars(mapping_class):
+        mapping_class.__column_builders__ = {}
+
+    key = tuple(names)
+    builders = mapping_class.__column_builders__
+    if key not in builders:
+        builders[key] = compile_builder(mapping_class, key)
+
+    return builders[key]
+
+
+def columns_to_protobuf(mapping_class, data, into=None):
+    """Converts every row of columnar data.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param data: a NumPy structured or record array, an Arrow table or a mapping of columns by ``name_at_source``, where columns are lists or arrays of the same length.
+    :param into: an optional ``repeated`` message field of a parent message, which will be filled in place.
+    :returns: a :py:class:`list` of :ref:`proto` instances, or ``into`` when given.
+    """
+    names, columns, length = cast_columns(mapping_class, data)
+    build = get_builder(mapping_class, names)
+    if into is not None:
+        build = functools.partial(build, proto=into.add)
+
+    if columns:
+        messages = list(map(build, *columns))
+    else:
+        messages = [build() for _ in range(length)]
+
+    return into if into is not None else messages
+
+
+def columns_to_bytes(mapping_class, data):
+    """like :py:func:`columns_to_protobuf` but returns a :py:class:`list` of serialized messages"""
+    return [message.SerializeToString() for message in columns_to_protobuf(mapping_class, data)]
@@ -0,0 +1,240 @@
+"""Applies partial updates of source data to existing messages, e.g.:
+the changes received by a change-data-capture pipeline for objects
+whose message is already known.
+
+:py:meth:`~mercator.ProtoMapping.apply_to` converts only the keys
+present in the source data and replaces the corresponding fields of
+the given message in place, rather than building the whole message
+again:
+
+.. code:: python
+
+   message = UserMapping(user).to_protobuf()
+
+   UserMapping({'login': 'hulk'}).apply_to(message)
+   UserMapping({'email': None}).apply_to(message)   # clears the field
+
+Keys are looked up in an index of the ``name_at_source`` of the field
+mappings computed once per mapping class, so the cost depends on the
+number of changed keys rather than on the width of the message. Values
+are converted by the casters of :py:mod:`mercator.plan`; ``None``
+clears the field, other values replace it, including nested messages
+and ``repeated`` fields. Instances of :ref:`source-input-type` provide
+their attributes whose names are in the index.
+
+:py:meth:`~mercator.ProtoMapping.diff` compares two versions of the
+source data and returns the changed keys, ready to be applied:
+
+.. code:: python
+
+   changes = UserMapping.diff(old_user, new_user)
+   mask = UserMapping(changes).apply_to(message, mask=True)
+"""
+from google.protobuf import field_mask_pb2
+
+from .meta import is_repeated
+from .plan import bind_casters
+
+
+# distinguishes missing attributes from attributes set to ``None``
+MISSING = object()
+
+
+def compile_source_index(mapping_class):
+    """returns a :py:class:`dict` with a tuple of ``(proto_field_name, caster, opaque, scalar)``
+    for every ``name_at_source`` of the given mapping, where ``caster``
+    is ``None`` for values that pass through untouched, ``opaque`` is
+    ``True`` for casters that also take ``None`` and ``scalar`` is
+    ``True`` for singular fields that are not messages.
+    """
+    namespace = {}
+    index = {}
+    fields_by_name = mapping_class.__proto__.DESCRIPTOR.fields_by_name
+    specs = bind_casters(mapping_class.__fields__, namespace)
+    for position, (name, name_at_source, kind) in enumerate(specs):
+        descriptor = fields_by_name[name]
+        scalar = descriptor.message_type is None and not is_repeated(descriptor)
+        target = (name, namespace.get(f'c{position}'), kind == 'opaque', scalar)
+        index[name_at_source] = index.get(name_at_source, ()) + (target,)
+
+    return index
+
+
+def get_source_index(mapping_class):
+    """returns the index of :py:func:`compile_source_index`, computing
+    it on first use.
+    """
+    # look up the class' own attribute, indexes are not inherited
+    if '__source_index__' not in vars(mapping_class):
+        mapping_class.__source_index__ = compile_source_index(mapping_class)
+
+    return mapping_class.__source_index__
+
+
+def get_discriminators(mapping_class):
+    """returns the ``name_at_source`` of the discriminators of the
+    :py:class:`~mercator.ProtoOneOf` declarations of the given mapping.
+    """
+    return [oneof.name_at_source for oneof in mapping_class.__oneofs__.values() if oneof.name_at_source is not None]
+
+
+def iter_present_items(mapping_class, data):
+    """generates the ``(name_at_source, value)`` of the keys or attributes present in ``data``"""
+    if isinstance(data, dict):
+        yield from data.items()
+        return
+
+    for name in list(get_source_index(mapping_class)) + get_discriminators(mapping_class):
+        value = getattr(data, name, MISSING)
+        if value is not MISSING:
+            yield name, value
+
+
+def extract_changes(mapping_class, data):
+    """converts the values of the keys present in ``data``.
+
+    :returns: a tuple with the :py:class:`dict` of keyword-arguments of the fields with values, the list of names of the fields to clear, and the list of :py:class:`~mercator.ProtoOneOf` whose discriminator is present.
+    """
+    index = get_source_index(mapping_class)
+    kwargs = {}
+    cleared = []
+    for key, value in iter_present_items(mapping_class, data):
+        targets = index.get(key)
+        if targets is None:
+            continue
+
+        for name, cast, opaque, _ in targets:
+            if opaque or (cast is not None and value is not None):
+                converted = cast(value)
+            else:
+                converted = value
+
+            if converted is None:
+                cleared.append(name)
+            else:
+                kwargs[name] = converted
+
+    switched = []
+    for oneof in mapping_class.__oneofs__.values():
+        discriminator = None
+        if oneof.name_at_source is not None:
+            discriminator = data.get(oneof.name_at_source, MISSING) if isinstance(data, dict) else getattr(data, oneof.name_at_source, MISSING)
+            if discriminator is MISSING:
+                discriminator = None
+            else:
+                switched.append(oneof)
+
+        oneof.compile_selector()(discriminator, kwargs)
+
+    return kwargs, cleared, switched
+
+
+def apply_changes(mapping_class, data, message):
+    """replaces in ``message`` the fields whose name at source is
+    present in ``data``, see :py:meth:`~mercator.ProtoMapping.apply_to`.
+
+    Scalar fields are assigned directly, the other ones are cleared and
+    merged from a message built with the converted values only. The
+    ``oneof`` of a discriminator present in ``data`` is cleared first,
+    so that none of its members remains set unless chosen.
+
+    :returns: a :py:class:`set` with the names of the fields replaced or cleared.
+    """
+    proto = mapping_class.__proto__
+    if not isinstance(message, proto):
+        raise TypeError(f'{message} must be a {proto} but is {type(message)} instead')
+
+    if data is None:
+        return set()
+
+    source_type = getattr(mapping_class, '__source_input_type__', None)
+    if not isinstance(data, dict) and (source_type is None or not isinstance(data, source_type)):
+        raise TypeError(f'{data} must be a dict or {source_type} but is {type(data)} instead')
+
+    kwargs, cleared, switched = extract_changes(mapping_class, data)
+    for oneof in switched:
+        message.ClearField(oneof.oneof)
+        cleared.extend(oneof.members)
+
+    for name in cleared:
+        message.ClearField(name)
+
+    scalars = get_scalar_fields(mapping_class)
+    composite = {}
+    for name, value in kwargs.items():
+        if name in scalars:
+            setattr(message, name, value)
+        else:
+            message.ClearField(name)
+            composite[name] = value
+
+    if composite:
+        # merging into cleared fields replaces them, in C
+        message.MergeFrom(proto(**composite))
+
+    return set(cleared).union(kwargs)
+
+
+def get_scalar_fields(mapping_class):
+    """returns a :py:class:`frozenset` with the names of the singular
+    fields of the given mapping that are not messages.
+    """
+    if '__scalar_fields__' not in vars(mapping_class):
+        mapping_class.__scalar_fields__ = frozenset([
+            target[0]
+            for targets in get_source_index(mapping_class).values()
+            for target in targets
+            if target[3]
+        ])
+
+    return mapping_class.__scalar_fields__
+
+
+def to_field_mask(mapping_class, names):
+    """returns a ``google.protobuf.FieldMask`` with the given field
+    names, in the order of the fields of :ref:`proto`.
+    """
+    fields = mapping_class.__proto__.DESCRIPTOR.fields
+    return field_mask_pb2.FieldMask(paths=[field.name for field in fields if field.name in names])
+
+
+def get_getter(data):
+    "returns a function that takes a key or attribute name and returns its value in ``data`` or ``None``"
+    if isinstance(data, dict):
+        return data.get
+
+    return lambda name: getattr(data, name, None)
+
+
+def diff(mapping_class, old, new):
+    """returns a :py:class:`dict` with the keys or attributes of ``new``
+    whose value differs from ``old``, among the ``name_at_source`` of
+    the given mapping, see :py:meth:`~mercator.ProtoMapping.diff`.
+
+    When a member or the discriminator of a :py:class:`~mercator.ProtoOneOf`
+    changes, the changes carry the discriminator and every member, so
+    that applying them chooses the same member as ``new``.
+    """
+    index = get_source_index(mapping_class)
+    get_old = get_getter(old)
+    get_new = get_getter(new)
+    changes = {}
+    for name in index:
+        value = get_new(name)
+        if value != get_old(name):
+            changes[name] = value
+
+    for oneof in mapping_class.__oneofs__.values():
+        discriminator = oneof.name_at_source
+        if discriminator is None:
+            continue
+
+        members = set(oneof.members)
+        sources = [key for key, targets in index.items() if any(target[0] in members for target in targets)]
+        value = get_new(discriminator)
+        if value != get_old(discriminator) or any(key in changes for key in sources):
+            changes[discriminator] = value
+            for key in sources:
+                changes[key] = get_new(key)
+
+    return changes
@@ -0,0 +1,184 @@
+"""Converts sub-objects shared by many records once per batch.
+
+When the same nested value, e.g.: the ``author`` of thousands of
+media, is converted by a :py:class:`~mercator.ProtoKey` or
+:py:class:`~mercator.ProtoList` of a nested mapping, the nested message
+is rebuilt for every record. Field mappings declared with ``memoize``
+look up their values in the active :py:class:`MemoCache` first:
+
+.. code:: python
+
+   class MediaMapping(ProtoMapping):
+       __proto__ = domain_pb2.UserMedia
+
+       author = ProtoKey('author', UserMapping, memoize='uuid')
+
+
+   memo = MemoCache(maxsize=10000)
+   messages = MediaMapping.to_protobuf_many(query, memo=memo)
+   memo.hit_rate
+
+``memoize=True`` identifies values by identity, which suits ORM
+instances loaded by the same session. The name of a key or attribute
+identifies them by value instead, so that equal dictionaries share
+the same message.
+
+Cached messages are never handed out: message constructors copy nested
+messages, so each parent gets its own copy of the cached one, and
+:py:meth:`~mercator.ProtoMapping.to_bytes` reuses the serialized bytes
+of the nested message as is. Values must not change while the cache
+is active, since they are not converted again.
+
+Outside of an active cache, memoized fields are converted as usual.
+"""
+import threading
+import collections
+import contextvars
+
+
+DEFAULT_MAXSIZE = 4096
+
+CURRENT_CACHE = contextvars.ContextVar('mercator_memo_cache', default=None)
+
+# the tokens of the ``with`` blocks entered in the current context, so
+# that tasks or threads entering the same cache each restore their own
+CURRENT_TOKENS = contextvars.ContextVar('mercator_memo_tokens', default=())
+
+
+class MemoCache(object):
+    """A least-recently-used cache of nested conversions, active within
+    a ``with`` block or for the duration of a batch given the
+    ``memo`` argument of :py:meth:`~mercator.ProtoMapping.to_protobuf_many`.
+
+    A cache can be shared by several threads or tasks: lookups and
+    evictions hold a lock, conversions run outside of it.
+
+    :param maxsize: the maximum number of cached conversions, the least recently used ones are evicted first.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        if maxsize < 1:
+            raise ValueError(f'MemoCache() takes a positive maxsize, but got {maxsize} instead')
+
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        CURRENT_TOKENS.set(CURRENT_TOKENS.get() + (CURRENT_CACHE.set(self),))
+        return self
+
+    def __exit__(self, *exc_info):
+        tokens = CURRENT_TOKENS.get()
+        CURRENT_TOKENS.set(tokens[:-1])
+        CURRENT_CACHE.reset(tokens[-1])
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        """the ratio of lookups that found a cached conversion, between ``0.0`` and ``1.0``"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """returns the statistics of the cache
+
+        :returns: a :py:class:`dict` like ``{'hits': 999, 'misses': 1, 'evictions': 0, 'size': 1, 'maxsize': 4096, 'hit_rate': 0.999}``
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hit_rate,
+        }
+
+    def clear(self):
+        """removes all cached conversions and resets the statistics"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def convert(self, convert, key, value, by_identity=False):
+        """returns the cached result of ``convert(value)`` under ``key``,
+        calling it only on a miss.
+
+        Values identified by identity are kept along with their result,
+        so that their :py:func:`id` is not reused while cached.
+        """
+        entries = self.entries
+        with self.lock:
+            entry = entries.get(key)
+            if entry is not None and (not by_identity or entry[0] is value):
+                self.hits += 1
+                entries.move_to_end(key)
+                return entry[1]
+
+            self.misses += 1
+
+        # nested conversions may look up the same cache
+        result = convert(value)
+        with self.lock:
+            entries[key] = (value if by_identity else None, result)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+        return result
+
+
+def get_current_cache():
+    """returns the active :py:class:`MemoCache` or ``None``"""
+    return CURRENT_CACHE.get()
+
+
+def key_function(memoize):
+    """returns a function that takes a value and returns its key, or
+    ``None`` to identify values by identity.
+    """
+    if memoize is True:
+        return None
+
+    if callable(memoize):
+        return memoize
+
+    def get_key(value):
+        if isinstance(value, dict):
+            return value.get(memoize)
+
+        return getattr(value, memoize, None)
+
+    return get_key
+
+
+def memoized(convert, memoize):
+    """returns a function equivalent to ``convert`` that looks up the
+    active :py:class:`MemoCache` first.
+
+    :param convert: the converter of a nested mapping, e.g.: its compiled plan.
+    :param memoize: the ``memoize`` argument of the field mapping.
+    """
+    get_key = key_function(memoize)
+
+    def convert_memoized(value):
+        cache = CURRENT_CACHE.get()
+        if cache is None:
+            return convert(value)
+
+        # the declaration is part of the key, so that keys of
+        # different kinds never collide
+        if get_key is None:
+            return cache.convert(convert, (convert, memoize, id(value)), value, by_identity=True)
+
+        key = get_key(value)
+        if key is None:
+            return convert(value)
+
+        return cache.convert(convert, (convert, memoize, key), value)
+
+    return convert_memoized
@@ -1,10 +1,56 @@
+import os
+import copy
+import types
 import inspect
+import weakref
+import threading
 from .errors import ProtobufCastError
+from google.protobuf import json_format
 from google.protobuf.descriptor import FieldDescriptor
+from .plan import compile_plan
+from .plan import find_declaring_class
 
 REGISTRY = {}
 BASE_MODEL_CLASS_REGISTRY = {}
 
+# the implicit fields of each __proto__ class, shared by its mappings,
+# see :py:func:`get_implicit_mappings`
+IMPLICIT_MAPPINGS = weakref.WeakKeyDictionary()
+
+# mappings declared with ``__lazy__`` that were not finalized yet, see
+# :py:func:`finalize_all`
+PENDING_MAPPINGS = []
+
+# default value of ``__lazy__`` for mappings that don't declare it
+LAZY_BY_DEFAULT = os.environ.get('MERCATOR_LAZY_MAPPINGS', '').lower() in ('1', 'true', 'yes')
+
+# the integers that protobuf accepts by C++ type, see
+# :py:func:`compile_field_checker`
+INTEGER_RANGES = {
+    FieldDescriptor.CPPTYPE_INT32: (-2 ** 31, 2 ** 31 - 1),
+    FieldDescriptor.CPPTYPE_INT64: (-2 ** 63, 2 ** 63 - 1),
+    FieldDescriptor.CPPTYPE_UINT32: (0, 2 ** 32 - 1),
+    FieldDescriptor.CPPTYPE_UINT64: (0, 2 ** 64 - 1),
+}
+
+# held while finalizing mappings, reentrant because nested mappings
+# are finalized while compiling the plan of their parent.
+FINALIZATION_LOCK = threading.RLock()
+
+# functions called with every mapping class once finalized, used by
+# :py:mod:`mercator.metrics`
+FINALIZATION_HOOKS = []
+
+# class attributes computed by :py:func:`finalize_mapping`
+FINALIZED_ATTRIBUTES = (
+    '__field_names__',
+    '__implicit_mappings__',
+    '__explicit_mappings__',
+    '__fields__',
+    '__oneofs__',
+    '__plan__',
+)
+
 
 class MercatorDomainClass(object):
     """The existence of this class is a trick to avoid redundant imports.
@@ -16,6 +62,61 @@ class MercatorDomainClass(object):
     :py:class:`~mercator.SinglePropertyMapping` but can be used in the
     future in any new types that leverage type casting.
     """
+    __slots__ = ()
+
+
+def is_repeated(descriptor):
+    """returns ``True`` if the given :py:class:`~google.protobuf.descriptor.FieldDescriptor` is a ``repeated`` field"""
+    if hasattr(descriptor, 'is_repeated'):
+        return descriptor.is_repeated
+
+    return descriptor.label == FieldDescriptor.LABEL_REPEATED
+
+
+def is_required(descriptor):
+    if hasattr(descriptor, 'is_required'):
+        return descriptor.is_required
+
+    return descriptor.label == FieldDescriptor.LABEL_REQUIRED
+
+
+def has_presence(descriptor):
+    """returns ``True`` if the given field is serialized even when set to its default value"""
+    if hasattr(descriptor, 'has_presence'):
+        return descriptor.has_presence
+
+    if is_repeated(descriptor):
+        return False
+
+    return (
+        descriptor.message_type is not None
+        or descriptor.containing_oneof is not None
+        or descriptor.file.syntax == 'proto2'
+    )
+
+
+def is_packed(descriptor):
+    if hasattr(descriptor, 'is_packed'):
+        return descriptor.is_packed
+
+    options = descriptor.GetOptions()
+    if options.HasField('packed'):
+        return options.packed
+
+    return descriptor.file.syntax == 'proto3'
+
+
+def is_map_field(descriptor):
+    message_type = descriptor.message_type
+    return message_type is not None and message_type.GetOptions().map_entry
+
+
+def is_oneof_member(descriptor):
+    """returns ``True`` for members of a ``oneof`` with more than one
+    field, as opposed to the synthetic oneofs of proto3 ``optional`` fields.
+    """
+    oneof = descriptor.containing_oneof
+    return oneof is not None and len(oneof.fields) > 1
 
 
 class FieldMapping(object):
@@ -24,21 +125,83 @@ class FieldMapping(object):
 
     - :py:class:`~mercator.ProtoKey`
     - :py:class:`~mercator.ProtoList`
+    - :py:class:`~mercator.ProtoMap`
+    - :py:class:`~mercator.ProtoEnum`
+    - :py:class:`~mercator.ProtoOneOf`
 
     This base-class resides in :py:mod:`mercator.meta`
     so the metaclass can capture the field mapping declarations during
     import-time.
 
+    Once declared in a :py:class:`~mercator.ProtoMapping`, the field
+    mapping is bound to the :py:class:`~google.protobuf.descriptor.FieldDescriptor`
+    of its protobuf field, whose metadata is exposed by the properties
+    :py:attr:`number`, :py:attr:`proto_type`, :py:attr:`label`,
+    :py:attr:`message_type` and :py:attr:`oneof`.
+
     :param name_at_source: a string with the name of key or property to be extracted in an input object before casting into the target type.
     :param target_type: an optional :py:class:`~mercator.ProtoMapping` subclass or native python type. Check :ref:`target-type` for more details.
+    :param memoize: an optional key for :py:class:`~mercator.ProtoMapping` target types, so that values converted within a :py:class:`~mercator.memo.MemoCache` are converted once: ``True`` to identify values by identity, the name of a key or attribute of the values (e.g.: ``'uuid'``) or a function that returns the key of a value. See :py:mod:`mercator.memo`.
     """
-    def __init__(self, name_at_source: str, target_type: type = None):
+    __slots__ = ('name_at_source', 'target_type', 'memoize', 'descriptor')
+
+    def __init__(self, name_at_source: str, target_type: type = None, memoize=None):
         self.name_at_source = name_at_source
         self.target_type = target_type
+        self.memoize = memoize
+        self.descriptor = None
 
         if target_type is not None and not isinstance(target_type, type) and not isinstance(target_type, MercatorDomainClass):
             raise TypeError(f'{self.__class__} takes a type as second argument, but got {type(target_type).__name__} instead')
 
+        if memoize and not isinstance(target_type, MetaMapping):
+            raise TypeError(f'{self.__class__} can only memoize ProtoMapping target types, but got {target_type} instead')
+
+    def bind(self, descriptor):
+        """Invoked by :py:class:`~mercator.MetaMapping` during "import time"
+        to associate the field mapping with the given :py:class:`~google.protobuf.descriptor.FieldDescriptor`.
+
+        :returns: the field mapping itself, or a copy if it was already bound to another field, e.g.: when the same declaration is shared by several mappings.
+        """
+        field = self
+        if self.descriptor is not None and self.descriptor is not descriptor:
+            field = copy.copy(self)
+
+        field.descriptor = descriptor
+        return field
+
+    @property
+    def number(self):
+        """the number of the protobuf field, or ``None`` if not bound"""
+        return self.descriptor and self.descriptor.number
+
+    @property
+    def proto_type(self):
+        """the type of the protobuf field, one of the ``TYPE_*`` constants of :py:class:`~google.protobuf.descriptor.FieldDescriptor`"""
+        return self.descriptor and self.descriptor.type
+
+    @property
+    def label(self):
+        """either ``'repeated'``, ``'required'`` or ``'optional'``"""
+        if self.descriptor is None:
+            return
+        if is_repeated(self.descriptor):
+            return 'repeated'
+        if is_required(self.descriptor):
+            return 'required'
+        return 'optional'
+
+    @property
+    def message_type(self):
+        """the :py:class:`~google.protobuf.descriptor.Descriptor` of message fields, otherwise ``None``"""
+        return self.descriptor and self.descriptor.message_type
+
+    @property
+    def oneof(self):
+        """the name of the ``oneof`` containing the protobuf field, otherwise ``None``"""
+        if self.descriptor is not None and is_oneof_member(self.descriptor):
+            return self.descriptor.containing_oneof.name
+
     def cast(self, value):
         """coerces the given ``value`` into the target type.
         :param value: a python object that is compatible with the given ``target_type``
@@ -52,14 +215,178 @@ class FieldMapping(object):
         try:
             return self.target_type(value)
         except (ValueError, TypeError) as e:
-            msg = str(e)
-            raise ProtobufCastError(f'{msg} while casting "{value}" ({type(value).__name__}) to {self.target_type.__name__}')
+            raise cast_error(e, value, self.target_type)
+
+    def compile_caster(self, get_converter=None):
+        """returns a callable equivalent to :py:meth:`cast` for values
+        that are not ``None``, or ``None`` when values should be passed
+        along untouched.
+
+        Invoked by :py:class:`~mercator.MetaMapping` during "import time"
+        to build the compiled plan of each :py:class:`~mercator.ProtoMapping`,
+        see :py:mod:`mercator.plan`.
+
+        :param get_converter: an optional function that takes a :py:class:`~mercator.ProtoMapping` subclass and returns the function used to convert nested values, used by :py:mod:`mercator.wire`.
+        """
+        target_type = self.target_type
+        if target_type is None:
+            return
+
+        def cast(value):
+            try:
+                return target_type(value)
+            except (ValueError, TypeError) as e:
+                raise cast_error(e, value, target_type)
+
+        return cast
+
+    def compile_column_caster(self, get_converter=None):
+        """like :py:meth:`compile_caster` but returns a callable that
+        casts a whole column at once: it takes a :py:class:`list` of
+        values and returns a :py:class:`list` of the same length where
+        ``None`` values are kept. The other values must be accepted by
+        the constructor of the message, e.g.: a :py:class:`dict` in
+        place of a nested message.
+
+        Python types are applied with :py:func:`map` over the column,
+        see :py:mod:`mercator.columns`.
+        """
+        caster = self.compile_caster(get_converter)
+        if caster is None:
+            return
+
+        target_type = self.target_type
+        if not isinstance(target_type, type):
+            return cast_each(caster)
+
+        def cast_column(values):
+            if None in values:
+                return [None if value is None else caster(value) for value in values]
+
+            try:
+                return list(map(target_type, values))
+            except (ValueError, TypeError):
+                # find the faulty value
+                return list(map(caster, values))
+
+        return cast_column
+
+    def compile_parser(self, get_parser=None):
+        """returns a callable that converts the value of the bound
+        protobuf field back into a python value, the inverse of
+        :py:meth:`compile_caster`, or ``None`` when values should be
+        passed along untouched.
+
+        Invoked by :py:mod:`mercator.reverse` on first use of
+        :py:meth:`~mercator.ProtoMapping.from_protobuf`.
+
+        :param get_parser: an optional function that takes a :py:class:`~mercator.ProtoMapping` subclass and returns the function used to parse nested messages.
+        """
+        if is_map_field(self.descriptor):
+            return dict
+
+        parse = self.compile_value_parser(get_parser)
+        if not is_repeated(self.descriptor):
+            return parse
+
+        if parse is None:
+            return list
+
+        def parse_list(values):
+            return [parse(value) for value in values]
+
+        return parse_list
+
+    def compile_value_parser(self, get_parser=None):
+        """like :py:meth:`compile_parser` but for a single item of the
+        protobuf field, regardless of it being ``repeated``.
+
+        Values of :py:class:`~mercator.MercatorDomainClass` target
+        types are parsed with their ``from_protobuf()`` method while
+        messages declared with :py:class:`dict` or :py:class:`list`
+        (e.g.: ``google.protobuf.Struct``) become plain python objects.
+        """
+        target_type = self.target_type
+        if isinstance(target_type, MercatorDomainClass):
+            return target_type.from_protobuf
+
+        if self.message_type is not None and target_type in (dict, list):
+            return json_format.MessageToDict
+
+
+def cast_error(error, value, target_type):
+    """returns a :py:class:`~mercator.errors.ProtobufCastError` describing
+    the given ``error`` raised while casting ``value`` into ``target_type``.
+    """
+    msg = str(error)
+    target_name = getattr(target_type, '__name__', type(target_type).__name__)
+    return ProtobufCastError(f'{msg} while casting "{value}" ({type(value).__name__}) to {target_name}')
+
+
+def compile_field_checker(message_type, name):
+    """returns a function that takes a value of the field ``name`` of
+    ``message_type`` and returns it, raising the same :py:class:`TypeError`
+    or :py:class:`ValueError` as the constructor of the message for
+    values that it rejects, e.g.: out-of-range integers, without
+    building a new message.
+
+    Integers in range and numbers are accepted as is, other values are
+    assigned to a message kept for this purpose, which is only ever
+    written to.
+    """
+    descriptor = message_type.DESCRIPTOR.fields_by_name[name]
+    scratch = message_type()
+
+    if is_repeated(descriptor):
+        def check(value):
+            container = getattr(scratch, name)
+            del container[:]
+            container.extend(value)
+            return value
+
+        return check
+
+    cpp_type = descriptor.cpp_type
+    if cpp_type in INTEGER_RANGES:
+        low, high = INTEGER_RANGES[cpp_type]
+
+        def check(value):
+            if type(value) is not int or not low <= value <= high:
+                setattr(scratch, name, value)
+            return value
+
+    elif cpp_type in (FieldDescriptor.CPPTYPE_DOUBLE, FieldDescriptor.CPPTYPE_FLOAT):
+        def check(value):
+            if type(value) is not float and type(value) is not int:
+                setattr(scratch, name, value)
+            return value
+
+    else:
+        def check(value):
+            setattr(scratch, name, value)
+            return value
+
+    return check
+
+
+def cast_each(caster):
+    """returns a column caster, see :py:meth:`FieldMapping.compile_column_caster`,
+    that applies ``caster`` to every value that is not ``None``.
+    """
+    def cast_column(values):
+        return [None if value is None else caster(value) for value in values]
+
+    return cast_column
 
 
 class ImplicitField(FieldMapping):
     """Like :py:class:`~mercator.ProtoKey` but works is
     declared automagically by the metaclass.
+
+    Implicit fields are shared by all the mappings of the same
+    :ref:`proto`, see :py:func:`get_implicit_mappings`.
     """
+    __slots__ = ()
 
 
 def is_field_property(obj):
@@ -78,10 +405,66 @@ def is_field_property(obj):
     return name and 'FieldProperty' in name
 
 
+def field_descriptors_from_proto_class(proto_class):
+    """returns a :py:class:`dict` with the :py:class:`~google.protobuf.descriptor.FieldDescriptor`
+    of every field of the given proto_class, by name and in declaration order.
+    """
+    descriptor = getattr(proto_class, 'DESCRIPTOR', None)
+    fields = getattr(descriptor, 'fields', None)
+    if fields is None:
+        return {}
+
+    return dict([(field.name, field) for field in fields])
+
+
+def oneof_descriptors_from_proto_class(proto_class):
+    """returns a :py:class:`dict` with the :py:class:`~google.protobuf.descriptor.OneofDescriptor`
+    of every ``oneof`` of the given proto_class, by name.
+    """
+    descriptor = getattr(proto_class, 'DESCRIPTOR', None)
+    oneofs = getattr(descriptor, 'oneofs', None)
+    if oneofs is None:
+        return {}
+
+    return dict([(oneof.name, oneof) for oneof in oneofs])
+
+
+def is_oneof_mapping(field):
+    """returns ``True`` for field mappings declared with the name of a
+    ``oneof`` rather than of a field, e.g.: :py:class:`~mercator.ProtoOneOf`.
+    """
+    return callable(getattr(field, 'compile_selector', None))
+
+
+def get_implicit_mappings(proto_class):
+    """returns a read-only mapping of the names of the fields of the
+    given proto_class to their :py:class:`ImplicitField`, created once
+    per proto_class and shared by all the mappings that declare it as
+    :ref:`proto`.
+    """
+    implicit_mappings = IMPLICIT_MAPPINGS.get(proto_class)
+    if implicit_mappings is None:
+        descriptors = field_descriptors_from_proto_class(proto_class)
+        implicit_mappings = types.MappingProxyType(dict([
+            (k, ImplicitField(k).bind(descriptors.get(k)))
+            for k in field_properties_from_proto_class(proto_class)
+        ]))
+        IMPLICIT_MAPPINGS[proto_class] = implicit_mappings
+
+    return implicit_mappings
+
+
 def field_properties_from_proto_class(proto_class):
-    """inspects all members of the given proto_class and returns a list of
-    those who seem to be a message field (determined by :py:meth:`~mercator.meta.is_field_property`)
+    """returns the names of the fields of the given proto_class from its ``DESCRIPTOR``.
+
+    Classes without a descriptor have all their members inspected
+    instead, returning those who seem to be a message field
+    (determined by :py:meth:`~mercator.meta.is_field_property`)
     """
+    descriptors = field_descriptors_from_proto_class(proto_class)
+    if descriptors:
+        return list(descriptors)
+
     members = inspect.getmembers(proto_class)
     return [k for k, v in members if is_field_property(v)]
 
@@ -110,6 +493,131 @@ def validate_and_register_base_model_class(cls, name, attributes):
         BASE_MODEL_CLASS_REGISTRY[base_model_class] = cls
 
 
+def validate_cache_key_attribute(name, attributes):
+    """Invoked by :py:class:`~mercator.MetaMapping` during "import time"
+    to validate the declaration of ``__cache_key__``, see :py:mod:`mercator.cache`.
+    """
+    cache_key = attributes.get('__cache_key__')
+    if cache_key is None or callable(cache_key):
+        return
+
+    if not isinstance(cache_key, (tuple, list)) or not cache_key or not all(isinstance(key, str) for key in cache_key):
+        raise SyntaxError(f'class {name} defined a __cache_key__ attribute that is not a function or a tuple of names: {cache_key!r}')
+
+
+def uses_default_conversion(cls):
+    """returns ``False`` if the given :py:class:`~mercator.ProtoMapping`
+    subclass overrides ``to_dict()`` or ``to_protobuf()``, in which
+    case it cannot be converted with a compiled plan.
+    """
+    return all(
+        find_declaring_class(cls, name).__name__ == 'ProtoMapping'
+        for name in ('to_dict', 'to_protobuf')
+    )
+
+
+class PendingAttribute(object):
+    """Placeholder for the attributes listed in ``FINALIZED_ATTRIBUTES``
+    in the body of lazy mappings.
+
+    The first access to any of them, either from the class or from an
+    instance, finalizes the mapping and returns the actual value.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        finalize_mapping(owner)
+        return getattr(owner, self.name)
+
+
+def is_finalized(cls):
+    """returns ``False`` if the given :py:class:`~mercator.ProtoMapping`
+    subclass was declared with ``__lazy__`` and was not used yet.
+    """
+    fields = vars(cls).get('__fields__')
+    return fields is not None and not isinstance(fields, PendingAttribute)
+
+
+def finalize_mapping(cls):
+    """Inspects the fields of :ref:`proto`, binds the field mappings
+    and compiles the conversion plan of the given
+    :py:class:`~mercator.ProtoMapping` subclass.
+
+    Invoked by :py:class:`~mercator.MetaMapping` during "import time",
+    or on first use for mappings declared with ``__lazy__``.
+    Does nothing if the mapping is already finalized.
+    """
+    with FINALIZATION_LOCK:
+        if not is_finalized(cls):
+            bind_fields_and_compile_plan(cls)
+            for hook in FINALIZATION_HOOKS:
+                hook(cls)
+
+
+def bind_fields_and_compile_plan(cls):
+    proto_cls = vars(cls)['__proto__']
+
+    # extract field names from the __proto__ class, those will
+    # become "ImplicitField" instances in the eyes of mercator.
+    # The implicit fields are shared by all the mappings of the same
+    # __proto__ class.
+    descriptors = field_descriptors_from_proto_class(proto_cls)
+    implicit_field_mappings = get_implicit_mappings(proto_cls)
+    field_names = tuple(implicit_field_mappings)
+
+    # extract all FieldMapping declarations from the ProtoMapping
+    # itself, this means all ProtoKey and ProtoList arguments will
+    # be considered "explicit fields" in the eyes of mercator.
+    # Each of them is bound to the descriptor of its protobuf field,
+    # except for ProtoOneOf which is bound to the descriptor of its
+    # oneof and kept apart from the fields.
+    oneof_descriptors = oneof_descriptors_from_proto_class(proto_cls)
+    declarations = [(k, v) for k, v in vars(cls).items() if isinstance(v, FieldMapping)]
+    for k, v in declarations:
+        if is_oneof_mapping(v) and k not in oneof_descriptors:
+            raise SyntaxError(f'class {cls.__name__} declares {type(v).__name__}() as {k} but {proto_cls.__name__} has no oneof named {k}')
+
+    explicit_field_mappings = dict([(k, v.bind(descriptors.get(k))) for k, v in declarations if not is_oneof_mapping(v)])
+    oneof_mappings = dict([(k, v.bind(oneof_descriptors[k])) for k, v in declarations if is_oneof_mapping(v)])
+    for k, v in list(explicit_field_mappings.items()) + list(oneof_mappings.items()):
+        setattr(cls, k, v)
+
+    # store the metadata in the class definition to leverage the
+    # whole magic of mapping attributes.
+    cls.__field_names__ = field_names
+    cls.__implicit_mappings__ = implicit_field_mappings
+    cls.__explicit_mappings__ = explicit_field_mappings
+
+    # generate one final dict with the implicit and explicit fields.
+    # note the deliberate override of  implicit fields with explicit ones.
+    cls.__fields__ = dict(list(implicit_field_mappings.items()) + list(explicit_field_mappings.items()))
+    cls.__oneofs__ = oneof_mappings
+
+    # compile the field declarations into a single converter
+    # function used by ProtoMapping.to_protobuf(), see mercator.plan
+    # for details. Mappings that customize the conversion keep
+    # using the interpreted path.
+    cls.__plan__ = staticmethod(compile_plan(cls)) if uses_default_conversion(cls) else None
+
+
+def finalize_all():
+    """Finalizes every mapping declared with ``__lazy__`` that was not
+    used yet, e.g.: before forking worker processes so that they share
+    the finalized mappings.
+
+    :returns: the number of mappings finalized
+    """
+    count = 0
+    while PENDING_MAPPINGS:
+        cls = PENDING_MAPPINGS.pop()
+        if not is_finalized(cls):
+            finalize_mapping(cls)
+            count += 1
+
+    return count
+
+
 class MetaMapping(type):
     """Metaclass to leverage and enforce correct syntax sugar when
     declaring protomappings.
@@ -118,34 +626,31 @@ class MetaMapping(type):
     works.
     """
     def __new__(cls, name, bases, attributes):
+        # mappings declared with ``__compact__``, and their subclasses,
+        # only hold their data in instances, unless they declare their
+        # own __slots__ or __init__, which may set other attributes.
+        compact = attributes.get('__compact__', any(getattr(base, '__compact__', False) for base in bases))
+        if compact and '__slots__' not in attributes and '__init__' not in attributes:
+            attributes['__slots__'] = ()
+
         cls = type.__new__(cls, name, bases, attributes)
         if name in ('MetaMapping', 'ProtoMapping'):
+            cls.__plan__ = None
             return cls
 
-        proto_cls = validate_proto_attribute(name, attributes)
+        validate_proto_attribute(name, attributes)
         validate_and_register_base_model_class(cls, name, attributes)
-
-        # extract field names from the __proto__ class, those will
-        # become "ImplicitField" instances in the eyes of mercator.
-        field_names = field_properties_from_proto_class(proto_cls)
-
-        # create a dictionary with all default implicit fields
-        implicit_field_mappings = dict([(k, ImplicitField(k)) for k in field_names])
-
-        # extract all FieldMapping declarations from the ProtoMapping
-        # itself, this means all ProtoKey and ProtoList arguments will
-        # be considered "explicit fields" in the eyes of mercator.
-        explicit_field_mappings = dict([(k, v) for k, v in attributes.items() if isinstance(v, FieldMapping)])
-
-        # store the metadata in the class definition to leverage the
-        # whole magic of mapping attributes.
-        cls.__field_names__ = field_names
-        cls.__implicit_mappings__ = implicit_field_mappings
-        cls.__explicit_mappings__ = explicit_field_mappings
-
-        # generate one final dict with the implicit and explicit fields.
-        # note the deliberate override of  implicit fields with explicit ones.
-        cls.__fields__ = dict(list(implicit_field_mappings.items()) + list(explicit_field_mappings.items()))
+        validate_cache_key_attribute(name, attributes)
+
+        # lazy mappings defer the inspection of fields and compilation
+        # of plans until first use, which cuts the import time of
+        # modules with many mappings.
+        if getattr(cls, '__lazy__', LAZY_BY_DEFAULT):
+            for attribute in FINALIZED_ATTRIBUTES:
+                setattr(cls, attribute, PendingAttribute(attribute))
+            PENDING_MAPPINGS.append(cls)
+        else:
+            finalize_mapping(cls)
 
         # register all ProtoMapping declarations collected during
         # "import time" in a global dictionary that can be used for
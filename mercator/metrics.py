@@ -0,0 +1,332 @@
+"""Opt-in instrumentation of conversions to protobuf messages.
+
+Once :py:func:`enable` is called, the compiled plan (see
+:py:mod:`mercator.plan`) and the wire encoder (see :py:mod:`mercator.wire`)
+of every mapping are replaced by instrumented versions that record, per
+mapping, the number of conversions and their cumulative time and, per
+field with a caster, the number of calls, their cumulative time and the
+number of items of ``repeated`` fields. Times are inclusive: the time of
+a field with a nested mapping includes the conversion of the nested
+message.
+
+The conversions measured are those of
+:py:meth:`~mercator.ProtoMapping.to_protobuf`,
+:py:meth:`~mercator.ProtoMapping.to_protobuf_many`,
+:py:meth:`~mercator.ProtoMapping.to_protobuf_async`,
+:py:meth:`~mercator.ProtoMapping.to_bytes`,
+:py:func:`~mercator.stream.write_delimited`,
+:py:func:`~mercator.stream.iter_delimited` and the misses of result
+caches. The following are **not** measured: the rows and columns of
+:py:mod:`mercator.rows`, the worker processes of
+:py:mod:`mercator.parallel`, mappings generated by
+:py:mod:`mercator.codegen` and the interpreted
+:py:meth:`~mercator.meta.FieldMapping.cast` of ``to_dict()``.
+
+:py:func:`disable` restores the original plans and encoders, so that
+conversions run the exact same code as if metrics had never been enabled.
+
+Example:
+
+.. code:: python
+
+   from mercator import metrics
+
+   metrics.enable()
+   UserMapping(data).to_protobuf()
+
+   metrics.snapshot()['myapp.mappings.UserMapping']['fields']['metadata']['seconds']
+   print(metrics.to_prometheus())
+
+Mappings that override ``to_dict()`` or ``to_protobuf()`` are only
+measured when nested in other mappings. Counters are updated without
+locks and may be approximate when converting from several threads.
+"""
+import json
+import time
+
+from .cache import get_mapping_name
+from .meta import FINALIZATION_HOOKS
+from .meta import finalize_mapping
+from .meta import is_finalized
+from .plan import compile_plan
+from .wire import EncodedMessage
+from .wire import compile_encoder
+from .wire import supports_direct_encoding
+
+
+STATISTICS = {}
+INSTRUMENTED_PLANS = {}
+INSTRUMENTED_ENCODERS = {}
+
+
+class FieldStatistics(object):
+    """the statistics of a field of a mapping"""
+    def __init__(self):
+        self.calls = 0
+        self.nanoseconds = 0
+        self.items = 0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'seconds': self.nanoseconds / 1e9,
+            'items': self.items,
+        }
+
+
+class MappingStatistics(object):
+    """the statistics of a :py:class:`~mercator.ProtoMapping` subclass"""
+    def __init__(self):
+        self.calls = 0
+        self.nanoseconds = 0
+        self.fields = {}
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'seconds': self.nanoseconds / 1e9,
+            'fields': dict([(name, field.to_dict()) for name, field in self.fields.items()]),
+        }
+
+
+def get_statistics(mapping_class):
+    key = get_mapping_name(mapping_class)
+    if key not in STATISTICS:
+        STATISTICS[key] = MappingStatistics()
+
+    return STATISTICS[key]
+
+
+def instrument_caster(statistics, name, field, caster):
+    """returns a function that calls ``caster`` and records its
+    statistics under the given field ``name``.
+    """
+    field_statistics = statistics.fields.setdefault(name, FieldStatistics())
+    perf_counter_ns = time.perf_counter_ns
+
+    if field.label == 'repeated':
+        def cast(value):
+            started = perf_counter_ns()
+            try:
+                return caster(value)
+            finally:
+                field_statistics.nanoseconds += perf_counter_ns() - started
+                field_statistics.calls += 1
+                field_statistics.items += len(value) if hasattr(value, '__len__') else 0
+    else:
+        def cast(value):
+            started = perf_counter_ns()
+            try:
+                return caster(value)
+            finally:
+                field_statistics.nanoseconds += perf_counter_ns() - started
+                field_statistics.calls += 1
+
+    return cast
+
+
+def instrument_converter(statistics, converter):
+    """returns a function that calls the converter of a mapping and
+    records its statistics.
+    """
+    perf_counter_ns = time.perf_counter_ns
+
+    def convert(data, *args):
+        started = perf_counter_ns()
+        try:
+            return converter(data, *args)
+        finally:
+            statistics.nanoseconds += perf_counter_ns() - started
+            statistics.calls += 1
+
+    convert.__wrapped__ = converter
+    return convert
+
+
+def get_instrumented_converter(mapping_class):
+    """the ``get_converter`` given to :py:func:`~mercator.plan.compile_plan`
+    so that nested mappings are instrumented as well.
+    """
+    # lazy mappings are instrumented by the finalization hook
+    finalize_mapping(mapping_class)
+    if mapping_class not in INSTRUMENTED_PLANS:
+        INSTRUMENTED_PLANS[mapping_class] = compile_instrumented_plan(mapping_class)
+
+    return INSTRUMENTED_PLANS[mapping_class]
+
+
+def compile_instrumented_plan(mapping_class):
+    from . import get_plan_converter
+
+    statistics = get_statistics(mapping_class)
+    if mapping_class.__plan__ is None:
+        # measure custom conversions as a whole
+        return instrument_converter(statistics, get_plan_converter(mapping_class))
+
+    def wrap_caster(name, field, caster):
+        return instrument_caster(statistics, name, field, caster)
+
+    plan = compile_plan(mapping_class, get_instrumented_converter, wrap_caster)
+    return instrument_converter(statistics, plan)
+
+
+def get_instrumented_encoder(mapping_class):
+    """returns the instrumented wire encoder of the given mapping"""
+    finalize_mapping(mapping_class)
+    if mapping_class not in INSTRUMENTED_ENCODERS:
+        INSTRUMENTED_ENCODERS[mapping_class] = compile_instrumented_encoder(mapping_class)
+
+    return INSTRUMENTED_ENCODERS[mapping_class]
+
+
+def get_instrumented_nested_converter(mapping_class):
+    """the ``get_converter`` given to :py:func:`~mercator.wire.compile_encoder`
+    so that nested mappings are instrumented as well.
+    """
+    encode = get_instrumented_encoder(mapping_class)
+
+    def convert(data):
+        return EncodedMessage(encode(data, bytearray()))
+
+    return convert
+
+
+def compile_instrumented_encoder(mapping_class):
+    if not supports_direct_encoding(mapping_class):
+        # messages are built by the plan, which is measured already
+        return compile_encoder(mapping_class)
+
+    statistics = get_statistics(mapping_class)
+
+    def wrap_caster(name, field, caster):
+        return instrument_caster(statistics, name, field, caster)
+
+    encoder = compile_encoder(mapping_class, get_instrumented_nested_converter, wrap_caster)
+    return instrument_converter(statistics, encoder)
+
+
+def instrument(mapping_class):
+    """replaces the compiled plan and the wire encoder of the given
+    mapping with instrumented ones.
+    """
+    if '__original_plan__' in vars(mapping_class) or vars(mapping_class).get('__plan__') is None:
+        return
+
+    mapping_class.__original_plan__ = mapping_class.__plan__
+    # encoders are compiled on first use, see mercator.wire.get_encoder
+    mapping_class.__original_encoder__ = vars(mapping_class).get('__encoder__')
+    mapping_class.__plan__ = staticmethod(get_instrumented_converter(mapping_class))
+    mapping_class.__encoder__ = staticmethod(get_instrumented_encoder(mapping_class))
+
+
+def restore(mapping_class):
+    """restores the original compiled plan and wire encoder of the given mapping"""
+    if '__original_plan__' not in vars(mapping_class):
+        return
+
+    mapping_class.__plan__ = staticmethod(mapping_class.__original_plan__)
+    if mapping_class.__original_encoder__ is None:
+        del mapping_class.__encoder__
+    else:
+        mapping_class.__encoder__ = mapping_class.__original_encoder__
+
+    del mapping_class.__original_plan__
+    del mapping_class.__original_encoder__
+
+
+def iter_mappings():
+    """generates every finalized :py:class:`~mercator.ProtoMapping` subclass"""
+    from . import ProtoMapping
+
+    pending = list(ProtoMapping.__subclasses__())
+    while pending:
+        mapping_class = pending.pop()
+        pending.extend(mapping_class.__subclasses__())
+        if is_finalized(mapping_class):
+            yield mapping_class
+
+
+def is_enabled():
+    return instrument in FINALIZATION_HOOKS
+
+
+def enable():
+    """instruments all existing mappings and those finalized afterwards"""
+    if is_enabled():
+        return
+
+    FINALIZATION_HOOKS.append(instrument)
+    for mapping_class in iter_mappings():
+        instrument(mapping_class)
+
+
+def disable():
+    """restores the original plans and encoders of all mappings, the statistics
+    collected so far remain available until :py:func:`reset`.
+    """
+    if is_enabled():
+        FINALIZATION_HOOKS.remove(instrument)
+
+    for mapping_class in iter_mappings():
+        restore(mapping_class)
+
+    INSTRUMENTED_PLANS.clear()
+    INSTRUMENTED_ENCODERS.clear()
+
+
+def reset():
+    """sets all statistics back to zero"""
+    for statistics in STATISTICS.values():
+        statistics.calls = statistics.nanoseconds = 0
+        for field_statistics in statistics.fields.values():
+            field_statistics.calls = field_statistics.nanoseconds = field_statistics.items = 0
+
+
+def snapshot():
+    """returns the statistics of every mapping used since enabled, by
+    the module and qualified name of the mapping class.
+
+    :returns: a :py:class:`dict` like ``{'myapp.mappings.UserMapping': {'calls': 1, 'seconds': 0.0001, 'fields': {'tokens': {'calls': 1, 'seconds': 0.00005, 'items': 3}}}}``
+    """
+    return dict([(name, statistics.to_dict()) for name, statistics in STATISTICS.items() if statistics.calls])
+
+
+def to_json(**kwargs):
+    """returns :py:func:`snapshot` serialized as JSON"""
+    return json.dumps(snapshot(), **kwargs)
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PROMETHEUS_METRICS = [
+    ('mercator_mapping_calls_total', 'Number of conversions per mapping.'),
+    ('mercator_mapping_seconds_total', 'Cumulative time of conversions per mapping.'),
+    ('mercator_field_calls_total', 'Number of values cast per field.'),
+    ('mercator_field_seconds_total', 'Cumulative time casting values per field.'),
+    ('mercator_field_items_total', 'Number of items cast per repeated field.'),
+]
+
+
+def to_prometheus():
+    """returns :py:func:`snapshot` in the text exposition format of Prometheus"""
+    samples = dict([(name, []) for name, _ in PROMETHEUS_METRICS])
+    for mapping, statistics in snapshot().items():
+        labels = f'mapping="{escape_label(mapping)}"'
+        samples['mercator_mapping_calls_total'].append((labels, statistics['calls']))
+        samples['mercator_mapping_seconds_total'].append((labels, statistics['seconds']))
+
+        for field, field_statistics in statistics['fields'].items():
+            field_labels = f'{labels},field="{escape_label(field)}"'
+            samples['mercator_field_calls_total'].append((field_labels, field_statistics['calls']))
+            samples['mercator_field_seconds_total'].append((field_labels, field_statistics['seconds']))
+            samples['mercator_field_items_total'].append((field_labels, field_statistics['items']))
+
+    lines = []
+    for name, description in PROMETHEUS_METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{{{labels}}} {value}' for labels, value in samples[name])
+
+    return '\n'.join(lines) + '\n'
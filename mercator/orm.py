@@ -0,0 +1,171 @@
+"""Plans the loading of SQLAlchemy relationships from the declarations
+of a :py:class:`~mercator.ProtoMapping`.
+
+Converting a list of ORM instances triggers one lazy load per row for
+every relationship read by the mapping, and again for every nested
+mapping. :py:func:`loader_options` walks the field mappings whose name
+at source is a relationship of :ref:`source-input-type` and returns
+the matching loader options, so that the conversion runs with a fixed
+number of queries:
+
+- ``selectinload`` for collections, e.g.: a :py:class:`~mercator.ProtoList`
+- ``joinedload`` for many-to-one relationships, e.g.: a :py:class:`~mercator.ProtoKey` of a nested mapping
+- ``load_only`` with the columns read by each mapping, plus those needed to load its relationships
+
+Example:
+
+.. code:: python
+
+   from mercator.orm import eager_load
+
+   query = eager_load(session.query(Media), MediaMapping)
+   messages = MediaMapping.to_protobuf_many(query.limit(500))
+
+Skipping the ORM altogether, :py:func:`select_columns` returns a Core
+``select()`` of the columns read by a mapping, labeled with their name
+at source, for :py:meth:`~mercator.ProtoMapping.to_protobuf_rows`:
+
+.. code:: python
+
+   from mercator.orm import select_columns
+
+   result = connection.execute(select_columns(MediaMapping).limit(500))
+   messages = MediaMapping.to_protobuf_rows(result)
+
+This module requires SQLAlchemy, which is not a dependency of mercator.
+"""
+import sqlalchemy
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Load
+from sqlalchemy.orm import ColumnProperty
+from sqlalchemy.orm import RelationshipProperty
+
+
+# select() takes the columns as positional arguments since 1.4
+SELECT_TAKES_LIST = tuple(map(int, sqlalchemy.__version__.split('.')[:2])) < (1, 4)
+
+
+def get_source_model(mapping_class):
+    """returns the :ref:`source-input-type` of the given mapping if it is a SQLAlchemy model, otherwise ``None``"""
+    model = getattr(mapping_class, '__source_input_type__', None)
+    if model is not None and inspect(model, raiseerr=False) is not None:
+        return model
+
+
+def get_nested_mapping(field):
+    """returns the target type of the given field mapping if it is a
+    :py:class:`~mercator.ProtoMapping` of a SQLAlchemy model, otherwise ``None``
+    """
+    from . import is_proto_mapping
+
+    target_type = field.target_type
+    if is_proto_mapping(target_type) and get_source_model(target_type) is not None:
+        return target_type
+
+
+def plan_attributes(mapping_class, model):
+    """returns the column attributes read by the given mapping and a
+    list of ``(relationship property, nested mapping or None)``.
+    """
+    mapper = inspect(model)
+    columns = {}
+    relationships = []
+    for field in mapping_class.__fields__.values():
+        prop = mapper.attrs.get(field.name_at_source)
+        if isinstance(prop, ColumnProperty):
+            columns[prop.key] = getattr(model, prop.key)
+
+        elif isinstance(prop, RelationshipProperty):
+            relationships.append((prop, get_nested_mapping(field)))
+
+            # the local columns of relationships are needed to load them
+            for column in prop.local_columns:
+                local = mapper.get_property_by_column(column)
+                columns[local.key] = getattr(model, local.key)
+
+    return list(columns.values()), relationships
+
+
+def build_options(loader, mapping_class, model, load_only, path):
+    """returns the loader options of ``mapping_class`` chained from
+    ``loader``, which is either :py:class:`~sqlalchemy.orm.Load` or a
+    relationship loader of a parent mapping.
+    """
+    columns, relationships = plan_attributes(mapping_class, model)
+    options = []
+    if load_only and columns:
+        options.append(loader.load_only(*columns))
+
+    for prop, nested_mapping in relationships:
+        attribute = getattr(model, prop.key)
+        strategy = 'selectinload' if prop.uselist else 'joinedload'
+        relationship_loader = getattr(loader, strategy)(attribute)
+
+        nested_model = prop.mapper.class_
+        if nested_mapping is None or nested_mapping in path:
+            options.append(relationship_loader)
+            continue
+
+        nested = build_options(relationship_loader, nested_mapping, nested_model, load_only, path | {nested_mapping})
+        options.extend(nested or [relationship_loader])
+
+    return options
+
+
+def loader_options(mapping_class, load_only=True):
+    """Plans the loader options needed to convert instances of the
+    :ref:`source-input-type` of the given mapping without lazy loads.
+
+    Nested mappings are followed when their name at source is a
+    relationship and they declare a SQLAlchemy model as
+    ``__source_input_type__``. Mappings that reference each other are
+    followed only once.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass with a SQLAlchemy model as :ref:`source-input-type`
+    :param load_only: when ``True`` (default) only the columns read by the mappings are loaded.
+    :returns: a :py:class:`list` of options for :py:meth:`~sqlalchemy.orm.query.Query.options`
+    """
+    model = get_source_model(mapping_class)
+    if model is None:
+        raise TypeError(f'{mapping_class.__name__} does not declare a SQLAlchemy model as __source_input_type__')
+
+    return build_options(Load(model), mapping_class, model, load_only, {mapping_class})
+
+
+def eager_load(query, mapping_class, load_only=True):
+    """returns the given query with the options of :py:func:`loader_options`"""
+    return query.options(*loader_options(mapping_class, load_only))
+
+
+def select_columns(mapping_class):
+    """Builds the SQLAlchemy Core ``select()`` of the table of
+    :ref:`source-input-type` with exactly the columns read by the given
+    mapping, each labeled with the ``name_at_source`` of its field so
+    that the rows can be converted with
+    :py:meth:`~mercator.ProtoMapping.to_protobuf_rows`.
+
+    Relationships are not selected: fields of nested mappings are left
+    unset when converting the rows.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass with a SQLAlchemy model as :ref:`source-input-type`
+    :returns: a ``Select`` that can be further filtered, ordered or limited.
+    """
+    model = get_source_model(mapping_class)
+    if model is None:
+        raise TypeError(f'{mapping_class.__name__} does not declare a SQLAlchemy model as __source_input_type__')
+
+    mapper = inspect(model)
+    columns = {}
+    for field in mapping_class.__fields__.values():
+        prop = mapper.attrs.get(field.name_at_source)
+        if isinstance(prop, ColumnProperty) and prop.key not in columns:
+            columns[prop.key] = prop.columns[0].label(prop.key)
+
+    if not columns:
+        raise TypeError(f'{mapping_class.__name__} does not read any column of {model.__name__}')
+
+    if SELECT_TAKES_LIST:
+        return sqlalchemy.select(list(columns.values()))
+
+    return sqlalchemy.select(*columns.values())
@@ -0,0 +1,112 @@
+"""Converts large batches of records in parallel worker processes.
+
+Conversion is pure python, so a single process is bound to one CPU
+core. :py:func:`iter_bytes_parallel` splits the input records in
+chunks, encodes each chunk in a
+:py:class:`~concurrent.futures.ProcessPoolExecutor` with
+:py:mod:`mercator.wire` and yields the serialized messages in the
+order of the input.
+
+Only the records and the resulting :py:class:`bytes` cross process
+boundaries: mapping classes are not pickled but looked up by
+:py:func:`get_mapping_id` in :py:data:`mercator.meta.REGISTRY` of the
+worker, importing the module that declares them if necessary. Records
+must therefore be picklable, e.g.: plain :py:class:`dict` rather than
+SQLAlchemy instances bound to a session.
+"""
+import os
+import itertools
+import importlib
+import collections
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .meta import REGISTRY
+from .wire import get_encoder
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_mapping_id(mapping_class):
+    """returns the identifier used by workers to find the given
+    :py:class:`~mercator.ProtoMapping` subclass: the name of its module
+    and its key in :py:data:`~mercator.meta.REGISTRY`.
+    """
+    name = mapping_class.__name__
+    if REGISTRY.get(name) is not mapping_class:
+        raise LookupError(f'{mapping_class} is not registered as {name!r} in mercator.meta.REGISTRY, '
+                          f'possibly shadowed by another mapping with the same name')
+
+    return mapping_class.__module__, name
+
+
+def resolve_mapping(mapping_id):
+    """returns the :py:class:`~mercator.ProtoMapping` subclass identified
+    by :py:func:`get_mapping_id`, importing its module when the worker
+    process was not forked from the parent.
+    """
+    module, name = mapping_id
+    mapping_class = REGISTRY.get(name)
+    if mapping_class is None or mapping_class.__module__ != module:
+        importlib.import_module(module)
+        mapping_class = REGISTRY.get(name)
+
+    if mapping_class is None or mapping_class.__module__ != module:
+        raise LookupError(f'could not find the mapping {name!r} of module {module!r} in mercator.meta.REGISTRY')
+
+    return mapping_class
+
+
+def encode_chunk(mapping_id, items):
+    """runs in worker processes and returns the list of messages encoded from ``items``"""
+    encode = get_encoder(resolve_mapping(mapping_id))
+    return [bytes(encode(item, bytearray())) for item in items]
+
+
+def iter_chunks(items, chunk_size):
+    if chunk_size < 1:
+        raise ValueError(f'iter_chunks() takes a positive chunk_size, but got {chunk_size} instead')
+
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_bytes_parallel(mapping_class, items, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+    """Encodes the given records in worker processes.
+
+    At most two chunks per worker are pending at any time, so the
+    input is consumed progressively and may be a generator of any
+    length.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass declared at module level.
+    :param items: an iterable of picklable records, usually :py:class:`dict`
+    :param workers: the number of worker processes, defaults to the number of CPUs.
+    :param chunk_size: the number of records sent to a worker at once.
+    :param executor: an optional :py:class:`~concurrent.futures.ProcessPoolExecutor` to be reused across calls, in which case ``workers`` should match its number of processes.
+    :returns: a generator of :py:class:`bytes`, one serialized message per record and in the same order.
+    """
+    mapping_id = get_mapping_id(mapping_class)
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    pending = collections.deque()
+    try:
+        for chunk in iter_chunks(items, chunk_size):
+            pending.append(executor.submit(encode_chunk, mapping_id, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown()
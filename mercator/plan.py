@@ -0,0 +1,293 @@
+"""Compiles :py:class:`~mercator.ProtoMapping` declarations into
+specialized converter functions during "import time".
+
+The interpreted path (:py:meth:`~mercator.ProtoMapping.to_dict`)
+walks ``__fields__`` and dispatches :py:meth:`~mercator.meta.FieldMapping.cast`
+for every field of every message. A compiled plan resolves all of
+that once per mapping class: the source key names, the casters
+returned by :py:meth:`~mercator.meta.FieldMapping.compile_caster` and
+the nested mappings are bound as locals of a single generated function
+that takes the source data and returns a new :ref:`proto` instance.
+
+Sparse dictionaries, with fewer keys than half the fields of the
+mapping, are converted by iterating over their keys and looking them
+up in a precomputed index of source names, so that the cost depends on
+the number of populated keys rather than on the width of the message,
+and only the fields with values are given to the message constructor.
+"""
+import sys
+import keyword
+import linecache
+import itertools
+
+
+PLAN_COUNTER = itertools.count()
+
+
+def find_declaring_class(cls, attribute):
+    """returns the first class in the MRO of ``cls`` that declares the
+    given ``attribute`` in its own body.
+    """
+    for klass in cls.__mro__:
+        if attribute in vars(klass):
+            return klass
+
+
+def is_opaque_field(field):
+    """returns ``True`` if the given
+    :py:class:`~mercator.meta.FieldMapping` overrides ``cast()``
+    without providing a matching ``compile_caster()``.
+
+    Such fields are always invoked through ``cast()``, even for
+    ``None`` values, so custom subclasses keep their exact behavior.
+    """
+    field_class = type(field)
+    compiled_by = find_declaring_class(field_class, 'compile_caster')
+    cast_by = find_declaring_class(field_class, 'cast')
+    return not issubclass(compiled_by, cast_by)
+
+
+def is_valid_keyword_argument(name):
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def bind_casters(fields, namespace, get_converter=None, wrap_caster=None):
+    """binds the caster of every field into ``namespace``.
+
+    ``get_converter`` is given to :py:meth:`~mercator.meta.FieldMapping.compile_caster`
+    to customize how nested mappings are converted.
+
+    ``wrap_caster`` is an optional function that takes the field name,
+    the :py:class:`~mercator.meta.FieldMapping` and its caster and
+    returns a replacement, used by :py:mod:`mercator.metrics`.
+
+    :returns: a list of ``(proto_field_name, name_at_source, caster_kind)``
+      where ``caster_kind`` is ``None`` for values that pass through
+      untouched, ``'value'`` for casters applied to values that are
+      not ``None`` and ``'opaque'`` for casters that take any value.
+    """
+    specs = []
+    for index, (name, field) in enumerate(fields.items()):
+        if is_opaque_field(field):
+            caster = field.cast
+            kind = 'opaque'
+        else:
+            caster = field.compile_caster(get_converter)
+            kind = 'value' if caster is not None else None
+
+        if caster is not None:
+            namespace[f'c{index}'] = wrap_caster(name, field, caster) if wrap_caster else caster
+
+        specs.append((name, field.name_at_source, kind))
+
+    return specs
+
+
+def bind_selectors(oneofs, namespace):
+    """binds the selector of every :py:class:`~mercator.ProtoOneOf`
+    into ``namespace``, see :py:meth:`~mercator.ProtoOneOf.compile_selector`.
+
+    :returns: a list with the ``name_at_source`` of the discriminator of each ``oneof``.
+    """
+    discriminators = []
+    for index, oneof in enumerate(oneofs.values()):
+        namespace[f'o{index}'] = oneof.compile_selector()
+        discriminators.append(oneof.name_at_source)
+
+    return discriminators
+
+
+def generate_extraction(lines, specs, accessor):
+    """appends to ``lines`` the python statements that extract every
+    field with the given ``accessor`` format string and cast it.
+
+    :returns: a list of ``(proto_field_name, local_variable_name)``
+    """
+    assignments = []
+    for index, (name, name_at_source, kind) in enumerate(specs):
+        variable = f'v{index}'
+        value = accessor.format(repr(name_at_source))
+
+        if kind == 'opaque':
+            lines.append(f'        {variable} = c{index}({value})')
+        else:
+            lines.append(f'        {variable} = {value}')
+            if kind == 'value':
+                lines.append(f'        if {variable} is not None:')
+                lines.append(f'            {variable} = c{index}({variable})')
+
+        assignments.append((name, variable))
+
+    return assignments
+
+
+def build_source_index(specs, namespace):
+    """returns a :py:class:`dict` with a tuple of ``(proto_field_name, caster)``
+    for every ``name_at_source`` of fields that are not opaque, where
+    ``caster`` is ``None`` for values that pass through untouched.
+    """
+    index = {}
+    for position, (name, name_at_source, kind) in enumerate(specs):
+        if kind != 'opaque':
+            caster = namespace.get(f'c{position}')
+            index[name_at_source] = index.get(name_at_source, ()) + ((name, caster),)
+
+    return index
+
+
+def supports_sparse_extraction(fields):
+    """returns ``False`` when any field belongs to a ``oneof``, whose
+    last assigned member wins, since sparse extraction assigns the
+    fields in the order of the source keys.
+    """
+    return not any(field.oneof for field in fields.values())
+
+
+def generate_sparse_extraction(lines, specs):
+    """appends to ``lines`` the python statements that populate the
+    dict ``kwargs`` only with fields whose source value is not ``None``.
+
+    Opaque fields are always invoked as they might produce a value
+    from ``None``.
+    """
+    lines.extend([
+        '            kwargs = {}',
+        '            for key, value in data.items():',
+        '                targets = index.get(key)',
+        '                if targets is not None and value is not None:',
+        '                    for name, cast in targets:',
+        '                        kwargs[name] = value if cast is None else cast(value)',
+    ])
+    for position, (name, name_at_source, kind) in enumerate(specs):
+        if kind == 'opaque':
+            lines.append(f'            v{position} = c{position}(get({name_at_source!r}))')
+            lines.append(f'            if v{position} is not None:')
+            lines.append(f'                kwargs[{name!r}] = v{position}')
+
+
+def generate_kwargs_extraction(lines, specs, accessor, discriminators=()):
+    """like :py:func:`generate_extraction` but the values that are not
+    ``None`` are collected in the dict ``kwargs`` of the message
+    constructor, since passing ``None`` to protobuf constructors is
+    costly for wide messages.
+
+    ``accessor`` is either a format string or a function that takes
+    the ``name_at_source`` and returns the python expression of its
+    value, or ``None`` when the source does not provide it.
+
+    ``discriminators`` are the names returned by :py:func:`bind_selectors`,
+    whose selectors are applied to ``kwargs`` once all fields are extracted.
+    """
+    lines.append('        kwargs = {}')
+    for index, (name, name_at_source, kind) in enumerate(specs):
+        variable = f'v{index}'
+        if callable(accessor):
+            value = accessor(name_at_source)
+        else:
+            value = accessor.format(repr(name_at_source))
+
+        if value is None:
+            # the source does not provide this field
+            if kind == 'opaque':
+                lines.append(f'        {variable} = c{index}(None)')
+                lines.append(f'        if {variable} is not None:')
+                lines.append(f'            kwargs[{name!r}] = {variable}')
+            continue
+
+        if kind == 'opaque':
+            lines.append(f'        {variable} = c{index}({value})')
+        else:
+            lines.append(f'        {variable} = {value}')
+
+        lines.append(f'        if {variable} is not None:')
+        if kind == 'value':
+            lines.append(f'            kwargs[{name!r}] = c{index}({variable})')
+        else:
+            lines.append(f'            kwargs[{name!r}] = {variable}')
+
+    for index, name_at_source in enumerate(discriminators):
+        value = None
+        if name_at_source is not None:
+            value = accessor(name_at_source) if callable(accessor) else accessor.format(repr(name_at_source))
+
+        lines.append(f'        o{index}({value}, kwargs)')
+
+    lines.append('        return proto(**kwargs)')
+
+
+def generate_plan_source(function_name, fields, namespace, get_converter=None, wrap_caster=None, oneofs=None):
+    """returns the source code of a converter function for the given
+    fields and :py:class:`~mercator.ProtoOneOf` declarations.
+    """
+    lines = [
+        f'def {function_name}(data, proto=proto):',
+        '    if data is None:',
+        '        return proto()',
+        '    if isinstance(data, dict):',
+        '        get = data.get',
+    ]
+    specs = bind_casters(fields, namespace, get_converter, wrap_caster)
+    discriminators = bind_selectors(oneofs or {}, namespace)
+    if supports_sparse_extraction(fields):
+        namespace['index'] = build_source_index(specs, namespace)
+        lines.append(f'        if len(data) < {max(len(specs) // 2, 1)}:')
+        generate_sparse_extraction(lines, specs)
+        lines.append('            return proto(**kwargs)')
+
+    generate_kwargs_extraction(lines, specs, 'get({})', discriminators)
+
+    lines.append('    if source_type is not None and isinstance(data, source_type):')
+    generate_kwargs_extraction(lines, specs, 'getattr(data, {}, None)', discriminators)
+
+    lines.append("    raise TypeError(f'{data} must be a dict or {source_type} but is {type(data)} instead')")
+    return '\n'.join(lines) + '\n'
+
+
+def register_source(filename, source):
+    """registers the generated ``source`` in the :py:mod:`linecache`
+    under ``filename`` so that tracebacks and debuggers can display it.
+
+    Lines are interned since the sources generated for different
+    mappings mostly share the same lines.
+    """
+    lines = [sys.intern(line) for line in source.splitlines(True)]
+    linecache.cache[filename] = (len(source), None, lines, filename)
+
+
+def compile_plan(mapping_class, get_converter=None, wrap_caster=None):
+    """Generates a converter function for the given
+    :py:class:`~mercator.ProtoMapping` subclass.
+
+    The returned function takes a :py:class:`dict`, an instance of
+    :ref:`source-input-type` or ``None`` and returns a new instance of
+    :ref:`proto`, exactly like :py:meth:`~mercator.ProtoMapping.to_protobuf`
+    would through the interpreted path.
+
+    An optional second argument replaces the message constructor, for
+    example with the ``add`` method of a repeated field so that the
+    message is created in place within its parent.
+
+    ``get_converter`` and ``wrap_caster`` customize the casters of the
+    fields, see :py:func:`bind_casters`.
+
+    The generated source code is available in the ``__source__``
+    attribute of the returned function for debugging purposes.
+    """
+    namespace = {
+        'proto': mapping_class.__proto__,
+        'source_type': getattr(mapping_class, '__source_input_type__', None),
+    }
+    function_name = f'convert_{mapping_class.__name__}'
+    source = generate_plan_source(function_name, mapping_class.__fields__, namespace, get_converter, wrap_caster,
+                                  mapping_class.__oneofs__)
+
+    # register the generated source in the linecache so that
+    # tracebacks and debuggers can display it.
+    filename = f'<mercator-plan-{next(PLAN_COUNTER)} {mapping_class.__qualname__}>'
+    register_source(filename, source)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__source__ = source
+    function.__qualname__ = f'{mapping_class.__qualname__}.{function_name}'
+    return function
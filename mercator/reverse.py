@@ -0,0 +1,161 @@
+"""Converts protobuf messages back into the source data of a
+:py:class:`~mercator.ProtoMapping`, reusing its declarations in reverse.
+
+:py:meth:`~mercator.ProtoMapping.from_protobuf` returns a
+:py:class:`dict` keyed by the ``name_at_source`` of every field mapping,
+so that ``username = ProtoKey('login', str)`` produces the key
+``login``, or an instance of :ref:`source-input-type` constructed with
+those keyword-arguments, leaving out the ones that are neither
+attributes of the class nor parameters of its constructor.
+
+Like :py:mod:`mercator.plan`, the conversion is compiled once per
+mapping class into a single generated function that reads every field
+of the message and applies the parsers returned by
+:py:meth:`~mercator.meta.FieldMapping.compile_parser`. Message fields
+that are not set and fields with explicit presence that are not set
+become ``None``, other fields keep their protobuf default values.
+The discriminator of a :py:class:`~mercator.ProtoOneOf` becomes the
+name, or the first alias, of the member set in the message.
+"""
+import inspect
+import itertools
+
+from .meta import has_presence
+from .meta import is_repeated
+from .plan import is_valid_keyword_argument
+from .plan import register_source
+
+
+PARSER_COUNTER = itertools.count()
+
+
+def accepts_keyword(source_type, name):
+    """returns ``True`` if ``name`` is an attribute of the given
+    :ref:`source-input-type` (e.g.: a SQLAlchemy column or relationship)
+    or a named parameter of its constructor.
+    """
+    # the attributes of SQLAlchemy mappers include backrefs declared
+    # by other models, which are only set in the class once mappers
+    # are configured.
+    mapper = getattr(source_type, '__mapper__', None)
+    if mapper is not None and name in mapper.attrs:
+        return True
+
+    if hasattr(source_type, name):
+        return True
+
+    try:
+        parameters = inspect.signature(source_type).parameters
+    except (TypeError, ValueError):
+        return False
+
+    return name in parameters
+
+
+def generate_field_read(index, name, descriptor, has_parser):
+    """returns the python expression that reads and parses a field of ``message``"""
+    if is_valid_keyword_argument(name):
+        value = f'message.{name}'
+    else:
+        value = f'getattr(message, {name!r})'
+
+    if has_parser:
+        value = f'p{index}({value})'
+
+    if not is_repeated(descriptor) and has_presence(descriptor):
+        value = f'{value} if message.HasField({name!r}) else None'
+
+    return value
+
+
+def generate_parser_source(function_name, mapping_class, namespace, as_object):
+    """returns the source code of a parser function for the given mapping"""
+    get_nested_parser = get_object_parser if as_object else get_parser
+    lines = [
+        f'def {function_name}(message):',
+        '    if not isinstance(message, proto):',
+        "        raise TypeError(f'{message} must be a {proto} but is {type(message)} instead')",
+    ]
+    source_type = namespace['source_type'] if as_object else None
+    if source_type is not None:
+        lines.append('    return source_type(**{')
+        closing = '    })'
+    else:
+        lines.append('    return {')
+        closing = '    }'
+
+    for index, field in enumerate(mapping_class.__fields__.values()):
+        descriptor = field.descriptor
+        if descriptor is None:
+            continue
+
+        if source_type is not None and not accepts_keyword(source_type, field.name_at_source):
+            continue
+
+        parse = field.compile_parser(get_nested_parser)
+        if parse is not None:
+            namespace[f'p{index}'] = parse
+
+        value = generate_field_read(index, descriptor.name, descriptor, parse is not None)
+        lines.append(f'        {field.name_at_source!r}: {value},')
+
+    # the discriminators of ProtoOneOf declarations name the member set
+    for index, oneof in enumerate(mapping_class.__oneofs__.values()):
+        name = oneof.name_at_source
+        if name is None or (source_type is not None and not accepts_keyword(source_type, name)):
+            continue
+
+        namespace[f'd{index}'] = oneof.compile_discriminator_parser()
+        lines.append(f'        {name!r}: d{index}(message.WhichOneof({oneof.oneof!r})),')
+
+    lines.append(closing)
+    return '\n'.join(lines) + '\n'
+
+
+def compile_parser(mapping_class, as_object=False):
+    """Generates a function that takes an instance of :ref:`proto` and
+    returns the source data of the given :py:class:`~mercator.ProtoMapping`
+    subclass.
+
+    :param as_object: when ``True`` the function returns instances of :ref:`source-input-type` if the mapping declares it, also for nested mappings.
+
+    The generated source code is available in the ``__source__``
+    attribute of the returned function for debugging purposes.
+    """
+    namespace = {
+        'proto': mapping_class.__proto__,
+        'source_type': getattr(mapping_class, '__source_input_type__', None),
+    }
+    function_name = f'parse_{mapping_class.__name__}'
+    source = generate_parser_source(function_name, mapping_class, namespace, as_object)
+
+    filename = f'<mercator-parser-{next(PARSER_COUNTER)} {mapping_class.__qualname__}>'
+    register_source(filename, source)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__source__ = source
+    function.__qualname__ = f'{mapping_class.__qualname__}.{function_name}'
+    return function
+
+
+def get_parser(mapping_class):
+    """returns the function that converts messages into :py:class:`dict`
+    for the given :py:class:`~mercator.ProtoMapping` subclass, compiling
+    it on first use.
+    """
+    # look up the class' own attribute, parsers are not inherited
+    if '__parser__' not in vars(mapping_class):
+        mapping_class.__parser__ = staticmethod(compile_parser(mapping_class))
+
+    return mapping_class.__parser__
+
+
+def get_object_parser(mapping_class):
+    """like :py:func:`get_parser` but the function returns instances
+    of :ref:`source-input-type` when declared.
+    """
+    if '__object_parser__' not in vars(mapping_class):
+        mapping_class.__object_parser__ = staticmethod(compile_parser(mapping_class, as_object=True))
+
+    return mapping_class.__object_parser__
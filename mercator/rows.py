@@ -0,0 +1,147 @@
+"""Converts rows of SQL results and plain tuples, addressed by the
+position of their columns rather than by attribute or key lookups.
+
+SQLAlchemy Core results (:py:meth:`~sqlalchemy.engine.Connection.execute`)
+return rows that behave like tuples, along with the names of their
+columns. :py:func:`compile_row_converter` computes once, for a given
+sequence of column names, the position of the ``name_at_source`` of
+every field mapping and generates a converter that reads ``row[i]``
+directly. Fields whose name at source is not among the columns are left
+unset.
+
+:py:func:`iter_rows_to_protobuf` finds the column names of a result set
+from ``result.keys()`` or from its first row, so that the index map is
+computed once per result set. Rows that are mappings, such as the
+``RowMapping`` of SQLAlchemy 1.4 (``row._mapping``), are read by key
+instead.
+
+Converters are cached per mapping class and tuple of column names.
+Only columns are converted: relationships are not part of Core results,
+so fields of nested mappings expect the nested data in a column (e.g.:
+JSON) or are left unset. See :py:func:`mercator.orm.select_columns` to
+select exactly the columns needed by a mapping.
+"""
+import itertools
+import collections.abc
+
+from .plan import bind_casters
+from .plan import bind_selectors
+from .plan import register_source
+from .plan import generate_kwargs_extraction
+
+
+ROW_CONVERTER_COUNTER = itertools.count()
+
+
+def generate_row_converter_source(function_name, fields, namespace, columns, keyed, oneofs=None):
+    """returns the source code of a function that converts rows with the given columns"""
+    positions = dict([(name, position) for position, name in reversed(list(enumerate(columns)))])
+
+    def accessor(name_at_source):
+        if name_at_source not in positions:
+            return None
+        if keyed:
+            return f'row[{name_at_source!r}]'
+        return f'row[{positions[name_at_source]}]'
+
+    lines = [
+        f'def {function_name}(row, proto=proto):',
+        '    if row is not None:',
+    ]
+    specs = bind_casters(fields, namespace)
+    discriminators = bind_selectors(oneofs or {}, namespace)
+    generate_kwargs_extraction(lines, specs, accessor, discriminators)
+    lines.append('    return proto()')
+    return '\n'.join(lines) + '\n'
+
+
+def compile_row_converter(mapping_class, columns, keyed=False):
+    """Generates a function that takes a row with the given columns and
+    returns a new instance of :ref:`proto`.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param columns: the names of the columns of the rows, in order.
+    :param keyed: when ``True`` the values are read by column name (e.g.: from a ``RowMapping`` or a :py:class:`dict`), otherwise by position.
+
+    The generated source code is available in the ``__source__``
+    attribute of the returned function for debugging purposes.
+    """
+    namespace = {
+        'proto': mapping_class.__proto__,
+    }
+    function_name = f'convert_rows_{mapping_class.__name__}'
+    source = generate_row_converter_source(function_name, mapping_class.__fields__, namespace, columns, keyed,
+                                           mapping_class.__oneofs__)
+
+    filename = f'<mercator-rows-{next(ROW_CONVERTER_COUNTER)} {mapping_class.__qualname__}>'
+    register_source(filename, source)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__source__ = source
+    function.__qualname__ = f'{mapping_class.__qualname__}.{function_name}'
+    return function
+
+
+def get_row_converter(mapping_class, columns, keyed=False):
+    """returns the converter of :py:func:`compile_row_converter`,
+    compiling it on first use for the given columns.
+    """
+    # look up the class' own attribute, converters are not inherited
+    if '__row_converters__' not in vars(mapping_class):
+        mapping_class.__row_converters__ = {}
+
+    key = (tuple(columns), keyed)
+    converters = mapping_class.__row_converters__
+    if key not in converters:
+        converters[key] = compile_row_converter(mapping_class, key[0], keyed)
+
+    return converters[key]
+
+
+def is_keyed_row(row):
+    """returns ``True`` for rows that can only be read by column name"""
+    return isinstance(row, collections.abc.Mapping)
+
+
+def get_row_columns(row):
+    """returns the column names of a row, or ``None`` if unknown"""
+    # RowMapping and dict
+    if is_keyed_row(row):
+        return list(row.keys())
+
+    # Row of SQLAlchemy 1.4+ and named tuples
+    fields = getattr(row, '_fields', None)
+    if fields is not None:
+        return list(fields)
+
+    # RowProxy of SQLAlchemy 1.3
+    keys = getattr(row, 'keys', None)
+    if callable(keys):
+        return list(keys())
+
+
+def iter_rows_to_protobuf(mapping_class, rows, columns=None):
+    """Converts every row of a result set.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param rows: a SQLAlchemy result, or any iterable of rows or tuples.
+    :param columns: the names of the columns of the rows, in order. Defaults to ``rows.keys()`` or to the column names of the first row, and is required for plain tuples.
+    :returns: a generator of :ref:`proto` instances
+    """
+    if columns is None and callable(getattr(rows, 'keys', None)) and not is_keyed_row(rows):
+        columns = list(rows.keys())
+
+    iterator = iter(rows)
+    for row in iterator:
+        keyed = is_keyed_row(row)
+        if columns is None:
+            columns = get_row_columns(row)
+
+        if columns is None:
+            raise TypeError(f'cannot find the columns of {row!r}, please provide them to convert {type(row)}')
+
+        convert = get_row_converter(mapping_class, columns, keyed)
+        yield convert(row)
+        for row in iterator:
+            yield convert(row)
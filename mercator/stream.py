@@ -0,0 +1,102 @@
+"""Streams of length-delimited protobuf messages.
+
+Each message is encoded with :py:mod:`mercator.wire` and prefixed with
+its size as a varint, the same framing as ``writeDelimitedTo()`` in the
+Java protobuf runtime. Records are consumed one by one from any
+iterable, for example a generator or a SQLAlchemy ``Query`` with
+``yield_per()``, and messages are accumulated in a single reusable
+buffer that is flushed whenever it reaches ``chunk_size`` bytes, so the
+memory used does not depend on the number of records.
+"""
+from .wire import get_encoder
+from .wire import write_varint
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def encode_delimited(encode, data, out):
+    """appends the message encoded from ``data`` to ``out`` prefixed with its size"""
+    mark = len(out)
+    encode(data, out)
+    size = bytearray()
+    write_varint(size, len(out) - mark)
+    out[mark:mark] = size
+
+
+def iter_delimited(mapping_class, items, chunk_size=None):
+    """Generates length-delimited messages from the given records.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param items: an iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+    :param chunk_size: when given, consecutive messages are grouped in chunks of at least ``chunk_size`` bytes (except the last one), otherwise each message is generated separately.
+    :returns: a generator of :py:class:`bytes`
+    """
+    encode = get_encoder(mapping_class)
+    buffer = bytearray()
+    limit = chunk_size or 1
+
+    for item in items:
+        encode_delimited(encode, item, buffer)
+        if len(buffer) >= limit:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def write_delimited(mapping_class, items, file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Writes length-delimited messages from the given records into a
+    file-like object, calling ``file.write()`` once per chunk.
+
+    :param mapping_class: a :py:class:`~mercator.ProtoMapping` subclass
+    :param items: an iterable of :py:class:`dict` or objects compatible with the :ref:`source-input-type` declaration.
+    :param file: a binary file-like object
+    :param chunk_size: the minimum amount of bytes per call to ``file.write()``
+    :returns: the number of messages written
+    """
+    encode = get_encoder(mapping_class)
+    buffer = bytearray()
+    count = 0
+
+    for item in items:
+        encode_delimited(encode, item, buffer)
+        count += 1
+        if len(buffer) >= chunk_size:
+            file.write(buffer)
+            buffer.clear()
+
+    if buffer:
+        file.write(buffer)
+
+    return count
+
+
+def read_varint(data, position):
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def iter_parse_delimited(message_class, data):
+    """Parses a sequence of length-delimited messages, the inverse of
+    :py:func:`iter_delimited`.
+
+    :param message_class: a :py:class:`~google.protobuf.message.Message` subclass
+    :param data: :py:class:`bytes` with the length-delimited messages
+    :returns: a generator of ``message_class`` instances
+    """
+    view = memoryview(data)
+    position = 0
+    while position < len(view):
+        size, position = read_varint(view, position)
+        message = message_class()
+        message.ParseFromString(view[position:position + size])
+        position += size
+        yield message
@@ -0,0 +1,538 @@
+"""Converts JSON-like python values into the well-known types
+``google.protobuf.Struct``, ``google.protobuf.ListValue`` and
+``google.protobuf.Value``.
+
+Protobuf fills these messages value by value from python, and rejects
+values that JSON libraries and database drivers commonly produce,
+such as :py:class:`~decimal.Decimal`, :py:class:`~datetime.datetime`
+or :py:class:`~uuid.UUID`. Here the serialized message is written in a
+single pass over the value and parsed at once by protobuf. Nested
+containers are walked with an explicit stack rather than recursion,
+so deep documents don't hit the recursion limit. Documents nested
+deeper than :py:data:`MAX_NESTING` containers, or containing
+themselves, are rejected with :py:class:`ValueError` while they are
+encoded.
+
+Protobuf refuses to parse messages nested deeper than
+:py:data:`MAX_DEPTH` levels. Each list of a document takes two of them:
+a ``Value`` and its ``ListValue``, and each object takes three: the map
+entry of ``Struct``, a ``Value`` and its ``Struct``. Messages of
+documents that are too deep to be parsed are built in memory instead,
+see :py:func:`build_message`, and fields take them as documents since
+message constructors parse the messages they are given.
+
+Values of other types are replaced using a coercion table, a
+:py:class:`dict` of types to functions that return a JSON-like value,
+:py:data:`DEFAULT_COERCIONS` by default. Types are looked up exactly
+first, then with :py:func:`isinstance` in the order of the table.
+
+:py:class:`~mercator.ProtoKey` fields declared with :py:class:`dict`
+or :py:class:`list` on fields of these types are converted with the
+default coercions. :py:class:`StructCaster` selects another table:
+
+.. code:: python
+
+   class UserMapping(ProtoMapping):
+       __proto__ = domain_pb2.User
+
+       metadata = ProtoKey('extra_info', StructCaster(coercions={**DEFAULT_COERCIONS, set: sorted}))
+
+JSON documents given as :py:class:`bytes`, or as :py:class:`str` to
+``Struct`` and ``ListValue`` fields, are parsed with :py:func:`json.loads`
+first.
+"""
+import json
+import uuid
+import struct
+import decimal
+import datetime
+import collections.abc
+
+from google.protobuf import json_format
+from google.protobuf import struct_pb2
+from google.protobuf.message import DecodeError
+
+from .meta import MercatorDomainClass
+
+
+DEFAULT_COERCIONS = {
+    decimal.Decimal: float,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    uuid.UUID: str,
+}
+
+JSON_MESSAGE_TYPES = {
+    'google.protobuf.Struct': struct_pb2.Struct,
+    'google.protobuf.ListValue': struct_pb2.ListValue,
+    'google.protobuf.Value': struct_pb2.Value,
+}
+
+# serialized fields of google.protobuf.Value
+NULL_VALUE = b'\x08\x00'
+TRUE_VALUE = b'\x20\x01'
+FALSE_VALUE = b'\x20\x00'
+NUMBER_TAG = b'\x11'
+STRING_TAG = b'\x1a'
+STRUCT_TAG = b'\x2a'
+LIST_TAG = b'\x32'
+
+# tags of the map entries of Struct, the values of ListValue and the
+# keys of map entries (field 1) and of the values of map entries (field 2)
+ENTRY_TAG = b'\x0a'
+VALUE_TAG = b'\x12'
+
+pack_double = struct.Struct('<d').pack
+
+# errors of numbers that are JSON scalars by type but not doubles,
+# e.g.: integers larger than the range of floats
+ENCODING_ERRORS = (OverflowError, struct.error)
+
+# the nested messages that protobuf parses at most
+MAX_DEPTH = 100
+
+# the containers of a document that are converted at most, as protobuf
+# could not parse deeper lists of lists
+MAX_NESTING = MAX_DEPTH // 2
+
+LENGTHS = tuple([bytes((size,)) for size in range(0x80)])
+
+# the serialized key of Struct entries by key, followed by the tag of
+# their value, as documents of the same kind share most of their keys
+KEY_PREFIXES = {}
+KEY_PREFIXES_MAXSIZE = 4096
+
+
+def encode_length(size):
+    """returns the varint of ``size``"""
+    if size < 0x80:
+        return LENGTHS[size]
+
+    out = bytearray()
+    while size > 0x7f:
+        out.append((size & 0x7f) | 0x80)
+        size >>= 7
+    out.append(size)
+    return bytes(out)
+
+
+def encode_scalar(value):
+    """returns the serialized ``Value`` of a JSON scalar, or ``None``
+    for other values.
+    """
+    value_type = type(value)
+    if value_type is str:
+        encoded = value.encode('utf-8')
+        return STRING_TAG + encode_length(len(encoded)) + encoded
+
+    if value_type is bool:
+        return TRUE_VALUE if value else FALSE_VALUE
+
+    if value_type is int or value_type is float:
+        return NUMBER_TAG + pack_double(value)
+
+    if value is None:
+        return NULL_VALUE
+
+
+def encode_key_prefix(key):
+    """returns the serialized ``key`` of a ``Struct`` entry followed by
+    the tag of its value.
+    """
+    prefix = KEY_PREFIXES.get(key)
+    if prefix is None:
+        encoded = key.encode('utf-8')
+        prefix = ENTRY_TAG + encode_length(len(encoded)) + encoded + VALUE_TAG
+        if len(KEY_PREFIXES) >= KEY_PREFIXES_MAXSIZE:
+            KEY_PREFIXES.clear()
+        KEY_PREFIXES[key] = prefix
+
+    return prefix
+
+
+def iter_container(value):
+    """returns ``(is_struct, iterator of (key, item))`` for mappings,
+    lists and tuples, otherwise ``None``.
+    """
+    if isinstance(value, dict) or isinstance(value, collections.abc.Mapping):
+        return True, iter(value.items())
+
+    if isinstance(value, (list, tuple)):
+        return False, enumerate(value)
+
+
+def find_coercion(value, coercions):
+    coerce_value = coercions.get(type(value))
+    if coerce_value is not None:
+        return coerce_value
+
+    for value_type, function in coercions.items():
+        if isinstance(value, value_type):
+            return function
+
+
+def format_path(keys):
+    return ''.join([f'[{key!r}]' for key in keys]) or 'the root'
+
+
+def not_serializable(value, keys):
+    return TypeError(f'{type(value).__name__} is not JSON serializable at {format_path(keys)}')
+
+
+def encode_other(value, coercions):
+    """returns ``(serialized Value, None)`` or ``(None, container)``
+    for values that are not JSON scalars, see :py:func:`iter_container`,
+    or ``(None, None)`` for values that cannot be coerced.
+    """
+    container = iter_container(value)
+    if container is not None:
+        return None, container
+
+    # subclasses of JSON scalars, e.g.: enumerations
+    if isinstance(value, bool):
+        return (TRUE_VALUE if value else FALSE_VALUE), None
+
+    if isinstance(value, (int, float)):
+        return NUMBER_TAG + pack_double(value), None
+
+    if isinstance(value, str):
+        return encode_scalar(str.__str__(value)), None
+
+    if isinstance(value, struct_pb2.Value):
+        return value.SerializeToString(), None
+
+    if isinstance(value, (struct_pb2.Struct, struct_pb2.ListValue)):
+        serialized = value.SerializeToString()
+        tag = STRUCT_TAG if isinstance(value, struct_pb2.Struct) else LIST_TAG
+        return tag + encode_length(len(serialized)) + serialized, None
+
+    coerce_value = find_coercion(value, coercions)
+    if coerce_value is not None:
+        coerced = coerce_value(value)
+        encoded = encode_scalar(coerced)
+        if encoded is not None:
+            return encoded, None
+
+        container = iter_container(coerced)
+        if container is not None:
+            return None, container
+
+    return None, None
+
+
+def encode_container(container, coercions, value=None):
+    """returns the serialized ``Struct`` or ``ListValue`` of the given
+    container, see :py:func:`iter_container`.
+
+    Scalars are written inline, as they make up most documents.
+
+    :param value: the container itself, to detect that it contains itself.
+    :raises ValueError: for containers nested deeper than :py:data:`MAX_NESTING` or containing themselves.
+    """
+    is_struct, items = container
+    key_prefixes = KEY_PREFIXES
+    root = bytearray()
+    # frames of (items, out, is_struct, key in the parent container, id of the container)
+    stack = [(items, root, is_struct, None, id(value))]
+    # ids of the containers on the stack
+    active = {id(value)}
+    while stack:
+        items, out, is_struct, _, _ = stack[-1]
+        for key, item in items:
+            if is_struct and type(key) is not str and not isinstance(key, str):
+                keys = [frame[3] for frame in stack[1:]]
+                raise TypeError(f'Struct keys must be strings, but got {key!r} at {format_path(keys)}')
+
+            item_type = type(item)
+            if item_type is str:
+                encoded = item.encode('utf-8')
+                size = len(encoded)
+                encoded = STRING_TAG + (LENGTHS[size] if size < 0x80 else encode_length(size)) + encoded
+            elif item_type is int or item_type is float:
+                encoded = NUMBER_TAG + pack_double(item)
+            elif item_type is bool:
+                encoded = TRUE_VALUE if item else FALSE_VALUE
+            elif item is None:
+                encoded = NULL_VALUE
+            else:
+                if item_type is dict:
+                    child = True, iter(item.items())
+                elif item_type is list:
+                    child = False, enumerate(item)
+                else:
+                    encoded, child = encode_other(item, coercions)
+
+                if child is not None:
+                    push_container(stack, active, item, child, key)
+                    break
+                if encoded is None:
+                    raise not_serializable(item, [frame[3] for frame in stack[1:]] + [key])
+
+            size = len(encoded)
+            if is_struct:
+                prefix = key_prefixes.get(key) or encode_key_prefix(key)
+                encoded = prefix + (LENGTHS[size] if size < 0x80 else encode_length(size)) + encoded
+                size = len(encoded)
+
+            out += ENTRY_TAG + (LENGTHS[size] if size < 0x80 else encode_length(size)) + encoded
+        else:
+            _, out, is_struct, key, ident = stack.pop()
+            active.discard(ident)
+            if stack:
+                encoded = (STRUCT_TAG if is_struct else LIST_TAG) + encode_length(len(out)) + out
+                _, parent, parent_is_struct, _, _ = stack[-1]
+                if parent_is_struct:
+                    encoded = encode_key_prefix(key) + encode_length(len(encoded)) + encoded
+
+                parent += ENTRY_TAG + encode_length(len(encoded)) + encoded
+
+    return bytes(root)
+
+
+def push_container(stack, active, item, container, key):
+    """pushes the frame of a nested container on the stack of :py:func:`encode_container`"""
+    if len(stack) >= MAX_NESTING:
+        keys = [frame[3] for frame in stack[1:]] + [key]
+        raise ValueError(f'documents cannot be nested deeper than {MAX_NESTING} containers, at {format_path(keys)}')
+
+    ident = id(item)
+    if ident in active:
+        keys = [frame[3] for frame in stack[1:]] + [key]
+        raise ValueError(f'circular reference detected at {format_path(keys)}')
+
+    active.add(ident)
+    stack.append((container[1], bytearray(), container[0], key, ident))
+
+
+def is_json_text(value):
+    return isinstance(value, (bytes, bytearray, memoryview))
+
+
+def load_json(value, message_type):
+    """returns the python value of JSON documents given to :py:func:`encode`, otherwise ``value``"""
+    if is_json_text(value) or isinstance(value, str) and message_type is not struct_pb2.Value:
+        return json.loads(bytes(value) if isinstance(value, memoryview) else value)
+
+    return value
+
+
+def encode(value, message_type=struct_pb2.Struct, coercions=DEFAULT_COERCIONS):
+    """returns the serialized message of the given type for ``value``
+
+    :param value: a JSON-like python value, or a JSON document as :py:class:`bytes` (or :py:class:`str` for ``Struct`` and ``ListValue``).
+    :param message_type: ``Struct``, ``ListValue`` or ``Value`` of :py:mod:`google.protobuf.struct_pb2`.
+    :param coercions: a :py:class:`dict` of types to functions that return a JSON-like value.
+    """
+    return encode_value(load_json(value, message_type), message_type, coercions)
+
+
+def encode_value(value, message_type, coercions):
+    """returns the serialized message of :py:func:`encode` for values that are not JSON documents"""
+    if message_type is struct_pb2.Value:
+        encoded = encode_scalar(value)
+        if encoded is not None:
+            return encoded
+
+        encoded, container = encode_other(value, coercions)
+        if container is None:
+            if encoded is None:
+                raise not_serializable(value, [])
+            return encoded
+
+        tag = STRUCT_TAG if container[0] else LIST_TAG
+        serialized = encode_container(container, coercions, value)
+        return tag + encode_length(len(serialized)) + serialized
+
+    if isinstance(value, message_type):
+        return value.SerializeToString()
+
+    container = iter_container(value)
+    if container is None or container[0] is not (message_type is struct_pb2.Struct):
+        expected = 'a mapping' if message_type is struct_pb2.Struct else 'a list or tuple'
+        raise TypeError(f'{message_type.DESCRIPTOR.full_name} takes {expected}, but got {type(value).__name__} instead')
+
+    return encode_container(container, coercions, value)
+
+
+def build_message(value, message_type, coercions=DEFAULT_COERCIONS):
+    """returns a new message of the given type for a ``value`` already
+    accepted by :py:func:`encode`, filled field by field rather than
+    parsed, for documents nested deeper than protobuf parses.
+    """
+    message = message_type()
+    if message_type is struct_pb2.Value:
+        if isinstance(value, struct_pb2.Value):
+            message.CopyFrom(value)
+            return message
+
+        _, container = encode_other(value, coercions)
+        root = message
+        message = root.struct_value if container[0] else root.list_value
+        message.SetInParent()
+    elif isinstance(value, message_type):
+        message.CopyFrom(value)
+        return message
+    else:
+        container = iter_container(value)
+        root = message
+
+    # encode() checked the keys, the values, the nesting and circular
+    # references already
+    stack = [(container[1], message, container[0])]
+    while stack:
+        items, message, is_struct = stack[-1]
+        for key, item in items:
+            target = message.fields[key] if is_struct else message.values.add()
+            item_type = type(item)
+            if item_type is str:
+                target.string_value = item
+                continue
+            if item_type is int or item_type is float:
+                target.number_value = item
+                continue
+            if item_type is bool:
+                target.bool_value = item
+                continue
+            if item is None:
+                target.null_value = 0
+                continue
+
+            if isinstance(item, struct_pb2.Value):
+                target.CopyFrom(item)
+                continue
+            if isinstance(item, struct_pb2.Struct):
+                target.struct_value.CopyFrom(item)
+                continue
+            if isinstance(item, struct_pb2.ListValue):
+                target.list_value.CopyFrom(item)
+                continue
+
+            encoded, child = encode_other(item, coercions)
+            if child is not None:
+                nested = target.struct_value if child[0] else target.list_value
+                nested.SetInParent()
+                stack.append((child[1], nested, child[0]))
+                break
+
+            target.MergeFromString(encoded)
+        else:
+            stack.pop()
+
+    return root
+
+
+def to_message(value, message_type, coercions=DEFAULT_COERCIONS):
+    """returns a new message of the given type for ``value``, see :py:func:`encode`"""
+    value = load_json(value, message_type)
+    encoded = encode_value(value, message_type, coercions)
+    try:
+        return message_type.FromString(encoded)
+    except DecodeError:
+        # nested deeper than MAX_DEPTH, encode() already rejected any
+        # other invalid value
+        return build_message(value, message_type, coercions)
+
+
+def to_document(message):
+    """returns the JSON-like python value of a message of
+    :py:func:`build_message`, which message constructors take for fields
+    of its type and build field by field as well.
+    """
+    document = json_format.MessageToDict(message)
+    if isinstance(message, struct_pb2.Value):
+        # Value fields take the keyword-arguments of a Value
+        return {message.WhichOneof('kind'): document}
+
+    return document
+
+
+def to_field_value(value, message_type, coercions=DEFAULT_COERCIONS):
+    """returns a new message of the given type for ``value``, or
+    :py:func:`to_document` for documents nested deeper than protobuf
+    parses, since message constructors parse the messages they are given.
+    """
+    value = load_json(value, message_type)
+    encoded = encode_value(value, message_type, coercions)
+    try:
+        return message_type.FromString(encoded)
+    except DecodeError:
+        return to_document(build_message(value, message_type, coercions))
+
+
+def to_struct(value, coercions=DEFAULT_COERCIONS):
+    """returns a new ``google.protobuf.Struct`` with the given mapping or JSON document"""
+    return to_message(value, struct_pb2.Struct, coercions)
+
+
+def to_list_value(value, coercions=DEFAULT_COERCIONS):
+    """returns a new ``google.protobuf.ListValue`` with the given list, tuple or JSON document"""
+    return to_message(value, struct_pb2.ListValue, coercions)
+
+
+def to_value(value, coercions=DEFAULT_COERCIONS):
+    """returns a new ``google.protobuf.Value`` with the given value or JSON document"""
+    return to_message(value, struct_pb2.Value, coercions)
+
+
+def get_json_message_type(descriptor):
+    """returns the class of ``Struct``, ``ListValue`` or ``Value`` for
+    fields of these types, otherwise ``None``.
+    """
+    message_type = descriptor.message_type if descriptor is not None else None
+    if message_type is None:
+        return
+
+    return JSON_MESSAGE_TYPES.get(message_type.full_name)
+
+
+def compile_json_caster(message_type, coercions=DEFAULT_COERCIONS, fallback=None):
+    """returns a function that takes a value and returns a new
+    message of the given type, see :py:func:`to_field_value`.
+
+    :param fallback: an optional function applied first to values that ``Struct`` or ``ListValue`` do not take as is, e.g.: :py:class:`dict` for iterables of pairs.
+    """
+    if message_type is struct_pb2.Struct:
+        accepted = (collections.abc.Mapping, str, bytes, bytearray, memoryview, message_type)
+    else:
+        accepted = (list, tuple, str, bytes, bytearray, memoryview, message_type)
+
+    if fallback is None or message_type is struct_pb2.Value:
+        def cast(value):
+            return to_field_value(value, message_type, coercions)
+    else:
+        def cast(value):
+            if not isinstance(value, accepted):
+                value = fallback(value)
+            return to_field_value(value, message_type, coercions)
+
+    return cast
+
+
+class StructCaster(MercatorDomainClass):
+    """Converts values of :py:class:`~mercator.ProtoKey` into
+    ``Struct``, ``ListValue`` or ``Value`` messages with a custom
+    coercion table.
+
+    :param message_type: ``Struct`` (default), ``ListValue`` or ``Value`` of :py:mod:`google.protobuf.struct_pb2`.
+    :param coercions: a :py:class:`dict` of types to functions that return a JSON-like value, :py:data:`DEFAULT_COERCIONS` by default.
+    """
+    __slots__ = ('message_type', 'coercions', 'cast')
+
+    def __init__(self, message_type=struct_pb2.Struct, coercions=DEFAULT_COERCIONS):
+        if message_type not in JSON_MESSAGE_TYPES.values():
+            raise TypeError(f'StructCaster() takes Struct, ListValue or Value, but got {message_type} instead')
+
+        self.message_type = message_type
+        self.coercions = coercions
+        self.cast = compile_json_caster(message_type, coercions)
+
+    def __call__(self, value):
+        return self.cast(value)
+
+    def from_protobuf(self, message):
+        """the inverse of calling this object, used by :py:meth:`~mercator.ProtoMapping.from_protobuf`.
+
+        :returns: a :py:class:`dict`, a :py:class:`list` or a JSON scalar.
+        """
+        return json_format.MessageToDict(message)
@@ -0,0 +1,327 @@
+"""Casters of the well-known types ``google.protobuf.Timestamp``,
+``Duration``, ``FieldMask`` and of the wrappers such as
+``Int64Value``, for :py:class:`~mercator.ProtoKey` fields.
+
+.. code:: python
+
+   from mercator.wellknown import TIMESTAMP, DURATION, INT64_VALUE
+
+   class UserAuthTokenMapping(ProtoMapping):
+       __proto__ = domain_pb2.User.AuthToken
+
+       created_at = ProtoKey('created_at', TIMESTAMP)
+       lifetime = ProtoKey('lifetime', DURATION)
+       uses = ProtoKey('uses', INT64_VALUE)
+
+Compiled plans don't build a message per value: casters return the
+fields of the message as a :py:class:`dict`, e.g.: ``{'seconds': 1552240433,
+'nanos': 500000000}``, which the constructor of the parent message
+fills its sub-message with. Calling a caster returns a new message.
+
+:py:class:`TimestampCaster` takes :py:class:`~datetime.datetime`
+(naive ones are in UTC), :py:class:`~datetime.date`, seconds since the
+epoch as :py:class:`int`, :py:class:`float` or
+:py:class:`~decimal.Decimal`, and ISO 8601 strings with up to
+nanoseconds. :py:class:`DurationCaster` takes
+:py:class:`~datetime.timedelta`, seconds, and strings like ``'1.5s'``.
+"""
+import re
+import abc
+import math
+import datetime
+
+from google.protobuf import duration_pb2
+from google.protobuf import field_mask_pb2
+from google.protobuf import timestamp_pb2
+from google.protobuf import wrappers_pb2
+
+from .meta import MercatorDomainClass
+from .meta import compile_field_checker
+
+
+NANOS_PER_SECOND = 10 ** 9
+SECONDS_PER_DAY = 86400
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+ISO_TIMESTAMP = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[Tt ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,9}))?)?)?'
+    r'(Z|z|[+-]\d{2}(?::?\d{2})?)?$'
+)
+DURATION_STRING = re.compile(r'(-)?(\d+)(?:\.(\d{1,9}))?s$')
+
+WRAPPER_TYPES = {
+    wrappers_pb2.DoubleValue: float,
+    wrappers_pb2.FloatValue: float,
+    wrappers_pb2.Int64Value: int,
+    wrappers_pb2.UInt64Value: int,
+    wrappers_pb2.Int32Value: int,
+    wrappers_pb2.UInt32Value: int,
+    wrappers_pb2.BoolValue: bool,
+    wrappers_pb2.StringValue: str,
+    wrappers_pb2.BytesValue: bytes,
+}
+
+
+def split_seconds(value, truncate=False):
+    """returns ``(seconds, nanos)`` of a number of seconds, with
+    ``nanos`` rounded to the nearest nanosecond.
+
+    :param truncate: when ``True``, ``nanos`` has the sign of ``value`` like in ``Duration``, otherwise it is positive like in ``Timestamp``.
+    """
+    if type(value) is int:
+        return value, 0
+
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f'{value} is not a finite number of seconds')
+
+    seconds = math.trunc(value) if truncate else math.floor(value)
+    nanos = round((value - seconds) * NANOS_PER_SECOND)
+    if nanos >= NANOS_PER_SECOND:
+        seconds, nanos = seconds + 1, nanos - NANOS_PER_SECOND
+    elif nanos <= -NANOS_PER_SECOND:
+        seconds, nanos = seconds - 1, nanos + NANOS_PER_SECOND
+
+    return int(seconds), int(nanos)
+
+
+def parse_fraction(digits):
+    """returns the nanoseconds of the digits after the decimal point"""
+    return int(digits.ljust(9, '0')) if digits else 0
+
+
+def parse_offset(offset):
+    """returns the seconds of a UTC offset like ``Z``, ``+02``, ``-0530`` or ``+05:30``"""
+    if not offset or offset in 'Zz':
+        return 0
+
+    digits = offset[1:].replace(':', '')
+    seconds = int(digits[:2]) * 3600 + int(digits[2:] or 0) * 60
+    return -seconds if offset[0] == '-' else seconds
+
+
+def parse_timestamp(value):
+    """returns ``(seconds, nanos)`` of an ISO 8601 string"""
+    match = ISO_TIMESTAMP.match(value.strip())
+    if match is None:
+        raise ValueError(f'{value!r} is not an ISO 8601 timestamp')
+
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    date = datetime.date(int(year), int(month), int(day))
+    time = datetime.time(int(hour or 0), int(minute or 0), int(second or 0))
+    seconds = (
+        (date.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY
+        + time.hour * 3600 + time.minute * 60 + time.second
+        - parse_offset(offset)
+    )
+    return seconds, parse_fraction(fraction)
+
+
+class WellKnownCaster(MercatorDomainClass, abc.ABC):
+    """Abstract base class of the casters of well-known types.
+
+    Subclasses implement :py:meth:`to_fields` and :py:meth:`from_protobuf`.
+    """
+    __slots__ = ()
+
+    message_type = None
+
+    @abc.abstractmethod
+    def to_fields(self, value):
+        """returns the fields of the message for ``value`` as a
+        :py:class:`dict`, or ``value`` itself if it already is a message
+        of :py:attr:`message_type`.
+
+        Values that the message rejects, e.g.: out of the range of its
+        fields, must raise here rather than in the constructor of the
+        parent message, see :py:func:`~mercator.meta.compile_field_checker`.
+        """
+        raise NotImplementedError
+
+    def __call__(self, value):
+        fields = self.to_fields(value)
+        if type(fields) is not dict:
+            return fields
+
+        return self.message_type(**fields)
+
+    def cast_column(self, values):
+        """casts a :py:class:`list` of values at once, keeping ``None``
+        values, see :py:meth:`~mercator.meta.FieldMapping.compile_column_caster`.
+        """
+        to_fields = self.to_fields
+        return [None if value is None else to_fields(value) for value in values]
+
+    @abc.abstractmethod
+    def from_protobuf(self, message):
+        """the inverse of calling this object, used by :py:meth:`~mercator.ProtoMapping.from_protobuf`."""
+        raise NotImplementedError
+
+
+class TimestampCaster(WellKnownCaster):
+    """Casts dates, times, seconds since the epoch and ISO 8601 strings
+    into ``google.protobuf.Timestamp``.
+    """
+    __slots__ = ()
+
+    message_type = timestamp_pb2.Timestamp
+    check_seconds = staticmethod(compile_field_checker(timestamp_pb2.Timestamp, 'seconds'))
+
+    def to_fields(self, value):
+        value_type = type(value)
+        if value_type is datetime.datetime:
+            if value.tzinfo is not None:
+                offset = value.utcoffset()
+                if offset is not None:
+                    value = value.replace(tzinfo=None) - offset
+
+            delta = value.replace(tzinfo=None) - EPOCH
+            return {'seconds': delta.days * SECONDS_PER_DAY + delta.seconds, 'nanos': delta.microseconds * 1000}
+
+        if value_type is int:
+            return {'seconds': self.check_seconds(value)}
+
+        if value_type is str:
+            seconds, nanos = parse_timestamp(value)
+        elif value_type is timestamp_pb2.Timestamp:
+            return value
+        elif isinstance(value, datetime.datetime):
+            return self.to_fields(datetime.datetime.combine(value.date(), value.timetz()))
+        elif isinstance(value, datetime.date):
+            return {'seconds': (value.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY}
+        elif isinstance(value, (int, float)) or hasattr(value, '__floor__'):
+            seconds, nanos = split_seconds(value)
+        else:
+            raise TypeError(f'cannot convert {type(value).__name__} to Timestamp')
+
+        return {'seconds': self.check_seconds(seconds), 'nanos': nanos}
+
+    def from_protobuf(self, message):
+        """
+        :returns: an aware :py:class:`~datetime.datetime` in UTC, with microsecond precision.
+        """
+        return EPOCH_UTC + datetime.timedelta(seconds=message.seconds, microseconds=message.nanos // 1000)
+
+
+class DurationCaster(WellKnownCaster):
+    """Casts :py:class:`~datetime.timedelta`, seconds and strings like
+    ``'1.5s'`` into ``google.protobuf.Duration``.
+    """
+    __slots__ = ()
+
+    message_type = duration_pb2.Duration
+    check_seconds = staticmethod(compile_field_checker(duration_pb2.Duration, 'seconds'))
+
+    def to_fields(self, value):
+        value_type = type(value)
+        if value_type is datetime.timedelta:
+            microseconds = (value.days * SECONDS_PER_DAY + value.seconds) * 1000000 + value.microseconds
+            seconds = abs(microseconds) // 1000000
+            nanos = abs(microseconds) % 1000000 * 1000
+            if microseconds < 0:
+                return {'seconds': -seconds, 'nanos': -nanos}
+            return {'seconds': seconds, 'nanos': nanos}
+
+        if value_type is int:
+            return {'seconds': self.check_seconds(value)}
+
+        if value_type is str:
+            match = DURATION_STRING.match(value.strip())
+            if match is None:
+                raise ValueError(f'{value!r} is not a duration like "1.5s"')
+
+            sign, seconds, fraction = match.groups()
+            seconds, nanos = int(seconds), parse_fraction(fraction)
+            if sign:
+                seconds, nanos = -seconds, -nanos
+        elif value_type is duration_pb2.Duration:
+            return value
+        elif isinstance(value, datetime.timedelta):
+            return self.to_fields(datetime.timedelta(value.days, value.seconds, value.microseconds))
+        elif isinstance(value, (int, float)) or hasattr(value, '__trunc__'):
+            seconds, nanos = split_seconds(value, truncate=True)
+        else:
+            raise TypeError(f'cannot convert {type(value).__name__} to Duration')
+
+        return {'seconds': self.check_seconds(seconds), 'nanos': nanos}
+
+    def from_protobuf(self, message):
+        """
+        :returns: a :py:class:`~datetime.timedelta`, with microsecond precision.
+        """
+        return datetime.timedelta(seconds=message.seconds, microseconds=int(message.nanos / 1000))
+
+
+class WrapperCaster(WellKnownCaster):
+    """Casts values into the wrapper types of
+    :py:mod:`google.protobuf.wrappers_pb2`, e.g.: ``Int64Value``.
+
+    :param message_type: the wrapper type.
+    :param to_python: an optional function that takes the value and returns the wrapped one, e.g.: :py:class:`int` for ``Int64Value`` by default.
+    """
+    __slots__ = ('message_type', 'to_python', 'check')
+
+    def __init__(self, message_type, to_python=None):
+        if message_type not in WRAPPER_TYPES:
+            raise TypeError(f'WrapperCaster() takes a type of google.protobuf.wrappers_pb2, but got {message_type} instead')
+
+        self.message_type = message_type
+        self.to_python = to_python or WRAPPER_TYPES[message_type]
+        self.check = compile_field_checker(message_type, 'value')
+
+    def to_fields(self, value):
+        if type(value) is self.message_type:
+            return value
+
+        return {'value': self.check(self.to_python(value))}
+
+    def from_protobuf(self, message):
+        """
+        :returns: the wrapped value.
+        """
+        return message.value
+
+
+class FieldMaskCaster(WellKnownCaster):
+    """Casts lists of paths and comma-separated strings into
+    ``google.protobuf.FieldMask``.
+    """
+    __slots__ = ()
+
+    message_type = field_mask_pb2.FieldMask
+    check_paths = staticmethod(compile_field_checker(field_mask_pb2.FieldMask, 'paths'))
+
+    def to_fields(self, value):
+        if isinstance(value, str):
+            return {'paths': [path.strip() for path in value.split(',') if path.strip()]}
+
+        if type(value) is field_mask_pb2.FieldMask:
+            return value
+
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            raise TypeError(f'cannot convert {type(value).__name__} to FieldMask')
+
+        return {'paths': self.check_paths(list(value))}
+
+    def from_protobuf(self, message):
+        """
+        :returns: a :py:class:`list` of paths.
+        """
+        return list(message.paths)
+
+
+TIMESTAMP = TimestampCaster()
+DURATION = DurationCaster()
+FIELD_MASK = FieldMaskCaster()
+DOUBLE_VALUE = WrapperCaster(wrappers_pb2.DoubleValue)
+FLOAT_VALUE = WrapperCaster(wrappers_pb2.FloatValue)
+INT64_VALUE = WrapperCaster(wrappers_pb2.Int64Value)
+UINT64_VALUE = WrapperCaster(wrappers_pb2.UInt64Value)
+INT32_VALUE = WrapperCaster(wrappers_pb2.Int32Value)
+UINT32_VALUE = WrapperCaster(wrappers_pb2.UInt32Value)
+BOOL_VALUE = WrapperCaster(wrappers_pb2.BoolValue)
+STRING_VALUE = WrapperCaster(wrappers_pb2.StringValue)
+BYTES_VALUE = WrapperCaster(wrappers_pb2.BytesValue)
@@ -0,0 +1,613 @@
+"""Encodes source data straight into protobuf wire format.
+
+:py:meth:`~mercator.ProtoMapping.to_bytes` is equivalent to
+``Mapping(data).to_protobuf().SerializeToString()`` but skips building
+the intermediate message tree: the fields extracted by the same
+casters used in :py:mod:`mercator.plan` are written into a
+:py:class:`bytearray` using the field numbers and types declared in
+the ``DESCRIPTOR`` of :ref:`proto`, in field number order, just like
+protobuf itself does.
+
+Sub-messages given as a :py:class:`dict` of their fields, e.g.: by
+:py:mod:`mercator.wellknown`, are serialized through a sub-message
+instance. Other values that cannot be encoded natively (e.g.: map
+fields or values of unexpected types) are serialized field by field
+through a single-field message instance, so the output remains
+byte-for-byte equal to ``SerializeToString()`` and invalid values
+raise the same errors.
+"""
+import math
+import textwrap
+import struct
+import itertools
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from .meta import is_map_field
+from .meta import is_oneof_member
+from .meta import is_packed
+from .meta import is_repeated
+from .meta import is_required
+from .meta import has_presence
+from .plan import bind_casters
+from .plan import generate_extraction
+from .plan import register_source
+
+
+ENCODER_COUNTER = itertools.count()
+
+WIRETYPE_VARINT = 0
+WIRETYPE_FIXED64 = 1
+WIRETYPE_LENGTH_DELIMITED = 2
+WIRETYPE_FIXED32 = 5
+
+MASK64 = (1 << 64) - 1
+
+VARINT_RANGES = {
+    FieldDescriptor.TYPE_INT32: (-(1 << 31), (1 << 31) - 1),
+    FieldDescriptor.TYPE_ENUM: (-(1 << 31), (1 << 31) - 1),
+    FieldDescriptor.TYPE_SINT32: (-(1 << 31), (1 << 31) - 1),
+    FieldDescriptor.TYPE_INT64: (-(1 << 63), (1 << 63) - 1),
+    FieldDescriptor.TYPE_SINT64: (-(1 << 63), (1 << 63) - 1),
+    FieldDescriptor.TYPE_UINT32: (0, (1 << 32) - 1),
+    FieldDescriptor.TYPE_UINT64: (0, (1 << 64) - 1),
+}
+
+FIXED_FORMATS = {
+    FieldDescriptor.TYPE_FIXED32: ('<I', WIRETYPE_FIXED32),
+    FieldDescriptor.TYPE_SFIXED32: ('<i', WIRETYPE_FIXED32),
+    FieldDescriptor.TYPE_FLOAT: ('<f', WIRETYPE_FIXED32),
+    FieldDescriptor.TYPE_FIXED64: ('<Q', WIRETYPE_FIXED64),
+    FieldDescriptor.TYPE_SFIXED64: ('<q', WIRETYPE_FIXED64),
+    FieldDescriptor.TYPE_DOUBLE: ('<d', WIRETYPE_FIXED64),
+}
+
+FIXED_RANGES = {
+    FieldDescriptor.TYPE_FIXED32: (0, (1 << 32) - 1),
+    FieldDescriptor.TYPE_SFIXED32: (-(1 << 31), (1 << 31) - 1),
+    FieldDescriptor.TYPE_FIXED64: (0, (1 << 64) - 1),
+    FieldDescriptor.TYPE_SFIXED64: (-(1 << 63), (1 << 63) - 1),
+}
+
+FLOATING_POINT_TYPES = (FieldDescriptor.TYPE_FLOAT, FieldDescriptor.TYPE_DOUBLE)
+
+ZIGZAG_SHIFTS = {
+    FieldDescriptor.TYPE_SINT32: 31,
+    FieldDescriptor.TYPE_SINT64: 63,
+}
+
+# messages whose constructor takes a document, e.g.: ``Struct`` takes
+# a dict of its fields rather than the keyword-arguments of its fields
+DOCUMENT_MESSAGE_TYPES = ('google.protobuf.Struct', 'google.protobuf.ListValue')
+
+# errors that make a value acceptable by type but not encodable natively,
+# e.g.: floats out of the float32 range or strings with lone surrogates
+ENCODING_ERRORS = (OverflowError, struct.error, UnicodeEncodeError)
+
+
+class EncodedMessage(bytes):
+    """the wire format of a nested message produced by the encoder of
+    a nested :py:class:`~mercator.ProtoMapping`, ready to be embedded
+    in its parent.
+    """
+
+
+def write_varint(out, value):
+    """appends the given non-negative integer to ``out`` as a base-128 varint"""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_tag(number, wire_type):
+    out = bytearray()
+    write_varint(out, (number << 3) | wire_type)
+    return bytes(out)
+
+
+def fallback_writer(proto, name):
+    """returns a writer that serializes a single field through a
+    message instance, used for values not supported natively.
+    """
+    def write(value, out):
+        out += proto(**{name: value}).SerializeToString()
+
+    return write
+
+
+def value_codec(descriptor):
+    """returns the functions used to encode items of repeated fields:
+
+    - ``accepts(value)`` checks that the value can be encoded natively
+    - ``encode(value, out)`` appends the value without its tag to ``out``
+
+    as well as the wire type of the field.
+    """
+    field_type = descriptor.type
+
+    if field_type == FieldDescriptor.TYPE_BOOL:
+        def accepts(value):
+            return type(value) is bool
+
+        def encode(value, out):
+            out.append(value)
+
+        return accepts, encode, WIRETYPE_VARINT
+
+    if field_type in VARINT_RANGES:
+        low, high = VARINT_RANGES[field_type]
+        shift = ZIGZAG_SHIFTS.get(field_type)
+
+        def accepts(value):
+            return type(value) is int and low <= value <= high
+
+        if shift is None:
+            def encode(value, out):
+                write_varint(out, value & MASK64)
+        else:
+            def encode(value, out):
+                write_varint(out, ((value << 1) ^ (value >> shift)) & MASK64)
+
+        return accepts, encode, WIRETYPE_VARINT
+
+    if field_type in FIXED_FORMATS:
+        fmt, wire_type = FIXED_FORMATS[field_type]
+        pack = struct.Struct(fmt).pack
+
+        if field_type in FLOATING_POINT_TYPES:
+            def accepts(value):
+                value_type = type(value)
+                return value_type is float or value_type is int
+        else:
+            low, high = FIXED_RANGES[field_type]
+
+            def accepts(value):
+                return type(value) is int and low <= value <= high
+
+        def encode(value, out):
+            out += pack(value)
+
+        return accepts, encode, wire_type
+
+    if field_type == FieldDescriptor.TYPE_STRING:
+        def accepts(value):
+            return type(value) is str
+
+        def encode(value, out):
+            payload = value.encode('utf-8')
+            write_varint(out, len(payload))
+            out += payload
+
+        return accepts, encode, WIRETYPE_LENGTH_DELIMITED
+
+    if field_type == FieldDescriptor.TYPE_BYTES:
+        def accepts(value):
+            return type(value) is bytes
+
+        def encode(value, out):
+            write_varint(out, len(value))
+            out += value
+
+        return accepts, encode, WIRETYPE_LENGTH_DELIMITED
+
+    if field_type == FieldDescriptor.TYPE_MESSAGE:
+        message_class = descriptor.message_type._concrete_class
+
+        def accepts(value):
+            value_type = type(value)
+            return value_type is EncodedMessage or value_type is message_class
+
+        def encode(value, out):
+            if type(value) is not EncodedMessage:
+                value = value.SerializeToString()
+
+            write_varint(out, len(value))
+            out += value
+
+        return accepts, encode, WIRETYPE_LENGTH_DELIMITED
+
+
+def bulk_packer(descriptor):
+    """returns a function that encodes a whole list of values of the
+    given packed field at once when possible, without a python-level
+    loop, or returns ``None`` to let the values be encoded one by one.
+    """
+    field_type = descriptor.type
+
+    if field_type in FIXED_FORMATS:
+        code = FIXED_FORMATS[field_type][0][1:]
+        if field_type in FLOATING_POINT_TYPES:
+            allowed_types = {float, int}
+            low = high = None
+        else:
+            allowed_types = {int}
+            low, high = FIXED_RANGES[field_type]
+
+        def pack(values):
+            if not set(map(type, values)) <= allowed_types:
+                return
+
+            if low is not None and (min(values) < low or max(values) > high):
+                return
+
+            return struct.pack(f'<{len(values)}{code}', *values)
+
+        return pack
+
+    if field_type == FieldDescriptor.TYPE_BOOL or field_type in VARINT_RANGES and field_type not in ZIGZAG_SHIFTS:
+        allowed_types = {bool} if field_type == FieldDescriptor.TYPE_BOOL else {int}
+
+        def pack(values):
+            # varints of values between 0 and 127 are the values themselves
+            if set(map(type, values)) == allowed_types and min(values) >= 0 and max(values) < 128:
+                return bytes(values)
+
+        return pack
+
+
+def repeated_writer(descriptor, fallback):
+    """returns a function ``write(value, out)`` for the given repeated
+    field, which writes numeric types as a single packed field when
+    the field is packed.
+
+    Packed values that cannot be packed at once by :py:func:`bulk_packer`
+    are serialized through a message, since protobuf encodes varints
+    much faster than a python-level loop.
+    """
+    codec = value_codec(descriptor)
+    if codec is None:
+        return fallback
+
+    accepts, encode, wire_type = codec
+    packed = wire_type != WIRETYPE_LENGTH_DELIMITED and is_packed(descriptor)
+    bulk_pack = None
+    if packed:
+        tag = encode_tag(descriptor.number, WIRETYPE_LENGTH_DELIMITED)
+        bulk_pack = bulk_packer(descriptor)
+    else:
+        item_tag = encode_tag(descriptor.number, wire_type)
+
+    def write(value, out):
+        if not isinstance(value, (list, tuple)):
+            return fallback(value, out)
+
+        if bulk_pack is not None and value:
+            try:
+                payload = bulk_pack(value)
+            except ENCODING_ERRORS:
+                payload = None
+
+            if payload is not None:
+                out += tag
+                write_varint(out, len(payload))
+                out += payload
+                return
+
+        if packed:
+            if value:
+                fallback(value, out)
+            return
+
+        encoded = bytearray()
+        try:
+            for item in value:
+                if not accepts(item):
+                    return fallback(value, out)
+
+                encoded += item_tag
+                encode(item, encoded)
+        except ENCODING_ERRORS:
+            return fallback(value, out)
+
+        out += encoded
+
+    return write
+
+
+# python templates for the singular fields written inline by the
+# generated encoder, where ``{v}`` is the value, ``{t}`` the encoded
+# tag, ``{f}`` the fallback writer and ``{nonzero}`` the condition to
+# serialize the value.
+WRITE_LENGTH = '''\
+n = len({payload})
+if n < 128:
+    out.append(n)
+else:
+    write_varint(out, n)
+out += {payload}
+'''
+
+SINGULAR_TEMPLATES = {
+    'bool': '''\
+if type({v}) is bool:
+    if {nonzero}:
+        out += {t}
+        out.append({v})
+else:
+    {f}({v}, out)
+''',
+    'varint': '''\
+if type({v}) is int and {low} <= {v} <= {high}:
+    if {nonzero}:
+        out += {t}
+        {write_varint}
+else:
+    {f}({v}, out)
+''',
+    'fixed': '''\
+if {accepts}:
+    if {nonzero}:
+        try:
+            payload = {pack}({v})
+        except ENCODING_ERRORS:
+            {f}({v}, out)
+        else:
+            out += {t}
+            out += payload
+else:
+    {f}({v}, out)
+''',
+    'string': '''\
+if type({v}) is str:
+    if {nonzero}:
+        try:
+            payload = {v}.encode('utf-8')
+        except ENCODING_ERRORS:
+            {f}({v}, out)
+        else:
+            out += {t}
+%s
+else:
+    {f}({v}, out)
+''' % textwrap.indent(WRITE_LENGTH.format(payload='payload'), ' ' * 12).rstrip(),
+    'bytes': '''\
+if type({v}) is bytes:
+    if {nonzero}:
+        out += {t}
+%s
+else:
+    {f}({v}, out)
+''' % textwrap.indent(WRITE_LENGTH.format(payload='{v}'), ' ' * 8).rstrip(),
+    'message': '''\
+if type({v}) is EncodedMessage:
+    out += {t}
+%s
+elif type({v}) is {message_class}:
+    payload = {v}.SerializeToString()
+    out += {t}
+%s
+elif type({v}) is dict:
+    payload = {message_class}(**{v}).SerializeToString()
+    out += {t}
+%s
+else:
+    {f}({v}, out)
+''' % (
+        textwrap.indent(WRITE_LENGTH.format(payload='{v}'), ' ' * 4).rstrip(),
+        textwrap.indent(WRITE_LENGTH.format(payload='payload'), ' ' * 4).rstrip(),
+        textwrap.indent(WRITE_LENGTH.format(payload='payload'), ' ' * 4).rstrip(),
+    ),
+    # Struct and ListValue take documents rather than keyword-arguments
+    'document': '''\
+if type({v}) is EncodedMessage:
+    out += {t}
+%s
+elif type({v}) is {message_class}:
+    payload = {v}.SerializeToString()
+    out += {t}
+%s
+else:
+    {f}({v}, out)
+''' % (
+        textwrap.indent(WRITE_LENGTH.format(payload='{v}'), ' ' * 4).rstrip(),
+        textwrap.indent(WRITE_LENGTH.format(payload='payload'), ' ' * 4).rstrip(),
+    ),
+}
+
+
+def generate_singular_write(index, descriptor, namespace):
+    """returns the python statements that write the value ``v{index}``
+    of the given singular field, binding their constants into ``namespace``.
+    """
+    field_type = descriptor.type
+    value = f'v{index}'
+    nonzero = 'True' if has_presence(descriptor) else value
+    params = {
+        'v': value,
+        't': f't{index}',
+        'f': f'f{index}',
+        'nonzero': nonzero,
+    }
+
+    if field_type == FieldDescriptor.TYPE_BOOL:
+        kind, wire_type = 'bool', WIRETYPE_VARINT
+
+    elif field_type in VARINT_RANGES:
+        kind, wire_type = 'varint', WIRETYPE_VARINT
+        low, high = VARINT_RANGES[field_type]
+        shift = ZIGZAG_SHIFTS.get(field_type)
+        params['low'] = low
+        params['high'] = high
+        if shift is None:
+            params['write_varint'] = (
+                f'if 0 <= {value} < 128:\n'
+                f'            out.append({value})\n'
+                f'        else:\n'
+                f'            write_varint(out, {value} & MASK64)'
+            )
+        else:
+            params['write_varint'] = f'write_varint(out, (({value} << 1) ^ ({value} >> {shift})) & MASK64)'
+
+    elif field_type in FIXED_FORMATS:
+        fmt, wire_type = FIXED_FORMATS[field_type]
+        kind = 'fixed'
+        namespace[f'p{index}'] = struct.Struct(fmt).pack
+        params['pack'] = f'p{index}'
+        if field_type in FLOATING_POINT_TYPES:
+            params['accepts'] = f'type({value}) is float or type({value}) is int'
+            if nonzero != 'True':
+                # -0.0 is not the default value and must be serialized
+                params['nonzero'] = f'{value} or copysign(1.0, {value}) < 0'
+        else:
+            low, high = FIXED_RANGES[field_type]
+            params['accepts'] = f'type({value}) is int and {low} <= {value} <= {high}'
+
+    elif field_type == FieldDescriptor.TYPE_STRING:
+        kind, wire_type = 'string', WIRETYPE_LENGTH_DELIMITED
+
+    elif field_type == FieldDescriptor.TYPE_BYTES:
+        kind, wire_type = 'bytes', WIRETYPE_LENGTH_DELIMITED
+
+    elif field_type == FieldDescriptor.TYPE_MESSAGE:
+        kind, wire_type = 'message', WIRETYPE_LENGTH_DELIMITED
+        if descriptor.message_type.full_name in DOCUMENT_MESSAGE_TYPES:
+            kind = 'document'
+        namespace[f'm{index}'] = descriptor.message_type._concrete_class
+        params['message_class'] = f'm{index}'
+
+    else:
+        return f'f{index}({value}, out)\n'
+
+    namespace[f't{index}'] = encode_tag(descriptor.number, wire_type)
+    return SINGULAR_TEMPLATES[kind].format(**params)
+
+
+def supports_direct_encoding(mapping_class):
+    """returns ``False`` for mappings whose messages cannot be encoded
+    field by field: when fields are missing from the descriptor, belong
+    to a ``oneof`` (whose last assigned member wins) or are ``required``,
+    or when members of a ``oneof`` are chosen by a :py:class:`~mercator.ProtoOneOf`.
+    """
+    if mapping_class.__plan__ is None or mapping_class.__oneofs__:
+        return False
+
+    for field in mapping_class.__fields__.values():
+        descriptor = field.descriptor
+        if descriptor is None or is_oneof_member(descriptor) or is_required(descriptor):
+            return False
+
+    return True
+
+
+def get_nested_converter(mapping_class):
+    """the ``get_converter`` given to :py:meth:`~mercator.meta.FieldMapping.compile_caster`
+    so that nested mappings produce :py:class:`EncodedMessage` instead of messages.
+    """
+    encode = get_encoder(mapping_class)
+
+    def convert(data):
+        return EncodedMessage(encode(data, bytearray()))
+
+    return convert
+
+
+def generate_encoder_source(function_name, mapping_class, namespace, get_converter=get_nested_converter, wrap_caster=None):
+    """returns the source code of an encoder function for the given
+    mapping, see :py:func:`~mercator.plan.bind_casters` for
+    ``get_converter`` and ``wrap_caster``.
+    """
+    proto = mapping_class.__proto__
+    fields = mapping_class.__fields__
+
+    lines = [
+        f'def {function_name}(data, out):',
+        '    if data is None:',
+        '        return out',
+        '    if isinstance(data, dict):',
+        '        get = data.get',
+    ]
+    specs = bind_casters(fields, namespace, get_converter, wrap_caster)
+    for index, (name, field) in enumerate(fields.items()):
+        # maps are serialized through a message, which does not take
+        # encoded messages as values
+        if specs[index][2] == 'value' and is_map_field(field.descriptor):
+            caster = field.compile_caster()
+            namespace[f'c{index}'] = wrap_caster(name, field, caster) if wrap_caster else caster
+
+    generate_extraction(lines, specs, 'get({})')
+
+    lines.append('    elif source_type is not None and isinstance(data, source_type):')
+    generate_extraction(lines, specs, 'getattr(data, {}, None)')
+
+    lines.append('    else:')
+    lines.append("        raise TypeError(f'{data} must be a dict or {source_type} but is {type(data)} instead')")
+
+    # protobuf serializes known fields in field number order
+    descriptors = [field.descriptor for field in fields.values()]
+    for index in sorted(range(len(descriptors)), key=lambda i: descriptors[i].number):
+        name, descriptor = specs[index][0], descriptors[index]
+        namespace[f'f{index}'] = fallback = fallback_writer(proto, name)
+
+        if is_map_field(descriptor):
+            write = f'f{index}(v{index}, out)\n'
+        elif is_repeated(descriptor):
+            namespace[f'w{index}'] = repeated_writer(descriptor, fallback)
+            write = f'w{index}(v{index}, out)\n'
+        else:
+            write = generate_singular_write(index, descriptor, namespace)
+
+        lines.append(f'    if v{index} is not None:')
+        lines.append(textwrap.indent(write, ' ' * 8).rstrip())
+
+    lines.append('    return out')
+    return '\n'.join(lines) + '\n'
+
+
+def serialize_through_message(mapping_class):
+    """returns an encoder that builds the message and serializes it,
+    used for mappings that do not support direct encoding.
+    """
+    def encode(data, out):
+        out += mapping_class(data).to_protobuf().SerializeToString()
+        return out
+
+    return encode
+
+
+def compile_encoder(mapping_class, get_converter=get_nested_converter, wrap_caster=None):
+    """Generates a function ``encode(data, out)`` for the given
+    :py:class:`~mercator.ProtoMapping` subclass that appends the wire
+    format of the message to the :py:class:`bytearray` ``out`` and
+    returns it.
+
+    ``get_converter`` and ``wrap_caster`` are given to
+    :py:func:`~mercator.plan.bind_casters`, :py:mod:`mercator.metrics`
+    uses them to compile instrumented encoders.
+
+    The generated source code is available in the ``__source__``
+    attribute of the returned function for debugging purposes.
+    """
+    if not supports_direct_encoding(mapping_class):
+        return serialize_through_message(mapping_class)
+
+    namespace = {
+        'source_type': getattr(mapping_class, '__source_input_type__', None),
+        'write_varint': write_varint,
+        'copysign': math.copysign,
+        'EncodedMessage': EncodedMessage,
+        'ENCODING_ERRORS': ENCODING_ERRORS,
+        'MASK64': MASK64,
+    }
+    function_name = f'encode_{mapping_class.__name__}'
+    source = generate_encoder_source(function_name, mapping_class, namespace, get_converter, wrap_caster)
+
+    filename = f'<mercator-encoder-{next(ENCODER_COUNTER)} {mapping_class.__qualname__}>'
+    register_source(filename, source)
+
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__source__ = source
+    function.__qualname__ = f'{mapping_class.__qualname__}.{function_name}'
+    return function
+
+
+def get_encoder(mapping_class):
+    """returns the encoder of the given :py:class:`~mercator.ProtoMapping`
+    subclass, compiling it on first use.
+    """
+    # look up the class' own attribute, encoders are not inherited
+    if '__encoder__' not in vars(mapping_class):
+        mapping_class.__encoder__ = staticmethod(compile_encoder(mapping_class))
+
+    return mapping_class.__encoder__
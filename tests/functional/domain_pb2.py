@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: domain.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'domain.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
+from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x64omain.proto\x12\x18services.social_platform\x1a\x1fgoogle/protobuf/timestamp.proto\x1a\x1cgoogle/protobuf/struct.proto\"1\n\x0b\x41uthRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"G\n\x0c\x41uthResponse\x12\x37\n\x05token\x18\x01 \x01(\x0b\x32(.services.social_platform.User.AuthToken\"\x96\x02\n\x04User\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x38\n\x06tokens\x18\x04 \x03(\x0b\x32(.services.social_platform.User.AuthToken\x12)\n\x08metadata\x18\x05 \x01(\x0b\x32\x17.google.protobuf.Struct\x1az\n\tAuthToken\x12\r\n\x05value\x18\x01 \x01(\t\x12.\n\ncreated_at\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12.\n\nexpires_at\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\"\x8a\x02\n\tUserMedia\x12\x0c\n\x04uuid\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12.\n\x06\x61uthor\x18\x03 \x01(\x0b\x32\x1e.services.social_platform.User\x12\x14\n\x0c\x64ownload_url\x18\x04 \x01(\t\x12\x0c\n\x04\x62lob\x18\x05 \x01(\x0c\x12\x45\n\x0c\x63ontent_type\x18\x06 \x01(\x0e\x32/.services.social_platform.UserMedia.ContentType\"F\n\x0b\x43ontentType\x12\r\n\tBLOG_POST\x10\x00\x12\t\n\x05IMAGE\x10\x01\x12\t\n\x05VIDEO\x10\x02\x12\t\n\x05QUOTE\x10\x03\x12\x07\n\x03GIF\x10\x04\"6\n\x0cMediaRequest\x12\x12\n\nmedia_uuid\x18\x01 \x01(\t\x12\x12\n\nmedia_name\x18\x02 \x01(\t\"\xf5\x03\n\x0bMeasurement\x12\r\n\x05value\x18\x01 \x01(\x01\x12\r\n\x05ratio\x18\x02 \x01(\x02\x12\r\n\x05\x64\x65lta\x18\x03 \x01(\x05\x12\r\n\x05total\x18\x04 \x01(\x03\x12\r\n\x05\x63ount\x18\x05 \x01(\r\x12\x11\n\tbig_count\x18\x06 \x01(\x04\x12\x0e\n\x06offset\x18\x07 \x01(\x11\x12\x12\n\nbig_offset\x18\x08 \x01(\x12\x12\x10\n\x08\x63hecksum\x18\t \x01(\x07\x12\x14\n\x0c\x62ig_checksum\x18\n \x01(\x06\x12\x17\n\x0fsigned_checksum\x18\x0b \x01(\x0f\x12\x1b\n\x13\x62ig_signed_checksum\x18\x0c \x01(\x10\x12\r\n\x05valid\x18\r \x01(\x08\x12\x0c\n\x04unit\x18\x0e \x01(\t\x12\x0b\n\x03raw\x18\x0f \x01(\x0c\x12\x0f\n\x07samples\x18\x10 \x03(\x01\x12\x0e\n\x06\x64\x65ltas\x18\x11 \x03(\x12\x12\x0c\n\x04tags\x18\x12 \x03(\t\x12\r\n\x05\x66lags\x18\x13 \x03(\x08\x12\x41\n\x06labels\x18\x14 \x03(\x0b\x32\x31.services.social_platform.Measurement.LabelsEntry\x12,\n\x08taken_at\x18\x15 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x1a-\n\x0bLabelsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x32k\n\x04\x41uth\x12\x63\n\x10\x41uthenticateUser\x12%.services.social_platform.AuthRequest\x1a&.services.social_platform.AuthResponse\"\x00\x32\x62\n\x05Media\x12Y\n\x08GetMedia\x12&.services.social_platform.MediaRequest\x1a#.services.social_platform.UserMedia\"\x00\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'domain_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_MEASUREMENT_LABELSENTRY']._loaded_options = None
+  _globals['_MEASUREMENT_LABELSENTRY']._serialized_options = b'8\001'
+  _globals['_AUTHREQUEST']._serialized_start=105
+  _globals['_AUTHREQUEST']._serialized_end=154
+  _globals['_AUTHRESPONSE']._serialized_start=156
+  _globals['_AUTHRESPONSE']._serialized_end=227
+  _globals['_USER']._serialized_start=230
+  _globals['_USER']._serialized_end=508
+  _globals['_USER_AUTHTOKEN']._serialized_start=386
+  _globals['_USER_AUTHTOKEN']._serialized_end=508
+  _globals['_USERMEDIA']._serialized_start=511
+  _globals['_USERMEDIA']._serialized_end=777
+  _globals['_USERMEDIA_CONTENTTYPE']._serialized_start=707
+  _globals['_USERMEDIA_CONTENTTYPE']._serialized_end=777
+  _globals['_MEDIAREQUEST']._serialized_start=779
+  _globals['_MEDIAREQUEST']._serialized_end=833
+  _globals['_MEASUREMENT']._serialized_start=836
+  _globals['_MEASUREMENT']._serialized_end=1337
+  _globals['_MEASUREMENT_LABELSENTRY']._serialized_start=1292
+  _globals['_MEASUREMENT_LABELSENTRY']._serialized_end=1337
+  _globals['_AUTH']._serialized_start=1339
+  _globals['_AUTH']._serialized_end=1446
+  _globals['_MEDIA']._serialized_start=1448
+  _globals['_MEDIA']._serialized_end=1546
+# @@protoc_insertion_point(module_scope)
@@ -46,6 +46,7 @@ class MediaMapping(ProtoMapping):
     __proto__ = domain_pb2.UserMedia
 
     __source_input_type__ = sql.Media
+    uuid = ProtoKey('uuid', str)
     author = ProtoKey('author', UserMapping)
     download_url = ProtoKey('link', str)
     blob = ProtoKey('blob', bytes)
@@ -62,6 +63,32 @@ class MediaRequestMapping(ProtoMapping):
     __proto__ = domain_pb2.MediaRequest
 
 
+class MeasurementMapping(ProtoMapping):
+    __proto__ = domain_pb2.Measurement
+
+    value = ProtoKey('value')
+    ratio = ProtoKey('ratio')
+    delta = ProtoKey('delta')
+    total = ProtoKey('total')
+    count = ProtoKey('count')
+    big_count = ProtoKey('big_count')
+    offset = ProtoKey('offset')
+    big_offset = ProtoKey('big_offset')
+    checksum = ProtoKey('checksum')
+    big_checksum = ProtoKey('big_checksum')
+    signed_checksum = ProtoKey('signed_checksum')
+    big_signed_checksum = ProtoKey('big_signed_checksum')
+    valid = ProtoKey('valid')
+    unit = ProtoKey('unit', str)
+    raw = ProtoKey('raw')
+    samples = ProtoList('samples', float)
+    deltas = ProtoList('deltas')
+    tags = ProtoList('tags', str)
+    flags = ProtoList('flags')
+    labels = ProtoKey('labels', dict)
+    taken_at = ProtoKey('taken_at', ProtobufTimestamp)
+
+
 class MediaServicer(domain_pb2_grpc.MediaServicer):
     def GetMedia(self, request, context):
         media = business_logic_module.retrieve_media_from_sqlalchemy(
@@ -3,12 +3,27 @@ from uuid import uuid4
 import sqlalchemy as sa
 from sqlalchemy import orm as sa_orm
 from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 
 
 BaseModel = declarative_base()
 
 
+@compiles(postgresql.UUID, 'sqlite')
+def compile_uuid_for_sqlite(type_, compiler, **kw):
+    "allows the functional tests to run against an in-memory sqlite database"
+    return 'CHAR(36)'
+
+
+def create_session():
+    """returns a session bound to a new in-memory sqlite database with
+    all tables created"""
+    engine = sa.create_engine('sqlite://')
+    BaseModel.metadata.create_all(engine)
+    return sa_orm.Session(bind=engine)
+
+
 def PrimaryKeyUUID():
     return sa.Column(
         postgresql.UUID(as_uuid=True),
@@ -40,7 +55,7 @@ class AuthToken(BaseModel):
     created_at = sa.Column(sa.Integer)
     owner_id = sa.Column(
         postgresql.UUID(as_uuid=True),
-        sa.ForeignKey('User.uuid')
+        sa.ForeignKey('user.uuid')
     )
     owner = sa_orm.relationship(
         User,
@@ -57,11 +72,11 @@ class Media(BaseModel):
     uuid = PrimaryKeyUUID()
     author_id = sa.Column(
         postgresql.UUID(as_uuid=True),
-        sa.ForeignKey('User.uuid')
+        sa.ForeignKey('user.uuid')
     )
     author = sa_orm.relationship(
         User,
-        primaryjoin='and_(Media.author_id == foreign(User.uuid))',
+        primaryjoin='and_(foreign(Media.author_id) == User.uuid)',
         backref='media',
         uselist=False,
     )
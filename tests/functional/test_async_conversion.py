@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from google.protobuf import struct_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoOneOf,
+)
+from mercator.aio import without_fields
+
+from .mappings import (
+    UserMapping,
+    MeasurementMapping,
+)
+
+from . import sql
+
+
+class Reading(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ReadingMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+    __source_input_type__ = Reading
+
+    kind = ProtoOneOf('type', aliases={'number': 'number_value', 'text': 'string_value'})
+    number_value = ProtoKey('amount', float)
+    string_value = ProtoKey('text', str)
+
+
+def make_user(token_count):
+    return {
+        'id': 'some-uuid',
+        'login': 'Hulk',
+        'tokens': [
+            {'data': f'token-{index}', 'created_at': 1552240433 + index}
+            for index in range(token_count)
+        ],
+        'extra_info': {'plan': 'free'},
+    }
+
+
+async def count_ticks(coroutine):
+    """runs ``coroutine`` along with a task that counts how many
+    times the event loop gives it control."""
+    ticks = 0
+    done = False
+
+    async def tick():
+        nonlocal ticks
+        while not done:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.ensure_future(tick())
+    await asyncio.sleep(0)
+    try:
+        result = await coroutine
+    finally:
+        done = True
+        await ticker
+
+    return result, ticks
+
+
+def test_to_protobuf_async_yields_between_slices():
+    ("ProtoMapping.to_protobuf_async() should convert large repeated "
+     "fields in slices, yielding control to the event loop between them")
+
+    # Given a user with 1000 tokens
+    data = make_user(1000)
+
+    # When I convert it asynchronously in slices of 100 tokens
+    message, ticks = asyncio.run(count_ticks(UserMapping(data).to_protobuf_async(slice_size=100)))
+
+    # Then the message equals the synchronous conversion
+    message.should.equal(UserMapping(data).to_protobuf())
+
+    # And the event loop ran other tasks between the 10 slices
+    ticks.should.be.greater_than_or_equal_to(10)
+
+
+def test_to_protobuf_async_small_payloads_at_once():
+    ("ProtoMapping.to_protobuf_async() should convert messages with "
+     "small repeated fields at once")
+
+    # Given a user with a few tokens
+    data = make_user(3)
+
+    # When I convert it asynchronously
+    message, ticks = asyncio.run(count_ticks(UserMapping(data).to_protobuf_async()))
+
+    # Then it did not yield
+    message.should.equal(UserMapping(data).to_protobuf())
+    ticks.should.equal(1)
+
+
+def test_to_protobuf_async_sqlalchemy_and_buffers():
+    ("ProtoMapping.to_protobuf_async() should slice the lists of "
+     "sqlalchemy instances and typed buffers")
+
+    # Given a sqlalchemy user with tokens and a measurement with many samples
+    user = sql.User(login='Hulk', email='hulk@avengers.world')
+    user.tokens = [sql.AuthToken(data=f'token-{index}', created_at=index) for index in range(50)]
+    measurement = {'unit': 'ms', 'samples': [index / 3 for index in range(50)], 'tags': ['a']}
+
+    async def convert():
+        return (
+            await UserMapping(user).to_protobuf_async(slice_size=7),
+            await MeasurementMapping(measurement).to_protobuf_async(slice_size=7),
+        )
+
+    # When I convert them in slices
+    converted_user, converted_measurement = asyncio.run(convert())
+
+    # Then they equal the synchronous conversions
+    converted_user.should.equal(UserMapping(user).to_protobuf())
+    converted_measurement.should.equal(MeasurementMapping(measurement).to_protobuf())
+
+
+def test_to_protobuf_async_offloads_to_executor():
+    ("ProtoMapping.to_protobuf_async() should convert in the given "
+     "executor above the offload threshold")
+
+    # Given a user with 100 tokens and an executor
+    data = make_user(100)
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    # When I convert it with a lower threshold
+    async def convert():
+        return await UserMapping(data).to_protobuf_async(executor=executor, offload_threshold=50)
+
+    try:
+        message = asyncio.run(convert())
+    finally:
+        executor.shutdown()
+
+    # Then the message equals the synchronous conversion
+    message.should.equal(UserMapping(data).to_protobuf())
+
+
+def test_iter_protobuf_async_from_async_iterable():
+    ("ProtoMapping.iter_protobuf_async() should convert the records of "
+     "an asynchronous iterable in slices")
+
+    # Given an asynchronous generator of 5 users
+    async def fetch_users():
+        for index in range(5):
+            yield {'login': f'user{index}'}
+
+    async def convert():
+        return [message async for message in UserMapping.iter_protobuf_async(fetch_users(), slice_size=2)]
+
+    # When I convert them
+    messages = asyncio.run(convert())
+
+    # Then I get one message per user in order
+    [message.username for message in messages].should.equal([f'user{index}' for index in range(5)])
+
+
+def test_without_fields_keeps_oneof_discriminators():
+    ("without_fields() should copy the discriminators of oneofs from "
+     "instances of the source input type")
+
+    # Given a reading whose discriminator selects the text
+    reading = Reading(type='text', amount=1, text='one')
+
+    # When I copy its source data
+    data = without_fields(ReadingMapping, reading, [])
+
+    # Then the discriminator is kept
+    data.should.have.key('type').being.equal('text')
+
+    # And the compiled plan converts it as the synchronous conversion
+    ReadingMapping.__plan__(data).should.equal(ReadingMapping(reading).to_protobuf())
+    ReadingMapping.__plan__(data).should.equal(struct_pb2.Value(string_value='one'))
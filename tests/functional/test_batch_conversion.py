@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from uuid import uuid4
+
+from .mappings import (
+    UserMapping,
+    UserAuthTokenMapping,
+)
+
+from . import domain_pb2
+from . import sql
+
+
+def test_to_protobuf_many_mixed_dicts_and_objects():
+    ("ProtoMapping.to_protobuf_many() should convert a mix of "
+     "dicts and sqlalchemy objects into a list of messages")
+
+    # Given a list with a dict and a sqlalchemy instance
+    users = [
+        {
+            'id': str(uuid4()),
+            'login': 'Hulk',
+            'tokens': [{'data': 'smash', 'created_at': 1552240433}],
+        },
+        sql.User(login='chucknorris', email='chuck@norris.com'),
+        None,
+    ]
+
+    # When I convert them at once
+    result = UserMapping.to_protobuf_many(iter(users))
+
+    # Then it should return a list of messages
+    result.should.be.a(list)
+    result.should.have.length_of(3)
+
+    hulk, chuck, empty = result
+    hulk.should.be.a(domain_pb2.User)
+    hulk.username.should.equal('Hulk')
+    hulk.tokens[0].value.should.equal('smash')
+    hulk.tokens[0].created_at.seconds.should.equal(1552240433)
+    chuck.username.should.equal('chucknorris')
+    chuck.email.should.equal('chuck@norris.com')
+    empty.should.equal(domain_pb2.User())
+
+    # And each message should be identical to the one-by-one conversion
+    for item, message in zip(users, result):
+        message.should.equal(UserMapping(item).to_protobuf())
+
+
+def test_to_protobuf_many_into_repeated_field():
+    ("ProtoMapping.to_protobuf_many() should fill a repeated "
+     "field of a parent message in place")
+
+    # Given a parent message with one existing token
+    user = domain_pb2.User(username='Hulk')
+    user.tokens.add(value='existing')
+
+    # And a list of token records
+    tokens = [
+        {'data': 'first', 'expires_at': 1552240733},
+        sql.AuthToken(data='second', created_at=1552240433),
+    ]
+
+    # When I convert them into the repeated field
+    result = UserAuthTokenMapping.to_protobuf_many(tokens, into=user.tokens)
+
+    # Then it should return the repeated field itself
+    result.should.be(user.tokens)
+
+    # And the parent message should contain all tokens
+    [token.value for token in user.tokens].should.equal(['existing', 'first', 'second'])
+    user.tokens[1].expires_at.seconds.should.equal(1552240733)
+    user.tokens[2].created_at.seconds.should.equal(1552240433)
+
+
+def test_to_protobuf_many_invalid_item():
+    "ProtoMapping.to_protobuf_many() should raise TypeError for items of unsupported types"
+
+    when_called = UserMapping.to_protobuf_many.when.called_with([{}, 'not a user'])
+
+    when_called.should.have.raised(
+        TypeError,
+        "not a user must be a dict or <class 'tests.functional.sql.User'> but is <class 'str'> instead"
+    )
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import decimal
+import importlib.util
+
+from mercator import ProtoMapping, ProtoKey
+from mercator import codegen
+
+from . import domain_pb2
+from . import mappings
+from . import sql
+
+
+def load_generated(tmp_path, argv=()):
+    "runs the code generator on tests.functional.mappings and imports the result"
+    path = tmp_path / 'static_mappings.py'
+    codegen.main(['tests.functional.mappings'] + list(argv) + ['-o', str(path)])
+    spec = importlib.util.spec_from_file_location('static_mappings', str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_user():
+    user = sql.User(login='Hulk', email='hulk@avengers.world', extra_info={'plan': 'free'})
+    user.tokens = [sql.AuthToken(data='token', created_at=1552240433)]
+    return user
+
+
+def test_generated_mappings_equal_dynamic_mappings(tmp_path):
+    ("python -m mercator.codegen should write mappings that produce the "
+     "same messages as the dynamic mappings")
+
+    # Given the generated module of the functional test mappings
+    static = load_generated(tmp_path)
+
+    # And inputs for each of them
+    user = make_user()
+    inputs = {
+        'AuthRequestMapping': [{'username': 'hulk', 'password': 'smash'}],
+        'UserAuthTokenMapping': [{'data': 'token', 'created_at': 1552240433}, user.tokens[0]],
+        'UserMapping': [{'id': 'uuid', 'login': 'Hulk', 'tokens': ({'data': 'a'},), 'extra_info': {'a': 1, 'price': decimal.Decimal('9.99')}}, user],
+        'MediaMapping': [{'uuid': 'media', 'author': {'login': 'Hulk'}, 'blob': b'\x00'}, sql.Media(author=user, url='x')],
+        'AuthResponseMapping': [{'token': {'data': 'token'}}],
+        'MeasurementMapping': [{
+            'value': 1.5, 'delta': -3, 'samples': [1, 2.5], 'deltas': (1, -1),
+            'tags': ['a'], 'labels': {'unit': 'ms'}, 'taken_at': 1552240433,
+        }],
+    }
+
+    # When I convert them with the generated and the dynamic mappings
+    for name, items in inputs.items():
+        for item in [None] + items:
+            dynamic = getattr(mappings, name)(item)
+            generated = getattr(static, name)(item)
+
+            # Then the messages and the encoded messages are the same,
+            # parsed since map entries are serialized in no fixed order
+            parse = dynamic.__proto__.FromString
+            generated.to_protobuf().should.equal(dynamic.to_protobuf())
+            parse(generated.to_bytes()).should.equal(parse(dynamic.to_bytes()))
+
+    # And batches are converted the same way
+    static.MediaMapping.to_protobuf_many(inputs['MediaMapping']).should.equal(
+        mappings.MediaMapping.to_protobuf_many(inputs['MediaMapping']))
+
+
+def test_generated_mappings_raise_the_same_errors(tmp_path):
+    ("python -m mercator.codegen should write mappings that raise the "
+     "same errors as the dynamic mappings")
+
+    # Given the generated module of the UserMapping only
+    static = load_generated(tmp_path, ['UserMapping'])
+
+    # Then it includes its nested mapping but not the others
+    static.should.have.property('UserAuthTokenMapping')
+    static.shouldnt.have.property('MediaMapping')
+
+    # And invalid values raise the same errors
+    for data in [{'tokens': [{'created_at': 'yesterday'}]}, {'tokens': [{'created_at': 2 ** 70}]}, {'tokens': 'token'}, 'user']:
+        dynamic_error = None
+        generated_error = None
+        try:
+            mappings.UserMapping(data).to_protobuf()
+        except Exception as e:
+            dynamic_error = e
+        try:
+            static.UserMapping(data).to_protobuf()
+        except Exception as e:
+            generated_error = e
+
+        dynamic_error.shouldnt.be.none
+        type(generated_error).should.be(type(dynamic_error))
+        str(generated_error).should.equal(str(dynamic_error))
+
+
+def test_codegen_rejects_custom_conversions():
+    "mercator.codegen.generate_module() should reject mappings that cannot be written out"
+
+    # Given a mapping with a custom conversion
+    class CustomMapping(ProtoMapping):
+        __proto__ = domain_pb2.AuthRequest
+
+        username = ProtoKey('login', str)
+
+        def to_protobuf(self):
+            return domain_pb2.AuthRequest(username='custom')
+
+    # When I generate its module
+    # Then it raises TypeError
+    codegen.generate_module.when.called_with([CustomMapping]).should.have.raised(
+        TypeError,
+        'test_codegen_rejects_custom_conversions.<locals>.CustomMapping cannot be generated statically: '
+        'it customizes to_dict() or to_protobuf()'
+    )
+
+
+def test_static_mappings_must_implement_convert(tmp_path):
+    ("StaticMapping subclasses without __convert__ should not be "
+     "instantiable, and generated ones only offer the conversions to protobuf")
+
+    # Given a static mapping that does not implement __convert__
+    class IncompleteMapping(codegen.StaticMapping):
+        __slots__ = ()
+        __proto__ = domain_pb2.AuthRequest
+
+    # When I instantiate it, then it should fail
+    IncompleteMapping.when.called_with({}).should.have.raised(TypeError, 'abstract')
+
+    # And the generated mappings can be instantiated
+    static = load_generated(tmp_path, ['AuthRequestMapping'])
+    mapping = static.AuthRequestMapping({'username': 'hulk'})
+    mapping.to_protobuf().should.equal(domain_pb2.AuthRequest(username='hulk'))
+
+    # But do not offer the rest of the API of ProtoMapping
+    mapping.shouldnt.have.property('from_protobuf')
+    mapping.shouldnt.have.property('to_dict')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from unittest import skipIf
+
+from mercator.errors import ProtobufCastError
+
+from .mappings import (
+    UserAuthTokenMapping,
+    MeasurementMapping,
+    domain_pb2,
+)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def test_to_protobuf_columns_from_dict_of_lists():
+    ("ProtoMapping.to_protobuf_columns() should convert a dict of "
+     "columns into the same messages as the row-dict path")
+
+    # Given columns keyed by name at source, with missing values
+    columns = {
+        'data': ['first', 'second', None],
+        'created_at': [1552240433, None, 1552240435],
+        'unknown': [1, 2, 3],
+    }
+
+    # When I convert them
+    messages = UserAuthTokenMapping.to_protobuf_columns(columns)
+
+    # Then they match the conversion of one dict per row
+    messages.should.equal(UserAuthTokenMapping.to_protobuf_many([
+        {'data': 'first', 'created_at': 1552240433},
+        {'data': 'second'},
+        {'created_at': 1552240435},
+    ]))
+
+
+def test_to_protobuf_columns_into_repeated_field():
+    ("ProtoMapping.to_protobuf_columns() should fill a repeated field in place")
+
+    # Given a user message
+    user = domain_pb2.User(username='john')
+
+    # When I convert columns into its tokens
+    result = UserAuthTokenMapping.to_protobuf_columns({'data': ['a', 'b']}, into=user.tokens)
+
+    # Then the repeated field was filled
+    result.should.be(user.tokens)
+    [token.value for token in user.tokens].should.equal(['a', 'b'])
+
+
+def test_to_bytes_columns():
+    ("ProtoMapping.to_bytes_columns() should return the serialized messages")
+
+    # When I convert columns into bytes
+    serialized = MeasurementMapping.to_bytes_columns({'unit': ['kg'], 'samples': [[0.5, 1.5]]})
+
+    # Then they parse back into the expected message
+    serialized.should.equal([domain_pb2.Measurement(unit='kg', samples=[0.5, 1.5]).SerializeToString()])
+
+
+def test_to_protobuf_columns_with_different_lengths():
+    ("ProtoMapping.to_protobuf_columns() should raise ValueError when "
+     "columns have different lengths")
+
+    when_called = UserAuthTokenMapping.to_protobuf_columns.when.called_with({
+        'data': ['a', 'b'],
+        'created_at': [1],
+    })
+
+    when_called.should.have.raised(ValueError, 'columns must have the same length, got [1, 2]')
+
+
+def test_to_protobuf_columns_reports_cast_errors():
+    ("ProtoMapping.to_protobuf_columns() should report the value that cannot be cast")
+
+    when_called = MeasurementMapping.to_protobuf_columns.when.called_with({
+        'taken_at': [1552240433, 'yesterday'],
+    })
+
+    when_called.should.have.raised(ProtobufCastError)
+
+
+def test_to_protobuf_columns_rejects_rows():
+    ("ProtoMapping.to_protobuf_columns() should raise TypeError for data that is not columnar")
+
+    when_called = MeasurementMapping.to_protobuf_columns.when.called_with([{'unit': 'kg'}])
+
+    when_called.should.have.raised(TypeError, "<class 'list'> is not a mapping of columns nor a structured array")
+
+
+@skipIf(numpy is None, 'requires numpy')
+def test_to_protobuf_columns_from_numpy_structured_array():
+    ("ProtoMapping.to_protobuf_columns() should convert NumPy "
+     "structured arrays into python values")
+
+    # Given a structured array
+    data = numpy.array(
+        [('kg', 1.5, 3, 1552240433), ('g', 0.25, 4, 1552240434)],
+        dtype=[('unit', 'U4'), ('value', 'f8'), ('count', 'u4'), ('taken_at', 'i8')],
+    )
+
+    # When I convert it
+    messages = MeasurementMapping.to_protobuf_columns(data)
+
+    # Then each column was converted
+    messages[1].unit.should.equal('g')
+    messages[1].value.should.equal(0.25)
+    messages[1].count.should.equal(4)
+    messages[1].taken_at.seconds.should.equal(1552240434)
+
+
+@skipIf(numpy is None, 'requires numpy')
+def test_to_protobuf_columns_from_dict_of_numpy_arrays():
+    ("ProtoMapping.to_protobuf_columns() should leave masked values unset")
+
+    # Given a dict of arrays with a masked value
+    columns = {
+        'data': numpy.array(['a', 'b']),
+        'created_at': numpy.ma.masked_array([1552240433, 0], mask=[False, True]),
+    }
+
+    # When I convert it
+    messages = UserAuthTokenMapping.to_protobuf_columns(columns)
+
+    # Then the masked value is unset
+    messages[0].created_at.seconds.should.equal(1552240433)
+    messages[1].HasField('created_at').should.be.false
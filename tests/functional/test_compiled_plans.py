@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+from contextlib import ExitStack
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+from mock import patch
+
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    SinglePropertyMapping,
+)
+from mercator.meta import REGISTRY
+from mercator.errors import TypeCastError, ProtobufCastError
+from mercator.wellknown import TIMESTAMP
+
+from .mappings import (
+    AuthRequestMapping,
+    AuthResponseMapping,
+    MediaMapping,
+    UserAuthTokenMapping,
+    UserMapping,
+)
+from . import domain_pb2
+from . import sql
+
+
+def interpreted(mapping_class, data):
+    "converts the given data with the compiled plans of every mapping disabled"
+    with ExitStack() as stack:
+        for mapping in REGISTRY.values():
+            stack.enter_context(patch.object(mapping, '__plan__', None))
+
+        return mapping_class(data).to_protobuf()
+
+
+def compiled(mapping_class, data):
+    return mapping_class(data).to_protobuf()
+
+
+def serialized(message):
+    return message.SerializeToString(deterministic=True)
+
+
+def test_compiled_plan_equals_interpreted_flat_dict():
+    ("the compiled plan should produce byte-identical output "
+     "to the interpreted path for flat dictionaries")
+
+    # Given a dict with auth request data
+    request = {
+        'username': 'Hulk',
+        'password': 'H00LK5m4sh',
+        'unknown_key': 'ignored',
+    }
+
+    # When I convert it through both paths
+    expected = interpreted(AuthRequestMapping, request)
+    result = compiled(AuthRequestMapping, request)
+
+    # Then the results should be identical
+    serialized(result).should.equal(serialized(expected))
+    result.username.should.equal('Hulk')
+
+
+def test_compiled_plan_equals_interpreted_nested_dicts():
+    ("the compiled plan should produce byte-identical output "
+     "to the interpreted path for nested mappings, lists and single property mappings")
+
+    # Given a full dictionary with user data
+    info = {
+        'id': uuid4(),
+        'login': 'Hulk',
+        'email': 'bruce@avengers.world',
+        'tokens': [
+            {
+                'data': 'this is the token',
+                'created_at': 1552240433,
+                'expires_at': 1552240733,
+            },
+            {
+                'data': 'this is another token',
+                'created_at': '1552240433',
+            },
+        ],
+        'extra_info': {
+            'just': 'some',
+            'arbitrary': 'json data',
+        },
+    }
+    media = {
+        'author': info,
+        'link': 'https://test.com/media/123/download',
+        'blob': b'\x00\x01',
+    }
+
+    # When I convert them through both paths
+    for mapping_class, data in [(UserMapping, info), (MediaMapping, media)]:
+        expected = interpreted(mapping_class, data)
+        result = compiled(mapping_class, data)
+
+        # Then the results should be identical
+        serialized(result).should.equal(serialized(expected))
+
+    compiled(MediaMapping, media).author.tokens[1].created_at.seconds.should.equal(1552240433)
+
+
+def test_compiled_plan_equals_interpreted_sqlalchemy_objects():
+    ("the compiled plan should produce byte-identical output "
+     "to the interpreted path for sqlalchemy objects")
+
+    # Given sqlalchemy instances related to each other
+    user = sql.User(
+        uuid=uuid4(),
+        login='chucknorris',
+        email='chuck@norris.com',
+        extra_info={'roundhouse': 'kick'},
+    )
+    user.tokens = [
+        sql.AuthToken(data='token1', created_at=1552240433),
+        sql.AuthToken(data='token2'),
+    ]
+    sql_media = sql.Media(
+        url='https://test.com/media/123/download',
+        author=user,
+    )
+
+    # When I convert them through both paths
+    for mapping_class, data in [(UserMapping, user), (MediaMapping, sql_media)]:
+        expected = interpreted(mapping_class, data)
+        result = compiled(mapping_class, data)
+
+        # Then the results should be identical
+        serialized(result).should.equal(serialized(expected))
+
+
+def test_compiled_plan_equals_interpreted_empty_values():
+    ("the compiled plan should produce byte-identical output "
+     "to the interpreted path for None and empty inputs")
+
+    for mapping_class in (AuthResponseMapping, UserAuthTokenMapping, UserMapping, MediaMapping):
+        for data in (None, {}, {'token': None, 'tokens': [], 'author': None}):
+            serialized(compiled(mapping_class, data)).should.equal(
+                serialized(interpreted(mapping_class, data))
+            )
+
+
+def test_compiled_plan_type_errors_match_interpreted():
+    "the compiled plan should raise the same errors as the interpreted path"
+
+    # Given invalid data for nested mappings
+    data = {'tokens': 'not a list'}
+
+    # When I convert through both paths
+    interpreted_call = interpreted.when.called_with(UserMapping, data)
+    compiled_call = compiled.when.called_with(UserMapping, data)
+
+    # Then both should raise the same error
+    message = 'ProtoList.cast() received a non-list value (type str): not a list'
+    interpreted_call.should.have.raised(TypeCastError, message)
+    compiled_call.should.have.raised(TypeCastError, message)
+
+
+def test_compiled_plan_equals_interpreted_json_fields():
+    ("the compiled plan should produce byte-identical output "
+     "to the interpreted path for Struct fields given JSON text or database values")
+
+    # Given extra info as JSON text and with values that protobuf rejects
+    documents = [
+        {'login': 'Hulk', 'extra_info': '{"a": 1}'},
+        {'login': 'Hulk', 'extra_info': b'{"tags": ["green"]}'},
+        {'login': 'Hulk', 'extra_info': {
+            'id': uuid4(),
+            'price': Decimal('9.99'),
+            'seen_at': datetime(2019, 3, 10, 17, 53),
+        }},
+    ]
+
+    for data in documents:
+        # When I convert it through both paths
+        expected = interpreted(UserMapping, data)
+        result = compiled(UserMapping, data)
+
+        # Then the results should be identical
+        serialized(result).should.equal(serialized(expected))
+
+    # And to_dict() takes the same values
+    UserMapping(documents[0]).to_dict().should.have.key('metadata').being.equal(
+        compiled(UserMapping, documents[0]).metadata
+    )
+
+
+class FloatTimestampMapping(ProtoMapping):
+    __proto__ = domain_pb2.User.AuthToken
+
+    created_at = ProtoKey('created_at', SinglePropertyMapping(float, Timestamp, 'seconds'))
+
+
+class WellKnownTimestampMapping(ProtoMapping):
+    __proto__ = domain_pb2.User.AuthToken
+
+    created_at = ProtoKey('created_at', TIMESTAMP)
+
+
+def test_compiled_plan_sub_message_errors_match_interpreted():
+    ("the compiled plan should raise the same ProtobufCastError as the interpreted path "
+     "for values that sub-messages of single property mappings and well-known types reject")
+
+    cases = [
+        (FloatTimestampMapping, {'created_at': 1.5}, "'float' object cannot be interpreted as an integer"),
+        (WellKnownTimestampMapping, {'created_at': 2 ** 70}, f'Value out of range: {2 ** 70}'),
+    ]
+    for mapping_class, data, message in cases:
+        # When I convert through every path
+        calls = [
+            interpreted.when.called_with(mapping_class, data),
+            compiled.when.called_with(mapping_class, data),
+            mapping_class.to_protobuf_many.when.called_with([data]),
+            mapping_class.to_protobuf_columns.when.called_with({key: [value] for key, value in data.items()}),
+        ]
+
+        # Then all of them should name the caster
+        for call in calls:
+            call.should.have.raised(ProtobufCastError, message)
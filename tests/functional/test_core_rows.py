@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import collections
+
+from mercator.orm import select_columns
+
+from .mappings import (
+    UserMapping,
+    UserAuthTokenMapping,
+    MeasurementMapping,
+    domain_pb2,
+)
+
+from . import sql
+
+
+def create_tokens(session, count):
+    for index in range(count):
+        session.add(sql.AuthToken(data=f'token-{index}', created_at=1552240433 + index))
+
+    session.commit()
+
+
+def test_select_columns_reads_exactly_the_mapped_columns():
+    ("select_columns() should select the columns read by the mapping "
+     "labeled with their name at source")
+
+    # When I build the select of the UserMapping
+    statement = select_columns(UserMapping)
+
+    # Then it has the columns of the declared fields, leaving out the relationships
+    sorted(statement.columns.keys()).should.equal(['email', 'extra_info', 'login'])
+
+
+def test_to_protobuf_rows_from_core_result():
+    ("ProtoMapping.to_protobuf_rows() should convert the rows of a "
+     "SQLAlchemy Core result by position")
+
+    # Given 3 tokens in the database
+    session = sql.create_session()
+    create_tokens(session, 3)
+
+    # When I convert the result of select_columns()
+    statement = select_columns(UserAuthTokenMapping).order_by(sql.AuthToken.created_at)
+    result = session.execute(statement)
+    messages = UserAuthTokenMapping.to_protobuf_rows(result)
+
+    # Then the messages match those converted from ORM instances
+    tokens = session.query(sql.AuthToken).order_by(sql.AuthToken.created_at)
+    messages.should.equal(UserAuthTokenMapping.to_protobuf_many(tokens))
+    messages[2].value.should.equal('token-2')
+    messages[2].created_at.seconds.should.equal(1552240435)
+
+
+def test_to_protobuf_rows_from_tuples_with_columns():
+    ("ProtoMapping.to_protobuf_rows() should convert plain tuples "
+     "given the names of their columns")
+
+    # Given tuples in a different order than the mapping, with an unknown column
+    rows = [
+        ('ms', 'ignored', 1.5),
+        (None, 'ignored', 2.5),
+    ]
+
+    # When I convert them
+    messages = MeasurementMapping.to_protobuf_rows(rows, columns=['unit', 'unknown', 'value'])
+
+    # Then each column is read by position and missing values are left unset
+    messages.should.equal([
+        domain_pb2.Measurement(unit='ms', value=1.5),
+        domain_pb2.Measurement(value=2.5),
+    ])
+
+
+def test_to_protobuf_rows_finds_columns_of_named_tuples_and_mappings():
+    ("ProtoMapping.to_protobuf_rows() should find the columns of named "
+     "tuples and read mappings by key")
+
+    # Given a named tuple and a dict
+    Row = collections.namedtuple('Row', ['value', 'unit'])
+
+    # When I convert them
+    from_tuples = MeasurementMapping.to_protobuf_rows([Row(1.5, 'ms')])
+    from_mappings = MeasurementMapping.to_protobuf_rows([{'unit': 'ms', 'value': 1.5}])
+
+    # Then both give the same message
+    expected = [domain_pb2.Measurement(unit='ms', value=1.5)]
+    from_tuples.should.equal(expected)
+    from_mappings.should.equal(expected)
+
+
+def test_to_protobuf_rows_requires_columns_of_plain_tuples():
+    ("ProtoMapping.to_protobuf_rows() should raise TypeError when the "
+     "columns of plain tuples are unknown")
+
+    # When I convert tuples without columns
+    when_called = MeasurementMapping.to_protobuf_rows.when.called_with([(1.5, 'ms')])
+
+    # Then it raises TypeError
+    when_called.should.have.raised(TypeError, 'cannot find the columns of (1.5, ')
+
+
+def test_row_converters_are_computed_once_per_columns():
+    ("the converters of rows should be cached per tuple of columns")
+
+    # When I convert two batches with the same columns
+    MeasurementMapping.to_protobuf_rows([(1.5,)], columns=['value'])
+    MeasurementMapping.to_protobuf_rows([(2.5,)], columns=['value'])
+
+    # Then a single converter was compiled for them
+    converter = MeasurementMapping.__row_converters__[(('value',), False)]
+    converter.__source__.should.contain('row[0]')
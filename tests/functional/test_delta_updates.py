@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from .mappings import (
+    UserMapping,
+    MediaMapping,
+)
+
+from . import sql
+
+
+def make_user(**changes):
+    user = {
+        'id': 'u1',
+        'email': 'hulk@avengers.com',
+        'login': 'hulk',
+        'tokens': [{'data': 'first', 'created_at': 1552240433}],
+        'extra_info': {'color': 'green'},
+    }
+    user.update(changes)
+    return user
+
+
+def test_apply_diff_matches_full_conversion():
+    "UserMapping.diff() applied to the previous message should equal the conversion of the new data"
+
+    # Given two versions of a user and the message of the first one
+    old = make_user()
+    new = make_user(login='bruce', tokens=[], extra_info={'color': 'grey'})
+    message = UserMapping(old).to_protobuf()
+
+    # When I apply the differences
+    changes = UserMapping.diff(old, new)
+    mask = UserMapping(changes).apply_to(message, mask=True)
+
+    # Then only the changed fields are in the mask
+    mask.paths.should.equal(['username', 'tokens', 'metadata'])
+
+    # And the message equals the conversion of the new version
+    message.should.equal(UserMapping(new).to_protobuf())
+
+
+def test_apply_to_nested_message():
+    "MediaMapping.apply_to() should replace the nested message of the author"
+
+    # Given the message of a media
+    message = MediaMapping({'uuid': 'm1', 'link': 'https://x', 'author': make_user()}).to_protobuf()
+
+    # When I apply a new author from an ORM instance
+    author = sql.User(login='thor', email='thor@asgard.com')
+    MediaMapping({'author': author}).apply_to(message)
+
+    # Then the author is replaced entirely
+    message.author.username.should.equal('thor')
+    message.author.email.should.equal('thor@asgard.com')
+    message.author.uuid.should.equal('')
+    len(message.author.tokens).should.equal(0)
+    message.download_url.should.equal('https://x')
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import sqlalchemy as sa
+
+from mercator.orm import eager_load
+from mercator.orm import loader_options
+
+from .mappings import (
+    MediaMapping,
+    UserMapping,
+    MeasurementMapping,
+)
+
+from . import sql
+
+
+def create_media(session, count):
+    for index in range(count):
+        author = sql.User(login=f'author{index}', email=f'{index}@test.com')
+        author.tokens = [
+            sql.AuthToken(data=f'token-{index}-{n}', created_at=1552240433 + n)
+            for n in range(2)
+        ]
+        session.add(sql.Media(url=f'https://test.com/media/{index}', author=author))
+
+    session.commit()
+    session.expunge_all()
+
+
+def count_statements(session):
+    statements = []
+
+    @sa.event.listens_for(session.bind, 'before_cursor_execute')
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    return statements
+
+
+def test_eager_load_converts_with_fixed_number_of_queries():
+    ("eager_load() should load the relationships read by nested "
+     "mappings so that converting a page runs a fixed number of queries")
+
+    # Given 50 media, each with an author with 2 tokens
+    session = sql.create_session()
+    create_media(session, 50)
+    statements = count_statements(session)
+
+    # When I convert them without eager loading
+    lazy = MediaMapping.to_protobuf_many(session.query(sql.Media).order_by(sql.Media.url))
+
+    # Then there is one query per author and per list of tokens
+    len(statements).should.equal(1 + 50 + 50)
+    session.expunge_all()
+    del statements[:]
+
+    # When I convert them with eager loading
+    query = eager_load(session.query(sql.Media), MediaMapping).order_by(sql.Media.url)
+    eager = MediaMapping.to_protobuf_many(query)
+
+    # Then the media and authors are loaded at once, followed by the tokens
+    len(statements).should.equal(2)
+    statements[0].should.contain('JOIN user')
+    statements[1].should.contain('FROM auth_token')
+
+    # And the messages should be the same
+    eager.should.equal(lazy)
+    eager[0].author.tokens[1].created_at.seconds.should.equal(1552240434)
+
+
+def test_loader_options_load_only_columns_read_by_mappings():
+    "loader_options() should only load the columns read by the mappings and needed by relationships"
+
+    session = sql.create_session()
+    query = session.query(sql.User).options(*loader_options(UserMapping))
+    statement = str(query)
+
+    # the password is not read by UserMapping
+    statement.should.contain('user.login')
+    statement.should.contain('user.extra_info')
+    statement.shouldnt.contain('user.password')
+
+    # without load_only all the columns are loaded
+    str(eager_load(session.query(sql.User), UserMapping, load_only=False)).should.contain('user.password')
+
+
+def test_loader_options_requires_sqlalchemy_model():
+    "loader_options() should raise TypeError for mappings without a SQLAlchemy model as __source_input_type__"
+
+    loader_options.when.called_with(MeasurementMapping).should.have.raised(
+        TypeError,
+        'MeasurementMapping does not declare a SQLAlchemy model as __source_input_type__'
+    )
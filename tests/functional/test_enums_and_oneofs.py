@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+
+from google.protobuf import struct_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoEnum,
+    ProtoOneOf,
+)
+from mercator import codegen
+from mercator.errors import ProtobufCastError
+
+from . import domain_pb2
+
+
+class MediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('id', str)
+    content_type = ProtoEnum('kind', aliases={'post': 'BLOG_POST', 'mp4': 'VIDEO', 'jpeg': 'IMAGE'})
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+
+    kind = ProtoOneOf('type', aliases={'number': 'number_value', 'text': 'string_value'})
+    number_value = ProtoKey('amount', float)
+    string_value = ProtoKey('text', str)
+
+
+def test_enum_fields_of_media():
+    "ProtoEnum() should convert the names of content types in every conversion path"
+
+    # Given media with content types by name and alias
+    media = [
+        {'id': 'm1', 'kind': 'video'},
+        {'id': 'm2', 'kind': 'POST'},
+        {'id': 'm3', 'kind': 'Jpeg'},
+        {'id': 'm4', 'kind': None},
+    ]
+    expected = [
+        domain_pb2.UserMedia(uuid='m1', content_type=domain_pb2.UserMedia.VIDEO),
+        domain_pb2.UserMedia(uuid='m2', content_type=domain_pb2.UserMedia.BLOG_POST),
+        domain_pb2.UserMedia(uuid='m3', content_type=domain_pb2.UserMedia.IMAGE),
+        domain_pb2.UserMedia(uuid='m4'),
+    ]
+
+    # Then every conversion path returns the same messages
+    MediaMapping.to_protobuf_many(media).should.equal(expected)
+    [MediaMapping(item).to_bytes() for item in media].should.equal([message.SerializeToString() for message in expected])
+    MediaMapping.to_protobuf_columns({
+        'id': [item['id'] for item in media],
+        'kind': [item['kind'] for item in media],
+    }).should.equal(expected)
+    MediaMapping.to_protobuf_rows(
+        [(item['id'], item['kind']) for item in media],
+        columns=['id', 'kind'],
+    ).should.equal(expected)
+
+    # And invalid names are reported
+    MediaMapping({'kind': 'podcast'}).to_protobuf.when.called_with().should.throw(
+        ProtobufCastError,
+        '"podcast" (str) is not a value of services.social_platform.UserMedia.ContentType'
+    )
+
+
+def test_oneof_columns_and_rows():
+    "ProtoOneOf() should choose the member of every row of columns and SQL rows"
+
+    # Given values with several members
+    columns = {
+        'type': ['text', 'number', None],
+        'amount': [1, 2, 3],
+        'text': ['one', 'two', None],
+    }
+    expected = [
+        struct_pb2.Value(string_value='one'),
+        struct_pb2.Value(number_value=2),
+        struct_pb2.Value(number_value=3),
+    ]
+
+    # Then only the chosen members are set
+    ValueMapping.to_protobuf_columns(columns).should.equal(expected)
+    ValueMapping.to_protobuf_rows(list(zip(*columns.values())), columns=list(columns)).should.equal(expected)
+
+    # And the given columns are not modified
+    columns['amount'].should.equal([1, 2, 3])
+
+
+def test_codegen_of_enum_fields(tmp_path):
+    "python -m mercator.codegen should write ProtoEnum fields that produce the same messages"
+
+    # Given the generated module of this test module
+    path = tmp_path / 'static_enums.py'
+    codegen.main([__name__, 'MediaMapping', '-o', str(path)])
+    spec = importlib.util.spec_from_file_location('static_enums', str(path))
+    static = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(static)
+
+    # When I convert media
+    media = {'id': 'm1', 'kind': 'MP4'}
+
+    # Then the messages are the same
+    static.MediaMapping(media).to_protobuf().should.equal(MediaMapping(media).to_protobuf())
+
+
+def test_codegen_of_oneofs():
+    "python -m mercator.codegen should refuse mappings that declare ProtoOneOf"
+
+    writer = codegen.ModuleWriter({ValueMapping: 'ValueMapping'})
+
+    writer.add_mapping.when.called_with(ValueMapping).should.throw(
+        TypeError,
+        'ValueMapping cannot be generated statically: it declares ProtoOneOf'
+    )
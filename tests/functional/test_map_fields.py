@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+
+from google.protobuf import struct_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoMap,
+    MemoCache,
+)
+from mercator import codegen
+
+from . import domain_pb2
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+
+    string_value = ProtoKey('text', str)
+    number_value = ProtoKey('amount', float)
+
+
+class StructMapping(ProtoMapping):
+    __proto__ = struct_pb2.Struct
+
+    fields = ProtoMap('properties', ValueMapping, key='name', memoize='name')
+
+
+class LabeledMeasurementMapping(ProtoMapping):
+    __proto__ = domain_pb2.Measurement
+
+    value = ProtoKey('value', float)
+    labels = ProtoMap('labels', str, key_type=str)
+
+
+def make_properties(count):
+    return [{'name': f'property-{index}', 'amount': index} for index in range(count)]
+
+
+def test_map_of_nested_mappings_to_bytes():
+    "ProtoMap() of nested mappings should encode the same messages in to_bytes()"
+
+    # Given a struct with many properties
+    data = {'properties': make_properties(100)}
+    message = StructMapping(data).to_protobuf()
+
+    # Then it has an entry per record
+    len(message.fields).should.equal(100)
+    message.fields['property-7'].number_value.should.equal(7)
+
+    # And to_bytes() parses into the same message
+    struct_pb2.Struct.FromString(StructMapping(data).to_bytes()).should.equal(message)
+
+
+def test_map_of_nested_mappings_with_memo_cache():
+    "ProtoMap(memoize=...) should convert every value once per cache"
+
+    # Given the same properties in several structs
+    structs = [{'properties': make_properties(10)} for _ in range(5)]
+    cache = MemoCache()
+
+    # When I convert them with a cache
+    messages = StructMapping.to_protobuf_many(structs, memo=cache)
+
+    # Then the values were converted once
+    cache.misses.should.equal(10)
+    cache.hits.should.equal(40)
+    messages.should.equal(StructMapping.to_protobuf_many(structs))
+
+
+def test_map_of_scalars():
+    "ProtoMap() of scalars should cast keys and values in every conversion path"
+
+    measurements = [
+        {'value': 1.5, 'labels': {'site': 'berlin', 'rack': 7}},
+        {'value': 2.5, 'labels': {}},
+        {'value': 3.5, 'labels': None},
+    ]
+    expected = [
+        domain_pb2.Measurement(value=1.5, labels={'site': 'berlin', 'rack': '7'}),
+        domain_pb2.Measurement(value=2.5),
+        domain_pb2.Measurement(value=3.5),
+    ]
+
+    LabeledMeasurementMapping.to_protobuf_many(measurements).should.equal(expected)
+    [domain_pb2.Measurement.FromString(LabeledMeasurementMapping(item).to_bytes()) for item in measurements].should.equal(expected)
+    LabeledMeasurementMapping.to_protobuf_columns({
+        'value': [item['value'] for item in measurements],
+        'labels': [item['labels'] for item in measurements],
+    }).should.equal(expected)
+
+
+def test_map_entries_with_default_values_to_bytes():
+    "to_bytes() should write the key and value of map entries even when they are empty"
+
+    data = {'value': 0.0, 'labels': {'': ''}}
+
+    LabeledMeasurementMapping(data).to_bytes().should.equal(
+        LabeledMeasurementMapping(data).to_protobuf().SerializeToString()
+    )
+
+
+def test_codegen_of_map_fields(tmp_path):
+    "python -m mercator.codegen should write ProtoMap fields that produce the same messages"
+
+    # Given the generated module of this test module
+    path = tmp_path / 'static_maps.py'
+    codegen.main([__name__, 'StructMapping', 'LabeledMeasurementMapping', '-o', str(path)])
+    spec = importlib.util.spec_from_file_location('static_maps', str(path))
+    static = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(static)
+
+    # When I convert maps
+    data = {'properties': make_properties(3)}
+    measurement = {'value': 1.5, 'labels': {'rack': 7}}
+
+    # Then the messages are the same
+    static.StructMapping(data).to_protobuf().should.equal(StructMapping(data).to_protobuf())
+    static.LabeledMeasurementMapping(measurement).to_protobuf().should.equal(
+        LabeledMeasurementMapping(measurement).to_protobuf()
+    )
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoList,
+    MemoCache,
+)
+
+from .mappings import (
+    MediaMapping,
+    UserMapping,
+    UserAuthTokenMapping,
+)
+
+from . import domain_pb2
+from . import sql
+
+
+class MemoizedMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    __source_input_type__ = sql.Media
+    uuid = ProtoKey('uuid', str)
+    author = ProtoKey('author', UserMapping, memoize=True)
+    download_url = ProtoKey('link', str)
+
+
+class KeyedMediaMapping(ProtoMapping):
+    __proto__ = domain_pb2.UserMedia
+
+    uuid = ProtoKey('uuid', str)
+    author = ProtoKey('author', UserMapping, memoize='id')
+
+
+class MemoizedUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+
+    uuid = ProtoKey('id', str)
+    tokens = ProtoList('tokens', UserAuthTokenMapping, memoize='data')
+
+
+def make_media(author, count):
+    return [
+        {'uuid': f'media-{index}', 'author': author, 'link': f'https://media/{index}'}
+        for index in range(count)
+    ]
+
+
+def test_memoize_shared_author_by_identity():
+    ("ProtoKey(memoize=True) should convert a nested value shared by "
+     "many records once per cache")
+
+    # Given 100 media sharing the same author
+    author = {'id': 'author-uuid', 'login': 'Hulk', 'tokens': [{'data': 'token', 'created_at': 1552240433}]}
+    media = make_media(author, 100)
+    cache = MemoCache()
+
+    # When I convert them with a cache
+    messages = MemoizedMediaMapping.to_protobuf_many(media, memo=cache)
+
+    # Then they equal the regular conversion
+    messages.should.equal(MediaMapping.to_protobuf_many(media))
+
+    # And the author was converted once
+    cache.stats().should.equal({
+        'hits': 99,
+        'misses': 1,
+        'evictions': 0,
+        'size': 1,
+        'maxsize': 4096,
+        'hit_rate': 0.99,
+    })
+
+    # And each message has its own copy of the author
+    messages[0].author.username = 'Bruce'
+    messages[1].author.username.should.equal('Hulk')
+
+
+def test_memoize_by_key_of_equal_values():
+    ("ProtoKey(memoize='id') should share the conversion of equal "
+     "values with the same key")
+
+    # Given 10 media whose authors are different but equal dictionaries
+    media = [
+        {'uuid': f'media-{index}', 'author': {'id': 'author-uuid', 'login': 'Hulk'}}
+        for index in range(10)
+    ]
+
+    # When I convert them within a cache
+    with MemoCache() as cache:
+        messages = [KeyedMediaMapping(item).to_protobuf() for item in media]
+
+    # Then the authors were converted once
+    cache.hits.should.equal(9)
+    cache.misses.should.equal(1)
+    set([message.author.username for message in messages]).should.equal({'Hulk'})
+
+
+def test_memoize_proto_list_items():
+    ("ProtoList(memoize='data') should convert the items shared by "
+     "many records once")
+
+    # Given 5 users sharing the same 2 tokens, and 1 token without a key
+    tokens = [{'data': 'first', 'created_at': 1}, {'data': 'second', 'created_at': 2}]
+    users = [{'id': f'user-{index}', 'tokens': tokens + [{'created_at': 3}]} for index in range(5)]
+    cache = MemoCache()
+
+    # When I convert them with a cache
+    messages = MemoizedUserMapping.to_protobuf_many(users, memo=cache)
+
+    # Then each token was converted once and the keyless ones are not cached
+    cache.misses.should.equal(2)
+    cache.hits.should.equal(8)
+    [token.value for token in messages[4].tokens].should.equal(['first', 'second', ''])
+
+
+def test_memoize_lru_eviction():
+    ("MemoCache() should evict the least recently used conversions "
+     "above its maxsize")
+
+    # Given 3 authors and a cache of 2 conversions
+    authors = [{'id': f'author-{index}', 'login': f'user{index}'} for index in range(3)]
+    media = [{'uuid': 'media', 'author': author} for author in authors + authors[2:]]
+    cache = MemoCache(maxsize=2)
+
+    # When I convert media of the 3 authors and of the last one again
+    messages = KeyedMediaMapping.to_protobuf_many(media, memo=cache)
+
+    # Then the first author was evicted and the last one was found
+    cache.evictions.should.equal(1)
+    cache.hits.should.equal(1)
+    len(cache).should.equal(2)
+    messages[3].author.username.should.equal('user2')
+
+
+def test_memoize_without_active_cache():
+    ("memoized field mappings should convert as usual without an "
+     "active cache")
+
+    # Given a media and a cache that is not active
+    media = make_media({'id': 'author-uuid', 'login': 'Hulk'}, 3)
+    cache = MemoCache()
+
+    # When I convert them without the cache
+    messages = MemoizedMediaMapping.to_protobuf_many(media)
+
+    # Then they equal the regular conversion and the cache was untouched
+    messages.should.equal(MediaMapping.to_protobuf_many(media))
+    cache.stats()['misses'].should.equal(0)
+
+
+def test_memoize_to_bytes_and_sqlalchemy():
+    ("MemoCache() should reuse the encoded author in to_bytes() and "
+     "cache sqlalchemy instances by identity")
+
+    # Given sqlalchemy media sharing the same author
+    author = sql.User(login='Hulk', email='hulk@avengers.world')
+    media = [sql.Media(url=f'https://media/{index}', author=author) for index in range(5)]
+
+    # When I encode them within a cache
+    with MemoCache() as cache:
+        encoded = [MemoizedMediaMapping(item).to_bytes() for item in media]
+
+    # Then they equal the regular serialization
+    encoded.should.equal([MediaMapping(item).to_protobuf().SerializeToString() for item in media])
+    cache.hits.should.equal(4)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ProcessPoolExecutor
+
+from mercator import ProtoMapping
+from mercator.parallel import get_mapping_id
+from mercator.parallel import resolve_mapping
+
+from .mappings import (
+    UserMapping,
+    MeasurementMapping,
+)
+
+from . import domain_pb2
+
+
+def make_users(count):
+    return [
+        {
+            'id': str(index),
+            'login': f'user{index}',
+            'tokens': [{'data': f'token{index}', 'created_at': index}],
+        }
+        for index in range(count)
+    ]
+
+
+def test_to_bytes_parallel_preserves_order():
+    ("ProtoMapping.to_bytes_parallel() should encode records in "
+     "worker processes and yield the messages in the input order")
+
+    # Given more users than fit in a single chunk
+    users = make_users(250)
+
+    # When I encode them in parallel from a generator
+    result = list(UserMapping.to_bytes_parallel(iter(users), workers=2, chunk_size=16))
+
+    # Then it should yield one message per user in the same order
+    result.should.equal([UserMapping(user).to_bytes() for user in users])
+
+
+def test_to_bytes_parallel_reuses_executor():
+    "ProtoMapping.to_bytes_parallel() should accept an existing executor"
+
+    measurements = [{'value': index / 3, 'samples': [1.0, 2.0], 'taken_at': index} for index in range(20)]
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        first = list(MeasurementMapping.to_bytes_parallel(measurements, executor=executor, chunk_size=7))
+        second = list(MeasurementMapping.to_bytes_parallel(measurements[:3], executor=executor))
+
+    first.should.equal([MeasurementMapping(item).to_bytes() for item in measurements])
+    second.should.equal(first[:3])
+
+
+def test_to_bytes_parallel_invalid_chunk_size():
+    "ProtoMapping.to_bytes_parallel() should require a positive chunk_size"
+
+    def encode(chunk_size):
+        return list(UserMapping.to_bytes_parallel(make_users(3), workers=1, chunk_size=chunk_size))
+
+    encode.when.called_with(0).should.have.raised(
+        ValueError,
+        'iter_chunks() takes a positive chunk_size, but got 0 instead'
+    )
+    encode.when.called_with(-1).should.have.raised(
+        ValueError,
+        'iter_chunks() takes a positive chunk_size, but got -1 instead'
+    )
+
+
+def test_mapping_id_resolves_registered_mapping():
+    "get_mapping_id() and resolve_mapping() should find mappings in the registry by module and name"
+
+    mapping_id = get_mapping_id(UserMapping)
+
+    mapping_id.should.equal(('tests.functional.mappings', 'UserMapping'))
+    resolve_mapping(mapping_id).should.be(UserMapping)
+
+
+def test_mapping_id_of_shadowed_mapping():
+    "get_mapping_id() should raise LookupError for mappings shadowed in the registry by another with the same name"
+
+    # Given two mappings declared with the same name
+    def declare():
+        class ShadowedMapping(ProtoMapping):
+            __proto__ = domain_pb2.User
+
+        return ShadowedMapping
+
+    first = declare()
+    second = declare()
+
+    # Then only the last one can be identified
+    get_mapping_id.when.called_with(first).should.have.raised(LookupError)
+    get_mapping_id(second).should.equal((__name__, 'ShadowedMapping'))
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoList,
+    LRUResultCache,
+    FileResultCache,
+)
+from mercator.cache import ResultCache
+
+from .mappings import (
+    UserMapping,
+    UserAuthTokenMapping,
+)
+
+from . import domain_pb2
+from . import sql
+
+
+class CachedUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+    __source_input_type__ = sql.User
+    __cache_key__ = ('id', 'version')
+
+    uuid = ProtoKey('id', str)
+    email = ProtoKey('email', str)
+    username = ProtoKey('login', str)
+    tokens = ProtoList('tokens', UserAuthTokenMapping)
+    metadata = ProtoKey('extra_info', dict)
+
+
+class LoginCachedUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+
+    username = ProtoKey('login', str)
+
+    @staticmethod
+    def __cache_key__(data):
+        return data['login'].lower()
+
+
+def make_user(version, login='Hulk'):
+    return {
+        'id': 'some-uuid',
+        'version': version,
+        'login': login,
+        'email': 'hulk@avengers.world',
+        'tokens': [{'data': 'token', 'created_at': 1552240433}],
+    }
+
+
+def test_lru_result_cache_by_version():
+    ("LRUResultCache() should return the cached bytes of records whose "
+     "__cache_key__ did not change")
+
+    # Given a cache and a user at version 1
+    cache = LRUResultCache()
+    user = make_user(1)
+
+    # When I encode it twice, then again at version 2 with another login
+    first = CachedUserMapping(user).to_bytes(cache=cache)
+    second = CachedUserMapping(user).to_bytes(cache=cache)
+    updated = CachedUserMapping(make_user(2, 'Bruce')).to_bytes(cache=cache)
+
+    # Then the cached bytes equal the regular serialization
+    first.should.equal(UserMapping(user).to_protobuf().SerializeToString())
+    second.should.be(first)
+
+    # And the new version was encoded again
+    domain_pb2.User.FromString(updated).username.should.equal('Bruce')
+    cache.stats().should.equal({
+        'hits': 1,
+        'misses': 2,
+        'evictions': 0,
+        'entries': 2,
+        'bytes': len(first) + len(updated),
+        'max_bytes': 64 * 1024 * 1024,
+        'hit_rate': 1 / 3,
+    })
+
+
+def test_lru_result_cache_evicts_by_size():
+    ("LRUResultCache() should evict the least recently used messages "
+     "above max_bytes")
+
+    # Given a cache that holds two messages
+    size = len(CachedUserMapping(make_user(0)).to_bytes())
+    cache = LRUResultCache(max_bytes=size * 2)
+
+    # When I encode versions 0, 1, 0 and 2
+    for version in (0, 1, 0, 2):
+        CachedUserMapping(make_user(version)).to_bytes(cache=cache)
+
+    # Then version 1 was evicted
+    cache.evictions.should.equal(1)
+    cache.size.should.equal(size * 2)
+    CachedUserMapping(make_user(0)).to_bytes(cache=cache)
+    cache.hits.should.equal(2)
+
+
+def test_result_cache_without_key_and_to_protobuf():
+    ("ProtoMapping.to_protobuf() should parse cached bytes and records "
+     "without a key should not be cached")
+
+    # Given a cache and a sqlalchemy user that was not flushed
+    cache = LRUResultCache()
+    user = sql.User(login='Hulk', email='hulk@avengers.world')
+
+    # When I convert it and a dictionary with a key function
+    message = CachedUserMapping(user).to_protobuf(cache=cache)
+    LoginCachedUserMapping({'login': 'HULK'}).to_protobuf(cache=cache)
+    cached = LoginCachedUserMapping({'login': 'hulk'}).to_protobuf(cache=cache)
+
+    # Then the sqlalchemy user was not cached
+    message.should.equal(UserMapping(user).to_protobuf())
+    cache.misses.should.equal(1)
+
+    # And the keys given by the function were shared
+    cache.hits.should.equal(1)
+    cached.username.should.equal('HULK')
+
+
+def test_file_result_cache_shared_and_evicted(tmp_path):
+    ("FileResultCache() should share messages between instances on the "
+     "same directory and remove the oldest files above max_bytes")
+
+    # Given two caches on the same directory, as in two processes
+    size = len(CachedUserMapping(make_user(0)).to_bytes())
+    writer = FileResultCache(str(tmp_path), max_bytes=size * 4)
+    reader = FileResultCache(str(tmp_path), max_bytes=size * 4)
+
+    # When one encodes a user and the other one reads it
+    encoded = CachedUserMapping(make_user(0)).to_bytes(cache=writer)
+    into = CachedUserMapping(make_user(0)).to_bytes(bytearray(b'prefix'), cache=reader)
+
+    # Then it was read from the directory
+    bytes(into).should.equal(b'prefix' + encoded)
+    reader.stats()['hits'].should.equal(1)
+    len(reader).should.equal(1)
+
+    # And when the writer stores more than 4 messages, files are removed
+    for version in range(1, 6):
+        CachedUserMapping(make_user(version)).to_bytes(cache=writer)
+
+    writer.evictions.should.equal(2)
+    writer.size.should.equal(size * 4)
+
+    # And clear() removes all of them
+    reader.clear()
+    len(writer).should.equal(0)
+
+
+def test_result_cache_backends_must_implement_storage():
+    ("ResultCache subclasses that do not implement load(), store(), "
+     "clear(), __len__ and size should not be instantiable")
+
+    # Given a backend that only implements load() and store()
+    class IncompleteCache(ResultCache):
+        def load(self, key):
+            return None
+
+        def store(self, key, value):
+            pass
+
+    # When I instantiate it, then it should fail
+    IncompleteCache.when.called_with().should.have.raised(TypeError, 'abstract')
+    ResultCache.when.called_with().should.have.raised(TypeError, 'abstract')
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from .mappings import (
+    MediaMapping,
+    MeasurementMapping,
+    UserMapping,
+    UserAuthTokenMapping,
+)
+
+from . import domain_pb2
+from . import sql
+
+
+def test_from_protobuf_renames_fields_back_to_source_keys():
+    ("ProtoMapping.from_protobuf() should return a dict keyed by "
+     "the name at source of each field, recursing into nested mappings")
+
+    # Given a user message with tokens and metadata
+    user = UserMapping({
+        'id': 'a3d5a0b1',
+        'login': 'Hulk',
+        'email': 'hulk@avengers.com',
+        'tokens': [{'data': 'smash', 'created_at': 1552240433}],
+        'extra_info': {'color': 'green'},
+    }).to_protobuf()
+
+    # When I convert it back
+    result = UserMapping.from_protobuf(user)
+
+    # Then it should return the source data
+    result.should.equal({
+        'id': 'a3d5a0b1',
+        'login': 'Hulk',
+        'email': 'hulk@avengers.com',
+        'tokens': [{'data': 'smash', 'created_at': 1552240433, 'expires_at': None}],
+        'extra_info': {'color': 'green'},
+    })
+
+
+def test_from_protobuf_unset_messages_become_none():
+    "ProtoMapping.from_protobuf() should return None for message fields that are not set"
+
+    result = MediaMapping.from_protobuf(domain_pb2.UserMedia(uuid='123'))
+
+    result.should.equal({
+        'uuid': '123',
+        'author': None,
+        'link': '',
+        'blob': b'',
+        'content_type': 0,
+        'name': '',
+    })
+
+
+def test_from_protobuf_round_trip_of_all_scalar_types():
+    "ProtoMapping.from_protobuf() should be the inverse of to_protobuf() for every field type"
+
+    # Given data for every field of a measurement
+    data = {
+        'value': 1.5,
+        'ratio': 0.25,
+        'delta': -3,
+        'total': 2 ** 40,
+        'count': 7,
+        'big_count': 2 ** 63,
+        'offset': -8,
+        'big_offset': -2 ** 40,
+        'checksum': 2 ** 31,
+        'big_checksum': 2 ** 63,
+        'signed_checksum': -5,
+        'big_signed_checksum': -2 ** 62,
+        'valid': True,
+        'unit': 'kg',
+        'raw': b'\x00\xff',
+        'samples': [0.5, 1.5],
+        'deltas': [-1, 1],
+        'tags': ['a', 'b'],
+        'flags': [True, False],
+        'labels': {'site': 'berlin'},
+        'taken_at': 1552240433,
+    }
+
+    # When it goes back and forth
+    message = MeasurementMapping(data).to_protobuf()
+    result = MeasurementMapping.from_protobuf(message)
+
+    # Then it should be equal to the original data
+    result.should.equal(data)
+
+
+def test_from_protobuf_as_source_input_type():
+    ("ProtoMapping.from_protobuf(as_object=True) should return "
+     "instances of __source_input_type__, also for nested mappings")
+
+    # Given a media message with an author and tokens
+    media = MediaMapping({
+        'uuid': 'b7c1',
+        'author': {'login': 'Hulk', 'tokens': [{'data': 'smash', 'created_at': 10}]},
+    }).to_protobuf()
+
+    # When I convert it back into objects
+    result = MediaMapping.from_protobuf(media, as_object=True)
+
+    # Then it should return sqlalchemy instances
+    result.should.be.a(sql.Media)
+    result.uuid.should.equal('b7c1')
+    result.author.should.be.a(sql.User)
+    result.author.login.should.equal('Hulk')
+    result.author.tokens.should.have.length_of(1)
+    result.author.tokens[0].should.be.a(sql.AuthToken)
+    result.author.tokens[0].data.should.equal('smash')
+    result.author.tokens[0].created_at.should.equal(10)
+
+    # And keys that are not attributes of the model should be left out
+    result.author.shouldnt.have.property('id')
+
+
+def test_from_protobuf_many():
+    "ProtoMapping.from_protobuf_many() should convert a repeated field back into a list"
+
+    # Given a user with two tokens
+    user = domain_pb2.User()
+    UserAuthTokenMapping.to_protobuf_many([{'data': 'one'}, {'data': 'two'}], into=user.tokens)
+
+    # When I convert the tokens back
+    result = UserAuthTokenMapping.from_protobuf_many(user.tokens)
+
+    # Then it should return a list of dicts
+    [token['data'] for token in result].should.equal(['one', 'two'])
+
+
+def test_from_protobuf_invalid_message():
+    "ProtoMapping.from_protobuf() should raise TypeError when given another message type"
+
+    UserMapping.from_protobuf.when.called_with(domain_pb2.UserMedia()).should.have.raised(TypeError)
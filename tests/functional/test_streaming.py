@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import io
+
+from mercator.stream import iter_parse_delimited
+
+from .mappings import (
+    MediaMapping,
+    UserMapping,
+)
+
+from . import domain_pb2
+from . import sql
+
+
+class RecordingFile(io.BytesIO):
+    "a file-like object that records the size of each write"
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(len(data))
+        return super().write(data)
+
+
+def generate_users(count):
+    for index in range(count):
+        yield {
+            'id': str(index),
+            'login': f'user{index}',
+            'tokens': [{'data': f'token{index}', 'created_at': index}],
+        }
+
+
+def test_iter_delimited_from_generator():
+    ("ProtoMapping.iter_delimited() should generate one "
+     "length-delimited message per record of a generator")
+
+    # When I stream users from a generator
+    result = list(UserMapping.iter_delimited(generate_users(300)))
+
+    # Then it should have generated one message per user
+    result.should.have.length_of(300)
+
+    # And each message should parse back into the original data
+    messages = list(iter_parse_delimited(domain_pb2.User, b''.join(result)))
+    messages.should.have.length_of(300)
+    messages[299].username.should.equal('user299')
+    messages[299].tokens[0].created_at.seconds.should.equal(299)
+    messages.should.equal(list(UserMapping.to_protobuf_many(generate_users(300))))
+
+
+def test_iter_delimited_chunks():
+    "ProtoMapping.iter_delimited() should group messages in chunks of at least chunk_size bytes"
+
+    # When I stream users in chunks of 1kb
+    chunks = list(UserMapping.iter_delimited(generate_users(300), chunk_size=1024))
+
+    # Then every chunk but the last should have at least 1kb
+    for chunk in chunks[:-1]:
+        len(chunk).should.be.greater_than_or_equal_to(1024)
+        len(chunk).should.be.lower_than(1024 + 100)
+
+    # And the chunks should contain all the messages
+    messages = list(iter_parse_delimited(domain_pb2.User, b''.join(chunks)))
+    messages.should.have.length_of(300)
+
+
+def test_iter_delimited_large_messages():
+    "ProtoMapping.iter_delimited() should prefix messages larger than 127 bytes with multi-byte varints"
+
+    users = [{'login': 'x' * size} for size in (100, 200, 20000)]
+
+    result = list(UserMapping.iter_delimited(users))
+
+    result[2][:3].should.equal(bytes([0xa4, 0x9c, 0x01]))
+    messages = list(iter_parse_delimited(domain_pb2.User, b''.join(result)))
+    [len(message.username) for message in messages].should.equal([100, 200, 20000])
+
+
+def test_write_delimited_batches_writes():
+    "ProtoMapping.write_delimited() should batch writes to the file-like object"
+
+    # Given a file-like object
+    file = RecordingFile()
+
+    # When I write the stream of users with chunks of 4kb
+    count = UserMapping.write_delimited(generate_users(1000), file, chunk_size=4096)
+
+    # Then it should return the number of messages
+    count.should.equal(1000)
+
+    # And it should have written in batches
+    len(file.writes).should.be.lower_than(20)
+    file.writes[0].should.be.greater_than_or_equal_to(4096)
+
+    # And the file should contain all the messages
+    messages = list(iter_parse_delimited(domain_pb2.User, file.getvalue()))
+    messages.should.have.length_of(1000)
+    messages[-1].username.should.equal('user999')
+
+
+def test_write_delimited_from_sqlalchemy_yield_per():
+    "ProtoMapping.write_delimited() should consume a SQLAlchemy Query with yield_per()"
+
+    # Given a database with media authored by users
+    session = sql.create_session()
+    author = sql.User(login='chucknorris')
+    session.add(author)
+    session.add_all([
+        sql.Media(url=f'https://test.com/media/{index}', author=author)
+        for index in range(50)
+    ])
+    session.commit()
+    session.expunge_all()
+
+    # When I stream all media from a query with yield_per
+    file = io.BytesIO()
+    query = session.query(sql.Media).order_by(sql.Media.url).yield_per(10)
+    count = MediaMapping.write_delimited(query, file)
+
+    # Then all media should have been written
+    count.should.equal(50)
+    messages = list(iter_parse_delimited(domain_pb2.UserMedia, file.getvalue()))
+    messages.should.have.length_of(50)
+    messages[0].author.username.should.equal('chucknorris')
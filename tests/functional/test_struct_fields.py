@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import uuid
+import decimal
+import datetime
+
+from google.protobuf import json_format
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    StructCaster,
+    DEFAULT_COERCIONS,
+)
+from mercator.errors import ProtobufCastError
+
+from .mappings import UserMapping
+
+from . import domain_pb2
+
+
+class TaggedUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+
+    username = ProtoKey('login', str)
+    metadata = ProtoKey('extra_info', StructCaster(coercions={**DEFAULT_COERCIONS, set: sorted}))
+
+
+def test_struct_field_coerces_database_values():
+    ("ProtoKey() of dict should convert Struct fields with decimals, "
+     "dates and UUIDs, in to_protobuf() and to_bytes()")
+
+    # Given a user whose extra info comes from a JSON column
+    user = {
+        'login': 'Hulk',
+        'extra_info': {
+            'balance': decimal.Decimal('10.50'),
+            'last_seen': datetime.datetime(2019, 3, 10, 18, 53, 53),
+            'friends': [{'id': uuid.UUID(int=1), 'since': datetime.date(2019, 1, 1)}],
+        },
+    }
+
+    # When I convert it
+    message = UserMapping(user).to_protobuf()
+
+    # Then the values should be coerced
+    json_format.MessageToDict(message.metadata).should.equal({
+        'balance': 10.5,
+        'last_seen': '2019-03-10T18:53:53',
+        'friends': [{'id': '00000000-0000-0000-0000-000000000001', 'since': '2019-01-01'}],
+    })
+
+    # And to_bytes() should produce the same message, whose map
+    # entries are serialized in no particular order
+    domain_pb2.User.FromString(UserMapping(user).to_bytes()).should.equal(message)
+
+
+def test_struct_field_json_bytes():
+    "ProtoKey() of dict should parse JSON documents stored as bytes"
+
+    message = UserMapping({'extra_info': b'{"plan": "free", "seats": [1, 2]}'}).to_protobuf()
+
+    json_format.MessageToDict(message.metadata).should.equal({'plan': 'free', 'seats': [1.0, 2.0]})
+
+
+def test_struct_field_iterable_of_pairs():
+    "ProtoKey() of dict should still take iterables of pairs"
+
+    message = UserMapping({'extra_info': [('plan', 'free')]}).to_protobuf()
+
+    json_format.MessageToDict(message.metadata).should.equal({'plan': 'free'})
+
+
+def test_struct_field_invalid_value():
+    "ProtoKey() of dict should raise ProtobufCastError for values that cannot be coerced"
+
+    when_called = UserMapping({'extra_info': {'plan': object()}}).to_protobuf.when.called_with()
+
+    when_called.should.have.raised(ProtobufCastError, "object is not JSON serializable at ['plan']")
+
+
+def test_struct_field_number_out_of_range():
+    "ProtoKey() of dict or StructCaster() should raise ProtobufCastError for numbers that are not doubles"
+
+    data = {'extra_info': {'seats': [2 ** 1100]}}
+
+    UserMapping(data).to_protobuf.when.called_with().should.have.raised(ProtobufCastError, 'to dict')
+    UserMapping(data).to_dict.when.called_with().should.have.raised(ProtobufCastError, 'to dict')
+    TaggedUserMapping(data).to_protobuf.when.called_with().should.have.raised(ProtobufCastError, 'to StructCaster')
+
+
+def make_nested_document(depth, lists=False, price=decimal.Decimal('1.5')):
+    """returns a document of ``depth`` containers, alternating objects
+    and lists of objects when ``lists`` is ``True``, with a single key
+    per object so that they are serialized in a single order."""
+    document = leaf = {}
+    count = 1
+    while count < depth:
+        child = {}
+        if lists and count + 2 <= depth:
+            leaf['items'] = [child]
+            count += 2
+        else:
+            leaf['child'] = child
+            count += 1
+        leaf = child
+
+    leaf['price'] = price
+    return document
+
+
+def test_struct_field_deeply_nested():
+    ("ProtoKey() of dict should convert Struct fields nested deeper "
+     "than protobuf parses, in to_protobuf(), to_protobuf_many() and to_bytes()")
+
+    for depth in range(34, 51):
+        for lists in (False, True):
+            # Given a user whose extra info is nested that deep
+            extra_info = make_nested_document(depth, lists)
+            user = {'login': 'Hulk', 'extra_info': extra_info}
+
+            # When I convert it
+            message = UserMapping(user).to_protobuf()
+
+            # Then it matches the document
+            expected = json_format.ParseDict(make_nested_document(depth, lists, 1.5), domain_pb2.User().metadata)
+            message.metadata.should.equal(expected)
+            UserMapping.to_protobuf_many([user]).should.equal([message])
+            UserMapping(user).to_bytes().should.equal(message.SerializeToString())
+
+
+def test_struct_field_circular_reference():
+    "ProtoKey() of dict should raise ProtobufCastError for documents that contain themselves"
+
+    # Given extra info that contains itself
+    extra_info = {'plan': 'free'}
+    extra_info['self'] = extra_info
+
+    # When I convert it
+    when_called = UserMapping({'extra_info': extra_info}).to_protobuf.when.called_with()
+
+    # Then it fails rather than looping forever
+    when_called.should.have.raised(ProtobufCastError, "circular reference detected at ['self']")
+
+
+def test_struct_caster_field():
+    "ProtoKey() of StructCaster() should convert with its coercion table and back"
+
+    # Given a user with a set in its extra info
+    user = {'login': 'Hulk', 'extra_info': {'roles': {'smash', 'admin'}}}
+
+    # When I convert it and back
+    message = TaggedUserMapping(user).to_protobuf()
+    result = TaggedUserMapping.from_protobuf(message)
+
+    # Then the set should become a sorted list
+    result.should.have.key('extra_info').being.equal({'roles': ['admin', 'smash']})
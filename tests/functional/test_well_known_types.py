@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import datetime
+import importlib.util
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoList,
+)
+from mercator import codegen
+from mercator.errors import ProtobufCastError
+from mercator.wellknown import TIMESTAMP
+
+from . import domain_pb2
+
+
+class TimestampedTokenMapping(ProtoMapping):
+    __proto__ = domain_pb2.User.AuthToken
+
+    value = ProtoKey('data', str)
+    created_at = ProtoKey('created_at', TIMESTAMP)
+    expires_at = ProtoKey('expires_at', TIMESTAMP)
+
+
+class TimestampedUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+
+    username = ProtoKey('login', str)
+    tokens = ProtoList('tokens', TimestampedTokenMapping)
+
+
+def make_token(index=0):
+    return {
+        'data': f'token-{index}',
+        'created_at': datetime.datetime(2019, 3, 10, 18, 53, 53, 250000) + datetime.timedelta(seconds=index),
+        'expires_at': '2019-03-11T18:53:53.123456789Z',
+    }
+
+
+def test_timestamp_fields():
+    ("ProtoKey() of TIMESTAMP should fill Timestamp fields from datetimes "
+     "and ISO strings in to_protobuf(), to_bytes() and back")
+
+    # When I convert a token
+    message = TimestampedTokenMapping(make_token()).to_protobuf()
+
+    # Then its timestamps keep their sub-second precision
+    message.created_at.seconds.should.equal(1552244033)
+    message.created_at.nanos.should.equal(250000000)
+    message.expires_at.nanos.should.equal(123456789)
+
+    # And to_bytes() produces the same message
+    TimestampedTokenMapping(make_token()).to_bytes().should.equal(message.SerializeToString())
+
+    # And from_protobuf() returns aware datetimes
+    TimestampedTokenMapping.from_protobuf(message)['created_at'].should.equal(
+        datetime.datetime(2019, 3, 10, 18, 53, 53, 250000, tzinfo=datetime.timezone.utc))
+
+
+def test_timestamp_columns():
+    "to_protobuf_columns() should cast columns of TIMESTAMP fields, keeping None values"
+
+    tokens = [make_token(0), make_token(1)]
+    columns = {
+        'data': [token['data'] for token in tokens],
+        'created_at': [token['created_at'] for token in tokens],
+        'expires_at': [None, tokens[1]['expires_at']],
+    }
+
+    result = TimestampedTokenMapping.to_protobuf_columns(columns)
+
+    result[0].should.equal(TimestampedTokenMapping({**tokens[0], 'expires_at': None}).to_protobuf())
+    result[1].should.equal(TimestampedTokenMapping(tokens[1]).to_protobuf())
+
+
+def test_timestamp_invalid_value():
+    "ProtoKey() of TIMESTAMP should raise ProtobufCastError for invalid values"
+
+    when_called = TimestampedTokenMapping({'created_at': 'yesterday'}).to_protobuf.when.called_with()
+
+    when_called.should.have.raised(
+        ProtobufCastError,
+        '\'yesterday\' is not an ISO 8601 timestamp while casting "yesterday" (str) to TimestampCaster'
+    )
+
+
+def test_timestamp_generated_mappings(tmp_path):
+    "python -m mercator.codegen should write TIMESTAMP fields that produce the same messages"
+
+    # Given the generated module of this test module
+    path = tmp_path / 'static_timestamps.py'
+    codegen.main([__name__, 'TimestampedUserMapping', '-o', str(path)])
+    spec = importlib.util.spec_from_file_location('static_timestamps', str(path))
+    static = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(static)
+
+    # When I convert a user with tokens
+    user = {'login': 'Hulk', 'tokens': [make_token(0), make_token(1)]}
+
+    # Then the messages and the bytes are the same
+    static.TimestampedUserMapping(user).to_protobuf().should.equal(TimestampedUserMapping(user).to_protobuf())
+    static.TimestampedUserMapping(user).to_bytes().should.equal(TimestampedUserMapping(user).to_bytes())
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import array
+from uuid import uuid4
+
+from mercator import ProtoMapping, ProtoKey
+from mercator.errors import ProtobufCastError
+from mercator.wire import get_encoder
+
+from .mappings import (
+    AuthRequestMapping,
+    AuthResponseMapping,
+    MeasurementMapping,
+    MediaMapping,
+    UserMapping,
+)
+from . import domain_pb2
+from . import sql
+
+
+class PassThroughUserMapping(ProtoMapping):
+    __proto__ = domain_pb2.User
+
+    username = ProtoKey('login', str)
+    metadata = ProtoKey('extra_info')
+
+
+def assert_same_bytes(mapping_class, data):
+    expected = mapping_class(data).to_protobuf().SerializeToString()
+    mapping_class(data).to_bytes().should.equal(expected)
+
+
+def test_to_bytes_equals_serialize_to_string_dicts():
+    ("ProtoMapping.to_bytes() should be byte-for-byte equal "
+     "to SerializeToString() for nested dicts")
+
+    # Given a dict of media data with nested author and tokens
+    info = {
+        'id': str(uuid4()),
+        'login': 'Hulk',
+        'email': 'bruce@avengers.world',
+        'tokens': [
+            {
+                'data': 'this is the token',
+                'created_at': 1552240433,
+                'expires_at': 1552240733,
+            },
+            {
+                'data': 'x' * 300,
+            },
+            {},
+        ],
+        'extra_info': {
+            'just': 'some',
+        },
+    }
+    media = {
+        'author': info,
+        'link': 'https://test.com/media/ç/download',
+        'blob': b'\x00' * 200,
+    }
+
+    # Then to_bytes() should match SerializeToString()
+    assert_same_bytes(AuthRequestMapping, {'username': 'Hulk', 'password': ''})
+    assert_same_bytes(AuthResponseMapping, {'token': {}})
+    assert_same_bytes(UserMapping, info)
+    assert_same_bytes(MediaMapping, media)
+    assert_same_bytes(MediaMapping, {})
+    assert_same_bytes(MediaMapping, None)
+
+
+def test_to_bytes_equals_serialize_to_string_sqlalchemy():
+    ("ProtoMapping.to_bytes() should be byte-for-byte equal "
+     "to SerializeToString() for sqlalchemy objects")
+
+    # Given a sqlalchemy media instance with an author with tokens
+    user = sql.User(uuid=uuid4(), login='chucknorris')
+    user.tokens = [sql.AuthToken(data='token', created_at=1552240433)]
+    media = sql.Media(url='https://test.com/media/123/download', author=user)
+
+    # Then to_bytes() should match SerializeToString()
+    assert_same_bytes(UserMapping, user)
+    assert_same_bytes(MediaMapping, media)
+
+
+def test_to_bytes_scalar_types():
+    ("ProtoMapping.to_bytes() should encode every scalar type "
+     "byte-for-byte equal to SerializeToString()")
+
+    # Given different values for every type of field
+    cases = [
+        {
+            'value': 1.5, 'ratio': 0.1, 'delta': -1, 'total': -(1 << 63),
+            'count': (1 << 32) - 1, 'big_count': (1 << 64) - 1,
+            'offset': -(1 << 31), 'big_offset': (1 << 63) - 1,
+            'checksum': 1, 'big_checksum': 1 << 40,
+            'signed_checksum': -5, 'big_signed_checksum': -(1 << 40),
+            'valid': True, 'unit': 'µs', 'raw': b'\xff',
+            'samples': [0.0, -1.5, 2], 'deltas': [-1, 0, 1 << 40],
+            'tags': ['a', '', 'ç'], 'flags': [True, False],
+            'labels': {'a': 'b'}, 'taken_at': 1552240433,
+        },
+        {
+            'value': 0.0, 'ratio': -0.0, 'delta': 0, 'valid': False,
+            'unit': '', 'raw': b'', 'samples': [], 'tags': (),
+        },
+        {
+            'value': float('nan'), 'ratio': 1e40, 'total': 300,
+            'samples': [float('inf')], 'offset': 1,
+        },
+        {
+            'value': 2, 'ratio': 3, 'count': 200,
+        },
+    ]
+
+    # Then to_bytes() should match SerializeToString() for all of them
+    for data in cases:
+        assert_same_bytes(MeasurementMapping, data)
+
+
+def test_to_bytes_packed_buffers_and_long_lists():
+    ("ProtoMapping.to_bytes() should encode typed buffers and long "
+     "packed lists byte-for-byte equal to SerializeToString()")
+
+    # Given repeated numeric fields as buffers and lists of large varints
+    cases = [
+        {'samples': array.array('d', [0.5, -1.5]), 'deltas': array.array('i', [-1, 0, 1 << 20])},
+        {'samples': memoryview(array.array('f', [0.5])), 'flags': array.array('b', [1, 0])},
+        {'deltas': list(range(-5000, 5000, 7)), 'samples': array.array('d')},
+    ]
+
+    # Then to_bytes() should match SerializeToString() for all of them
+    for data in cases:
+        assert_same_bytes(MeasurementMapping, data)
+
+
+def test_to_bytes_invalid_values_raise_like_protobuf():
+    "ProtoMapping.to_bytes() should raise the same errors as building the message"
+
+    for data in ({'delta': 1 << 40}, {'valid': 'yes'}, {'flags': [1, 'no']}, {'raw': 'text'}):
+        to_protobuf = MeasurementMapping(data).to_protobuf
+        to_bytes = MeasurementMapping(data).to_bytes
+
+        error = None
+        try:
+            to_protobuf()
+        except Exception as e:
+            error = e
+
+        error.shouldnt.be.none
+        to_bytes.when.called.should.have.raised(type(error), str(error))
+
+    MeasurementMapping({'unit': 'ok', 'samples': ['x']}).to_bytes.when.called.should.have.raised(ValueError)
+    UserMapping({'tokens': [{'created_at': {}}]}).to_bytes.when.called.should.have.raised(ProtobufCastError)
+
+
+def test_to_bytes_into_reusable_buffer():
+    "ProtoMapping.to_bytes() should append to the given bytearray"
+
+    # Given a buffer with existing data
+    buffer = bytearray(b'prefix')
+
+    # When I encode two messages into it
+    result = AuthRequestMapping({'username': 'Hulk'}).to_bytes(into=buffer)
+    AuthRequestMapping({'password': 'smash'}).to_bytes(into=buffer)
+
+    # Then it should return the buffer itself
+    result.should.be(buffer)
+
+    # And the buffer should contain both messages after the prefix
+    bytes(buffer).should.equal(
+        b'prefix'
+        + AuthRequestMapping({'username': 'Hulk'}).to_protobuf().SerializeToString()
+        + AuthRequestMapping({'password': 'smash'}).to_protobuf().SerializeToString()
+    )
+
+
+def test_to_bytes_struct_fields_from_dicts():
+    "to_bytes() should give dicts to the constructor of Struct fields as documents, not as keyword-arguments"
+
+    assert_same_bytes(PassThroughUserMapping, {'login': 'Hulk', 'extra_info': {'color': 'green', 'tags': ['a']}})
+    assert_same_bytes(PassThroughUserMapping, {'login': 'Hulk', 'extra_info': {}})
+
+
+def test_encoder_is_compiled_once():
+    "get_encoder() should compile the encoder of a mapping on first use and cache it"
+
+    encoder = get_encoder(MediaMapping)
+
+    get_encoder(MediaMapping).should.be(encoder)
+    encoder.__source__.should.contain("getattr(data, 'author', None)")
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import json
+
+from mercator import bench
+
+
+def test_bench_writes_comparable_json(tmpdir):
+    "python -m mercator.bench --json should write the statistics of every scenario that can be compared across runs"
+
+    # Given a file for the results
+    output = tmpdir.join('results.json')
+
+    # When the flat scenarios run for a short time
+    bench.main(['--duration', '0.01', '--filter', 'flat', '--json', str(output)])
+
+    # Then the file should contain the environment and results
+    data = json.loads(output.read())
+    data['environment'].should.have.key('protobuf_implementation')
+    data['results'].keys().should.equal({'flat: dict -> AuthToken', 'flat: dict -> AuthToken bytes'})
+
+    for result in data['results'].values():
+        result['runs'].should.be.greater_than_or_equal_to(5)
+        result['ops_per_sec'].should.be.greater_than(0)
+        result['p99_us'].should.be.greater_than_or_equal_to(result['p50_us'])
+        result['peak_alloc_bytes'].should.be.greater_than(0)
+
+    # And a following run should compare against it
+    bench.main(['--duration', '0.01', '--filter', 'flat: dict -> AuthToken bytes', '--compare', str(output)]).should.have.length_of(1)
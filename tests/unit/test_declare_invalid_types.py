@@ -29,3 +29,17 @@ def test_declare_mapping_invalid_base_model_class():
         SyntaxError,
         'class Foo defined a __source_input_type__ attribute that is not a valid python type: foobar'
     )
+
+
+def test_declare_mapping_invalid_cache_key():
+    "SyntaxError should be raised when declaring a proto mapping with __cache_key__ that is not a function or a tuple of names"
+
+    def declare_invalid():
+        class Foo(ProtoMapping):
+            __proto__ = Message
+            __cache_key__ = 'uuid'
+
+    declare_invalid.when.called.should.have.raised(
+        SyntaxError,
+        "class Foo defined a __cache_key__ attribute that is not a function or a tuple of names: 'uuid'"
+    )
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+from google.protobuf import field_mask_pb2
+from google.protobuf import struct_pb2
+from google.protobuf import type_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoList,
+    ProtoEnum,
+    ProtoOneOf,
+)
+from mercator.delta import get_source_index
+
+
+class Record(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class OptionMapping(ProtoMapping):
+    __proto__ = type_pb2.Option
+
+    name = ProtoKey('name', str)
+
+
+class FieldMapping(ProtoMapping):
+    __proto__ = type_pb2.Field
+    __source_input_type__ = Record
+
+    name = ProtoKey('name', str)
+    number = ProtoKey('number', int)
+    kind = ProtoEnum('kind')
+    json_name = ProtoKey('name', str)
+    options = ProtoList('options', OptionMapping)
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+
+    kind = ProtoOneOf('type', aliases={'number': 'number_value', 'text': 'string_value'})
+    number_value = ProtoKey('amount', float)
+    string_value = ProtoKey('text', str)
+
+
+def make_field():
+    return FieldMapping({
+        'name': 'id',
+        'number': 1,
+        'kind': 'TYPE_STRING',
+        'options': [{'name': 'deprecated'}],
+    }).to_protobuf()
+
+
+def test_apply_to_replaces_present_keys_only():
+    "ProtoMapping.apply_to() should convert the present keys and keep the other fields"
+
+    # Given an existing message
+    message = make_field()
+
+    # When I apply a change of one key
+    result = FieldMapping({'number': '2'}).apply_to(message)
+
+    # Then it returns the same message, updated in place
+    result.should.be(message)
+    message.should.equal(type_pb2.Field(
+        name='id',
+        json_name='id',
+        number=2,
+        kind=type_pb2.Field.TYPE_STRING,
+        options=[type_pb2.Option(name='deprecated')],
+    ))
+
+
+def test_apply_to_fans_out_keys_to_every_field():
+    "ProtoMapping.apply_to() should update every field mapped from the same key"
+
+    message = make_field()
+
+    FieldMapping({'name': 'uuid'}).apply_to(message)
+
+    message.name.should.equal('uuid')
+    message.json_name.should.equal('uuid')
+
+
+def test_apply_to_replaces_repeated_fields():
+    "ProtoMapping.apply_to() should replace repeated fields rather than append to them"
+
+    message = make_field()
+
+    FieldMapping({'options': [{'name': 'packed'}, {'name': 'lazy'}]}).apply_to(message)
+
+    list(message.options).should.equal([type_pb2.Option(name='packed'), type_pb2.Option(name='lazy')])
+
+
+def test_apply_to_clears_none_values():
+    "ProtoMapping.apply_to() should clear the fields of keys set to None"
+
+    message = make_field()
+
+    FieldMapping({'kind': None, 'options': None}).apply_to(message)
+
+    message.kind.should.equal(type_pb2.Field.TYPE_UNKNOWN)
+    list(message.options).should.equal([])
+    message.name.should.equal('id')
+
+
+def test_apply_to_returns_field_mask():
+    "ProtoMapping.apply_to(mask=True) should return the touched fields in the order of the message"
+
+    message = make_field()
+
+    mask = FieldMapping({'options': None, 'name': 'uuid', 'unknown': 1}).apply_to(message, mask=True)
+
+    mask.should.equal(field_mask_pb2.FieldMask(paths=['name', 'options', 'json_name']))
+
+
+def test_apply_to_from_object_attributes():
+    "ProtoMapping.apply_to() should take the attributes present on instances of the source input type"
+
+    message = make_field()
+
+    mask = FieldMapping(Record(number=3)).apply_to(message, mask=True)
+
+    mask.paths.should.equal(['number'])
+    message.number.should.equal(3)
+    message.name.should.equal('id')
+
+
+def test_apply_to_invalid_message_or_data():
+    "ProtoMapping.apply_to() should raise TypeError for messages or data of other types"
+
+    FieldMapping({'number': 1}).apply_to.when.called_with(type_pb2.Option()).should.throw(
+        TypeError, 'must be a <class \'google.protobuf.type_pb2.Field\'>'
+    )
+    FieldMapping(object()).apply_to.when.called_with(type_pb2.Field()).should.throw(
+        TypeError, 'must be a dict or'
+    )
+
+
+def test_apply_to_switches_oneof_members():
+    "ProtoMapping.apply_to() should set the member of a oneof chosen by its discriminator"
+
+    # Given a value with a number
+    message = ValueMapping({'type': 'number', 'amount': 1, 'text': 'one'}).to_protobuf()
+    message.WhichOneof('kind').should.equal('number_value')
+
+    # When I apply the other member
+    ValueMapping({'type': 'text', 'amount': 1, 'text': 'one'}).apply_to(message)
+
+    # Then the oneof switches to it
+    message.should.equal(struct_pb2.Value(string_value='one'))
+
+
+def test_apply_to_clears_oneof_of_discriminator():
+    "ProtoMapping.apply_to() should clear the oneof whose discriminator is present, even without members"
+
+    # Given a value with a number
+    message = ValueMapping({'type': 'number', 'amount': 1}).to_protobuf()
+
+    # When I apply the discriminator of the other member alone
+    mask = ValueMapping({'type': 'text'}).apply_to(message, mask=True)
+
+    # Then the oneof is cleared, along with every member in the mask
+    message.WhichOneof('kind').should.be.none
+    mask.paths.should.equal([field.name for field in struct_pb2.Value.DESCRIPTOR.oneofs_by_name['kind'].fields])
+
+
+def test_diff_returns_changed_keys():
+    "ProtoMapping.diff() should return the changed values of the keys of the mapping"
+
+    old = {'name': 'id', 'number': 1, 'kind': 'TYPE_STRING', 'comment': 'old'}
+    new = Record(name='id', number=2, kind=None, comment='new')
+
+    FieldMapping.diff(old, new).should.equal({'number': 2, 'kind': None})
+    FieldMapping.diff(new, new).should.equal({})
+
+
+def test_diff_includes_oneof_discriminator():
+    "ProtoMapping.diff() should include the discriminator and members of a oneof whose member changed"
+
+    old = {'type': 'number', 'amount': 1, 'text': 'one'}
+    new = {'type': 'number', 'amount': 2, 'text': 'one'}
+
+    changes = ValueMapping.diff(old, new)
+
+    changes.should.have.key('type').being.equal('number')
+    changes.should.have.key('amount').being.equal(2)
+    changes.should.have.key('text').being.equal('one')
+    ValueMapping.diff(old, old).should.equal({})
+
+
+def test_diff_switches_oneof_members():
+    "ProtoMapping.diff() should carry the members of a oneof whose discriminator changed"
+
+    # Given a value whose discriminator changes but not its members
+    old = {'type': 'number', 'amount': 1, 'text': 'one'}
+    new = {'type': 'text', 'amount': 1, 'text': 'one'}
+    message = ValueMapping(old).to_protobuf()
+
+    # When I apply the differences
+    ValueMapping(ValueMapping.diff(old, new)).apply_to(message)
+
+    # Then the message is the one of the new value
+    message.should.equal(ValueMapping(new).to_protobuf())
+
+
+def test_source_index_is_computed_once_per_class():
+    "get_source_index() should keep the index in the mapping class"
+
+    index = get_source_index(FieldMapping)
+
+    get_source_index(FieldMapping).should.be(index)
+    [target[0] for target in index['name']].should.equal(['name', 'json_name'])
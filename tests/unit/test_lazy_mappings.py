@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from google.protobuf.struct_pb2 import ListValue
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoList, ProtoMapping
+from mercator import finalize_all
+from mercator.meta import PENDING_MAPPINGS
+from mercator.meta import is_finalized
+
+
+def test_lazy_mapping_is_finalized_on_first_use():
+    "mappings declared with __lazy__ should only compute their fields when used"
+
+    # Given a lazy mapping
+    class LazyTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+        __lazy__ = True
+
+        seconds = ProtoKey('epoch', int)
+
+    # Then it should not be finalized yet
+    is_finalized(LazyTimestampMapping).should.be.false
+    LazyTimestampMapping.seconds.descriptor.should.be.none
+
+    # When it converts data
+    result = LazyTimestampMapping({'epoch': '10', 'nanos': 5}).to_protobuf()
+
+    # Then it should have been finalized
+    result.should.equal(Timestamp(seconds=10, nanos=5))
+    is_finalized(LazyTimestampMapping).should.be.true
+    list(LazyTimestampMapping.__fields__).should.equal(['seconds', 'nanos'])
+    list(LazyTimestampMapping.__implicit_mappings__).should.equal(['seconds', 'nanos'])
+    LazyTimestampMapping.seconds.number.should.equal(1)
+    LazyTimestampMapping.__plan__.should.be.callable
+
+
+def test_lazy_mapping_finalizes_nested_mappings():
+    "a lazy mapping used as target type should be finalized along with its parent"
+
+    # Given a lazy mapping nested in another lazy mapping
+    class LazyTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+        __lazy__ = True
+
+    class LazyListMapping(ProtoMapping):
+        __proto__ = ListValue
+        __lazy__ = True
+
+        values = ProtoList('items', LazyTimestampMapping)
+
+    # When the parent is finalized
+    LazyListMapping.__fields__.should.have.key('values')
+
+    # Then the nested mapping is finalized as well
+    is_finalized(LazyTimestampMapping).should.be.true
+
+
+def test_finalize_all():
+    "finalize_all() should finalize all pending lazy mappings"
+
+    # Given a few lazy mappings
+    class LazySecondsMapping(ProtoMapping):
+        __proto__ = Timestamp
+        __lazy__ = True
+
+    class LazyNanosMapping(ProtoMapping):
+        __proto__ = Timestamp
+        __lazy__ = True
+
+    # When finalize_all() is called
+    count = finalize_all()
+
+    # Then all of them are finalized
+    count.should.be.greater_than_or_equal_to(2)
+    is_finalized(LazySecondsMapping).should.be.true
+    is_finalized(LazyNanosMapping).should.be.true
+    PENDING_MAPPINGS.should.be.empty
+
+    # And calling it again does nothing
+    finalize_all().should.equal(0)
+
+
+def test_lazy_mapping_missing_proto():
+    "SyntaxError should still be raised when declaring a lazy mapping without a __proto__ attribute"
+
+    def declare_invalid():
+        class Foo(ProtoMapping):
+            __lazy__ = True
+
+    declare_invalid.when.called.should.have.raised(
+        SyntaxError,
+        'class Foo does not define a __proto__'
+    )
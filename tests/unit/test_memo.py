@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import sys
+import asyncio
+import threading
+
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoList, MemoCache
+from mercator.memo import get_current_cache
+from mercator.memo import memoized
+
+
+def test_memo_cache_nested_activation():
+    "MemoCache() should be the current cache within its block only, even when nested"
+
+    outer = MemoCache()
+    inner = MemoCache()
+    with outer:
+        with inner:
+            get_current_cache().should.be(inner)
+
+        get_current_cache().should.be(outer)
+
+    get_current_cache().should.be.none
+
+
+def test_memo_cache_interleaved_tasks():
+    "MemoCache() should be entered by concurrent tasks that exit in any order"
+
+    # Given a cache shared by two tasks
+    cache = MemoCache()
+    first_entered = asyncio.Event()
+    second_entered = asyncio.Event()
+    first_exited = asyncio.Event()
+    seen = []
+
+    async def first():
+        with cache:
+            first_entered.set()
+            await second_entered.wait()
+
+        first_exited.set()
+        seen.append(('first', get_current_cache()))
+
+    async def second():
+        await first_entered.wait()
+        with cache:
+            second_entered.set()
+            await first_exited.wait()
+            seen.append(('second', get_current_cache()))
+
+        seen.append(('second', get_current_cache()))
+
+    async def main():
+        await asyncio.gather(first(), second())
+
+    # When the first task exits while the second one is still within the block
+    asyncio.run(main())
+
+    # Then each task restores its own state
+    seen.should.equal([('first', None), ('second', cache), ('second', None)])
+    get_current_cache().should.be.none
+
+
+def test_memo_cache_shared_by_threads():
+    "MemoCache() should keep consistent entries and statistics when shared by several threads"
+
+    # Given a small cache shared by 8 threads that convert overlapping keys
+    cache = MemoCache(maxsize=8)
+    convert_memoized = memoized(lambda value: value['id'] * 2, 'id')
+    errors = []
+    start = threading.Barrier(8)
+
+    def work(offset):
+        start.wait()
+        try:
+            with cache:
+                for index in range(2000):
+                    value = (index + offset) % 32
+                    convert_memoized({'id': value}).should.equal(value * 2)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+
+    # When they convert at the same time, evicting each other's entries,
+    # switching between threads as often as possible
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    # Then every lookup was counted and the cache kept its maximum size
+    errors.should.equal([])
+    (cache.hits + cache.misses).should.equal(8 * 2000)
+    len(cache).should.be.lower_than_or_equal_to(8)
+    cache.evictions.should.be.greater_than(0)
+
+
+def test_memoized_distinct_values():
+    "memoized(memoize=True) should convert distinct values separately, even while they are alive"
+
+    calls = []
+
+    def convert(value):
+        calls.append(value)
+        return len(calls)
+
+    convert_memoized = memoized(convert, True)
+    with MemoCache() as cache:
+        convert_memoized([1]).should.equal(1)
+        convert_memoized([2]).should.equal(2)
+
+    cache.hits.should.equal(0)
+    cache.clear()
+    cache.stats().should.equal({'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 4096, 'hit_rate': 0.0})
+
+
+def test_memo_cache_invalid_maxsize():
+    "MemoCache() should require a positive maxsize"
+
+    MemoCache.when.called_with(maxsize=0).should.have.raised(
+        ValueError,
+        'MemoCache() takes a positive maxsize, but got 0 instead'
+    )
+
+
+def test_memoize_requires_proto_mapping():
+    "ProtoKey() and ProtoList() should only memoize ProtoMapping target types"
+
+    ProtoKey.when.called_with('created_at', Timestamp, memoize=True).should.have.raised(
+        TypeError,
+        "<class 'mercator.ProtoKey'> can only memoize ProtoMapping target types"
+    )
+    ProtoList.when.called_with('tags', str, memoize='id').should.have.raised(
+        TypeError,
+        "<class 'mercator.ProtoList'> can only memoize ProtoMapping target types"
+    )
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.struct_pb2 import ListValue, Struct, Value
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoList, ProtoMapping
+from mercator.meta import ImplicitField
+from mercator.meta import field_properties_from_proto_class
+
+
+def test_field_properties_from_proto_class_uses_descriptor():
+    "field_properties_from_proto_class() should return field names from the DESCRIPTOR in declaration order"
+
+    field_properties_from_proto_class(Timestamp).should.equal(['seconds', 'nanos'])
+    field_properties_from_proto_class(Value).should.equal([
+        'null_value',
+        'number_value',
+        'string_value',
+        'bool_value',
+        'struct_value',
+        'list_value',
+    ])
+
+
+def test_implicit_fields_expose_descriptor_metadata():
+    "MetaMapping should bind implicit fields to their descriptor"
+
+    class TimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+    seconds = TimestampMapping.__fields__['seconds']
+    seconds.should.be.an(ImplicitField)
+    seconds.number.should.equal(1)
+    seconds.proto_type.should.equal(FieldDescriptor.TYPE_INT64)
+    seconds.label.should.equal('optional')
+    seconds.message_type.should.be.none
+    seconds.oneof.should.be.none
+
+    TimestampMapping({'seconds': 10, 'nanos': 5}).to_protobuf().should.equal(Timestamp(seconds=10, nanos=5))
+
+
+def test_explicit_fields_expose_descriptor_metadata():
+    "MetaMapping should bind ProtoKey and ProtoList declarations to their descriptor"
+
+    class ValueMapping(ProtoMapping):
+        __proto__ = Value
+
+        string_value = ProtoKey('text', str)
+
+    class ListValueMapping(ProtoMapping):
+        __proto__ = ListValue
+
+        values = ProtoList('items', ValueMapping)
+
+    string_value = ValueMapping.__fields__['string_value']
+    string_value.should.be(ValueMapping.string_value)
+    string_value.number.should.equal(3)
+    string_value.proto_type.should.equal(FieldDescriptor.TYPE_STRING)
+    string_value.oneof.should.equal('kind')
+
+    struct_value = ValueMapping.__fields__['struct_value']
+    struct_value.message_type.should.be(Struct.DESCRIPTOR)
+
+    values = ListValueMapping.__fields__['values']
+    values.label.should.equal('repeated')
+    values.message_type.should.be(Value.DESCRIPTOR)
+
+
+def test_shared_declarations_are_bound_separately():
+    "MetaMapping should copy field mappings shared by different protobuf fields"
+
+    shared = ProtoKey('value', int)
+
+    class SecondsMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        seconds = shared
+
+    class NanosMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        nanos = shared
+
+    SecondsMapping.__fields__['seconds'].number.should.equal(1)
+    NanosMapping.__fields__['nanos'].number.should.equal(2)
+    NanosMapping.__fields__['nanos'].shouldnt.be(shared)
+
+
+def test_unbound_field_mapping_metadata():
+    "FieldMapping metadata should be None for fields not declared in the protobuf"
+
+    class TimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        unknown = ProtoKey('unknown')
+
+    unknown = TimestampMapping.__fields__['unknown']
+    unknown.number.should.be.none
+    unknown.label.should.be.none
+    unknown.oneof.should.be.none
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from mercator.meta import FieldMapping
+from mercator.errors import ProtobufCastError
 
 
 def test_proto_key_invalid_type():
@@ -14,3 +15,33 @@ def test_proto_key_invalid_type():
         TypeError,
         "<class 'mercator.meta.FieldMapping'> takes a type as second argument, but got str instead"
     )
+
+
+def test_compile_column_caster_maps_python_types():
+    "FieldMapping.compile_column_caster() should cast a whole column and keep None values"
+
+    # Given a field mapping with a python type
+    cast_column = FieldMapping('count', str).compile_column_caster()
+
+    # When I cast columns with and without None
+    cast_column([1, 2]).should.equal(['1', '2'])
+    cast_column([1, None]).should.equal(['1', None])
+
+
+def test_compile_column_caster_reports_faulty_value():
+    "FieldMapping.compile_column_caster() should raise ProtobufCastError for the value that cannot be cast"
+
+    # Given a column caster into int
+    cast_column = FieldMapping('count', int).compile_column_caster()
+
+    # When I cast a column with an invalid value
+    when_called = cast_column.when.called_with(['1', 'two'])
+
+    # Then it reports the faulty value
+    when_called.should.have.raised(ProtobufCastError, 'while casting "two" (str) to int')
+
+
+def test_compile_column_caster_without_target_type():
+    "FieldMapping.compile_column_caster() should return None when values pass through untouched"
+
+    FieldMapping('count').compile_column_caster().should.be.none
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+from google.protobuf.struct_pb2 import ListValue, Value
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoList, ProtoMapping
+from mercator import metrics
+from mercator.stream import iter_delimited, write_delimited
+
+
+class NumberMapping(ProtoMapping):
+    __proto__ = Value
+
+    number_value = ProtoKey('number', float)
+
+
+class NumbersMapping(ProtoMapping):
+    __proto__ = ListValue
+
+    values = ProtoList('numbers', NumberMapping)
+
+
+def test_metrics_record_mappings_and_fields():
+    "metrics.enable() should record calls, time and items per mapping and per field"
+
+    # Given that metrics are enabled
+    metrics.reset()
+    metrics.enable()
+    try:
+        # When a nested mapping converts data twice
+        NumbersMapping({'numbers': [{'number': 1}, {'number': 2}]}).to_protobuf()
+        NumbersMapping.to_protobuf_many([{'numbers': [{'number': 3}]}])
+    finally:
+        metrics.disable()
+
+    # Then the statistics should be available in a snapshot
+    snapshot = metrics.snapshot()
+    numbers = snapshot[f'{__name__}.NumbersMapping']
+    numbers['calls'].should.equal(2)
+    numbers['seconds'].should.be.greater_than(0)
+    numbers['fields']['values']['calls'].should.equal(2)
+    numbers['fields']['values']['items'].should.equal(3)
+
+    number = snapshot[f'{__name__}.NumberMapping']
+    number['calls'].should.equal(3)
+    number['fields']['number_value']['calls'].should.equal(3)
+
+    # And be serializable as JSON
+    json.loads(metrics.to_json()).should.equal(snapshot)
+
+
+class TimestampMapping(ProtoMapping):
+    __proto__ = Timestamp
+
+    seconds = ProtoKey('epoch', int)
+
+
+def test_metrics_record_wire_encoding():
+    "metrics.enable() should record the conversions of to_bytes() and of delimited streams"
+
+    # Given that metrics are enabled
+    metrics.reset()
+    metrics.enable()
+    try:
+        # When data is encoded in wire format
+        TimestampMapping({'epoch': 1}).to_bytes()
+        list(iter_delimited(TimestampMapping, [{'epoch': 2}]))
+        write_delimited(TimestampMapping, [{'epoch': 3}], io.BytesIO())
+        NumbersMapping({'numbers': [{'number': 1}, {'number': 2}]}).to_bytes()
+    finally:
+        metrics.disable()
+
+    # Then every encoded message should be counted
+    snapshot = metrics.snapshot()
+    timestamp = snapshot[f'{__name__}.TimestampMapping']
+    timestamp['calls'].should.equal(3)
+    timestamp['fields']['seconds']['calls'].should.equal(3)
+
+    numbers = snapshot[f'{__name__}.NumbersMapping']
+    numbers['calls'].should.equal(1)
+    numbers['fields']['values']['items'].should.equal(2)
+
+    # And nested messages built through their plan only once
+    snapshot[f'{__name__}.NumberMapping']['calls'].should.equal(2)
+
+
+def test_metrics_do_not_record_rows_columns_and_dicts():
+    "metrics should not record rows, columns nor the interpreted to_dict()"
+
+    # Given that metrics are enabled
+    metrics.reset()
+    metrics.enable()
+    try:
+        # When data is converted by rows, by columns or by to_dict()
+        TimestampMapping.to_protobuf_rows([(1,)], columns=['epoch'])
+        TimestampMapping.to_protobuf_columns({'epoch': [1, 2]})
+        TimestampMapping({'epoch': 1}).to_dict()
+    finally:
+        metrics.disable()
+
+    # Then nothing should be recorded
+    metrics.snapshot().should.equal({})
+
+
+def test_metrics_disabled_restores_original_plans():
+    "metrics.disable() should restore the exact plans that were compiled without metrics"
+
+    # Given the original plans
+    original = NumbersMapping.__plan__
+    nested = NumberMapping.__plan__
+
+    # When metrics are enabled
+    metrics.enable()
+    try:
+        # Then the plans should be replaced
+        NumbersMapping.__plan__.shouldnt.be(original)
+        NumbersMapping.__plan__.__wrapped__.shouldnt.be(original)
+    finally:
+        metrics.disable()
+
+    # And restored once disabled
+    NumbersMapping.__plan__.should.be(original)
+    NumberMapping.__plan__.should.be(nested)
+
+
+def test_metrics_disabled_restores_original_encoders():
+    "metrics.disable() should restore the encoders compiled without metrics"
+
+    # Given an encoder compiled before metrics are enabled
+    TimestampMapping({'epoch': 1}).to_bytes()
+    original = TimestampMapping.__encoder__
+
+    # When metrics are enabled
+    metrics.enable()
+    try:
+        # Then the encoder should be replaced
+        TimestampMapping.__encoder__.shouldnt.be(original)
+    finally:
+        metrics.disable()
+
+    # And restored once disabled
+    TimestampMapping.__encoder__.should.be(original)
+
+
+def test_metrics_mappings_declared_while_enabled():
+    "mappings declared after metrics.enable() should be instrumented without affecting their plans once disabled"
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        class LaterTimestampMapping(ProtoMapping):
+            __proto__ = Timestamp
+            __lazy__ = True
+
+            seconds = ProtoKey('epoch', int)
+
+        LaterTimestampMapping({'epoch': '10'}).to_protobuf().should.equal(Timestamp(seconds=10))
+    finally:
+        metrics.disable()
+
+    statistics = metrics.snapshot()[f'{__name__}.test_metrics_mappings_declared_while_enabled.<locals>.LaterTimestampMapping']
+    statistics['calls'].should.equal(1)
+    statistics['fields']['seconds']['calls'].should.equal(1)
+    LaterTimestampMapping.__plan__.shouldnt.have.property('__wrapped__')
+
+
+def test_metrics_to_prometheus():
+    "metrics.to_prometheus() should export the snapshot in the Prometheus text format"
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        NumberMapping({'number': 4}).to_protobuf()
+    finally:
+        metrics.disable()
+
+    text = metrics.to_prometheus()
+    text.should.contain('# TYPE mercator_mapping_calls_total counter\n')
+    text.should.contain(f'mercator_mapping_calls_total{{mapping="{__name__}.NumberMapping"}} 1\n')
+    text.should.contain(f'mercator_field_calls_total{{mapping="{__name__}.NumberMapping",field="number_value"}} 1\n')
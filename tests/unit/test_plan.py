@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from google.protobuf.struct_pb2 import Value
+from google.protobuf.timestamp_pb2 import Timestamp
+from google.protobuf.type_pb2 import Field
+
+from mercator import ProtoKey, ProtoList, ProtoMapping
+from mercator.meta import FieldMapping
+from mercator.plan import is_opaque_field
+from mercator.plan import supports_sparse_extraction
+
+
+class TimestampMapping(ProtoMapping):
+    __proto__ = Timestamp
+
+    seconds = ProtoKey('secs', int)
+    nanos = ProtoKey('nanos')
+
+
+def test_compiled_plan_is_generated_at_class_creation():
+    "MetaMapping should compile a plan with the source key names resolved up front"
+
+    plan = TimestampMapping.__plan__
+
+    plan.should.be.callable
+    plan.__source__.should.contain("get('secs')")
+    plan.__source__.should.contain("getattr(data, 'nanos', None)")
+
+    result = plan({'secs': '10', 'nanos': 5})
+    result.should.equal(Timestamp(seconds=10, nanos=5))
+
+
+def test_compiled_plan_disabled_when_to_dict_is_overriden():
+    "MetaMapping should not compile a plan for mappings that customize to_dict()"
+
+    class CustomTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        def to_dict(self):
+            return {'seconds': 42}
+
+    CustomTimestampMapping.__plan__.should.be.none
+    CustomTimestampMapping({}).to_protobuf().seconds.should.equal(42)
+
+
+def test_compiled_plan_nested_custom_mapping():
+    "ProtoKey should convert nested mappings with custom to_protobuf() through their own method"
+
+    class CustomTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        def to_protobuf(self):
+            return Timestamp(seconds=self.data * 2)
+
+    field = ProtoKey('created_at', CustomTimestampMapping)
+    field.compile_caster()(21).should.equal(Timestamp(seconds=42))
+
+
+def test_is_opaque_field():
+    "is_opaque_field() should detect FieldMapping subclasses that override cast() but not compile_caster()"
+
+    class DoublingKey(ProtoKey):
+        def cast(self, value):
+            return (value or 1) * 2
+
+    is_opaque_field(ProtoKey('seconds', int)).should.be.false
+    is_opaque_field(ProtoList('seconds', int)).should.be.false
+    is_opaque_field(FieldMapping('seconds')).should.be.false
+    is_opaque_field(DoublingKey('seconds')).should.be.true
+
+
+def test_compiled_plan_opaque_field_receives_none():
+    "the compiled plan should call cast() of custom fields even for missing values"
+
+    class DoublingKey(ProtoKey):
+        def cast(self, value):
+            return (value or 1) * 2
+
+    class DoublingMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        seconds = DoublingKey('seconds')
+
+    DoublingMapping({}).to_protobuf().seconds.should.equal(2)
+    DoublingMapping({'seconds': 4}).to_protobuf().seconds.should.equal(8)
+
+
+def test_compiled_plan_invalid_input_type():
+    "the compiled plan should raise TypeError for inputs that are neither dicts nor __source_input_type__ instances"
+
+    TimestampMapping.__plan__.when.called_with(['invalid']).should.have.raised(
+        TypeError,
+        "['invalid'] must be a dict or None but is <class 'list'> instead"
+    )
+
+
+def test_compiled_plan_sparse_dicts():
+    "the compiled plan should convert dicts with few keys by iterating over the keys present"
+
+    # Given a mapping of a wide message with casters, a key used by
+    # two fields and a custom field
+    class DoublingKey(ProtoKey):
+        def cast(self, value):
+            return (value or 1) * 2
+
+    class ProtoFieldMapping(ProtoMapping):
+        __proto__ = Field
+
+        number = ProtoKey('position', int)
+        oneof_index = ProtoKey('position', int)
+        name = ProtoKey('title', str)
+        json_name = ProtoKey('title')
+        packed = ProtoKey('packed', bool)
+        cardinality = DoublingKey('cardinality')
+
+    plan = ProtoFieldMapping.__plan__
+    plan.__source__.should.contain('for key, value in data.items():')
+
+    # When a sparse dict is converted
+    result = plan({'position': '3', 'title': 'Hulk', 'unknown': 'key', 'packed': None})
+
+    # Then only the given fields should be populated
+    result.should.equal(Field(number=3, oneof_index=3, name='Hulk', json_name='Hulk', cardinality=2))
+
+    # And it should match the conversion of the equivalent dense dict
+    dense = {'position': '3', 'title': 'Hulk', 'packed': None, 'kind': None, 'options': None, 'type_url': None}
+    result.should.equal(plan(dense))
+
+
+def test_compiled_plan_sparse_disabled_for_oneofs():
+    "the compiled plan should not use sparse extraction for messages with oneof fields"
+
+    class ValueMapping(ProtoMapping):
+        __proto__ = Value
+
+    supports_sparse_extraction(ValueMapping.__fields__).should.be.false
+    ValueMapping.__plan__.__source__.shouldnt.contain('for key, value in data.items():')
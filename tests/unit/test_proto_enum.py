@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import enum
+
+from google.protobuf import descriptor_pb2
+from google.protobuf import type_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoEnum,
+)
+from mercator.errors import ProtobufCastError, TypeCastError
+
+
+class FieldMapping(ProtoMapping):
+    __proto__ = type_pb2.Field
+
+    kind = ProtoEnum('type', aliases={'str': 'TYPE_STRING', 'int': 'TYPE_INT64', 'float': 1})
+    cardinality = ProtoEnum('cardinality', case_sensitive=True)
+
+
+class EnumValueMapping(ProtoMapping):
+    __proto__ = type_pb2.Field
+
+    kind = ProtoEnum('type')
+
+
+def test_proto_enum_tables():
+    "ProtoEnum() should compute the numbers of names, aliases and their case-folded forms when bound"
+
+    # Given the field mapping bound to google.protobuf.Field.kind
+    field = FieldMapping.kind
+
+    # Then the table has the names, numbers and aliases of the enum
+    field.numbers['TYPE_STRING'].should.equal(type_pb2.Field.TYPE_STRING)
+    field.numbers['type_string'].should.equal(type_pb2.Field.TYPE_STRING)
+    field.numbers[type_pb2.Field.TYPE_STRING].should.equal(type_pb2.Field.TYPE_STRING)
+    field.numbers['str'].should.equal(type_pb2.Field.TYPE_STRING)
+    field.numbers['float'].should.equal(type_pb2.Field.TYPE_DOUBLE)
+
+    # And the names by number
+    field.names[type_pb2.Field.TYPE_INT64].should.equal('TYPE_INT64')
+
+
+def test_proto_enum_cast():
+    "ProtoEnum() should cast names, aliases, numbers and enum members into numbers"
+
+    cast = FieldMapping.kind.compile_caster()
+
+    cast('TYPE_BOOL').should.equal(type_pb2.Field.TYPE_BOOL)
+    cast('Type_Bool').should.equal(type_pb2.Field.TYPE_BOOL)
+    cast('INT').should.equal(type_pb2.Field.TYPE_INT64)
+    cast(type_pb2.Field.TYPE_BYTES).should.equal(type_pb2.Field.TYPE_BYTES)
+    FieldMapping.kind.cast(None).should.be.none
+
+
+def test_proto_enum_case_sensitive():
+    "ProtoEnum(case_sensitive=True) should only accept the exact names"
+
+    cast = FieldMapping.cardinality.compile_caster()
+
+    cast('CARDINALITY_REPEATED').should.equal(type_pb2.Field.CARDINALITY_REPEATED)
+    cast.when.called_with('cardinality_repeated').should.throw(
+        ProtobufCastError,
+        '"cardinality_repeated" (str) is not a value of google.protobuf.Field.Cardinality'
+    )
+
+
+def test_proto_enum_members_of_python_enums():
+    "ProtoEnum() should look up members of enum.Enum by name"
+
+    class Kind(enum.Enum):
+        TYPE_STRING = 'string'
+        type_bool = 'bool'
+        OTHER = 'other'
+
+    cast = EnumValueMapping.kind.compile_caster()
+
+    cast(Kind.TYPE_STRING).should.equal(type_pb2.Field.TYPE_STRING)
+    cast(Kind.type_bool).should.equal(type_pb2.Field.TYPE_BOOL)
+    cast.when.called_with(Kind.OTHER).should.throw(ProtobufCastError, 'is not a value of google.protobuf.Field.Kind')
+
+
+def test_proto_enum_unknown_values():
+    "ProtoEnum() should reject unknown names and unhashable values but keep unknown numbers of open enums"
+
+    cast = EnumValueMapping.kind.compile_caster()
+
+    cast(999).should.equal(999)
+    cast.when.called_with('TYPE_COMPLEX').should.throw(
+        ProtobufCastError,
+        '"TYPE_COMPLEX" (str) is not a value of google.protobuf.Field.Kind'
+    )
+    cast.when.called_with(['TYPE_STRING']).should.throw(ProtobufCastError, "(list) is not a value")
+
+
+def test_proto_enum_to_protobuf():
+    "ProtoEnum() fields should be converted by to_protobuf(), to_dict() and back by from_protobuf()"
+
+    # Given a field description with names
+    data = {'type': 'str', 'cardinality': 'CARDINALITY_OPTIONAL', 'name': 'login'}
+
+    # When I convert it
+    message = FieldMapping(data).to_protobuf()
+
+    # Then the enum fields have their numbers
+    message.should.equal(type_pb2.Field(
+        kind=type_pb2.Field.TYPE_STRING,
+        cardinality=type_pb2.Field.CARDINALITY_OPTIONAL,
+        name='login',
+    ))
+    FieldMapping(data).to_dict().should.have.key('kind').being.equal(type_pb2.Field.TYPE_STRING)
+    FieldMapping(data).to_bytes().should.equal(message.SerializeToString())
+
+    # And converting the message back returns the canonical names
+    parsed = FieldMapping.from_protobuf(message)
+    parsed.should.have.key('type').being.equal('TYPE_STRING')
+    parsed.should.have.key('cardinality').being.equal('CARDINALITY_OPTIONAL')
+
+
+def test_proto_enum_repeated_fields():
+    "ProtoEnum() should cast every item of repeated enum fields"
+
+    class FieldOptionsMapping(ProtoMapping):
+        __proto__ = descriptor_pb2.FieldOptions
+
+        targets = ProtoEnum('targets', aliases={'file': 'TARGET_TYPE_FILE'})
+
+    cast = FieldOptionsMapping.targets.compile_caster()
+
+    cast(['file', 'target_type_message']).should.equal([
+        descriptor_pb2.FieldOptions.TARGET_TYPE_FILE,
+        descriptor_pb2.FieldOptions.TARGET_TYPE_MESSAGE,
+    ])
+    cast.when.called_with('file').should.throw(TypeCastError, 'ProtoEnum.cast() received a non-list value')
+
+    # And the closed enums of proto2 reject unknown numbers
+    cast.when.called_with([999]).should.throw(ProtobufCastError, '"999" (int) is not a value of')
+
+    message = FieldOptionsMapping({'targets': ['FILE', 'TARGET_TYPE_ENUM']}).to_protobuf()
+    list(message.targets).should.equal([
+        descriptor_pb2.FieldOptions.TARGET_TYPE_FILE,
+        descriptor_pb2.FieldOptions.TARGET_TYPE_ENUM,
+    ])
+    FieldOptionsMapping.from_protobuf(message).should.have.key('targets').being.equal(['TARGET_TYPE_FILE', 'TARGET_TYPE_ENUM'])
+
+
+def test_proto_enum_invalid_declarations():
+    "ProtoEnum() should reject fields that are not enums and aliases of unknown values"
+
+    def declare(name, field):
+        return type('InvalidMapping', (ProtoMapping,), {'__proto__': type_pb2.Field, name: field})
+
+    declare.when.called_with('name', ProtoEnum('name')).should.throw(
+        TypeError,
+        'ProtoEnum() must be declared for an enum field, but google.protobuf.Field.name is not one'
+    )
+    declare.when.called_with('kind', ProtoEnum('kind', aliases={'str': 'STRING'})).should.throw(
+        TypeError,
+        "ProtoEnum() takes aliases of the values of google.protobuf.Field.Kind, but got 'str': 'STRING'"
+    )
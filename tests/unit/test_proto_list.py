@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import array
+
+from google.protobuf.descriptor_pb2 import SourceCodeInfo
 from google.protobuf.timestamp_pb2 import Timestamp
 
 from mercator import ProtoList, ProtoKey, ProtoMapping
@@ -66,3 +69,37 @@ def test_proto_list_native_type():
     t1, t2 = result
     t1.should.be.a(str)
     t2.should.be.a(str)
+
+
+def test_proto_list_from_array():
+    "ProtoList() should convert typed buffers into lists of native types"
+
+    field = ProtoList('user_ids', str)
+    result = field.cast(array.array('q', [1, 2]))
+
+    result.should.equal(['1', '2'])
+
+
+def test_proto_list_bound_to_numeric_field_from_array():
+    "ProtoList() should convert buffers given to a numeric field at once"
+
+    field = ProtoList('path')
+    field.bind(SourceCodeInfo.Location.DESCRIPTOR.fields_by_name['path'])
+    cast = field.compile_caster()
+
+    cast(array.array('i', [1, 2])).should.equal([1, 2])
+    cast(memoryview(array.array('B', [3]))).should.equal([3])
+
+
+def test_proto_list_bound_to_numeric_field_from_array_of_other_type():
+    "ProtoList() should raise TypeCastError when a numeric field receives a buffer of another type"
+
+    field = ProtoList('path')
+    field.bind(SourceCodeInfo.Location.DESCRIPTOR.fields_by_name['path'])
+
+    when_called = field.compile_caster().when.called_with(array.array('d', [1.5]))
+
+    when_called.should.have.raised(
+        TypeCastError,
+        "ProtoList.cast() received a buffer of 'd' items for the numeric field google.protobuf.SourceCodeInfo.Location.path"
+    )
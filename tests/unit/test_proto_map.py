@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from google.protobuf import struct_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoMap,
+)
+from mercator.errors import ProtobufCastError, TypeCastError
+
+
+class Record(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+    __source_input_type__ = Record
+
+    string_value = ProtoKey('text', str)
+    number_value = ProtoKey('amount', float)
+
+
+class StructMapping(ProtoMapping):
+    __proto__ = struct_pb2.Struct
+
+    fields = ProtoMap('properties', ValueMapping, key='name')
+
+
+class KeyedStructMapping(ProtoMapping):
+    __proto__ = struct_pb2.Struct
+
+    fields = ProtoMap('properties', key_type=str)
+
+
+def test_proto_map_from_dict():
+    "ProtoMap() should convert every value of a dict with the nested mapping"
+
+    # Given a dict of values
+    data = {'properties': {'name': {'text': 'Hulk'}, 'age': {'amount': 49}}}
+
+    # When I convert it
+    message = StructMapping(data).to_protobuf()
+
+    # Then the map has all the entries
+    message.should.equal(struct_pb2.Struct(fields={
+        'name': struct_pb2.Value(string_value='Hulk'),
+        'age': struct_pb2.Value(number_value=49),
+    }))
+
+
+def test_proto_map_from_records():
+    "ProtoMap(key=...) should key a list of records by one of their keys or attributes"
+
+    # Given records as dicts and objects
+    data = {'properties': [{'name': 'name', 'text': 'Hulk'}, Record(name='age', text=None, amount=49)]}
+
+    # When I cast them
+    cast = StructMapping.fields.compile_caster()
+    values = cast(data['properties'])
+
+    # Then the values are keyed by their name, as the keyword-arguments of their message
+    values.should.equal({
+        'name': {'string_value': 'Hulk'},
+        'age': {'number_value': 49.0},
+    })
+
+
+def test_proto_map_key_type():
+    "ProtoMap(key_type=...) should cast the keys and keep values as they are without target type"
+
+    cast = KeyedStructMapping.fields.compile_caster()
+
+    cast({1: {'string_value': 'one'}}).should.equal({'1': {'string_value': 'one'}})
+    KeyedStructMapping({'properties': {1: {'bool_value': True}}}).to_protobuf().should.equal(
+        struct_pb2.Struct(fields={'1': struct_pb2.Value(bool_value=True)})
+    )
+
+
+def test_proto_map_invalid_values():
+    "ProtoMap() should reject values that are not dicts, or lists without key"
+
+    StructMapping.fields.cast.when.called_with('name').should.throw(
+        TypeCastError,
+        "ProtoMap('properties') takes a dict or a list of records, but got str: name"
+    )
+    KeyedStructMapping.fields.cast.when.called_with([1]).should.throw(
+        TypeCastError,
+        "ProtoMap('properties') takes a dict, but got list: [1]"
+    )
+    StructMapping.fields.cast.when.called_with({'age': {'amount': 'many'}}).should.throw(
+        ProtobufCastError,
+        'could not convert string to float: \'many\' while casting "many" (str) to float'
+    )
+    StructMapping.fields.cast(None).should.be.none
+
+
+def test_proto_map_invalid_declaration():
+    "ProtoMap() should only be declared for map fields"
+
+    def declare():
+        class InvalidMapping(ProtoMapping):
+            __proto__ = struct_pb2.ListValue
+
+            values = ProtoMap('values', ValueMapping)
+
+    declare.when.called_with().should.throw(
+        TypeError,
+        'ProtoMap() must be declared for a map field, but google.protobuf.ListValue.values is not one'
+    )
+
+
+def test_proto_map_from_protobuf():
+    "from_protobuf() should convert the values of ProtoMap() fields back with the nested mapping"
+
+    message = struct_pb2.Struct(fields={'name': struct_pb2.Value(string_value='Hulk')})
+
+    parsed = StructMapping.from_protobuf(message)
+
+    parsed.should.have.key('properties').being.a(dict)
+    parsed['properties'].should.have.key('name')
+    parsed['properties']['name'].should.have.key('text').being.equal('Hulk')
+    KeyedStructMapping.from_protobuf(message)['properties'].should.equal(dict(message.fields))
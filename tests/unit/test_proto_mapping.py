@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import weakref
+
 from mock import patch
 from google.protobuf.timestamp_pb2 import Timestamp
 
@@ -63,3 +65,67 @@ def test_proto_mapping_object_incompatible_with_source_input_type():
         "<dummy_object> must be a dict "
         "or <class 'tests.unit.test_proto_mapping.MyCustomObjectWithTimestampData'> "
         "but is <class 'tests.unit.test_proto_mapping.test_proto_mapping_object_incompatible_with_source_input_type.<locals>.DummyObject'> instead")
+
+
+def test_proto_mapping_to_protobuf_many_without_compiled_plan():
+    "ProtoMapping.to_protobuf_many() should use to_protobuf() of mappings that customize the conversion"
+
+    class DoubleTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        def to_protobuf(self):
+            return Timestamp(seconds=self.data * 2)
+
+    result = DoubleTimestampMapping.to_protobuf_many([1, 2])
+    result.should.equal([Timestamp(seconds=2), Timestamp(seconds=4)])
+
+
+def test_proto_mapping_instances_use_slots():
+    "ProtoMapping instances should only hold their data when declared with __compact__, unless the subclass defines __init__"
+
+    class CompactTimestampMapping(ProtoMapping):
+        __proto__ = Timestamp
+        __compact__ = True
+
+    class CompactSubclassMapping(CompactTimestampMapping):
+        __proto__ = Timestamp
+
+    class CustomTimestampMapping(CompactTimestampMapping):
+        __proto__ = Timestamp
+
+        def __init__(self, data, factor):
+            super().__init__(data)
+            self.factor = factor
+
+    CompactTimestampMapping({}).shouldnt.have.property('__dict__')
+    CompactSubclassMapping({}).shouldnt.have.property('__dict__')
+    CustomTimestampMapping({}, 2).factor.should.equal(2)
+
+
+def test_proto_mapping_instances_keep_attributes_by_default():
+    "ProtoMapping instances should take arbitrary attributes and weak references unless declared with __compact__"
+
+    # Given an instance of a mapping without __compact__
+    mapping = TimestampMapping({})
+
+    # When I set an attribute and take a weak reference
+    mapping.origin = 'test'
+    reference = weakref.ref(mapping)
+
+    # Then both work as with any python object
+    mapping.origin.should.equal('test')
+    reference().should.be(mapping)
+
+
+def test_proto_mapping_shares_implicit_fields():
+    "mappings of the same __proto__ should share their implicit fields"
+
+    class SecondsMapping(ProtoMapping):
+        __proto__ = Timestamp
+
+        seconds = ProtoKey('time', int)
+
+    SecondsMapping.__implicit_mappings__.should.be(TimestampMapping.__implicit_mappings__)
+    SecondsMapping.__fields__['nanos'].should.be(TimestampMapping.__fields__['nanos'])
+    SecondsMapping.__fields__['seconds'].name_at_source.should.equal('time')
+    SecondsMapping.__implicit_mappings__['seconds'].name_at_source.should.equal('seconds')
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from google.protobuf import struct_pb2
+from google.protobuf import type_pb2
+
+from mercator import (
+    ProtoMapping,
+    ProtoKey,
+    ProtoOneOf,
+)
+from mercator.errors import ProtobufCastError
+
+
+class Record(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+    __source_input_type__ = Record
+
+    kind = ProtoOneOf('type', aliases={'number': 'number_value', 'text': 'string_value'})
+    number_value = ProtoKey('amount', float)
+    string_value = ProtoKey('text', str)
+    bool_value = ProtoKey('flag', bool)
+
+
+class StrictValueMapping(ProtoMapping):
+    __proto__ = struct_pb2.Value
+
+    kind = ProtoOneOf()
+    number_value = ProtoKey('amount', float)
+    string_value = ProtoKey('text', str)
+
+
+def test_proto_oneof_binding():
+    "ProtoOneOf() should be bound to the oneof it is named after and kept apart from the fields"
+
+    ValueMapping.__oneofs__.should.equal({'kind': ValueMapping.kind})
+    ValueMapping.__fields__.shouldnt.have.key('kind')
+
+    ValueMapping.kind.oneof.should.equal('kind')
+    ValueMapping.kind.members.should.equal((
+        'null_value', 'number_value', 'string_value', 'bool_value', 'struct_value', 'list_value',
+    ))
+    ValueMapping.kind.choices.should.have.key('text').being.equal('string_value')
+    ValueMapping.kind.choices.should.have.key('bool_value').being.equal('bool_value')
+
+
+def test_proto_oneof_chooses_member_by_discriminator():
+    "ProtoOneOf() should only set the member chosen by the discriminator"
+
+    # Given a source with values for several members
+    data = {'type': 'text', 'amount': 1, 'text': 'one', 'flag': True}
+
+    # When I convert it
+    message = ValueMapping(data).to_protobuf()
+
+    # Then only the chosen member is set
+    message.WhichOneof('kind').should.equal('string_value')
+    message.string_value.should.equal('one')
+
+    # And member names choose members too
+    ValueMapping({'type': 'bool_value', 'amount': 1, 'flag': True}).to_protobuf().should.equal(struct_pb2.Value(bool_value=True))
+
+    # And the interpreted path and objects agree
+    ValueMapping(data).to_dict().should.equal({'string_value': 'one'})
+    record = Record(type='number', amount=2, text='two', flag=None)
+    ValueMapping(record).to_protobuf().should.equal(struct_pb2.Value(number_value=2.0))
+
+
+def test_proto_oneof_chosen_member_without_value():
+    "ProtoOneOf() should leave the oneof unset when the chosen member has no value"
+
+    message = ValueMapping({'type': 'number', 'text': 'one'}).to_protobuf()
+
+    message.WhichOneof('kind').should.be.none
+
+
+def test_proto_oneof_unknown_discriminator():
+    "ProtoOneOf() should reject discriminators that choose no member"
+
+    ValueMapping({'type': 'integer', 'amount': 1}).to_protobuf.when.called_with().should.throw(
+        ProtobufCastError,
+        '"integer" (str) is not a member of the oneof kind'
+    )
+    ValueMapping({'type': ['text'], 'amount': 1}).to_protobuf.when.called_with().should.throw(
+        ProtobufCastError,
+        "\"['text']\" (list) is not a member of the oneof kind"
+    )
+
+
+def test_proto_oneof_without_discriminator():
+    "ProtoOneOf() should reject sources where several members have values when there is no discriminator"
+
+    # Given sources without discriminator
+    StrictValueMapping({'text': 'one'}).to_protobuf().should.equal(struct_pb2.Value(string_value='one'))
+    ValueMapping({'amount': 1}).to_protobuf().should.equal(struct_pb2.Value(number_value=1.0))
+
+    # When several members have values
+    # Then the conversion fails rather than keeping the last one
+    for mapping in (StrictValueMapping, ValueMapping):
+        mapping({'amount': 1, 'text': 'one'}).to_protobuf.when.called_with().should.throw(
+            ProtobufCastError,
+            'several members of the oneof kind have values: number_value, string_value'
+        )
+        mapping({'amount': 1, 'text': 'one'}).to_dict.when.called_with().should.throw(
+            ProtobufCastError,
+            'several members of the oneof kind have values: number_value, string_value'
+        )
+
+
+def test_proto_oneof_to_bytes():
+    "ProtoOneOf() should be applied by to_bytes() as well"
+
+    ValueMapping({'type': 'text', 'amount': 1, 'text': 'one'}).to_bytes().should.equal(
+        struct_pb2.Value(string_value='one').SerializeToString()
+    )
+
+
+def test_proto_oneof_from_protobuf():
+    "from_protobuf() should return the discriminator of the member set, preferring its alias"
+
+    parsed = ValueMapping.from_protobuf(struct_pb2.Value(string_value='one'))
+    parsed.should.have.key('type').being.equal('text')
+    parsed.should.have.key('text').being.equal('one')
+
+    ValueMapping.from_protobuf(struct_pb2.Value(bool_value=False)).should.have.key('type').being.equal('bool_value')
+    ValueMapping.from_protobuf(struct_pb2.Value()).should.have.key('type').being.none
+    StrictValueMapping.from_protobuf(struct_pb2.Value(string_value='one')).shouldnt.have.key('type')
+
+
+def test_proto_oneof_invalid_declarations():
+    "ProtoOneOf() should only be declared with the name of a oneof and aliases of its members"
+
+    def declare(proto, name, field):
+        return type('InvalidMapping', (ProtoMapping,), {'__proto__': proto, name: field})
+
+    declare.when.called_with(type_pb2.Field, 'kind', ProtoOneOf('type')).should.throw(
+        SyntaxError,
+        'class InvalidMapping declares ProtoOneOf() as kind but Field has no oneof named kind'
+    )
+    declare.when.called_with(struct_pb2.Value, 'kind', ProtoOneOf('type', aliases={'int': 'int_value'})).should.throw(
+        TypeError,
+        "ProtoOneOf() takes aliases of the members of google.protobuf.Value.kind, but got 'int': 'int_value'"
+    )
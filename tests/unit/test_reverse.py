@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from google.protobuf.struct_pb2 import ListValue, Struct, Value
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoList, ProtoMapping, SinglePropertyMapping
+from mercator.reverse import compile_parser
+
+
+def test_single_property_mapping_from_protobuf():
+    "SinglePropertyMapping.from_protobuf() should return the value of its single property"
+
+    ProtobufTimestamp = SinglePropertyMapping(int, Timestamp, 'seconds')
+
+    ProtobufTimestamp.from_protobuf(Timestamp(seconds=42)).should.equal(42)
+
+
+def test_compile_parser_struct_and_list_values():
+    "compile_parser() should convert Struct and ListValue declared as dict and list into python objects"
+
+    # Given a mapping of a oneof with struct and list values
+    class ValueMapping(ProtoMapping):
+        __proto__ = Value
+
+        struct_value = ProtoKey('fields', dict)
+        list_value = ProtoKey('items', list)
+
+    parse = compile_parser(ValueMapping)
+
+    # When I parse a message with a struct value
+    result = parse(Value(struct_value=Struct(fields={'answer': Value(number_value=42)})))
+
+    # Then it should become a dict, and unset oneof members None
+    result['fields'].should.equal({'answer': 42})
+    result['items'].should.be.none
+    result['number_value'].should.be.none
+
+    # And the source code should be available for debugging
+    parse.__source__.should.contain("'fields': p4(message.struct_value) if message.HasField('struct_value') else None")
+
+
+def test_compile_parser_nested_repeated_mappings():
+    "compile_parser() should parse repeated fields of nested mappings"
+
+    class ValueMapping(ProtoMapping):
+        __proto__ = Value
+
+        number_value = ProtoKey('number')
+
+    class ListValueMapping(ProtoMapping):
+        __proto__ = ListValue
+
+        values = ProtoList('numbers', ValueMapping)
+
+    message = ListValue(values=[Value(number_value=1), Value(string_value='two')])
+
+    ListValueMapping.from_protobuf(message)['numbers'].should.equal([
+        {'null_value': None, 'number': 1.0, 'string_value': None, 'bool_value': None, 'struct_value': None, 'list_value': None},
+        {'null_value': None, 'number': None, 'string_value': 'two', 'bool_value': None, 'struct_value': None, 'list_value': None},
+    ])
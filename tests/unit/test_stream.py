@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from mercator import ProtoKey, ProtoMapping
+from mercator.stream import encode_delimited
+from mercator.stream import iter_parse_delimited
+from mercator.wire import get_encoder
+
+
+class TimestampMapping(ProtoMapping):
+    __proto__ = Timestamp
+
+    seconds = ProtoKey('seconds', int)
+
+
+def test_encode_delimited_prefixes_size():
+    "encode_delimited() should prefix the encoded message with its size as a varint"
+
+    out = bytearray(b'previous')
+    encode_delimited(get_encoder(TimestampMapping), {'seconds': 1 << 40}, out)
+
+    payload = Timestamp(seconds=1 << 40).SerializeToString()
+    bytes(out).should.equal(b'previous' + bytes([len(payload)]) + payload)
+
+
+def test_encode_delimited_consecutive_messages():
+    "iter_parse_delimited() should parse back consecutive messages written by encode_delimited()"
+
+    out = bytearray()
+    for value in range(100):
+        encode_delimited(get_encoder(TimestampMapping), {'seconds': value << 40}, out)
+
+    result = list(iter_parse_delimited(Timestamp, bytes(out)))
+    result.should.have.length_of(100)
+    result[99].seconds.should.equal(99 << 40)
+
+
+def test_iter_delimited_empty():
+    "ProtoMapping.iter_delimited() should generate nothing for no records"
+
+    list(TimestampMapping.iter_delimited([])).should.equal([])
+    list(TimestampMapping.iter_delimited([], chunk_size=10)).should.equal([])
+    list(TimestampMapping.iter_delimited([None])).should.equal([b'\x00'])
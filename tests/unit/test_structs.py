@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+import sys
+import uuid
+import decimal
+import datetime
+
+from google.protobuf import json_format
+from google.protobuf.struct_pb2 import Struct, ListValue, Value
+
+from mercator import StructCaster
+from mercator.structs import (
+    DEFAULT_COERCIONS,
+    MAX_NESTING,
+    encode,
+    to_struct,
+    to_list_value,
+    to_value,
+)
+
+
+def test_to_struct_same_message_as_protobuf():
+    "to_struct() should produce the same message as Struct.update()"
+
+    # Given a document with every JSON type, nested
+    document = {
+        'name': 'Hulk',
+        'ünïcode': 'ß' * 200,
+        'count': 3,
+        'ratio': 0.5,
+        'active': True,
+        'deleted': False,
+        'parent': None,
+        'tags': ['green', ('strong', 1), []],
+        'profile': {'address': {'city': 'NYC', 'zip': [1, 0, 0, 0, 1]}, 'empty': {}},
+    }
+    expected = Struct()
+    expected.update(document)
+
+    # When I convert it
+    result = to_struct(document)
+
+    # Then it should equal the message built by protobuf
+    result.should.equal(expected)
+
+
+def test_encode_deeply_nested():
+    "encode() should reject documents nested deeper than protobuf parses, without recursion"
+
+    # Given a document nested deeper than the recursion limit
+    document = leaf = {}
+    for _ in range(sys.getrecursionlimit() + 100):
+        leaf['child'] = [{}]
+        leaf = leaf['child'][0]
+
+    # When I serialize it
+    # Then it fails at the maximum nesting
+    encode.when.called_with(document).should.have.raised(
+        ValueError,
+        f'documents cannot be nested deeper than {MAX_NESTING} containers'
+    )
+
+
+def test_encode_maximum_nesting():
+    "to_list_value() should convert documents nested up to MAX_NESTING containers"
+
+    # Given a list nested MAX_NESTING times
+    document = leaf = []
+    for _ in range(MAX_NESTING - 1):
+        leaf.append([])
+        leaf = leaf[0]
+
+    # When I convert it
+    message = to_list_value(document)
+
+    # Then protobuf parses every level
+    depth = 1
+    while message.values:
+        message = message.values[0].list_value
+        depth += 1
+
+    depth.should.equal(MAX_NESTING)
+
+
+def make_nested_document(depth, lists=False):
+    """returns a document of ``depth`` containers, alternating objects
+    and lists of objects when ``lists`` is ``True``."""
+    document = leaf = {'depth': 1}
+    count = 1
+    while count < depth:
+        if lists and count + 2 <= depth:
+            child = {'depth': count + 2}
+            leaf['items'] = ['first', child]
+            count += 2
+        else:
+            child = {'depth': count + 1}
+            leaf['child'] = child
+            count += 1
+        leaf = child
+
+    return document
+
+
+def test_to_struct_deeper_than_protobuf_parses():
+    "to_struct() should convert objects nested up to MAX_NESTING containers, even beyond the depth protobuf parses"
+
+    for depth in range(34, MAX_NESTING + 1):
+        for lists in (False, True):
+            # Given a document nested that deep
+            document = make_nested_document(depth, lists)
+
+            # When I convert it
+            result = to_struct(document)
+
+            # Then it equals the message built by protobuf
+            result.should.equal(json_format.ParseDict(document, Struct()))
+            to_value(document).struct_value.should.equal(result)
+            to_struct(json_format.MessageToJson(result).encode('utf-8')).should.equal(result)
+
+    # And deeper documents are still rejected
+    to_struct.when.called_with(make_nested_document(MAX_NESTING + 1)).should.have.raised(
+        ValueError,
+        f'documents cannot be nested deeper than {MAX_NESTING} containers'
+    )
+
+
+def test_to_struct_embeds_deep_messages():
+    "to_struct() should embed Struct, ListValue and Value messages nested deeper than protobuf parses"
+
+    # Given a message of a document nested 40 times, and a Value of it
+    nested = to_struct(make_nested_document(40))
+    value = Value()
+    value.struct_value.CopyFrom(nested)
+
+    # When I embed them in every kind of message
+    result = to_struct({'struct': nested, 'list': [nested], 'value': value})
+
+    # Then it is copied as is
+    result.fields['struct'].struct_value.should.equal(nested)
+    result.fields['list'].list_value.values[0].struct_value.should.equal(nested)
+    result.fields['value'].struct_value.should.equal(nested)
+
+
+def test_encode_circular_references():
+    "encode() should reject containers that contain themselves"
+
+    # Given documents that contain themselves
+    document = {'name': 'loop'}
+    document['self'] = document
+    items = [1]
+    items.append({'items': items})
+
+    # Then they fail at the circular reference
+    encode.when.called_with(document).should.have.raised(
+        ValueError,
+        "circular reference detected at ['self']"
+    )
+    encode.when.called_with(items, Value).should.have.raised(
+        ValueError,
+        "circular reference detected at [1]['items']"
+    )
+
+    # And containers shared by siblings are not circular
+    shared = {'a': 1}
+    to_struct({'x': shared, 'y': shared}).should.equal(to_struct({'x': {'a': 1}, 'y': {'a': 1}}))
+
+
+def test_to_struct_nested():
+    "to_struct() should convert nested documents"
+
+    # Given a document nested 10 times
+    document = leaf = {}
+    for _ in range(10):
+        leaf['child'] = [{}]
+        leaf = leaf['child'][0]
+    leaf['answer'] = 42
+
+    # When I convert it
+    result = to_struct(document)
+
+    # Then the leaf should be found at the bottom
+    value = result
+    for _ in range(10):
+        value = value.fields['child'].list_value.values[0].struct_value
+    value.fields['answer'].number_value.should.equal(42)
+
+
+def test_to_struct_default_coercions():
+    "to_struct() should coerce decimals, dates and UUIDs by default"
+
+    # When I convert values that protobuf does not take
+    result = to_struct({
+        'price': decimal.Decimal('9.99'),
+        'created_at': datetime.datetime(2019, 3, 10, 18, 53, 53),
+        'day': datetime.date(2019, 3, 10),
+        'id': uuid.UUID(int=1),
+    })
+
+    # Then they should be coerced into JSON values
+    dict(result).should.equal({
+        'price': 9.99,
+        'created_at': '2019-03-10T18:53:53',
+        'day': '2019-03-10',
+        'id': '00000000-0000-0000-0000-000000000001',
+    })
+
+
+def test_to_struct_custom_coercions():
+    "to_struct() should coerce values with the given table, including into containers"
+
+    # Given a table that turns sets into sorted lists and decimals into strings
+    coercions = {**DEFAULT_COERCIONS, frozenset: sorted, decimal.Decimal: str}
+
+    # When I convert a document with those values
+    result = to_struct({'tags': frozenset(['b', 'a']), 'price': decimal.Decimal('9.99')}, coercions)
+
+    # Then they should be coerced with the table
+    result.fields['tags'].list_value.should.equal(to_list_value(['a', 'b']))
+    result.fields['price'].string_value.should.equal('9.99')
+
+
+def test_to_struct_json_text():
+    "to_struct() and to_list_value() should parse JSON documents"
+
+    to_struct(b'{"a": [1, {"b": null}]}').should.equal(to_struct({'a': [1, {'b': None}]}))
+    to_struct('{"a": true}').should.equal(to_struct({'a': True}))
+    to_list_value(bytearray(b'[1, "2"]')).should.equal(to_list_value([1, '2']))
+
+
+def test_to_value():
+    "to_value() should convert scalars, containers and JSON bytes but keep strings as is"
+
+    to_value('{"a": 1}').should.equal(Value(string_value='{"a": 1}'))
+    to_value(b'{"a": 1}').struct_value.should.equal(to_struct({'a': 1}))
+    to_value([1, 'a']).list_value.should.equal(to_list_value([1, 'a']))
+    to_value(None).should.equal(Value(null_value=0))
+    to_value(decimal.Decimal('1.5')).should.equal(Value(number_value=1.5))
+
+
+def test_to_struct_embeds_messages():
+    "to_struct() should embed Struct, ListValue and Value messages"
+
+    result = to_struct({
+        'struct': to_struct({'a': 1}),
+        'list': to_list_value([1]),
+        'value': Value(string_value='x'),
+    })
+
+    result.fields['struct'].struct_value.should.equal(to_struct({'a': 1}))
+    result.fields['list'].list_value.should.equal(to_list_value([1]))
+    result.fields['value'].string_value.should.equal('x')
+
+
+def test_to_struct_unsupported_value():
+    "to_struct() should point at values that cannot be coerced"
+
+    to_struct.when.called_with({'a': [1, {'b': object()}]}).should.have.raised(
+        TypeError,
+        "object is not JSON serializable at ['a'][1]['b']"
+    )
+
+
+def test_to_struct_invalid_keys():
+    "to_struct() should require string keys"
+
+    to_struct.when.called_with({'a': {1: 'one'}}).should.have.raised(
+        TypeError,
+        "Struct keys must be strings, but got 1 at ['a']"
+    )
+
+
+def test_to_struct_invalid_container():
+    "to_struct() should require a mapping"
+
+    to_struct.when.called_with([1]).should.have.raised(
+        TypeError,
+        'google.protobuf.Struct takes a mapping, but got list instead'
+    )
+
+
+def test_struct_caster():
+    "StructCaster() should convert with its coercion table and back with from_protobuf()"
+
+    # Given a caster of ListValue that turns sets into sorted lists
+    caster = StructCaster(ListValue, coercions={set: sorted})
+
+    # When I cast a list and parse it back
+    message = caster([{'b', 'a'}])
+
+    # Then it should be a ListValue with the coerced values
+    message.should.equal(to_list_value([['a', 'b']]))
+    caster.from_protobuf(message).should.equal([['a', 'b']])
+
+
+def test_struct_caster_invalid_message_type():
+    "StructCaster() should only take Struct, ListValue or Value"
+
+    def make_caster():
+        return StructCaster(dict)
+
+    make_caster.when.called_with().should.have.raised(
+        TypeError,
+        "StructCaster() takes Struct, ListValue or Value, but got <class 'dict'> instead"
+    )
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import decimal
+import datetime
+
+from google.protobuf.duration_pb2 import Duration
+from google.protobuf.field_mask_pb2 import FieldMask
+from google.protobuf.timestamp_pb2 import Timestamp
+from google.protobuf.wrappers_pb2 import Int32Value, Int64Value, StringValue
+
+from mercator import WrapperCaster
+from mercator import WellKnownCaster
+from mercator.wellknown import (
+    TIMESTAMP,
+    DURATION,
+    FIELD_MASK,
+    INT64_VALUE,
+    STRING_VALUE,
+)
+
+
+UTC = datetime.timezone.utc
+
+
+def test_timestamp_from_datetimes():
+    "TimestampCaster() should convert naive datetimes as UTC and aware ones to UTC"
+
+    naive = datetime.datetime(2019, 3, 10, 18, 53, 53, 500000)
+    aware = datetime.datetime(2019, 3, 10, 20, 53, 53, 500000, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+
+    TIMESTAMP.to_fields(naive).should.equal({'seconds': 1552244033, 'nanos': 500000000})
+    TIMESTAMP.to_fields(aware).should.equal({'seconds': 1552244033, 'nanos': 500000000})
+    TIMESTAMP.to_fields(datetime.datetime(1969, 12, 31, 23, 59, 59)).should.equal({'seconds': -1, 'nanos': 0})
+    TIMESTAMP.to_fields(datetime.date(2019, 3, 10)).should.equal({'seconds': 1552176000})
+
+
+def test_timestamp_from_seconds():
+    "TimestampCaster() should convert seconds since the epoch with nanoseconds"
+
+    TIMESTAMP.to_fields(1552244033).should.equal({'seconds': 1552244033})
+    TIMESTAMP.to_fields(1552244033.25).should.equal({'seconds': 1552244033, 'nanos': 250000000})
+    TIMESTAMP.to_fields(-1.5).should.equal({'seconds': -2, 'nanos': 500000000})
+    TIMESTAMP.to_fields(decimal.Decimal('1.000000001')).should.equal({'seconds': 1, 'nanos': 1})
+
+
+def test_timestamp_from_iso_strings():
+    "TimestampCaster() should parse ISO 8601 strings with up to nanoseconds"
+
+    TIMESTAMP.to_fields('2019-03-10T18:53:53.123456789Z').should.equal({'seconds': 1552244033, 'nanos': 123456789})
+    TIMESTAMP.to_fields('2019-03-10 20:53:53.5+02:00').should.equal({'seconds': 1552244033, 'nanos': 500000000})
+    TIMESTAMP.to_fields('2019-03-10T13:23:53-0530').should.equal({'seconds': 1552244033, 'nanos': 0})
+    TIMESTAMP.to_fields('2019-03-10').should.equal({'seconds': 1552176000, 'nanos': 0})
+
+    # And the result equals the parser of protobuf
+    expected = Timestamp()
+    expected.FromJsonString('2019-03-10T18:53:53.000001Z')
+    TIMESTAMP('2019-03-10T18:53:53.000001Z').should.equal(expected)
+
+
+def test_timestamp_invalid_values():
+    "TimestampCaster() should reject invalid strings, dates and types"
+
+    TIMESTAMP.to_fields.when.called_with('yesterday').should.have.raised(
+        ValueError, "'yesterday' is not an ISO 8601 timestamp")
+    TIMESTAMP.to_fields.when.called_with('2019-02-30').should.have.raised(ValueError)
+    TIMESTAMP.to_fields.when.called_with(float('nan')).should.have.raised(ValueError)
+    TIMESTAMP.to_fields.when.called_with([1]).should.have.raised(
+        TypeError, 'cannot convert list to Timestamp')
+
+
+def test_timestamp_round_trip():
+    "TimestampCaster() should return messages and parse them back into aware datetimes"
+
+    value = datetime.datetime(2019, 3, 10, 18, 53, 53, 123456, tzinfo=UTC)
+    message = TIMESTAMP(value)
+
+    message.should.be.a(Timestamp)
+    TIMESTAMP.from_protobuf(message).should.equal(value)
+    TIMESTAMP.to_fields(message).should.be(message)
+
+
+def test_duration():
+    "DurationCaster() should convert timedeltas, seconds and strings with the sign on both fields"
+
+    DURATION.to_fields(datetime.timedelta(seconds=90, microseconds=5)).should.equal({'seconds': 90, 'nanos': 5000})
+    DURATION.to_fields(datetime.timedelta(seconds=-1.5)).should.equal({'seconds': -1, 'nanos': -500000000})
+    DURATION.to_fields(-1.5).should.equal({'seconds': -1, 'nanos': -500000000})
+    DURATION.to_fields(3).should.equal({'seconds': 3})
+    DURATION.to_fields('-0.000000001s').should.equal({'seconds': 0, 'nanos': -1})
+    DURATION.to_fields.when.called_with('1 hour').should.have.raised(ValueError, '\'1 hour\' is not a duration like "1.5s"')
+
+    DURATION.from_protobuf(DURATION(datetime.timedelta(seconds=-1.5))).should.equal(datetime.timedelta(seconds=-1.5))
+    DURATION(90).should.equal(Duration(seconds=90))
+
+
+def test_wrappers():
+    "WrapperCaster() should wrap values cast with the python type of the wrapper"
+
+    INT64_VALUE('42').should.equal(Int64Value(value=42))
+    STRING_VALUE.to_fields(42).should.equal({'value': '42'})
+    INT64_VALUE.from_protobuf(Int64Value(value=42)).should.equal(42)
+    WrapperCaster(StringValue, str.upper)('hulk').should.equal(StringValue(value='HULK'))
+
+
+def test_wrapper_invalid_type():
+    "WrapperCaster() should only take the types of google.protobuf.wrappers_pb2"
+
+    def make_caster():
+        return WrapperCaster(Timestamp)
+
+    make_caster.when.called_with().should.have.raised(
+        TypeError,
+        'WrapperCaster() takes a type of google.protobuf.wrappers_pb2, '
+        "but got <class 'google.protobuf.timestamp_pb2.Timestamp'> instead"
+    )
+
+
+def test_to_fields_rejects_values_of_the_message():
+    "to_fields() should raise the errors of the message constructor for values it rejects"
+
+    WrapperCaster(Int32Value).to_fields.when.called_with(2 ** 40).should.have.raised(
+        ValueError, 'Value out of range: 1099511627776'
+    )
+    TIMESTAMP.to_fields.when.called_with(2 ** 70).should.have.raised(ValueError, 'Value out of range')
+    DURATION.to_fields.when.called_with(-2 ** 70).should.have.raised(ValueError, 'Value out of range')
+    FIELD_MASK.to_fields.when.called_with(['name', 1]).should.have.raised(TypeError)
+
+
+def test_field_mask():
+    "FieldMaskCaster() should convert lists of paths and comma-separated strings"
+
+    FIELD_MASK(['uuid', 'author.email']).should.equal(FieldMask(paths=['uuid', 'author.email']))
+    FIELD_MASK.to_fields('uuid, author.email').should.equal({'paths': ['uuid', 'author.email']})
+    FIELD_MASK.from_protobuf(FieldMask(paths=['uuid'])).should.equal(['uuid'])
+    FIELD_MASK.to_fields.when.called_with(1).should.have.raised(TypeError, 'cannot convert int to FieldMask')
+
+
+def test_casters_must_implement_to_fields_and_from_protobuf():
+    "WellKnownCaster subclasses without to_fields() and from_protobuf() should not be instantiable"
+
+    # Given a caster that only implements to_fields()
+    class IncompleteCaster(WellKnownCaster):
+        __slots__ = ()
+
+        message_type = Timestamp
+
+        def to_fields(self, value):
+            return {'seconds': value}
+
+    # When I instantiate it, then it should fail
+    IncompleteCaster.when.called_with().should.have.raised(TypeError, 'abstract')
+    WellKnownCaster.when.called_with().should.have.raised(TypeError, 'abstract')